@@ -46,12 +46,11 @@ def build_library(*, library_source_directory, archive_file, api_version_file, i
     # enforce library dependencies described by *library_names*
     with dlb.di.Cluster(f'check included files'):
         n = len(library_source_directory.parts)
-        for r in compile_results:
-            if r:
-                for p in r.included_files:
-                    if p[:n] not in include_directories:
-                        msg = f'{library_source_directory.as_string()!r} must not depend on {p.as_string()!r}'
-                        raise Exception(msg)
+        for r in compile_results:  # also without redo: included files of the last redo
+            for p in r.included_files:
+                if p[:n] not in include_directories:
+                    msg = f'{library_source_directory.as_string()!r} must not depend on {p.as_string()!r}'
+                    raise Exception(msg)
 
     with dlb.di.Cluster(f'link'):
         dlb_contrib.gnubinutils.Archive(object_files=[r.object_files[0] for r in compile_results],
@@ -88,7 +87,7 @@ with dlb.ex.Context():
                 result_file=output_directory / f'check/{library_source_directory.components[-1]}.complete'
             ).start()
 
-            with dlb.ex.Context():  # waits for previous redos to complete
+            with dlb.ex.Context():  # waits for redos of this library to complete on exit
                 if needs_update:  # need to take a closer look?
                     build_library(library_source_directory=library_source_directory,
                                   archive_file=archive_file,
@@ -5,6 +5,7 @@
 """Configuration parameters."""
 
 import datetime
+from typing import Callable, Optional
 from . import level
 
 # When > 0, a summary of the latest *latest_run_summary_max_count* dlb runs is output when a root context exits.
@@ -14,6 +15,56 @@ latest_run_summary_max_count: int = 0
 # 'max_dependency_age > datetime.timedelta(0)' must be True.
 max_dependency_age: datetime.timedelta = datetime.timedelta(days=30)
 
+# Name of a set of SQLite settings for the run-database: 'safe', 'fast', or 'ci-ephemeral'.
+# 'safe': run-database is consistent after a power failure; every commit is durable.
+# 'fast': run-database is consistent after a power failure; the latest commits may be lost.
+# 'ci-ephemeral': run-database may be corrupted by a power failure (for a run-database that is discarded afterwards).
+rundb_profile: str = 'safe'
+
+# When True, all information on tool instances of the current platform is read from the run-database into memory
+# when a root context is entered.
+# This is faster when most tool instances are run in a dlb run (e.g. a no-op build with many tool instances) but
+# needs more memory.
+preload_run_database: bool = False
+
+# When True, the memo of each filesystem object in the managed tree is read at most once per dlb run unless a tool
+# instance modifies it (e.g. an input dependency used by many tool instances).
+# Do not use if filesystem objects in the managed tree are modified by other means during a dlb run.
+cache_filesystem_object_memos: bool = False
+
+# Maximum number of filesystem objects in the managed tree whose status is read in parallel (by threads) when the
+# redo necessity of a tool instance is checked. Values > 1 are faster on a filesystem with high latency (e.g. NFS).
+max_parallel_memo_read_count: int = 1
+
+# Use the change journal of the working tree (recorded by 'dlb --watch-changes') to avoid reading the status of input
+# dependencies not modified since they were last read? Ignored if no watcher is running for the working tree.
+use_change_journal: bool = False
+
+# When True, 'start()' of a tool instance does not start a necessary redo but queues it. The queued redos are started
+# when the dlb script waits for a pending redo (e.g. by accessing its result or when a context is exited),
+# the one with the longest duration of its last successful redo first (the ones without a known duration before all
+# others) and without exceeding the 'max_parallel_redo_count' of the context.
+# With 'max_parallel_redo_count > 1', this avoids a long redo at the end of a dlb run that is mostly executed serially.
+# Use 'complete()' on the result of 'start()' if a redo must not be started before another one is completed.
+schedule_redos_by_expected_duration: bool = False
+
+# None or a callable that decides whether another redo may be started while *n* redos are pending (*n* > 0), in
+# addition to the limit set by 'max_parallel_redo_count' (e.g. to adapt the number of pending redos to the load and
+# available memory). Called with *n* as the only argument; another redo is started only if it returns True.
+# Is called again when a pending redo is completed or after a short time.
+# See 'dlb_contrib.linux.LoadAwareRedoAdmission' for an example.
+parallel_redo_admission: Optional[Callable[[int], bool]] = None
+
+# When True and the dlb script is run by GNU Make with a jobserver (advertised in the environment variable MAKEFLAGS),
+# each pending redo other than the first one of a dlb run needs a job token of this jobserver (in addition to the
+# limit set by 'max_parallel_redo_count').
+use_jobserver_of_make: bool = True
+
+# When True, helpers executed by a redo get a jobserver for GNU Make advertised in the environment variable MAKEFLAGS
+# (unless given explicitly): the one of 'use_jobserver_of_make' if used or else one created by the root context
+# with job tokens for 'max_parallel_redo_count' of the root context. Pending redos also need a job token of it.
+provide_jobserver_to_helpers: bool = False
+
 # Default value for output files of execute_helper*(), that is used when *None* is given.
 # False means: Output is suppressed by default.
 # True means: Output file is inherited from the Python process by default.
@@ -21,3 +72,4 @@ execute_helper_inherits_files_by_default: bool = True
 
 # Remove everything that is not a configuration parameter:
 del datetime
+del Callable, Optional
@@ -8,64 +8,212 @@ This is an implementation detail - do not import it unless you know what you are
 __all__ = []
 
 import time
+import heapq
 import asyncio
-from typing import Any, Callable, Coroutine, Dict, Hashable, Optional, Set
+import collections
+from typing import Any, Callable, Coroutine, Deque, Dict, Hashable, Iterable, List, Mapping, Optional, Set, Tuple
+
+
+# Interval in seconds to ask again for admission of a coroutine when admission was refused and no pending coroutine
+# is done in the meantime.
+ADMISSION_POLL_INTERVAL = 0.25
 
 
 class IdError(ValueError):
     pass
 
 
+def _set_result_unless_done(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
 class LimitingCoroutineSequencer:
     # Runs coroutines in a common 'asyncio' loop and limits the number of pending coroutines started by
-    # 'wait_then_start()'.
+    # 'wait_then_start()' or 'enqueue()'.
     # All public methods are normal synchronous methods, so this class acts as an intermediary between synchronous code
     # and coroutines.
-
-    def __init__(self, asyncio_loop: Optional[asyncio.AbstractEventLoop] = None):
+    #
+    # A coroutine queued by 'enqueue()' can also need tokens of named resources; the sum of the tokens needed by
+    # all pending coroutines never exceeds *resource_limits[r]* for a resource *r* in *resource_limits*.
+    # It can also be held back until other coroutines of the same instance are done.
+    #
+    # A coroutine can be assigned to a group (e.g. the context it was started in); its group can be completed,
+    # cancelled and consumed on its own. The limits hold for the coroutines of all groups together.
+
+    def __init__(self, asyncio_loop: Optional[asyncio.AbstractEventLoop] = None,
+                 resource_limits: Optional[Mapping[Hashable, int]] = None):
         if asyncio_loop is None:
             asyncio_loop = asyncio.get_event_loop()
         self._asyncio_loop = asyncio_loop
+        self._resource_limits = self._normalize_resource_limits(resource_limits)
+        self._used_resources: Dict[Hashable, int] = {}  # tokens needed by all pending tasks
+        self._resources_by_tid: Dict[int, Dict[Hashable, int]] = {}  # tokens needed by pending task
         self._tid_by_pending_task: Dict[asyncio.Task, int] = {}
         self._pending_task_by_tid: Dict[int, asyncio.Task] = {}
         self._next_tid = 0
         self._result_by_tid: Dict[int, Any] = {}
         self._exception_by_tid: Dict[int, BaseException] = {}
+        self._queued_by_tid: Dict[int, Tuple[int, Optional[Callable[[int], bool]], Dict[Hashable, int],
+                                             Dict[Hashable, int], Callable[[Any], Coroutine], tuple, dict]] = {}
+        self._tid_queue: List[Tuple[float, int]] = []  # heap of (-priority, tid) for tid in '_queued_by_tid'
+
+        # tid in '_queued_by_tid' to be started as soon as the limits allow (in the order of the values),
+        # not in '_tid_queue'
+        self._ready_tids: Dict[int, int] = {}
+        self._next_ready_order = 0
+
+        # tids in '_ready_tids' by their limits (in the order of their values in '_ready_tids'):
+        # if the first one cannot be started because of its limits, neither can the others
+        self._ready_tid_queue_by_limits: Dict[Hashable, Deque[int]] = {}
+
+        # tid in '_queued_by_tid' not to be started before the pending tasks it is to be started after are done,
+        # neither in '_tid_queue' nor in '_ready_tids'
+        self._held_by_tid: Dict[int, Tuple[int, Optional[float]]] = {}  # (count of tids to wait for, priority)
+        self._held_tids_by_tid: Dict[int, List[int]] = {}  # held tids waiting for a tid
+
+        # future to be done when a pending task is done while waiting for pending tasks
+        self._change_waiter: Optional[asyncio.Future] = None
+
+        self._group_by_tid: Dict[int, Hashable] = {}  # group of pending, queued or unconsumed tid
+        self._pending_tids_by_group: Dict[Hashable, Set[int]] = {}  # pending or queued tids of (non-empty) group
+
+    @staticmethod
+    def _normalize_resource_limits(resource_limits: Optional[Mapping[Hashable, int]]) -> Dict[Hashable, int]:
+        return {} if resource_limits is None else {r: max(1, int(n)) for r, n in resource_limits.items()}
 
     def wait_then_start(self, _max_count: int, _timeout: Optional[float],
-                        coro: Callable[[Any], Coroutine], *args, **kwargs) -> int:
+                        coro: Callable[[Any], Coroutine], *args,
+                        _admit: Optional[Callable[[int], bool]] = None, _group: Optional[Hashable] = None,
+                        **kwargs) -> int:
         # Wait until no more than *_max_count* - 1 coroutines started by 'wait_then_run()' are pending, then
         # run 'coro(*args, **kwargs)'.
+        # If *_group* is not None, the coroutine is assigned to the group *_group*.
+        #
+        # If *_admit* is not None and at least one coroutine is pending, also wait until '_admit(n)' returns True,
+        # where *n* is the number of pending coroutines. '_admit(n)' is called again when a pending coroutine is done
+        # or after ADMISSION_POLL_INTERVAL seconds.
         #
         # Returns a non-negative integer as the task ID for the started task. The task ID is unique among all tasks
         # started by 'wait_then_start()' of this instance in the past and in the future.
         #
         # Does not wait until *coro* is done. Use 'complete()' to get the return value of *coro*.
 
-        self._wait_for_pending_sync(max_count=int(_max_count) - 1, timeout=_timeout)
+        self._wait_for_pending_sync(max_count=int(_max_count) - 1, timeout=_timeout, admit=_admit, count_ready=False)
 
-        # noinspection PyCallingNonCallable
         tid, self._next_tid = self._next_tid, self._next_tid + 1  # reserve task id unique for self
-        task: asyncio.Task = self._asyncio_loop.create_task(coro(*args, **kwargs))  # is also a Future
-        self._tid_by_pending_task[task] = tid
-        self._pending_task_by_tid[tid] = task
+        self._add_to_group(tid, _group)
+        self._start(tid, coro, args, kwargs)
+
+        return tid
+
+    def enqueue(self, _max_count: int, _priority: float,
+                coro: Callable[[Any], Coroutine], *args,
+                _admit: Optional[Callable[[int], bool]] = None, _resources: Optional[Mapping[Hashable, int]] = None,
+                _resource_limits: Optional[Mapping[Hashable, int]] = None, _eager: bool = False,
+                _after: Optional[Iterable[int]] = None, _group: Optional[Hashable] = None, **kwargs) -> int:
+        # Queue 'coro(*args, **kwargs)' without waiting.
+        #
+        # Queued coroutines are started only while this object waits for pending coroutines (in any of its methods);
+        # a queued coroutine is started when no more than *_max_count* - 1 coroutines are pending.
+        # Queued coroutines with higher *_priority* are started first; queued coroutines with the same *_priority*
+        # are started in the order of the calls of 'enqueue()'.
+        # *_admit* restricts the start of a queued coroutine like for 'wait_then_start()'.
+        # A queued coroutine counts as pending when waiting for pending coroutines.
+        #
+        # A queued coroutine is also not started before '_resources[r]' tokens of each resource *r* in *_resources*
+        # with a limit are available (but at most as many as the limit); until then, other queued coroutines are
+        # started in its place.
+        # If *_resource_limits* is not None, it replaces the resource limits of this object for this coroutine
+        # (the tokens needed by all pending coroutines are counted nevertheless).
+        #
+        # If *_eager* is True, *_priority* is ignored and the coroutine is started as soon as the limits allow it -
+        # in this call or while this object waits for pending coroutines.
+        # A coroutine queued with *_eager* does not count as pending when 'wait_then_start()' waits.
+        #
+        # If *_after* is not None, the coroutine is not started before each task of this object whose task ID is in
+        # *_after* is done; until then, it does not count as pending when 'wait_then_start()' waits.
+        # If one of these tasks is done with an exception (or cancelled), the coroutine is never started;
+        # its task is done with the same exception instead.
+        #
+        # If *_group* is not None, the coroutine is assigned to the group *_group*.
+        #
+        # Returns a non-negative integer as the task ID like 'wait_then_start()'.
+
+        resource_limits = \
+            self._resource_limits if _resource_limits is None else self._normalize_resource_limits(_resource_limits)
+        resources = {}
+        if _resources is not None:
+            for r, n in _resources.items():
+                limit = resource_limits.get(r)
+                n = int(n)
+                if limit is not None and n > 0:
+                    resources[r] = min(n, limit)
+
+        tid, self._next_tid = self._next_tid, self._next_tid + 1  # reserve task id unique for self
+        self._add_to_group(tid, _group)
+        self._queued_by_tid[tid] = max(1, int(_max_count)), _admit, resources, resource_limits, coro, args, kwargs
+        priority = None if _eager else float(_priority)
+
+        held_count = 0
+        if _after is not None:
+            for t in set(_after):
+                if t in self._pending_task_by_tid or t in self._queued_by_tid:
+                    self._held_tids_by_tid.setdefault(t, []).append(tid)
+                    held_count += 1
+
+        if held_count:
+            self._held_by_tid[tid] = held_count, priority
+        elif priority is None:
+            self._make_ready(tid)
+            self._start_ready()
+        else:
+            heapq.heappush(self._tid_queue, (-priority, tid))
 
         return tid
 
     def complete(self, tid: int, *, timeout: Optional[float]):
         # Wait until there is no pending task with task ID *tid*.
         # Use consume(tid) to consume the result.
-        if tid in self._pending_task_by_tid:
+        if tid in self._pending_task_by_tid or tid in self._queued_by_tid:
             self._wait_for_pending_sync(max_count=0, tid_filter={tid}, timeout=timeout)
 
-    def complete_all(self, *, timeout: Optional[float]):
-        # Wait until all pending coroutines are done or cancelled.
-        self._wait_for_pending_sync(max_count=0, timeout=timeout)
-
-    def cancel_all(self, *, timeout: Optional[float]):
-        for t in self._tid_by_pending_task:
+    def complete_all(self, *, timeout: Optional[float], group: Optional[Hashable] = None):
+        # Wait until all pending coroutines (of group *group* if not None) are done or cancelled.
+        self._wait_for_pending_sync(max_count=0, timeout=timeout, group=group)
+
+    def cancel_all(self, *, timeout: Optional[float], group: Optional[Hashable] = None):
+        # Cancel all pending coroutines (of group *group* if not None) and wait until they are done.
+
+        if group is None:
+            queued_tids = list(self._queued_by_tid)
+            pending_tasks = list(self._tid_by_pending_task)
+        else:
+            tids = self._pending_tids_by_group.get(group, ())
+            queued_tids = [tid for tid in tids if tid in self._queued_by_tid]
+            pending_tasks = [self._pending_task_by_tid[tid] for tid in tids if tid in self._pending_task_by_tid]
+
+        for tid in queued_tids:
+            self._exception_by_tid[tid] = asyncio.CancelledError()
+            del self._queued_by_tid[tid]
+            self._ready_tids.pop(tid, None)
+            self._held_by_tid.pop(tid, None)
+            self._remove_from_pending_of_group(tid)
+        if queued_tids:
+            self._tid_queue = [(p, tid) for p, tid in self._tid_queue if tid in self._queued_by_tid]
+            heapq.heapify(self._tid_queue)
+            ready_tid_queue_by_limits = {}
+            for limits, queue in self._ready_tid_queue_by_limits.items():
+                queue = collections.deque(tid for tid in queue if tid in self._ready_tids)
+                if queue:
+                    ready_tid_queue_by_limits[limits] = queue
+            self._ready_tid_queue_by_limits = ready_tid_queue_by_limits
+            for tid in queued_tids:
+                self._release_held(tid, self._exception_by_tid[tid])
+
+        for t in pending_tasks:
             t.cancel()
-        self.complete_all(timeout=timeout)
+        self.complete_all(timeout=timeout, group=group)
 
     def consume(self, tid: int):
         # Wait until the task with task ID *tid* is completed and return its result.
@@ -73,35 +221,235 @@ class LimitingCoroutineSequencer:
         result = self._result_by_tid.get(tid)
         if result is not None:
             del self._result_by_tid[tid]
+            self._group_by_tid.pop(tid, None)
             return result
 
         exception = self._exception_by_tid.get(tid)
         if exception is not None:
             del self._exception_by_tid[tid]
+            self._group_by_tid.pop(tid, None)
             raise exception
 
         raise IdError('nothing to consume for tid')
 
-    def consume_all(self):
-        results = self._result_by_tid
-        exceptions = self._exception_by_tid
+    def consume_all(self, group: Optional[Hashable] = None):
+        # Return the results and exceptions of all done coroutines (of group *group* if not None) not yet consumed.
+
+        if group is None:
+            results = self._result_by_tid
+            exceptions = self._exception_by_tid
+            self._result_by_tid = {}
+            self._exception_by_tid = {}
+            self._group_by_tid = {tid: g for tid, g in self._group_by_tid.items()
+                                  if tid in self._pending_task_by_tid or tid in self._queued_by_tid}
+            return results, exceptions
+
+        group_by_tid = self._group_by_tid
+        results = {tid: r for tid, r in self._result_by_tid.items() if group_by_tid.get(tid) == group}
+        exceptions = {tid: e for tid, e in self._exception_by_tid.items() if group_by_tid.get(tid) == group}
+        for tid in results:
+            del self._result_by_tid[tid]
+            del group_by_tid[tid]
+        for tid in exceptions:
+            del self._exception_by_tid[tid]
+            del group_by_tid[tid]
+        return results, exceptions
 
-        self._result_by_tid = {}
-        self._exception_by_tid = {}
+    def _add_to_group(self, tid: int, group: Optional[Hashable]):
+        if group is not None:
+            self._group_by_tid[tid] = group
+            self._pending_tids_by_group.setdefault(group, set()).add(tid)
+
+    def _remove_from_pending_of_group(self, tid: int):
+        group = self._group_by_tid.get(tid)
+        if group is not None:
+            tids = self._pending_tids_by_group[group]
+            tids.discard(tid)
+            if not tids:
+                del self._pending_tids_by_group[group]
+
+    def _release_held(self, tid: int, exception: Optional[BaseException] = None):
+        # Release the queued coroutines held until the task with task ID *tid* is done.
+        # They are started by '_check_pending()' when no longer held.
+        #
+        # If *exception* is not None, the task with task ID *tid* is done with *exception*: the queued coroutines held
+        # until it is done are not started but done with *exception* (like the ones held until they are done).
+
+        failed_tids = [tid]
+        while failed_tids:
+            for held_tid in self._held_tids_by_tid.pop(failed_tids.pop(), ()):
+                held = self._held_by_tid.pop(held_tid, None)
+                if held is None:  # cancelled or failed
+                    continue
+                if exception is not None:
+                    del self._queued_by_tid[held_tid]
+                    self._remove_from_pending_of_group(held_tid)
+                    self._exception_by_tid[held_tid] = exception
+                    failed_tids.append(held_tid)
+                    continue
+                held_count, priority = held
+                if held_count > 1:
+                    self._held_by_tid[held_tid] = held_count - 1, priority
+                elif priority is None:
+                    self._make_ready(held_tid)
+                else:
+                    heapq.heappush(self._tid_queue, (-priority, held_tid))
+
+    def _count_pending(self, tid_filter: Optional[Set[int]], count_ready: bool,
+                       group: Optional[Hashable] = None) -> int:
+        if group is not None:  # count_ready is True
+            return len(self._pending_tids_by_group.get(group, ()))
+        if tid_filter is None:
+            pending_count = len(self._pending_task_by_tid) + len(self._queued_by_tid)
+            if not count_ready:
+                pending_count -= len(self._ready_tids) + len(self._held_by_tid)
+            return pending_count
+        return sum(1 for tid in tid_filter
+                   if tid in self._pending_task_by_tid or
+                   (tid in self._queued_by_tid and
+                    (count_ready or (tid not in self._ready_tids and tid not in self._held_by_tid))))
+
+    def _check_pending(self, *, max_count: int, tid_filter: Optional[Set[int]],
+                       admit: Optional[Callable[[int], bool]], count_ready: bool,
+                       group: Optional[Hashable] = None) -> Tuple[bool, bool]:
+        # Start queued coroutines as far as their limits allow it and check if no more than *max_count* coroutines
+        # are pending.
+        # Returns '(is_done, is_admission_refused)' where *is_done* is True if the waiting is over and
+        # *is_admission_refused* is True if the start of a coroutine was refused by an admission function.
+
+        # each done task may allow a queued one to be started
+        is_admission_refused = bool(self._ready_tids) and not self._start_ready()
+
+        pending_count = self._count_pending(tid_filter, count_ready, group)
+        if pending_count <= max_count:
+            if admit is None or pending_count == 0 or admit(pending_count):
+                return True, is_admission_refused
+            is_admission_refused = True
+        if self._tid_queue:
+            is_admission_refused = not self._start_queued() or is_admission_refused
+
+        return False, is_admission_refused
+
+    def _handle_done_task(self, task: asyncio.Task):
+        # Called by the 'asyncio' loop when *task* is done.
+
+        tid = self._tid_by_pending_task.pop(task, None)
+        if tid is None:
+            return
+
+        del self._pending_task_by_tid[tid]
+        self._remove_from_pending_of_group(tid)
+        resources = self._resources_by_tid.pop(tid, None)
+        if resources:
+            for r, n in resources.items():
+                self._used_resources[r] -= n
 
-        return results, exceptions
+        try:
+            self._result_by_tid[tid] = task.result()
+        except BaseException as e:  # asyncio.CancelledError if task.cancelled()
+            # Python 3.7: asyncio.CancelledError is a subclass of Exception
+            # Python 3.8: asyncio.CancelledError is _not_ a subclass of Exception
+            self._exception_by_tid[tid] = e
 
-    async def _wait_until_number_of_pending(self, *, max_count: int, tid_filter: Optional[Set[int]],
-                                            timeout_ns: int):
-        max_count = max(0, max_count)
+        self._release_held(tid, self._exception_by_tid.get(tid))
+
+        waiter = self._change_waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _start(self, tid: int, coro: Callable[[Any], Coroutine], args: tuple, kwargs: dict,
+               resources: Optional[Dict[Hashable, int]] = None):
+        # noinspection PyCallingNonCallable
+        task: asyncio.Task = self._asyncio_loop.create_task(coro(*args, **kwargs))  # is also a Future
+        self._tid_by_pending_task[task] = tid
+        self._pending_task_by_tid[tid] = task
+        task.add_done_callback(self._handle_done_task)
+        if resources:
+            self._resources_by_tid[tid] = resources
+            for r, n in resources.items():
+                self._used_resources[r] = self._used_resources.get(r, 0) + n
+
+    def _are_resources_available(self, resources: Dict[Hashable, int], resource_limits: Dict[Hashable, int]) -> bool:
+        return all(self._used_resources.get(r, 0) + n <= resource_limits[r] for r, n in resources.items())
+
+    def _start_queued(self) -> bool:
+        # Start queued coroutines in the order of their priority as long as their limits allow it.
+        # A queued coroutine whose resources are not available is moved to '_ready_tids'.
+        # Returns False if the start of a queued coroutine was refused by its admission function.
+
+        while self._tid_queue:
+            _, tid = self._tid_queue[0]
+            max_count, admit, resources, resource_limits, coro, args, kwargs = self._queued_by_tid[tid]
+            pending_count = len(self._pending_task_by_tid)
+            if pending_count >= max_count:
+                break
+            if admit is not None and pending_count > 0 and not admit(pending_count):
+                return False
+            heapq.heappop(self._tid_queue)
+            if self._are_resources_available(resources, resource_limits):
+                del self._queued_by_tid[tid]
+                self._start(tid, coro, args, kwargs, resources)
+            else:
+                self._make_ready(tid)  # started by '_start_ready()' when resources are available
+        return True
+
+    def _make_ready(self, tid: int):
+        max_count, _, resources, resource_limits, _, _, _ = self._queued_by_tid[tid]
+        limits = max_count, frozenset((r, n, resource_limits[r]) for r, n in resources.items())
+        self._ready_tids[tid] = self._next_ready_order
+        self._next_ready_order += 1
+        self._ready_tid_queue_by_limits.setdefault(limits, collections.deque()).append(tid)
+
+    def _start_ready(self) -> bool:
+        # Start coroutines in '_ready_tids' in this order as long as their limits allow it; skip the ones whose
+        # resources are not available.
+        # Returns False if the start of a coroutine was refused by its admission function.
+        #
+        # Starting a coroutine makes no limit less restrictive: the effort does not depend on the number of
+        # coroutines in '_ready_tids' that cannot be started.
+
+        # (order of first tid, limits) of the queues not (yet) blocked by their limits
+        heads = [(self._ready_tids[queue[0]], limits) for limits, queue in self._ready_tid_queue_by_limits.items()]
+        heapq.heapify(heads)
+
+        while heads:
+            _, limits = heads[0]
+            queue = self._ready_tid_queue_by_limits[limits]
+            tid = queue[0]
+            max_count, admit, resources, resource_limits, coro, args, kwargs = self._queued_by_tid[tid]
+            pending_count = len(self._pending_task_by_tid)
+            if pending_count < max_count and self._are_resources_available(resources, resource_limits):
+                if admit is not None and pending_count > 0 and not admit(pending_count):
+                    return False
+                queue.popleft()
+                del self._ready_tids[tid]
+                del self._queued_by_tid[tid]
+                self._start(tid, coro, args, kwargs, resources)
+                if queue:
+                    heapq.heapreplace(heads, (self._ready_tids[queue[0]], limits))
+                    continue
+                del self._ready_tid_queue_by_limits[limits]
+            heapq.heappop(heads)
+
+        return True
 
+    def _wait_for_pending_sync(self, *, max_count: int, timeout: Optional[float],
+                               tid_filter: Optional[Set[int]] = None, admit: Optional[Callable[[int], bool]] = None,
+                               count_ready: bool = True, group: Optional[Hashable] = None):
+        # Run the 'asyncio' loop until no more than *max_count* coroutines are pending.
+        #
+        # The 'asyncio' loop is not run at all if this is already the case; otherwise it is run until a pending
+        # task is done (or the admission is to be requested again) and the waiting is checked again.
+        # The effort for each check does not depend on the number of pending coroutines if *tid_filter* is None.
+
+        max_count = max(0, max_count)
         t0 = time.monotonic_ns()
+        timeout_ns = None if timeout is None else max(0, int(timeout * 1e9))
+
         while True:
-            if tid_filter is None:
-                tasks_to_wait_for = self._tid_by_pending_task.keys()
-            else:
-                tasks_to_wait_for = [t for t, tid in self._tid_by_pending_task.items() if tid in tid_filter]
-            if len(tasks_to_wait_for) <= max_count:
+            is_done, is_admission_refused = self._check_pending(
+                max_count=max_count, tid_filter=tid_filter, admit=admit, count_ready=count_ready, group=group)
+            if is_done:
                 break
 
             if timeout_ns is None:
@@ -110,55 +458,43 @@ class LimitingCoroutineSequencer:
                 timeout = (timeout_ns - (time.monotonic_ns() - t0)) / 1e9
                 if timeout <= 0.0:
                     raise TimeoutError
-
-            done_tasks: Set[asyncio.Task]
-            done_tasks, pending = await asyncio.wait(tasks_to_wait_for, return_when=asyncio.FIRST_COMPLETED,
-                                                     timeout=timeout)  # does _not_ raise TimeoutError or CancelledError
-
-            for task in done_tasks:  # "consume" all futures that are done
-                tid = self._tid_by_pending_task.get(task)
-
-                # tid is None: only seen when tasks were cancelled after KeyboardInterrupt (Python 3.7.3) under these
-                # circumstances or RuntimeError('This event loop is already running').
-                # pending is empty in these cases.
-
-                if tid is not None:
-                    del self._tid_by_pending_task[task]
-                    del self._pending_task_by_tid[tid]
-
-                try:
-                    r = task.result()
-                    if tid is not None:
-                        self._result_by_tid[tid] = r
-                except BaseException as e:  # asyncio.CancelledError if task.cancelled()
-                    # Python 3.7: asyncio.CancelledError is a subclass of Exception
-                    # Python 3.8: asyncio.CancelledError is _not_ a subclass of Exception
-                    if tid is not None:
-                        self._exception_by_tid[tid] = e
-
-    def _wait_for_pending_sync(self, *, max_count: int, timeout: Optional[float],
-                               tid_filter: Optional[Set[int]] = None):
-        timeout_ns = None if timeout is None else max(0, int(timeout * 1e9))
-        task = self._asyncio_loop.create_task(self._wait_until_number_of_pending(
-            max_count=max_count, tid_filter=tid_filter, timeout_ns=timeout_ns))
-        self._asyncio_loop.run_until_complete(task)
+            if is_admission_refused:
+                # load may have decreased without any pending task being done
+                timeout = ADMISSION_POLL_INTERVAL if timeout is None else min(timeout, ADMISSION_POLL_INTERVAL)
+
+            # done when a pending task is done or *timeout* has expired
+            waiter = self._asyncio_loop.create_future()
+            timer_handle = None if timeout is None else \
+                self._asyncio_loop.call_later(timeout, _set_result_unless_done, waiter)
+            # raises RuntimeError if called from a coroutine of the loop - must not replace the waiter of the caller
+            outer_waiter, self._change_waiter = self._change_waiter, waiter
+            try:
+                self._asyncio_loop.run_until_complete(waiter)
+            finally:
+                self._change_waiter = outer_waiter
+                if timer_handle is not None:
+                    timer_handle.cancel()
 
 
 class _ResultProxy:
 
     def __init__(self, sequencer: 'LimitingResultSequencer', tid: int,
-                 expected_class: type, timeout: Optional[float] = None):
+                 expected_class: type, timeout: Optional[float] = None, waits_for_bool: bool = False):
         # Construct a ResultProxy for the result of a task of *sequencer* with task ID *tid*.
         # Each read access to an attribute not in this class waits for the task to complete and forwards the attribute
         # look-up to its return value.
         # Each "normal" write access to an attribute raises AttributeError.
         #
+        # If *waits_for_bool* is True, 'bool()' also waits for the task to complete and returns the truth value of its
+        # return value. Otherwise, it returns True without waiting.
+        #
         # Instances should only be created by 'sequencer.create_result_proxy()'.
 
         object.__setattr__(self, '_sequencer', sequencer)
         object.__setattr__(self, '_tid', tid)
         object.__setattr__(self, '_expected_class', expected_class)
         object.__setattr__(self, '_timeout', timeout)
+        object.__setattr__(self, '_waits_for_bool', waits_for_bool)
         object.__setattr__(self, '_result', None)
         object.__setattr__(self, '_exception', None)
 
@@ -171,6 +507,9 @@ class _ResultProxy:
     def __delattr__(self, name: str):
         raise AttributeError(f'attributes of {self!r} cannot be deleted')
 
+    def __bool__(self) -> bool:
+        return not self._waits_for_bool or bool(self._get_or_wait_for_result())
+
     def __repr__(self) -> str:
         if self.iscomplete:
             return f"<proxy object for {self._result!r} result>"
@@ -206,6 +545,14 @@ class LimitingResultSequencer(LimitingCoroutineSequencer):
     def get_result_proxy(self, uid: Hashable) -> Optional[_ResultProxy]:
         return self._proxy_by_uid.get(uid, None)
 
+    def get_pending_tid(self, uid: Hashable) -> Optional[int]:
+        # Return the task ID of the pending (or queued) task whose result proxy was assigned *uid*, if any.
+        proxy = self._proxy_by_uid.get(uid, None)
+        if proxy is not None:
+            tid = proxy._tid
+            if tid in self._pending_task_by_tid or tid in self._queued_by_tid:
+                return tid
+
     def consume(self, tid: int):
         uid = self._proxy_uid_by_tid.pop(tid, None)
         proxy = None if uid is None else self._proxy_by_uid.pop(uid, None)
@@ -221,8 +568,8 @@ class LimitingResultSequencer(LimitingCoroutineSequencer):
 
         return result
 
-    def consume_all(self):
-        results, exceptions = super().consume_all()
+    def consume_all(self, group: Optional[Hashable] = None):
+        results, exceptions = super().consume_all(group)
 
         for tid, r in results.items():
             uid = self._proxy_uid_by_tid.pop(tid, None)
@@ -238,13 +585,14 @@ class LimitingResultSequencer(LimitingCoroutineSequencer):
 
         return results, exceptions
 
-    def create_result_proxy(self, tid: int, uid: Hashable, expected_class: Optional[type] = None) -> _ResultProxy:
+    def create_result_proxy(self, tid: int, uid: Hashable, expected_class: Optional[type] = None,
+                            waits_for_bool: bool = False) -> _ResultProxy:
         # Create a result proxy for the result of a task of this sequencer with task ID *tid* and assigned it
         # a unique *uid*.
         # Raises IdError if *tid* is not the task ID of a pending task with unconsumed result or if there already is
         # a result proxy with the same *tid* or 'id(uid)'.
 
-        if not (tid in self._pending_task_by_tid or tid in self._result_by_tid or
+        if not (tid in self._pending_task_by_tid or tid in self._queued_by_tid or tid in self._result_by_tid or
                 tid in self._exception_by_tid):
             raise IdError('nothing to consume for tid')
 
@@ -255,7 +603,7 @@ class LimitingResultSequencer(LimitingCoroutineSequencer):
         if existing_proxy is not None:
             raise IdError('id(uid) is not unique')
 
-        proxy = _ResultProxy(self, tid=tid, expected_class=expected_class)
+        proxy = _ResultProxy(self, tid=tid, expected_class=expected_class, waits_for_bool=waits_for_bool)
         self._proxy_by_uid[uid] = proxy
         self._proxy_uid_by_tid[tid] = uid
 
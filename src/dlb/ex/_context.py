@@ -8,12 +8,15 @@ This is an implementation detail - do not import it unless you know what you are
 __all__ = ['Context', 'ReadOnlyContext']
 
 import re
+import sys
 import os
 import os.path
 import stat
 import time
+import bisect
 import datetime
-from typing import Collection, Dict, Hashable, Iterable, List, Optional, Pattern, Tuple, Type, Union
+from typing import Collection, Dict, FrozenSet, Hashable, Iterable, List, Mapping, Optional, Pattern, Set, Tuple, \
+    Type, Union
 
 from .. import ut
 from .. import di
@@ -25,6 +28,41 @@ from . import _worktree
 
 _contexts: List['Context'] = []
 
+# If True, the run-database and the filesystem object memo cache of a successfully exited root context are retained
+# for the next root context of the same working tree with the same configuration in the same process
+# (set by a long-lived process like the dlb server). Call _close_retained_root_state() when no longer used.
+_retain_root_state = False
+_retained_root_state: Optional[Tuple[Hashable, _rundb.Database, _worktree.FilesystemObjectMemoCache]] = None
+
+
+def _take_retained_root_state(key: Hashable) \
+        -> Tuple[Optional[_rundb.Database], Optional[_worktree.FilesystemObjectMemoCache]]:
+    global _retained_root_state
+    state, _retained_root_state = _retained_root_state, None
+    if state is None:
+        return None, None
+    retained_key, rundb, fsobject_memo_cache = state
+    if retained_key == key:
+        return rundb, fsobject_memo_cache
+    fsobject_memo_cache.close()
+    rundb.close()
+    return None, None
+
+
+def _close_retained_root_state():
+    global _retained_helper_lookup
+    _retained_helper_lookup = None
+    _take_retained_root_state(None)
+
+
+# If _retain_root_state is True: the executable search paths and the helper paths found in them by the last
+# root context, for the next root context of the same working tree with the same os.get_exec_path()
+_retained_helper_lookup: Optional[Tuple[Hashable, Tuple[fs.Path, ...], Dict[fs.Path, fs.Path]]] = None
+
+# Encoded managed tree paths of the filesystem objects modified by redos of the last root context
+# (as declared by FilesystemObjectMemoCache.invalidate()), successful or not.
+_encoded_paths_modified_by_last_run: FrozenSet[str] = frozenset()
+
 
 def _get_root_specifics() -> '_RootSpecifics':
     if not _contexts:
@@ -40,6 +78,24 @@ def _get_rundb() -> _rundb.Database:
     return db
 
 
+def _get_fsobject_memo_cache() -> _worktree.FilesystemObjectMemoCache:
+    # use this to read memos of filesystem objects in the managed tree from dlb.ex.Tool
+    # noinspection PyProtectedMember,PyUnresolvedReferences
+    return _get_root_specifics()._fsobject_memo_cache
+
+
+def _get_jobserver() -> Optional['_jobserver.Jobserver']:
+    # use this to get the jobserver whose job tokens are needed by pending redos (if any)
+    # noinspection PyProtectedMember
+    return _get_root_specifics()._get_jobserver()
+
+
+def _get_redo_executor(in_process: bool) -> 'concurrent.futures.Executor':
+    # use this to get the pool of threads (or processes if *in_process* is True) shared by all redos
+    # noinspection PyProtectedMember
+    return _get_root_specifics()._get_redo_executor(in_process)
+
+
 def _register_successful_run(with_redo: bool):
     rs = _get_root_specifics()
     if with_redo:
@@ -50,13 +106,26 @@ def _register_successful_run(with_redo: bool):
         rs._successful_nonredo_run_count += 1
 
 
+def _check_not_in_redo(what: str):
+    # redos are coroutines of an asyncio loop that only runs while the dlb script waits for a pending redo
+    asyncio = sys.modules.get('asyncio')  # no loop can be running if not yet imported
+    if asyncio is None:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:  # no running loop
+        return
+    raise RuntimeError(f"{what} in a redo")
+
+
 class _BaseEnvVarDict:
 
     def __init__(self, context: 'Context'):
-        # these objects must not be replaced once constructed (only modified)
-        # reason: read-only view
+        # these objects must not be modified once a snapshot was taken (only replaced by a modified copy)
+        # reason: read-only view of a snapshot
 
         self._context = context
+        self._snapshot: Optional[_ReadOnlyEnvVarDictView] = None
 
         # all environment variables defined in this context or one of its outer contexts
         self._value_by_name = {} if context.parent is None else dict(context.parent.env._value_by_name)
@@ -149,13 +218,23 @@ class _EnvVarDict(_BaseEnvVarDict):
         if value is not None:
             self._value_by_name[name] = value
 
+    def _get_snapshot(self) -> '_ReadOnlyEnvVarDictView':
+        # Return a read-only view of the current state that is not affected by later modifications.
+        if self._snapshot is None:
+            self._snapshot = _ReadOnlyEnvVarDictView(self)
+        return self._snapshot
+
     def _prepare_for_modification(self):
         if not (_contexts and _contexts[-1] is self._context):
             raise _error.ContextModificationError(
                 "'env' of an inactive context must not be modified\n"
                 "  | use 'dlb.ex.Context.active.env' to get 'env' of the active context"
             )
-        self._context.complete_pending_redos()
+        _check_not_in_redo("'env' of a context must not be modified")
+        if self._snapshot is not None:  # copy on write
+            self._value_by_name = dict(self._value_by_name)
+            self._pattern_by_name = dict(self._pattern_by_name)
+            self._snapshot = None
 
     # dictionary methods
 
@@ -203,6 +282,16 @@ class _ReadOnlyEnvVarDictView(_BaseEnvVarDict):
         self._value_by_name = env_var_dict._value_by_name
         self._pattern_by_name = env_var_dict._pattern_by_name
 
+        # an outer context cannot be modified while this context is active
+        parent = self._context.parent
+        self._parent_snapshot = None if parent is None else parent.env._get_snapshot()
+
+    def is_imported(self, name):
+        self._check_non_empty_str(name=name)
+        if name in self._pattern_by_name:
+            return True
+        return self._parent_snapshot is not None and self._parent_snapshot.is_imported(name)
+
 
 _ReadOnlyEnvVarDictView.__name__ = 'ReadOnlyEnvVarDictView'
 _ReadOnlyEnvVarDictView.__qualname__ = 'Context.ReadOnlyEnvVarDictView'
@@ -223,14 +312,16 @@ class _BaseHelperDict:
         #
         #     self._implicit_abs_path_by_helper_path[helper_path] = [abs_path
 
-        # these objects must not be replaced once constructed (only modified)
-        # reason: read-only view
+        # self._explicit_abs_path_by_helper_path must not be modified once a snapshot was taken (only replaced by a
+        # modified copy); self._implicit_abs_path_by_helper_path is shared by all contexts and only extended
+        # reason: read-only view of a snapshot
 
         self._context = context
         self._explicit_abs_path_by_helper_path: Dict[fs.Path, fs.Path] = \
             {} if context.parent is None else dict(context.parent.helper._explicit_abs_path_by_helper_path)
 
         self._implicit_abs_path_by_helper_path = implicit_abs_path_by_helper_path
+        self._snapshot: Optional[_ReadOnlyHelperDictView] = None
 
     def __repr__(self) -> str:
         items = sorted(self.items())
@@ -290,13 +381,22 @@ class _BaseHelperDict:
 
 class _HelperDict(_BaseHelperDict):
 
+    def _get_snapshot(self) -> '_ReadOnlyHelperDictView':
+        # Return a read-only view of the current state that is not affected by later modifications.
+        if self._snapshot is None:
+            self._snapshot = _ReadOnlyHelperDictView(self)
+        return self._snapshot
+
     def _prepare_for_modification(self):
         if not (_contexts and _contexts[-1] is self._context):
             raise _error.ContextModificationError(
                 "'helper' of an inactive context must not be modified\n"
                 "  | use 'dlb.ex.Context.active.helper' to get 'helper' of the active context"
             )
-        self._context.complete_pending_redos()
+        _check_not_in_redo("'helper' of a context must not be modified")
+        if self._snapshot is not None:  # copy on write
+            self._explicit_abs_path_by_helper_path = dict(self._explicit_abs_path_by_helper_path)
+            self._snapshot = None
 
     def __setitem__(self, helper_path: fs.PathLike, abs_path: fs.PathLike):
         if not isinstance(helper_path, fs.Path):
@@ -394,23 +494,43 @@ class _RootSpecifics:
 
         self._root_path = _worktree.get_checked_root_path_from_cwd(os.getcwd(), path_cls)
         root_path = str(self._root_path.native)
+
+        # used before the working tree is locked
+        if not isinstance(cf.max_parallel_memo_read_count, int) or isinstance(cf.max_parallel_memo_read_count, bool):
+            raise TypeError("'dlb.cf.max_parallel_memo_read_count' must be an int")
+        if cf.max_parallel_memo_read_count < 1:
+            raise ValueError("'dlb.cf.max_parallel_memo_read_count' must be positive")
         self._root_path_native_str = root_path
+        self._retained_state_key = (root_path, cf.rundb_profile, cf.cache_filesystem_object_memos,
+                                    cf.max_parallel_memo_read_count)
+        self._is_retainable = False
+        retained_rundb, self._fsobject_memo_cache = _take_retained_root_state(self._retained_state_key)
+        if self._fsobject_memo_cache is None:
+            self._fsobject_memo_cache = _worktree.FilesystemObjectMemoCache(
+                self._root_path, enabled=cf.cache_filesystem_object_memos,
+                max_parallel_read_count=cf.max_parallel_memo_read_count)
         # TODO make sure the "calling" source file is in the managed tree
 
-        # path of all existing directories in os.get_exec_path(), that can be represented as dlb.fs.Path
-        executable_search_paths = []
-        for p in os.get_exec_path():  # do _not_ expand a leading '~'
-            try:
-                pn = fs.Path.Native(p)
-                if p and os.path.isdir(pn):
-                    p = fs.Path(pn, is_dir=True)
-                    if not p.is_absolute():
-                        p = self._root_path / p
-                    if p not in executable_search_paths:
-                        executable_search_paths.append(p)
-            except (OSError, ValueError):
-                pass
-        self._executable_search_paths = tuple(executable_search_paths)
+        global _retained_helper_lookup
+        self._helper_lookup_key = root_path, tuple(os.get_exec_path())
+        if _retained_helper_lookup is not None and _retained_helper_lookup[0] == self._helper_lookup_key:
+            _, self._executable_search_paths, self._implicit_abs_path_by_helper_path = _retained_helper_lookup
+        else:
+            # path of all existing directories in os.get_exec_path(), that can be represented as dlb.fs.Path
+            executable_search_paths = []
+            for p in self._helper_lookup_key[1]:  # do _not_ expand a leading '~'
+                try:
+                    pn = fs.Path.Native(p)
+                    if p and os.path.isdir(pn):
+                        p = fs.Path(pn, is_dir=True)
+                        if not p.is_absolute():
+                            p = self._root_path / p
+                        if p not in executable_search_paths:
+                            executable_search_paths.append(p)
+                except (OSError, ValueError):
+                    pass
+            self._executable_search_paths = tuple(executable_search_paths)
+        _retained_helper_lookup = None
 
         # 2. if yes: lock it
 
@@ -420,18 +540,104 @@ class _RootSpecifics:
 
         self._temp_path_provider = None
         self._mtime_probe = None
-        self._rundb = None
+        self._rundb = retained_rundb  # closed on error
+        self._jobserver = None
+        self._is_jobserver_initialized = False
+        self._redo_thread_executor = None
+        self._redo_process_executor = None
         try:
             if not isinstance(cf.max_dependency_age, datetime.timedelta):
                 raise TypeError("'dlb.cf.max_dependency_age' must be a datetime.timedelta object")
             if not cf.max_dependency_age > datetime.timedelta(0):
                 raise ValueError("'dlb.cf.max_dependency_age' must be positive")
-            self._temp_path_provider, self._mtime_probe, self._rundb, self._is_working_tree_case_sensitive = \
-                _worktree.prepare_locked_working_tree(self._root_path, _rundb.SCHEMA_VERSION, cf.max_dependency_age)
+            if not isinstance(cf.rundb_profile, str):
+                raise TypeError("'dlb.cf.rundb_profile' must be a str")
+            if cf.rundb_profile not in _rundb.PRAGMAS_BY_PROFILE:
+                profiles = ', '.join(repr(p) for p in _rundb.PRAGMAS_BY_PROFILE)
+                raise ValueError(f"'dlb.cf.rundb_profile' must be one of {profiles}")
+            if not (cf.parallel_redo_admission is None or callable(cf.parallel_redo_admission)):
+                raise TypeError("'dlb.cf.parallel_redo_admission' must be None or callable")
+            if not isinstance(cf.preload_run_database, bool):
+                raise TypeError("'dlb.cf.preload_run_database' must be a bool")
+            self._temp_path_provider, self._mtime_probe, rundb, self._is_working_tree_case_sensitive = \
+                _worktree.prepare_locked_working_tree(self._root_path, _rundb.SCHEMA_VERSION, cf.max_dependency_age,
+                                                      cf.rundb_profile, retained_rundb)
+            if rundb is not self._rundb:
+                retained_rundb, self._rundb = self._rundb, rundb
+                if retained_rundb is not None:
+                    retained_rundb.close()
+            if cf.preload_run_database:
+                try:
+                    self._rundb.preload()
+                except _error.DatabaseError as e:
+                    raise _error.ManagementTreeError(str(e)) from None
+            self._fsobject_memo_cache.start_next_run(self._read_change_journal() if cf.use_change_journal else None)
         except BaseException:
             self._close_and_unlock_if_open()
             raise
 
+    def _get_jobserver(self):
+        if not self._is_jobserver_initialized:
+            self._is_jobserver_initialized = True
+            from . import _jobserver
+            makeflags = os.environ.get('MAKEFLAGS', '')
+            if cf.use_jobserver_of_make and makeflags:
+                try:
+                    self._jobserver = _jobserver.open_inherited(makeflags)
+                except (OSError, ValueError) as e:
+                    di.inform(f'jobserver of GNU Make not used\n  | reason: {ut.exception_to_line(e)}',
+                              level=cf.level.run_preparation)
+                else:
+                    if self._jobserver is not None:
+                        di.inform('jobserver of GNU Make used', level=cf.level.run_preparation)
+            if self._jobserver is None and cf.provide_jobserver_to_helpers:
+                token_count = _contexts[0].max_parallel_redo_count - 1
+                fifo_path = str(self._temp_path_provider.generate().native)
+                try:
+                    self._jobserver = _jobserver.create(fifo_path, token_count)
+                except (AttributeError, OSError) as e:  # AttributeError: no os.mkfifo()
+                    di.inform(f'no jobserver for helpers created\n  | reason: {ut.exception_to_line(e)}',
+                              level=cf.level.run_preparation)
+                else:
+                    di.inform(f'jobserver with {token_count} job token(s) created for helpers',
+                              level=cf.level.run_preparation)
+        return self._jobserver
+
+    def _get_redo_executor(self, in_process: bool):
+        max_workers = _contexts[0].max_parallel_redo_count
+        import concurrent.futures
+        if in_process:
+            if self._redo_process_executor is None:
+                import multiprocessing
+                # 'fork' (where available) does not import the dlb script in the worker processes: with 'spawn' or
+                # 'forkserver', each worker would run the dlb script again as module '__mp_main__'.
+                # The worker processes are forked while other threads (e.g. the writer thread of the run-database)
+                # may hold locks; the forked copies of these locks are never used by a worker process: it only
+                # unpickles and calls the functions of run_in_process().
+                mp_context = multiprocessing.get_context(
+                    'fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+                self._redo_process_executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=mp_context)
+            return self._redo_process_executor
+        if self._redo_thread_executor is None:
+            self._redo_thread_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='dlb-redo')
+        return self._redo_thread_executor
+
+    def _read_change_journal(self):
+        from . import _fsjournal
+        management_tree_path = os.path.join(self._root_path_native_str, _worktree.MANAGEMENTTREE_DIR_NAME)
+        journal = _fsjournal.read_change_journal(management_tree_path, 2.0)
+        if journal is None:
+            di.inform('change journal not used: no responding watcher', level=cf.level.run_preparation)
+            return
+        try:
+            self._rundb.set_change_journal_position(journal.session, journal.position)
+        except _error.DatabaseError as e:
+            raise _error.ManagementTreeError(str(e)) from None
+        di.inform(f'change journal used at position {journal.position}', level=cf.level.run_preparation)
+        return journal
+
     @property
     def working_tree_time_ns(self) -> int:
         self._mtime_probe.seek(0)
@@ -455,6 +661,10 @@ class _RootSpecifics:
                     _show_summary(summaries + [summary])
             except (TypeError, ValueError):
                 pass  # ignore most common exceptions for invalid cf.latest_run_summary_max_count, cf.level.*
+            cache = self._fsobject_memo_cache
+            if cache.enabled:
+                di.inform(f'filesystem object memo cache: {cache.hit_count} hits, {cache.miss_count} misses',
+                          level=cf.level.run_summary)
         self._cleanup()  # seize the day
         while True:
             wt = self.working_tree_time_ns
@@ -469,8 +679,14 @@ class _RootSpecifics:
 
     def _close_and_unlock_if_open(self):  # safe to call multiple times
         # called while self is not an active context (note: an exception may already have happened)
+        global _retained_root_state, _retained_helper_lookup, _encoded_paths_modified_by_last_run
         most_serious_exception = None
 
+        _encoded_paths_modified_by_last_run = frozenset(self._fsobject_memo_cache.modified_encoded_paths)
+        if _retain_root_state:
+            _retained_helper_lookup = \
+                self._helper_lookup_key, self._executable_search_paths, self._implicit_abs_path_by_helper_path
+
         if self._mtime_probe:
             try:
                 self._mtime_probe.close()
@@ -478,6 +694,32 @@ class _RootSpecifics:
                 most_serious_exception = e
             self._mtime_probe = None
 
+        if self._jobserver is not None:
+            try:
+                self._jobserver.close()
+            except BaseException as e:
+                most_serious_exception = e
+            self._jobserver = None
+
+        for name in ('_redo_thread_executor', '_redo_process_executor'):
+            executor = getattr(self, name)
+            if executor is not None:
+                try:
+                    executor.shutdown()
+                except BaseException as e:
+                    most_serious_exception = e
+                setattr(self, name, None)
+
+        if self._is_retainable:
+            _retained_root_state = self._retained_state_key, self._rundb, self._fsobject_memo_cache
+            self._is_retainable = False
+            self._rundb = None
+        else:
+            try:
+                self._fsobject_memo_cache.close()
+            except BaseException as e:
+                most_serious_exception = e
+
         if self._rundb:
             try:
                 self._rundb.close()  # note: uncommitted changes are lost!
@@ -500,6 +742,7 @@ class _RootSpecifics:
 
         try:
             self._cleanup_and_delay_to_working_tree_time_change(was_successful)
+            self._is_retainable = was_successful and _retain_root_state
         except BaseException as e:
             first_exception = e
 
@@ -524,12 +767,23 @@ class _BaseContext(metaclass=_BaseContextMeta):
     HelperDict = NotImplemented
     ReadOnlyHelperDictView = NotImplemented
 
-    def __init__(self, *, path_cls: Type[fs.Path], max_parallel_redo_count: int, find_helpers: Optional[bool]):
+    def __init__(self, *, path_cls: Type[fs.Path], max_parallel_redo_count: int, find_helpers: Optional[bool],
+                 resource_limits: Optional[Mapping[str, int]]):
         if not (isinstance(path_cls, type) and issubclass(path_cls, fs.Path)):
             raise TypeError("'path_cls' must be a subclass of 'dlb.fs.Path'")
         self._path_cls = path_cls
         self._max_parallel_redo_count = max(1, int(max_parallel_redo_count))
         self._find_helpers = None if find_helpers is None else bool(find_helpers)
+        if resource_limits is not None:
+            if not isinstance(resource_limits, Mapping):
+                raise TypeError("'resource_limits' must be None or a mapping")
+            for name, limit in resource_limits.items():
+                if not isinstance(name, str):
+                    raise TypeError("each key of 'resource_limits' must be a str")
+                if not (isinstance(limit, int) and limit > 0):
+                    raise ValueError(f"limit of resource {name!r} must be a positive integer")
+            resource_limits = dict(resource_limits)
+        self._resource_limits = resource_limits
 
     @property
     def path_cls(self) -> Type[fs.Path]:
@@ -543,6 +797,10 @@ class _BaseContext(metaclass=_BaseContextMeta):
     def find_helpers(self) -> Optional[bool]:
         return self._find_helpers
 
+    @property
+    def resource_limits(self) -> Dict[str, int]:
+        return {} if self._resource_limits is None else dict(self._resource_limits)
+
     @property
     def root_path(self) -> fs.Path:
         # noinspection PyProtectedMember
@@ -675,27 +933,111 @@ class Context(_BaseContext, metaclass=_ContextMeta):
     active: Optional['Context'] = None
 
     def __init__(self, *, path_cls: Type[fs.Path] = fs.Path, max_parallel_redo_count: int = 1,
-                 find_helpers: Optional[bool] = None):
-        super().__init__(path_cls=path_cls, max_parallel_redo_count=max_parallel_redo_count, find_helpers=find_helpers)
+                 find_helpers: Optional[bool] = None, resource_limits: Optional[Mapping[str, int]] = None):
+        super().__init__(path_cls=path_cls, max_parallel_redo_count=max_parallel_redo_count, find_helpers=find_helpers,
+                         resource_limits=resource_limits)
+        self._has_own_resource_limits = resource_limits is not None
 
         self._env: Optional[_EnvVarDict] = None
         self._helper: Optional[_HelperDict] = None
 
         self._parent: Optional[Context] = None
-        self._optional_redo_sequencer = None  # constructed when needed
+        self._optional_redo_sequencer = None  # of root context only; constructed when needed
+        self._redo_uid_by_output_encoded_path: Dict[str, Hashable] = {}
+        self._sorted_output_encoded_paths: List[str] = []  # keys of '_redo_uid_by_output_encoded_path'
         self._root_specifics: Optional[_RootSpecifics] = None
 
+    def _get_root(self) -> 'Context':
+        context = self
+        while context._parent is not None:
+            context = context._parent
+        return context
+
     @property
     def _redo_sequencer(self):
-        if self._optional_redo_sequencer is None:
+        # The redo sequencer of the root context is used for the redos of all its inner contexts, with the context
+        # as group: 'max_parallel_redo_count' and 'resource_limits' of a context limit the redos of all active
+        # contexts together.
+        root = self._get_root()
+        if root._optional_redo_sequencer is None:
             from . import _aseq
-            self._optional_redo_sequencer = _aseq.LimitingResultSequencer()
-        return self._optional_redo_sequencer
+            root._optional_redo_sequencer = _aseq.LimitingResultSequencer()
+        return root._optional_redo_sequencer
 
     def _get_pending_result_proxy_for(self, tool_instance_dbid: Hashable):
-        if self._optional_redo_sequencer is None:
-            return
-        return self._redo_sequencer.get_result_proxy(tool_instance_dbid)
+        # Return the result proxy of the pending redo of the tool instance *tool_instance_dbid* started in this
+        # context or one of its outer contexts, if any.
+        # (The redos of an exited context are consumed.)
+        redo_sequencer = self._get_root()._optional_redo_sequencer
+        if redo_sequencer is not None:
+            return redo_sequencer.get_result_proxy(tool_instance_dbid)
+
+    def _register_outputs_of_pending_redo(self, tool_instance_dbid: Hashable, encoded_paths: Iterable[str]):
+        # Register the encoded managed tree paths of the explicit output dependencies of the pending redo of the
+        # tool instance *tool_instance_dbid* started in this context.
+        uid_by_encoded_path = self._redo_uid_by_output_encoded_path
+        for encoded_path in encoded_paths:
+            if encoded_path not in uid_by_encoded_path:
+                bisect.insort(self._sorted_output_encoded_paths, encoded_path)
+            uid_by_encoded_path[encoded_path] = tool_instance_dbid
+
+    def _get_uids_of_redos_with_outputs_for(self, encoded_paths: Iterable[str]) -> Set[Hashable]:
+        # Return the tool instance dbids of the redos (pending or not) started in this context with an explicit
+        # output dependency whose encoded managed tree path is in *encoded_paths*, has a member of *encoded_paths* as
+        # a prefix (e.g. a file in an input directory) or is a prefix of a member of *encoded_paths* (e.g. an output
+        # directory that contains an input file).
+
+        uids = set()
+        uid_by_encoded_path = self._redo_uid_by_output_encoded_path
+        if not uid_by_encoded_path:
+            return uids
+
+        sorted_encoded_paths = self._sorted_output_encoded_paths
+        for encoded_path in encoded_paths:
+            first, last = _rundb.get_encoded_path_range_of_prefix(encoded_path)
+            i = bisect.bisect_left(sorted_encoded_paths, first)
+            j = len(sorted_encoded_paths) if last is None else bisect.bisect_left(sorted_encoded_paths, last, i)
+            for p in sorted_encoded_paths[i:j]:
+                uids.add(uid_by_encoded_path[p])
+
+            k = encoded_path.find('/')
+            while 0 <= k < len(encoded_path) - 1:  # each proper prefix ending with '/'
+                uid = uid_by_encoded_path.get(encoded_path[:k + 1])
+                if uid is not None:
+                    uids.add(uid)
+                k = encoded_path.find('/', k + 1)
+
+        return uids
+
+    def _get_tids_of_pending_redos_for(self, encoded_paths: Iterable[str]) -> Set[int]:
+        # Return the task IDs (of the redo sequencer of this context) of the pending redos started in this context
+        # with an explicit output dependency in or containing a filesystem object whose encoded managed tree path is
+        # in *encoded_paths*.
+
+        tids = set()
+        for uid in self._get_uids_of_redos_with_outputs_for(encoded_paths):
+            tid = self._redo_sequencer.get_pending_tid(uid)
+            if tid is not None:
+                tids.add(tid)
+        return tids
+
+    def _complete_pending_redos_of_outer_contexts_for(self, encoded_paths: Optional[Collection[str]]):
+        # Wait for the pending redos started in an outer context with an explicit output dependency in or containing
+        # a filesystem object whose encoded managed tree path is in *encoded_paths* to complete.
+        # If *encoded_paths* is None, wait for all pending redos started in an outer context to complete.
+        #
+        # Replaces the completion of all pending redos of the outer context when this context is entered.
+
+        context = self._parent
+        while context is not None:
+            if encoded_paths is None:
+                context.complete_pending_redos()  # raises the exception of the first failed redo
+            else:
+                for uid in context._get_uids_of_redos_with_outputs_for(encoded_paths):
+                    proxy = context._redo_sequencer.get_result_proxy(uid)
+                    if proxy is not None:
+                        proxy.complete()  # raises the exception of a failed redo
+            context = context._parent
 
     @property
     def parent(self) -> Optional['Context']:
@@ -714,16 +1056,17 @@ class Context(_BaseContext, metaclass=_ContextMeta):
         return self._helper
 
     def complete_pending_redos(self):
-        if self._optional_redo_sequencer is None:
+        redo_sequencer = self._get_root()._optional_redo_sequencer
+        if redo_sequencer is None:
             return
         # raises RuntimeError if called from redo()
-        self._optional_redo_sequencer.complete_all(timeout=None)
-        self._consume_redos_and_raise_first_exception()
+        redo_sequencer.complete_all(timeout=None, group=self)
+        self._consume_redos_and_raise_first_exception(redo_sequencer)
 
-    def _consume_redos_and_raise_first_exception(self):
-        if self._optional_redo_sequencer is None:
+    def _consume_redos_and_raise_first_exception(self, redo_sequencer):
+        if redo_sequencer is None:
             return
-        redo_results, redo_exceptions = self._optional_redo_sequencer.consume_all()
+        redo_results, redo_exceptions = redo_sequencer.consume_all(group=self)
         redo_exceptions = [(tid, e) for tid, e in redo_exceptions.items()]
         if redo_exceptions:
             redo_exceptions.sort()
@@ -742,7 +1085,7 @@ class Context(_BaseContext, metaclass=_ContextMeta):
                 find_helpers = _contexts[0]._find_helpers
             elif find_helpers and not _contexts[0]._find_helpers:
                 raise ValueError("'find_helpers' must be False if 'find_helpers' of root context is False")
-            _contexts[-1].complete_pending_redos()
+            _check_not_in_redo("context must not be entered")
             try:
                 # noinspection PyCallingNonCallable
                 self._path_cls(self.root_path)
@@ -754,6 +1097,8 @@ class Context(_BaseContext, metaclass=_ContextMeta):
                 )
                 raise ValueError(msg) from None
             self._parent = _contexts[-1]
+            if not self._has_own_resource_limits:
+                self._resource_limits = self._parent._resource_limits
         else:
             self._root_specifics = _RootSpecifics(self._path_cls)
 
@@ -771,11 +1116,12 @@ class Context(_BaseContext, metaclass=_ContextMeta):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         # complete all pending redos (before context is changed in any way)
+        redo_sequencer = self._get_root()._optional_redo_sequencer
         try:
-            redo_sequencer = self._optional_redo_sequencer
             if redo_sequencer is not None:
                 redo_finisher = redo_sequencer.complete_all if exc_val is None else redo_sequencer.cancel_all
-                redo_finisher(timeout=None)  # may raise BaseException that is not an Exception (e.g. KeyboardInterrupt)
+                # may raise BaseException that is not an Exception (e.g. KeyboardInterrupt)
+                redo_finisher(timeout=None, group=self)
         finally:
             if not (_contexts and _contexts[-1] == self):
                 raise _error.ContextNestingError from None
@@ -784,6 +1130,10 @@ class Context(_BaseContext, metaclass=_ContextMeta):
             self._parent = None
             self._env = None
             self._helper = None
+            self._redo_uid_by_output_encoded_path = {}
+            self._sorted_output_encoded_paths = []
+            if not self._has_own_resource_limits:
+                self._resource_limits = None
 
             if self._root_specifics:
                 # noinspection PyProtectedMember
@@ -791,7 +1141,9 @@ class Context(_BaseContext, metaclass=_ContextMeta):
                 self._root_specifics = None
 
         if exc_val is None:
-            self._consume_redos_and_raise_first_exception()
+            self._consume_redos_and_raise_first_exception(redo_sequencer)
+        elif redo_sequencer is not None:
+            redo_sequencer.consume_all(group=self)  # the redo sequencer is used by the outer contexts
 
 
 class ReadOnlyContext(_BaseContext):
@@ -802,9 +1154,9 @@ class ReadOnlyContext(_BaseContext):
             raise TypeError("'context' must be a Context object")
         _get_root_specifics()
         super().__init__(path_cls=context.path_cls, max_parallel_redo_count=context.max_parallel_redo_count,
-                         find_helpers=context.find_helpers)
-        self._env = _ReadOnlyEnvVarDictView(context.env)
-        self._helper = _ReadOnlyHelperDictView(context.helper)
+                         find_helpers=context.find_helpers, resource_limits=context.resource_limits)
+        self._env = context.env._get_snapshot()
+        self._helper = context.helper._get_snapshot()
 
     @property
     def env(self) -> _ReadOnlyEnvVarDictView:
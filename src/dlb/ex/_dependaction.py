@@ -74,6 +74,12 @@ class Action:
         # note: *required* does _not_ affect the meaning or treatment of the _validated_ value.
         return ut.to_permanent_local_bytes((dependency_id, d.explicit))
 
+    # override in subclass
+    def compares_content_digest(self) -> bool:
+        # True if a changed mtime of a filesystem object of an input dependency is not a reason for a redo as long
+        # as its content digest remains the same.
+        return False
+
 
 # only for action with action.dependency.Value is dlb.fs.Path
 class _FilesystemObjectMixin(Action):
@@ -129,7 +135,8 @@ class _DirectoryMixin(_FilesystemObjectMixin):
 
 
 class RegularFileInputAction(_RegularFileMixin, Action):
-    pass
+    def compares_content_digest(self) -> bool:
+        return self.dependency.compare == 'digest'
 
 
 class NonRegularFileInputAction(_NonRegularFileMixin, Action):
@@ -0,0 +1,514 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# dlb - a Pythonic build tool
+# Copyright (C) 2020 Daniel Lutz <dlu-ch@users.noreply.github.com>
+
+"""Journal of changes of filesystem objects in the managed tree, recorded by a long-lived watcher process.
+This is an implementation detail - do not import it unless you know what you are doing."""
+
+# The watcher (GNU/Linux only) uses inotify to record the managed tree paths of changed filesystem objects in the
+# journal file. A run of dlb asks the watcher to append a sync record and reads the journal up to this record.
+# All changes before the request are then recorded before the sync record (inotify events are ordered).
+#
+# Journal file: a sequence of records, each terminated by b'\0':
+#
+#   - first record: JOURNAL_HEADER_PREFIX + session, where session is a string unique for each start of a session
+#   - b'c' + encoded managed tree path p: the filesystem object p itself has changed
+#   - b'r' + encoded managed tree path p: the filesystem object p has been created, removed, or replaced
+#     (with all filesystem objects in it)
+#   - b's' + token: sync record, requested by the creation of the file SYNC_FILE_PREFIX + token
+#
+# The index of a record is its position. A new session is started when the watcher starts, when the inotify queue
+# overflows, and when the journal becomes too large; the positions of different sessions are unrelated.
+
+__all__ = []
+
+import sys
+import errno
+import os
+import os.path
+import time
+import struct
+from typing import Collection, Dict, List, Optional, Tuple
+
+from .. import fs
+from . import _rundb
+from . import _worktree
+
+JOURNAL_DIR_NAME = 'w'  # in management tree
+JOURNAL_FILE_NAME = 'j'
+WATCHER_LOCK_FILE_NAME = 'l'
+SYNC_FILE_PREFIX = 's-'
+
+JOURNAL_HEADER_PREFIX = b'dlb change journal 1 '
+MAX_JOURNAL_SIZE = 2**24  # a larger journal would take too long to read
+
+
+class ChangeJournal:
+    # Records of a journal up to (but not including) a sync record at *position* of the session *session*.
+
+    def __init__(self, session: str, position: int, records: List[Tuple[int, str]]):
+        # *records* is a sequence of pairs (position, record)
+        self._session = session
+        self._position = position
+        self._change_position_by_encoded_path: Dict[str, int] = {}
+        self._replacement_position_by_encoded_path: Dict[str, int] = {}
+        for p, record in records:
+            kind, encoded_path = record[:1], record[1:]
+            if kind == 'c':
+                self._change_position_by_encoded_path[encoded_path] = p
+            elif kind == 'r':
+                self._replacement_position_by_encoded_path[encoded_path] = p
+
+    @property
+    def session(self) -> str:
+        return self._session
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    def is_unchanged_since(self, encoded_path: str, position: int) -> bool:
+        # Is the filesystem object with encoded managed tree path *encoded_path* unchanged since the position
+        # *position* of this session?
+        # It is not, if the filesystem object or any of its parent directories was replaced or declared as modified
+        # since *position* or if the filesystem object itself was changed since *position*.
+
+        # must be fast
+
+        if self._change_position_by_encoded_path.get(encoded_path, -1) >= position:
+            return False
+
+        replacement_position_by_encoded_path = self._replacement_position_by_encoded_path
+        if replacement_position_by_encoded_path.get('', -1) >= position:
+            return False
+        i = encoded_path.find('/')
+        while i >= 0:
+            if replacement_position_by_encoded_path.get(encoded_path[:i + 1], -1) >= position:
+                return False
+            i = encoded_path.find('/', i + 1)
+        return True
+
+    def declare_as_modified(self, encoded_path: str):
+        # Declare the filesystem object with encoded managed tree path *encoded_path* (and all filesystem objects in
+        # it) as modified after every position of this session.
+        self._replacement_position_by_encoded_path[encoded_path] = self._position + 2**62
+
+
+def read_change_journal(management_tree_path: str, timeout: float) -> Optional[ChangeJournal]:
+    # Request a sync record from the watcher of the management tree with absolute path *management_tree_path* and
+    # return the journal up to this sync record.
+    #
+    # Returns None if no watcher is running, the journal is invalid or no sync record was appended within *timeout*
+    # seconds.
+
+    try:
+        import fcntl
+    except ImportError:
+        return None  # no watcher on this platform
+
+    journal_dir_path = os.path.join(management_tree_path, JOURNAL_DIR_NAME)
+    journal_file_path = os.path.join(journal_dir_path, JOURNAL_FILE_NAME)
+
+    try:
+        with open(os.path.join(journal_dir_path, WATCHER_LOCK_FILE_NAME), 'rb') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return None  # not locked by a watcher
+    except BlockingIOError:
+        pass  # a watcher is running
+    except OSError:
+        return None
+
+    token = os.urandom(8).hex()
+    sync_file_path = os.path.join(journal_dir_path, SYNC_FILE_PREFIX + token)
+    sync_record = b'\0s' + token.encode() + b'\0'
+
+    try:
+        open(sync_file_path, 'xb').close()
+    except OSError:
+        return None
+
+    try:
+        t0 = time.monotonic()
+        delay = 1e-3
+        while True:
+            try:
+                with open(journal_file_path, 'rb') as f:
+                    content = f.read()
+            except OSError:
+                content = b''
+            i = content.find(sync_record)
+            if i >= 0:
+                break
+            if time.monotonic() - t0 > timeout:
+                return None
+            time.sleep(delay)
+            delay = min(2 * delay, 20e-3)
+    finally:
+        try:
+            os.remove(sync_file_path)
+        except OSError:
+            pass
+
+    raw_records = content[:i].split(b'\0')
+    header = raw_records[0]
+    if not header.startswith(JOURNAL_HEADER_PREFIX):
+        return None
+    session = header[len(JOURNAL_HEADER_PREFIX):].decode('ascii', errors='replace')
+    records = [(p, os.fsdecode(r)) for p, r in enumerate(raw_records) if r[:1] in (b'c', b'r')]
+    return ChangeJournal(session, len(raw_records), records)
+
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+TREE_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+)
+JOURNAL_DIR_WATCH_MASK = IN_CREATE | IN_MOVED_TO | IN_ONLYDIR | IN_DONT_FOLLOW
+
+_EVENT_HEADER = struct.Struct('iIII')  # struct inotify_event without name
+
+
+class _Inotify:
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init1 = libc.inotify_init1
+        except AttributeError:
+            raise OSError('inotify is not supported by the C library') from None
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._get_errno = ctypes.get_errno
+
+        self.fd = init1(IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise_oserror()
+
+    def _raise_oserror(self, path: Optional[str] = None):
+        error_number = self._get_errno()
+        raise OSError(error_number, os.strerror(error_number), path)
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise_oserror(path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._rm_watch(self.fd, wd)  # fails if already removed by the kernel
+
+    def read_events(self, timeout: Optional[float] = None) -> List[Tuple[int, int, bytes]]:
+        # Wait for at least one event (at most *timeout* seconds if not None) and return all available events as
+        # triples (wd, mask, name)
+        if timeout is not None:
+            import select
+            if not select.select([self.fd], [], [], timeout)[0]:
+                return []
+        buffer = os.read(self.fd, 2**16)
+        events = []
+        i = 0
+        while i < len(buffer):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, i)
+            i += _EVENT_HEADER.size
+            events.append((wd, mask, buffer[i:i + name_length].rstrip(b'\0')))
+            i += name_length
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _TreeWatcher:
+    # Watches the managed tree of the working tree with absolute path *root_path* for changes.
+
+    def __init__(self, root_path: str):
+        self._root_path = root_path
+        self._inotify = _Inotify()
+        self._encoded_path_by_wd: Dict[int, str] = {}
+
+    def watch_tree(self):
+        self._add_watches('')
+
+    def _add_watches(self, encoded_dir_path: str):
+        # Watch the directory with encoded managed tree path *encoded_dir_path* and all directories in it.
+        pending = [encoded_dir_path]
+        while pending:
+            encoded_path = pending.pop()
+            abs_path = os.path.join(self._root_path, *encoded_path.split('/'))
+            try:
+                wd = self._inotify.add_watch(abs_path, TREE_WATCH_MASK)
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # removed or replaced in the meantime (will be recorded)
+            self._encoded_path_by_wd[wd] = encoded_path
+            try:
+                with os.scandir(abs_path) as it:
+                    for e in it:
+                        if encoded_path == '' and e.name == _worktree.MANAGEMENTTREE_DIR_NAME:
+                            continue
+                        if e.is_dir(follow_symlinks=False):
+                            pending.append(f'{encoded_path}{e.name}/')
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+
+    def _remove_watches(self, encoded_dir_path: str):
+        # Stop watching the directory with encoded managed tree path *encoded_dir_path* and all directories in it
+        # (after it was moved: the events would be reported with the old path).
+        for wd, encoded_path in list(self._encoded_path_by_wd.items()):
+            if encoded_path.startswith(encoded_dir_path):
+                del self._encoded_path_by_wd[wd]
+                self._inotify.rm_watch(wd)
+
+    def _record_other_event(self, wd: int, mask: int, name: bytes, records: List[bytes]) -> bool:
+        # Handle an event of a watch not added by this class.
+        # Returns False if the session must be ended.
+        return True
+
+    def read_records(self, timeout: Optional[float] = None) -> Optional[List[bytes]]:
+        # Wait for events (at most *timeout* seconds if not None) and return the corresponding journal records
+        # (without terminating b'\0').
+        # Returns None if the session must be ended.
+
+        records = []
+        for wd, mask, name in self._inotify.read_events(timeout):
+            if mask & IN_Q_OVERFLOW:
+                return None
+
+            encoded_dir_path = self._encoded_path_by_wd.get(wd)
+            if encoded_dir_path is None:
+                if not self._record_other_event(wd, mask, name, records):
+                    return None
+                continue  # removed watch
+            if mask & IN_IGNORED:
+                del self._encoded_path_by_wd[wd]
+                continue
+
+            if not name:  # event on the watched directory itself
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    if not encoded_dir_path:
+                        return None
+                    records.append(b'r' + os.fsencode(encoded_dir_path))
+                else:
+                    records.append(b'c' + os.fsencode(encoded_dir_path))
+                continue
+
+            if not encoded_dir_path and name == _worktree.MANAGEMENTTREE_DIR_NAME.encode():
+                continue
+
+            encoded_path = encoded_dir_path + os.fsdecode(name) + '/'
+            if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                # the directory's mtime has changed
+                records.append(b'c' + os.fsencode(encoded_dir_path))
+                records.append(b'r' + os.fsencode(encoded_path))
+                if mask & IN_ISDIR:
+                    if mask & IN_MOVED_FROM:
+                        self._remove_watches(encoded_path)
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_watches(encoded_path)
+            else:
+                records.append(b'c' + os.fsencode(encoded_path))
+
+        return records
+
+    def close(self):
+        self._inotify.close()
+
+
+class _Watcher(_TreeWatcher):
+    # Records changes in the managed tree of the working tree with absolute path *root_path* in a journal
+    # until the inotify queue overflows or the journal becomes too large.
+
+    def __init__(self, root_path: str):
+        super().__init__(root_path)
+        self._journal_dir_path = os.path.join(root_path, _worktree.MANAGEMENTTREE_DIR_NAME, JOURNAL_DIR_NAME)
+        self._journal_dir_wd = None
+        self._journal_fd = None
+        self._journal_size = 0
+
+    def start_session(self):
+        # Watch the managed tree and start a new journal.
+        self._journal_dir_wd = self._inotify.add_watch(self._journal_dir_path, JOURNAL_DIR_WATCH_MASK)
+        self.watch_tree()
+
+        session = f'{os.getpid()}-{time.time_ns()}-{os.urandom(8).hex()}'
+        header = JOURNAL_HEADER_PREFIX + session.encode() + b'\0'
+        journal_file_path = os.path.join(self._journal_dir_path, JOURNAL_FILE_NAME)
+        temporary_path = journal_file_path + '.t'
+        with open(temporary_path, 'wb') as f:
+            f.write(header)
+        os.replace(temporary_path, journal_file_path)  # atomic
+        self._journal_fd = os.open(journal_file_path, os.O_WRONLY | os.O_APPEND | getattr(os, 'O_CLOEXEC', 0))
+        self._journal_size = len(header)
+
+    def _record_other_event(self, wd: int, mask: int, name: bytes, records: List[bytes]) -> bool:
+        if wd == self._journal_dir_wd:
+            name = os.fsdecode(name)
+            if name.startswith(SYNC_FILE_PREFIX) and mask & (IN_CREATE | IN_MOVED_TO):
+                records.append(b's' + name[len(SYNC_FILE_PREFIX):].encode())
+            elif mask & IN_IGNORED:
+                return False
+        return True
+
+    def record_events(self) -> bool:
+        # Wait for events and record them in the journal.
+        # Returns False if the session must be ended.
+
+        records = self.read_records()
+        if records is None:
+            return False
+
+        if records:
+            data = b''.join(r + b'\0' for r in records)
+            os.write(self._journal_fd, data)  # one write: sync record after all records of earlier events
+            self._journal_size += len(data)
+
+        return self._journal_size <= MAX_JOURNAL_SIZE
+
+    def close(self):
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+        super().close()
+
+
+class ChangeWaiter:
+    # Waits for changes in the managed tree of the working tree with absolute path *root_path* (GNU/Linux only).
+    # Changes are observed from the construction on.
+    #
+    # Raises OSError if the changes cannot be observed on this platform.
+
+    def __init__(self, root_path: fs.Path):
+        if not sys.platform.startswith('linux'):
+            raise OSError('changes in the managed tree cannot be observed on this platform')
+        self._root_path = str(root_path.native)
+        self._tree_watcher = None
+        self._start()
+
+    def _start(self):
+        self._tree_watcher = _TreeWatcher(self._root_path)
+        try:
+            self._tree_watcher.watch_tree()
+        except BaseException:
+            self._tree_watcher.close()
+            raise
+
+    def wait(self, ignored_encoded_paths: Collection[str] = (), delay: float = 0.1) -> List[str]:
+        # Wait for changes of filesystem objects in the managed tree since the construction or the last call of
+        # this method until no further change was observed for *delay* seconds.
+        # Changes of filesystem objects with an encoded managed tree path in *ignored_encoded_paths*, of filesystem
+        # objects in them, and of the directories that contain them (e.g. by the creation of a missing parent
+        # directory of an output dependency) are ignored.
+        #
+        # Returns the encoded managed tree paths of the changed filesystem objects
+        # (the list is empty if the changes could not be observed completely).
+
+        ignored_encoded_paths = frozenset(ignored_encoded_paths)
+        ignored_encoded_dir_paths = {''} if ignored_encoded_paths else set()
+        for p in ignored_encoded_paths:
+            i = p.find('/')
+            while 0 <= i < len(p) - 1:
+                ignored_encoded_dir_paths.add(p[:i + 1])
+                i = p.find('/', i + 1)
+
+        def is_ignored(encoded_path):
+            if encoded_path in ignored_encoded_dir_paths or encoded_path in ignored_encoded_paths:
+                return True
+            i = encoded_path.find('/')
+            while 0 <= i < len(encoded_path) - 1:
+                if encoded_path[:i + 1] in ignored_encoded_paths:
+                    return True
+                i = encoded_path.find('/', i + 1)
+            return False
+
+        changed_encoded_paths = []
+        timeout = 0.0  # first: events before this call
+        while True:
+            records = self._tree_watcher.read_records(timeout)
+            if records is None:  # restart
+                self._tree_watcher.close()
+                self._start()
+                return []
+            records = [p for p in (os.fsdecode(r[1:]) for r in records) if not is_ignored(p)]
+            if records:
+                changed_encoded_paths += records
+                timeout = delay  # wait for further changes
+            elif changed_encoded_paths:
+                return sorted(set(changed_encoded_paths))
+            else:
+                timeout = None  # wait for the first change
+
+    def close(self):
+        self._tree_watcher.close()
+
+
+def watch(root_path: fs.Path):
+    # Record changes in the managed tree of the working tree with absolute path *root_path* until interrupted.
+    # Raises OSError if no watcher can be started (e.g. because another one is running).
+
+    import fcntl
+
+    root_path = str(root_path.native)
+    journal_dir_path = os.path.join(root_path, _worktree.MANAGEMENTTREE_DIR_NAME, JOURNAL_DIR_NAME)
+    os.makedirs(journal_dir_path, exist_ok=True)
+
+    with open(os.path.join(journal_dir_path, WATCHER_LOCK_FILE_NAME), 'ab') as lock_file:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OSError(f'another watcher is running for working tree: {root_path!r}') from None
+
+        try:
+            while True:
+                watcher = _Watcher(root_path)
+                try:
+                    try:
+                        watcher.start_session()
+                    except OSError as e:
+                        if e.errno == errno.ENOSPC:
+                            raise OSError(
+                                f'{e}\n  | increase the maximum number of inotify watches '
+                                f'in /proc/sys/fs/inotify/max_user_watches') from None
+                        raise
+                    while watcher.record_events():
+                        pass
+                finally:
+                    watcher.close()
+        finally:
+            _worktree.remove_filesystem_object(os.path.join(journal_dir_path, JOURNAL_FILE_NAME),
+                                               ignore_non_existent=True)
+
+
+def get_unchanged_memos(journal: ChangeJournal, position: int, inputs: Dict[str, Tuple[bool, Optional[bytes]]]) \
+        -> Dict[str, _rundb.FilesystemObjectMemo]:
+    # Return the memos from *inputs* (as returned by _rundb.Database.get_fsobject_inputs()) of all existing
+    # filesystem objects that are unchanged since *position* according to *journal*.
+
+    memo_by_encoded_path = {}
+    for encoded_path, (_, encoded_memo) in inputs.items():
+        if encoded_memo is not None and journal.is_unchanged_since(encoded_path, position):
+            try:
+                memo = _rundb.decode_encoded_fsobject_memo(encoded_memo)
+            except ValueError:
+                continue
+            if memo.stat is not None:
+                memo_by_encoded_path[encoded_path] = memo
+    return memo_by_encoded_path
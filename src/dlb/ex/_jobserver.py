@@ -0,0 +1,235 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# dlb - a Pythonic build tool
+# Copyright (C) 2020 Daniel Lutz <dlu-ch@users.noreply.github.com>
+
+"""Cooperation with GNU Make by its jobserver protocol (POSIX only).
+This is an implementation detail - do not import it unless you know what you are doing."""
+
+# A jobserver of GNU Make is a pipe or FIFO that contains one byte (token) for each job that can be run in addition
+# to the one each process of the build may run anyway (implicit token).
+# A process of the build reads a token from the jobserver before it starts a job and writes the same token back
+# after the job is done.
+#
+# The jobserver is advertised to child processes by an option in the environment variable MAKEFLAGS:
+#
+#   --jobserver-auth=R,W  (since GNU Make 4.2; '--jobserver-fds=R,W' before):
+#       R and W are file descriptors of the read and the write end of a pipe inherited from the parent process
+#   --jobserver-auth=fifo:PATH  (since GNU Make 4.4):
+#       PATH is the path of a FIFO
+#
+# See https://www.gnu.org/software/make/manual/html_node/POSIX-Jobserver.html.
+
+__all__ = []
+
+import os
+import stat
+import collections
+from typing import Deque, Optional, Tuple, Union
+
+
+def parse_jobserver_auth(makeflags: str) -> Optional[Union[str, Tuple[int, int]]]:
+    # Return the jobserver advertised by the last '--jobserver-auth=' (or '--jobserver-fds=') option in *makeflags*
+    # as the path of a FIFO or a tuple of file descriptors, or None if there is none.
+    #
+    # Raises ValueError if the jobserver cannot be used by this module (e.g. a semaphore on MS Windows).
+
+    auth = None
+    for word in makeflags.split():
+        for prefix in ('--jobserver-auth=', '--jobserver-fds='):
+            if word.startswith(prefix):
+                auth = word[len(prefix):]
+
+    if auth is None:
+        return None
+
+    if auth.startswith('fifo:'):
+        if len(auth) <= len('fifo:'):
+            raise ValueError(f"invalid jobserver: {auth!r}")
+        return auth[len('fifo:'):]
+
+    try:
+        read_fd, write_fd = (int(s, 10) for s in auth.split(','))
+    except ValueError:
+        raise ValueError(f"unsupported jobserver: {auth!r}") from None
+    if read_fd < 0 or write_fd < 0:
+        raise ValueError(f"jobserver is disabled: {auth!r}")
+
+    return read_fd, write_fd
+
+
+class Jobserver:
+    # Client of a jobserver.
+    #
+    # 'acquire()' and 'release()' must only be called from coroutines of the same asyncio loop.
+
+    def __init__(self, read_fd: int, write_fd: int, makeflags: str, pass_fds: Tuple[int, ...] = (),
+                 owned_fds: Tuple[int, ...] = ()):
+        # Reads tokens from *read_fd* (which must be in non-blocking mode) and writes tokens to *write_fd*.
+        # *makeflags* is the value of MAKEFLAGS for child processes that must inherit the file descriptors *pass_fds*.
+        # Closes *read_fd*, *write_fd* and all members of *owned_fds* on 'close()'.
+
+        self._read_fd = read_fd
+        self._write_fd = write_fd
+        self._makeflags = makeflags
+        self._pass_fds = pass_fds
+        self._owned_fds = (read_fd, write_fd) + owned_fds
+        self._is_implicit_token_taken = False
+        self._waiters: Deque['asyncio.Future'] = collections.deque()
+        self._loop = None
+
+    @property
+    def makeflags(self) -> str:
+        return self._makeflags
+
+    @property
+    def pass_fds(self) -> Tuple[int, ...]:
+        return self._pass_fds
+
+    async def acquire(self) -> Optional[bytes]:
+        # Wait until a token is available and return it; None is the implicit token.
+
+        if not self._is_implicit_token_taken:
+            self._is_implicit_token_taken = True
+            return None
+
+        token = self._read_token()
+        if token is not None:
+            return token
+
+        import asyncio
+        loop = asyncio.get_event_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if len(self._waiters) == 1:
+            self._loop = loop
+            loop.add_reader(self._read_fd, self._hand_over_read_tokens)
+        try:
+            return await waiter
+        except BaseException:  # e.g. asyncio.CancelledError
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release(waiter.result())
+            self._remove_waiter(waiter)
+            raise
+
+    def release(self, token: Optional[bytes]):
+        # Release the token *token* returned by 'acquire()'.
+
+        if token is None:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    self._remove_waiter(None)
+                    waiter.set_result(None)  # hand over the implicit token
+                    return
+            self._remove_waiter(None)
+            self._is_implicit_token_taken = False
+        else:
+            os.write(self._write_fd, token)
+
+    def close(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.cancel()
+        self._remove_waiter(None)
+        fds, self._owned_fds = self._owned_fds, ()
+        for fd in fds:
+            os.close(fd)
+
+    def _read_token(self) -> Optional[bytes]:
+        try:
+            token = os.read(self._read_fd, 1)
+        except BlockingIOError:
+            return None
+        if not token:
+            raise ConnectionError('jobserver was closed')
+        return token
+
+    def _hand_over_read_tokens(self):
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.done():  # cancelled
+                self._waiters.popleft()
+                continue
+            try:
+                token = self._read_token()
+            except ConnectionError as e:
+                self._waiters.popleft()
+                waiter.set_exception(e)
+                continue
+            if token is None:
+                break
+            self._waiters.popleft()
+            waiter.set_result(token)
+        self._remove_waiter(None)
+
+    def _remove_waiter(self, waiter):
+        # Remove *waiter* (if not None) and stop waiting for tokens if there is no waiter left.
+        if waiter is not None:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        if not self._waiters and self._loop is not None:
+            self._loop.remove_reader(self._read_fd)
+            self._loop = None
+
+
+def open_inherited(makeflags: str) -> Optional[Jobserver]:
+    # Return a client of the jobserver advertised in *makeflags* (the value of MAKEFLAGS) or None if there is none.
+    #
+    # Raises ValueError or OSError if the advertised jobserver cannot be used (e.g. because the file descriptors were
+    # not inherited).
+
+    auth = parse_jobserver_auth(makeflags)
+    if auth is None:
+        return None
+
+    if isinstance(auth, str):
+        read_fd = os.open(auth, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            if not stat.S_ISFIFO(os.fstat(read_fd).st_mode):
+                raise ValueError(f"jobserver is not a FIFO: {auth!r}")
+            write_fd = os.open(auth, os.O_WRONLY)
+        except BaseException:
+            os.close(read_fd)
+            raise
+        return Jobserver(read_fd, write_fd, makeflags)
+
+    for fd in auth:
+        if not stat.S_ISFIFO(os.fstat(fd).st_mode):  # raises OSError if *fd* is not open
+            raise ValueError(f"jobserver file descriptor is not a pipe: {fd}")
+
+    # a pipe's end opened by its path has its own open file description: GNU Make may not expect O_NONBLOCK on the
+    # one it shares with this process
+    read_fd = os.open(f'/proc/self/fd/{auth[0]}', os.O_RDONLY | os.O_NONBLOCK)  # GNU/Linux only
+    try:
+        write_fd = os.dup(auth[1])
+    except BaseException:
+        os.close(read_fd)
+        raise
+    return Jobserver(read_fd, write_fd, makeflags, pass_fds=auth)
+
+
+def create(fifo_path: str, token_count: int) -> Jobserver:
+    # Create a jobserver with *token_count* tokens as a FIFO *fifo_path* (which must not exist) and return a client.
+    #
+    # The jobserver is advertised to child processes by file descriptors (supported by all versions of GNU Make
+    # with a jobserver).
+
+    token_count = max(0, int(token_count))
+    os.mkfifo(fifo_path, 0o600)
+
+    fds = []
+    try:
+        fds.append(os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK))
+        fds.append(os.open(fifo_path, os.O_WRONLY))
+        fds.append(os.open(fifo_path, os.O_RDONLY))  # for child processes: without O_NONBLOCK
+        fds.append(os.open(fifo_path, os.O_WRONLY))
+        os.write(fds[1], b'+' * token_count)
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+    makeflags = f' -j{token_count + 1} --jobserver-auth={fds[2]},{fds[3]}'
+    return Jobserver(fds[0], fds[1], makeflags, pass_fds=(fds[2], fds[3]), owned_fds=(fds[2], fds[3]))
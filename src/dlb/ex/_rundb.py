@@ -9,13 +9,16 @@ __all__ = []
 
 import os.path
 import enum
+import bisect
 import time
+import queue
+import threading
+import functools
 import stat
 import dataclasses
 import datetime
 import marshal  # very fast, reasonably secure, round-trip loss-less (see comment below)
-import sqlite3
-from typing import Dict, List, Optional, Sequence, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from .. import ut
 from .. import fs
@@ -52,6 +55,10 @@ from . import _error
 #   - The serialized data is of about the same length; some data is a bit shorter with marshal, some a bit longer.
 
 
+# module 'sqlite3', imported by the first Database() to speed up 'import dlb.ex'
+_sqlite3 = None
+
+
 @dataclasses.dataclass
 class FilesystemStatSummary:
     mode: int
@@ -65,10 +72,49 @@ class FilesystemStatSummary:
 class FilesystemObjectMemo:
     stat: Optional[FilesystemStatSummary] = None
     symlink_target: Optional[str] = None
+    digest: Optional[bytes] = None  # content digest of regular file (if known)
 
 
 # unique identification of run-database schema among all versions (with a Git tag) of dlb declared as stable
-SCHEMA_VERSION = (0, 5)
+SCHEMA_VERSION = (0, 8)
+
+
+# SQLite pragmas by name of profile, applied in this order when the run-database is opened (journal mode and
+# synchronization with the storage device).
+# https://sqlite.org/pragma.html, https://sqlite.org/wal.html
+#
+# In every profile the run-database is consistent after a crash of the Python process; changes since the last commit
+# are lost.
+PRAGMAS_BY_PROFILE: Dict[str, Tuple[Tuple[str, Union[int, str]], ...]] = {
+    # consistent after a crash of the operating system or a power failure; commits are durable
+    'safe': (
+        ('journal_mode', 'DELETE'),  # not persistent in the run-database (in contrast to 'WAL')
+        ('synchronous', 'FULL'),
+    ),
+    # consistent after a crash of the operating system or a power failure; the last commits may be lost
+    # (no fsync on commit in WAL mode with synchronous = NORMAL)
+    'fast': (
+        ('journal_mode', 'WAL'),  # without shared memory, since locking_mode = EXCLUSIVE
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -32 * 1024),  # in KiB
+        ('mmap_size', 256 * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    ),
+    # may be corrupted by a crash of the operating system or a power failure (never synchronized with the storage
+    # device); for run-databases that are discarded after the dlb run (e.g. in a CI job)
+    'ci-ephemeral': (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'OFF'),
+        ('cache_size', -32 * 1024),
+        ('mmap_size', 256 * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    ),
+}
+
+
+# maximum number of parameters in an SQL statement with a parameter for each of many rows
+# (the limit of SQLite before 3.32.0 is 999)
+_MAX_QUERY_PARAMETER_COUNT = 900
 
 
 # note: without trailing 'Z'
@@ -97,6 +143,15 @@ def encode_path(path: fs.Path) -> str:
     return encoded_path
 
 
+def get_encoded_path_range_of_prefix(encoded_path: str) -> Tuple[str, Optional[str]]:
+    # Return '(first, last)' such that 'first <= p < last' is True for exactly those encoded paths *p* that have
+    # *encoded_path* as a prefix (with respect to the order of code points or bytes of UTF-8 encoding).
+    # *last* is None (no upper bound) if *encoded_path* is the empty path.
+    if not encoded_path:
+        return '', None
+    return encoded_path, encoded_path[:-1] + chr(ord('/') + 1)  # works since *encoded_path* ends with '/'
+
+
 def decode_encoded_path_as_str(encoded_path: str) -> str:
     if not encoded_path:
         return '.'
@@ -123,6 +178,45 @@ def decode_datetime(encoded_utc: str) -> datetime.datetime:
     return datetime.datetime.strptime(encoded_utc, _DATETIME_FORMAT)
 
 
+def encode_duration(duration_ns: int) -> bytes:
+    if not isinstance(duration_ns, int):
+        raise TypeError
+    if duration_ns < 0:
+        raise ValueError
+    return marshal.dumps(duration_ns)
+
+
+def decode_encoded_duration(encoded_duration: bytes) -> Optional[int]:
+    # Return the duration in nanoseconds or None if *encoded_duration* is not a valid encoded duration.
+    try:
+        duration_ns = marshal.loads(encoded_duration)
+    except (TypeError, ValueError, EOFError):
+        return None
+    if not isinstance(duration_ns, int) or duration_ns < 0:
+        return None
+    return duration_ns
+
+
+def encode_object_outputs(fundamental_value_by_name: Dict[str, Any]) -> bytes:
+    # *fundamental_value_by_name* must contain only values returned by 'ut.make_fundamental()'.
+    if not isinstance(fundamental_value_by_name, dict):
+        raise TypeError
+    return marshal.dumps(fundamental_value_by_name)
+
+
+def decode_encoded_object_outputs(encoded_object_outputs: bytes) -> Optional[Dict[str, Any]]:
+    # Return the dictionary encoded by 'encode_object_outputs()' or None if *encoded_object_outputs* is not valid.
+    try:
+        fundamental_value_by_name = marshal.loads(encoded_object_outputs)
+    except (TypeError, ValueError, EOFError):
+        return None
+    if not isinstance(fundamental_value_by_name, dict):
+        return None
+    if not all(isinstance(name, str) for name in fundamental_value_by_name):
+        return None
+    return fundamental_value_by_name
+
+
 def encode_fsobject_memo(memo: FilesystemObjectMemo) -> bytes:
     # Return a representation of *memo* as marshal-encoded tuple.
 
@@ -142,9 +236,16 @@ def encode_fsobject_memo(memo: FilesystemObjectMemo) -> bytes:
     if stat.S_ISLNK(memo.stat.mode) and not isinstance(memo.symlink_target, str):
         raise TypeError
 
-    return marshal.dumps((
-        memo.stat.mode, memo.stat.size, memo.stat.mtime_ns, memo.stat.uid, memo.stat.gid,
-        memo.symlink_target))
+    t = (memo.stat.mode, memo.stat.size, memo.stat.mtime_ns, memo.stat.uid, memo.stat.gid, memo.symlink_target)
+    if memo.digest is None:
+        return marshal.dumps(t)
+
+    if not isinstance(memo.digest, bytes):
+        raise TypeError
+    if not stat.S_ISREG(memo.stat.mode):
+        raise ValueError
+
+    return marshal.dumps(t + (memo.digest,))
 
 
 def decode_encoded_fsobject_memo(encoded_memo: bytes) -> FilesystemObjectMemo:
@@ -158,10 +259,20 @@ def decode_encoded_fsobject_memo(encoded_memo: bytes) -> FilesystemObjectMemo:
     if not t:
         return FilesystemObjectMemo()
 
+    digest = None
+    if len(t) == 7:
+        digest = t[-1]
+        t = t[:-1]
+        if not isinstance(digest, bytes):
+            raise ValueError
+
     mode, size, mtime_ns, uid, gid, symlink_target = t  # ValueError if number does not match
     if not all(isinstance(f, int) for f in t[:5]):
         raise ValueError
 
+    if digest is not None and not stat.S_ISREG(mode):
+        raise ValueError
+
     if not stat.S_ISLNK(mode) and symlink_target is not None:
         raise ValueError
 
@@ -170,16 +281,22 @@ def decode_encoded_fsobject_memo(encoded_memo: bytes) -> FilesystemObjectMemo:
 
     return FilesystemObjectMemo(
         stat=FilesystemStatSummary(mode=mode, size=size, mtime_ns=mtime_ns, uid=uid, gid=gid),
-        symlink_target=symlink_target)
+        symlink_target=symlink_target, digest=digest)
 
 
 def compare_fsobject_memo_to_encoded_from_last_redo(memo: FilesystemObjectMemo, last_encoded_memo: Optional[bytes],
-                                                    is_explicit: bool) -> Optional[str]:
+                                                    is_explicit: bool,
+                                                    read_digest: Optional[Callable[[], bytes]] = None) -> Optional[str]:
     # Compares the present *memo* if a filesystem object in the managed tree that is an input dependency with its
     # last known encoded state *last_encoded_memo*, if any.
     #
     # Returns ``None`` if no redo is necessary due to the difference of *memo* and *last_encoded_memo* and
     # a short line describing the reason otherwise.
+    #
+    # If the last known state contains a content digest and *read_digest* is not ``None``, a difference in mtime
+    # alone is not a reason for a redo if the content digest is the same: *memo.digest* if it is not ``None`` and the
+    # value returned by *read_digest()* otherwise.
+    # *memo* is not modified (it may be shared by the memo cache).
 
     if last_encoded_memo is None:
         if is_explicit:
@@ -215,7 +332,16 @@ def compare_fsobject_memo_to_encoded_from_last_redo(memo: FilesystemObjectMemo,
         return 'size has changed'
 
     if memo.stat.mtime_ns != last_memo.stat.mtime_ns:
-        return 'mtime has changed'
+        if last_memo.digest is None or read_digest is None:
+            return 'mtime has changed'
+        digest = memo.digest
+        if digest is None:
+            try:
+                digest = read_digest()
+            except (ValueError, OSError):
+                return 'mtime has changed and content is inaccessible'
+        if digest != last_memo.digest:
+            return 'content has changed'
 
     if (memo.stat.mode, memo.stat.uid, memo.stat.gid) != \
             (last_memo.stat.mode, last_memo.stat.uid, last_memo.stat.gid):
@@ -223,7 +349,7 @@ def compare_fsobject_memo_to_encoded_from_last_redo(memo: FilesystemObjectMemo,
 
 
 class _CursorWithExceptionMapping:
-    def __init__(self, connection: sqlite3.Connection, summary_message_line: str, solution_message_line: str):
+    def __init__(self, connection: 'sqlite3.Connection', summary_message_line: str, solution_message_line: str):
         self._connection = connection
         self._summary_message_line = summary_message_line.strip()
         self._solution_message_line = solution_message_line.strip()
@@ -232,7 +358,7 @@ class _CursorWithExceptionMapping:
         return self._connection.cursor()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is not None and isinstance(exc_val, sqlite3.Error):
+        if exc_type is not None and isinstance(exc_val, _sqlite3.Error):  # '_sqlite3' was set by Database()
             lines = []
 
             if self._summary_message_line:
@@ -245,10 +371,97 @@ class _CursorWithExceptionMapping:
             raise _error.DatabaseError(msg) from None
 
 
+class _PreloadedState:
+    # In-memory copy of the rows of ToolInst, ToolInstFsInput, ToolInstRedoState for the current platform.
+    #
+    # If *is_complete* is False, it contains only the rows of some tool instances: the ones of a tool instance
+    # *tool_instance_dbid* in ToolInstFsInput and ToolInstRedoState if and only if *tool_instance_dbid* is a key of
+    # 'inputs_by_tool_instance_dbid' and 'redo_state_by_tool_instance_dbid', respectively.
+
+    def __init__(self, is_complete: bool = True):
+        self.is_complete = is_complete
+        self.tool_instance_dbid_by_key: Dict[Tuple[bytes, bytes], int] = {}
+        self.inputs_by_tool_instance_dbid: Dict[int, Dict[str, Tuple[bool, Optional[bytes]]]] = {}
+        self.redo_state_by_tool_instance_dbid: Dict[int, Dict[int, bytes]] = {}
+        self.input_run_dbid_by_tool_instance_dbid: Dict[int, int] = {}
+
+        # for prefix search by encoded path
+        self.tool_instance_dbids_by_encoded_path: Dict[str, Set[int]] = {}
+        self.sorted_encoded_paths: List[str] = []  # superset of keys of 'tool_instance_dbids_by_encoded_path'
+
+    def register_tool_instance(self, key: Tuple[bytes, bytes], tool_instance_dbid: int):
+        self.tool_instance_dbid_by_key[key] = tool_instance_dbid
+        if self.is_complete:
+            self.inputs_by_tool_instance_dbid.setdefault(tool_instance_dbid, {})
+            self.redo_state_by_tool_instance_dbid.setdefault(tool_instance_dbid, {})
+
+    def get_inputs(self, tool_instance_dbid: int) -> Optional[Dict[str, Tuple[bool, Optional[bytes]]]]:
+        # Return None if not in memory.
+        inputs = self.inputs_by_tool_instance_dbid.get(tool_instance_dbid)
+        if inputs is None and self.is_complete:
+            inputs = {}
+        return inputs
+
+    def get_redo_state(self, tool_instance_dbid: int) -> Optional[Dict[int, bytes]]:
+        # Return None if not in memory.
+        redo_state = self.redo_state_by_tool_instance_dbid.get(tool_instance_dbid)
+        if redo_state is None and self.is_complete:
+            redo_state = {}
+        return redo_state
+
+    def replace_inputs(self, tool_instance_dbid: int, inputs: Dict[str, Tuple[bool, Optional[bytes]]]):
+        for encoded_path in self._replace_inputs(tool_instance_dbid, inputs):
+            bisect.insort(self.sorted_encoded_paths, encoded_path)
+
+    def replace_inputs_of_many(self, inputs_by_tool_instance_dbid: Dict[int, Dict[str, Tuple[bool, Optional[bytes]]]]):
+        # Like replace_inputs() for each item of *inputs_by_tool_instance_dbid*, but sorts only once
+        # (one bisect.insort() per new path would be O(n**2) for n paths).
+        new_encoded_paths = []
+        for tool_instance_dbid, inputs in inputs_by_tool_instance_dbid.items():
+            new_encoded_paths += self._replace_inputs(tool_instance_dbid, inputs)
+        if new_encoded_paths:
+            self.sorted_encoded_paths += new_encoded_paths
+            self.sorted_encoded_paths.sort()
+
+    def _replace_inputs(self, tool_instance_dbid: int, inputs: Dict[str, Tuple[bool, Optional[bytes]]]) -> List[str]:
+        # Return the encoded paths not yet in 'sorted_encoded_paths'.
+        tool_instance_dbids_by_encoded_path = self.tool_instance_dbids_by_encoded_path
+        for encoded_path in self.inputs_by_tool_instance_dbid.get(tool_instance_dbid, ()):
+            tool_instance_dbids_by_encoded_path[encoded_path].discard(tool_instance_dbid)
+        new_encoded_paths = []
+        for encoded_path in inputs:
+            dbids = tool_instance_dbids_by_encoded_path.get(encoded_path)
+            if dbids is None:
+                dbids = set()
+                tool_instance_dbids_by_encoded_path[encoded_path] = dbids
+                new_encoded_paths.append(encoded_path)
+            dbids.add(tool_instance_dbid)
+        self.inputs_by_tool_instance_dbid[tool_instance_dbid] = inputs
+        return new_encoded_paths
+
+    def declare_as_modified(self, first: str, last: Optional[str]):
+        # like 'UPDATE ToolInstFsInput SET memo_before = NULL WHERE path >= first AND path < last'
+        sorted_encoded_paths = self.sorted_encoded_paths
+        i = bisect.bisect_left(sorted_encoded_paths, first)
+        j = len(sorted_encoded_paths) if last is None else bisect.bisect_left(sorted_encoded_paths, last, i)
+        for encoded_path in sorted_encoded_paths[i:j]:
+            for tool_instance_dbid in self.tool_instance_dbids_by_encoded_path[encoded_path]:
+                inputs = self.inputs_by_tool_instance_dbid[tool_instance_dbid]
+                is_explicit, _ = inputs[encoded_path]
+                inputs[encoded_path] = is_explicit, None
+
+
 @enum.unique
 class Aspect(enum.Enum):
     RESULT = 0  # redo request of last successful redo (b'\x01' or b'') (not present if no known redo)
     ENVIRONMENT_VARIABLES = 1  # memo digest of environment variables
+    REDO_DURATION = 2  # duration of last successful redo (encoded by encode_duration())
+    OBJECT_OUTPUTS = 3  # non-explicit output dependencies 'Object' of last successful redo (encode_object_outputs())
+
+
+def _get_file_id(path: Union[str, os.PathLike]) -> Tuple[int, int]:
+    sr = os.stat(path)
+    return sr.st_dev, sr.st_ino
 
 
 class Database:
@@ -257,7 +470,7 @@ class Database:
 
     def __init__(self, rundb_path: Union[str, os.PathLike],
                  max_dependency_age: Optional[datetime.timedelta] = None,
-                 suggestion_if_database_error: str = ''):
+                 suggestion_if_database_error: str = '', profile: str = 'safe', write_behind: bool = False):
         # Open or create the database with path *rundb_path*.
         #
         # Remove information from runs older than *max_dependency_age* and all dependency information last
@@ -265,22 +478,32 @@ class Database:
         #
         # *suggestion_if_database_error* should be a non-empty line suggesting a recovery solution for database errors.
         #
+        # *profile* is the name of a profile in :data:`PRAGMAS_BY_PROFILE`.
+        #
+        # If *write_behind* is True, modifications by :meth:`update_dependencies_and_state()` and commits by
+        # :meth:`commit_if_overdue()` are performed by a dedicated thread (the writer thread) in the order of the calls,
+        # so a commit does not block the caller.
+        # All other methods wait for the pending modifications if the result could depend on them.
+        #
         # Until :meth:`close()' is called on this object, no other process must construct an object with the same
         # *rundb_path*.
 
         self._suggestion_if_database_error = str(suggestion_if_database_error)
-        self._start_datetime = datetime.datetime.utcnow()
 
-        if max_dependency_age is None:
-            oldest_dependency_datetime = None
-        else:
-            try:
-                oldest_dependency_datetime = self._start_datetime - max_dependency_age
-            except OverflowError:
-                raise ValueError(f"'max_dependency_age' too large: {max_dependency_age!r}") from None
+        pragmas = PRAGMAS_BY_PROFILE.get(profile)
+        if pragmas is None:
+            raise ValueError(f"unknown 'profile': {profile!r}")
+        start_datetime, oldest_dependency_datetime = self._get_start_and_oldest_datetime(max_dependency_age)
+
+        global _sqlite3
+        if _sqlite3 is None:
+            import sqlite3
+            _sqlite3 = sqlite3
+        sqlite3 = _sqlite3
 
         try:
-            connection = sqlite3.connect(rundb_path, isolation_level='DEFERRED')  # raises sqlite3.Error on error
+            # raises sqlite3.Error on error
+            connection = sqlite3.connect(rundb_path, isolation_level='DEFERRED', check_same_thread=False)
         except sqlite3.Error as e:
             exists = os.path.isfile(rundb_path)  # does not raise OSError
             state_msg = 'existing' if exists else 'non-existent'
@@ -300,8 +523,10 @@ class Database:
         with cursor_with_exception_mapping as cursor:
             # https://sqlite.org/pragma.html
             # https://blog.devart.com/increasing-sqlite-performance.html
-            cursor.execute("PRAGMA locking_mode = EXCLUSIVE")
+            cursor.execute("PRAGMA locking_mode = EXCLUSIVE")  # before journal_mode
             cursor.execute("PRAGMA foreign_keys = ON")  # https://www.sqlite.org/foreignkeys.html
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name} = {value}").fetchall()  # journal_mode returns a row
 
             cursor.execute("BEGIN")
 
@@ -338,11 +563,24 @@ class Database:
                         "UNIQUE(pl_platform_id, pl_tool_id, pl_tool_inst_fp)"
                     ")")
 
+                # each path is stored only once: paths of common input dependencies (e.g. header files) are
+                # referenced by many tool instances
                 cursor.execute(
-                    "CREATE TABLE ToolInstFsInput("
-                        "tool_inst_dbid INTEGER, "            # tool instance
+                    "CREATE TABLE FsObject("
+                        "fsobject_dbid INTEGER NOT NULL, "    # unique id of path (until next cleanup)
                         "path TEXT NOT NULL, "                # path of filesystem object in managed tree,
                                                               # encoded by encode_path
+                        "PRIMARY KEY(fsobject_dbid)"          # makes fsobject_dbid an AUTOINCREMENT field
+                    ")")
+
+                # for lookup by 'path' and prefix search by 'path' (a prefix of an encoded path is a lexicographic
+                # range)
+                cursor.execute("CREATE UNIQUE INDEX FsObject_path ON FsObject(path)")
+
+                cursor.execute(
+                    "CREATE TABLE ToolInstFsInput("
+                        "tool_inst_dbid INTEGER, "            # tool instance
+                        "fsobject_dbid INTEGER NOT NULL, "    # filesystem object in managed tree
                         "is_explicit INTEGER NOT NULL, "      # 0 for implicit, 1 for explicit dependency of
                                                               # tool instance
                         "memo_before BLOB, "                  # memo of filesystem object before last redo of 
@@ -350,11 +588,15 @@ class Database:
                                                               # or NULL if filesystem object was modified since 
                                                               # last redo
                         "run_dbid INTEGER, "                  # run_dbid of last update
-                        "PRIMARY KEY(tool_inst_dbid, path), "
+                        "PRIMARY KEY(tool_inst_dbid, fsobject_dbid), "
                         "FOREIGN KEY(tool_inst_dbid) REFERENCES ToolInst(tool_inst_dbid), "
+                        "FOREIGN KEY(fsobject_dbid) REFERENCES FsObject(fsobject_dbid), "
                         "FOREIGN KEY(run_dbid) REFERENCES Run(run_dbid)"
                     ")")
 
+                # for search by 'fsobject_dbid' (invalidation of modified paths, cleanup)
+                cursor.execute("CREATE INDEX ToolInstFsInput_fsobject ON ToolInstFsInput(fsobject_dbid)")
+
                 # state before last sucessful redo of tool instance by aspect
                 cursor.execute(
                     "CREATE TABLE ToolInstRedoState("
@@ -373,34 +615,237 @@ class Database:
                 # If on average only a few of the aspects are used, this approach is more efficient. It is also more
                 # flexible.
 
+                # position in the change journal at the start of a dlb run (if a change journal was used)
+                cursor.execute(
+                    "CREATE TABLE RunChangeJournal("
+                        "run_dbid INTEGER NOT NULL, "         # dlb run
+                        "session TEXT NOT NULL, "             # session of the change journal
+                        "position INTEGER NOT NULL, "         # position in the change journal of 'session'
+                        "PRIMARY KEY(run_dbid), "
+                        "FOREIGN KEY(run_dbid) REFERENCES Run(run_dbid)"
+                    ")")
+
                 cursor.execute(
                     "CREATE TRIGGER delete_obsolete_toolinst "
                         "AFTER DELETE ON Run FOR EACH ROW BEGIN "
                             "DELETE FROM ToolInstFsInput WHERE run_dbid = OLD.run_dbid; "
                             "DELETE FROM ToolInstRedoState WHERE run_dbid = OLD.run_dbid; "
+                            "DELETE FROM RunChangeJournal WHERE run_dbid = OLD.run_dbid; "
                         "END")
 
-            if oldest_dependency_datetime is not None:
-                cursor.execute("DELETE FROM Run WHERE start_time < ?", (encode_datetime(oldest_dependency_datetime),))
-
-            # assign tool_inst_dbid by AUTOINCREMENT:
-            cursor.execute("INSERT INTO Run VALUES (NULL, ?, NULL, NULL, NULL)",
-                           (encode_datetime(self._start_datetime),))
-            cursor.execute("SELECT last_insert_rowid()")  # https://www.sqlite.org/c3ref/last_insert_rowid.html
-            self._run_dbid = cursor.fetchone()[0]
-            self._start_time_ns = time.monotonic_ns()  # since Python 3.7
+            self._start_run(cursor, start_datetime, oldest_dependency_datetime)
 
         self._modifying_operations_since_commit = 1
         self._connection = connection
+        try:
+            self._file_id = _get_file_id(rundb_path)
+        except OSError:
+            self._file_id = None
+        self._preloaded: Optional[_PreloadedState] = None
+
+        # The writer thread uses the same connection as all other methods: with 'locking_mode = EXCLUSIVE', a second
+        # connection to the same run-database would be locked out.
+        self._connection_lock = threading.Lock()  # protects 'self._connection'
+        self._pending_writes: Optional[queue.Queue] = None
+        self._writer_exception: Optional[BaseException] = None
+        self._writer_thread: Optional[threading.Thread] = None
 
         if not did_exist:
             # make sure tables exist afterwards
             self.commit()
 
+        if write_behind:
+            self._pending_writes = queue.Queue()
+            self._writer_thread = threading.Thread(target=self._write_pending, name='dlb-rundb-writer', daemon=True)
+            self._writer_thread.start()
+
+    @staticmethod
+    def _get_start_and_oldest_datetime(max_dependency_age: Optional[datetime.timedelta]) \
+            -> Tuple[datetime.datetime, Optional[datetime.datetime]]:
+        start_datetime = datetime.datetime.utcnow()
+        if max_dependency_age is None:
+            return start_datetime, None
+        try:
+            return start_datetime, start_datetime - max_dependency_age
+        except OverflowError:
+            raise ValueError(f"'max_dependency_age' too large: {max_dependency_age!r}") from None
+
+    def _start_run(self, cursor, start_datetime: datetime.datetime,
+                   oldest_dependency_datetime: Optional[datetime.datetime]):
+        if oldest_dependency_datetime is not None:
+            cursor.execute("DELETE FROM Run WHERE start_time < ?", (encode_datetime(oldest_dependency_datetime),))
+
+        # assign tool_inst_dbid by AUTOINCREMENT:
+        cursor.execute("INSERT INTO Run VALUES (NULL, ?, NULL, NULL, NULL)", (encode_datetime(start_datetime),))
+        cursor.execute("SELECT last_insert_rowid()")  # https://www.sqlite.org/c3ref/last_insert_rowid.html
+        self._run_dbid = cursor.fetchone()[0]
+        self._start_datetime = start_datetime
+        self._start_time_ns = time.monotonic_ns()  # since Python 3.7
+
+    def start_next_run(self, max_dependency_age: Optional[datetime.timedelta] = None):
+        # Start another dlb run with this (open) run-database after the current one was completed by
+        # :meth:`cleanup()` and :meth:`commit()`, like the construction of a new object with the same run-database
+        # would do.
+        #
+        # This avoids the setup of the connection to the run-database for each dlb run in a long-lived process.
+
+        start_datetime, oldest_dependency_datetime = self._get_start_and_oldest_datetime(max_dependency_age)
+        self._preloaded = None
+
+        self._wait_for_pending_writes()
+        with self._connection_lock, self._cursor_with_exception_mapping('could not start run') as cursor:
+            self._start_run(cursor, start_datetime, oldest_dependency_datetime)
+
+        self._modifying_operations_since_commit += 1
+        self.commit()
+
+    def is_file(self, rundb_path: Union[str, os.PathLike]) -> bool:
+        # Is the file with path *rundb_path* the run-database this object was constructed for?
+        try:
+            return self._file_id is not None and _get_file_id(rundb_path) == self._file_id
+        except OSError:
+            return False
+
     @property
     def run_dbid(self) -> int:
         return self._run_dbid
 
+    @property
+    def is_preloaded(self) -> bool:
+        return self._preloaded is not None and self._preloaded.is_complete
+
+    def preload(self):
+        # Read all information on tool instances of the current platform into memory.
+        #
+        # Afterwards (until the next :meth:`cleanup()` on this object), :meth:`get_and_register_tool_instance_dbid()`
+        # for registered tool instances, :meth:`get_fsobject_inputs()`, and :meth:`get_redo_state()` do not access
+        # the run-database, and :meth:`update_dependencies_and_state()` writes to the run-database and to memory.
+        #
+        # This replaces a few queries for each tool instance by three queries in total.
+
+        preloaded = _PreloadedState(is_complete=True)
+        platform_id = (_platform.PERMANENT_PLATFORM_ID,)
+
+        self._wait_for_pending_writes()
+        with self._connection_lock, self._cursor_with_exception_mapping('preloading of run-database failed') as cursor:
+            for tool_id, fingerprint, tool_instance_dbid in cursor.execute(
+                    "SELECT pl_tool_id, pl_tool_inst_fp, tool_inst_dbid FROM ToolInst WHERE pl_platform_id = ?",
+                    platform_id):
+                preloaded.register_tool_instance((tool_id, fingerprint), tool_instance_dbid)
+
+            inputs_by_tool_instance_dbid: Dict[int, Dict[str, Tuple[bool, Optional[bytes]]]] = {}
+            input_run_dbid_by_tool_instance_dbid = preloaded.input_run_dbid_by_tool_instance_dbid
+            for tool_instance_dbid, encoded_path, is_explicit, encoded_memo_before, run_dbid in cursor.execute(
+                    "SELECT fs.tool_inst_dbid, fo.path, fs.is_explicit, fs.memo_before, fs.run_dbid "
+                    "FROM ToolInstFsInput AS fs "
+                    "INNER JOIN ToolInst AS ti ON fs.tool_inst_dbid = ti.tool_inst_dbid "
+                    "INNER JOIN FsObject AS fo ON fs.fsobject_dbid = fo.fsobject_dbid "
+                    "WHERE ti.pl_platform_id = ? ORDER BY fo.path",
+                    platform_id):
+                inputs = inputs_by_tool_instance_dbid.get(tool_instance_dbid)
+                if inputs is None:
+                    inputs = {}
+                    inputs_by_tool_instance_dbid[tool_instance_dbid] = inputs
+                inputs[encoded_path] = bool(is_explicit), encoded_memo_before
+                input_run_dbid_by_tool_instance_dbid[tool_instance_dbid] = min(
+                    run_dbid, input_run_dbid_by_tool_instance_dbid.get(tool_instance_dbid, run_dbid))
+
+            for tool_instance_dbid, aspect, memo_digest in cursor.execute(
+                    "SELECT do.tool_inst_dbid, do.aspect, do.memo_digest FROM ToolInstRedoState AS do "
+                    "INNER JOIN ToolInst AS ti ON do.tool_inst_dbid = ti.tool_inst_dbid WHERE ti.pl_platform_id = ?",
+                    platform_id):
+                preloaded.redo_state_by_tool_instance_dbid[tool_instance_dbid][aspect] = memo_digest
+
+        preloaded.replace_inputs_of_many(inputs_by_tool_instance_dbid)
+
+        self._preloaded = preloaded
+
+    def preload_tool_instances(self, keys: Sequence[Tuple[bytes, bytes]]) -> List[int]:
+        # Return the tool instance dbid for each tool instance identified by a pair of a permanent local tool id and
+        # a permanent local tool instance fingerprint in *keys* (in the same order) like
+        # :meth:`get_and_register_tool_instance_dbid()` and read all information on these tool instances into memory.
+        #
+        # Afterwards (until the next :meth:`cleanup()` on this object), :meth:`get_and_register_tool_instance_dbid()`,
+        # :meth:`get_fsobject_inputs()`, and :meth:`get_redo_state()` do not access the run-database for these
+        # tool instances, like after :meth:`preload()`.
+        #
+        # This replaces a few queries for each tool instance by a few queries for many tool instances.
+
+        self._raise_writer_exception()
+
+        preloaded = self._preloaded
+        if preloaded is None:
+            preloaded = _PreloadedState(is_complete=False)
+
+        tool_instance_dbid_by_key = preloaded.tool_instance_dbid_by_key
+        unknown_keys = list(dict.fromkeys(k for k in keys if k not in tool_instance_dbid_by_key))  # ordered
+        platform_id = _platform.PERMANENT_PLATFORM_ID
+
+        self._wait_for_pending_writes()
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
+            if unknown_keys:
+                # assign tool_inst_dbid by AUTOINCREMENT (in the order of *keys*):
+                cursor.executemany("INSERT OR IGNORE INTO ToolInst VALUES (NULL, ?, ?, ?)",
+                                   [(platform_id,) + k for k in unknown_keys])
+                unknown_keys = set(unknown_keys)
+                tool_ids = sorted(set(tool_id for tool_id, _ in unknown_keys))
+                for i in range(0, len(tool_ids), _MAX_QUERY_PARAMETER_COUNT):
+                    chunk = tool_ids[i:i + _MAX_QUERY_PARAMETER_COUNT]
+                    for tool_id, fingerprint, tool_instance_dbid in cursor.execute(
+                            f"SELECT pl_tool_id, pl_tool_inst_fp, tool_inst_dbid FROM ToolInst "
+                            f"WHERE pl_platform_id = ? AND pl_tool_id IN ({', '.join('?' * len(chunk))})",
+                            [platform_id] + chunk):
+                        if (tool_id, fingerprint) in unknown_keys:
+                            preloaded.register_tool_instance((tool_id, fingerprint), tool_instance_dbid)
+
+            tool_instance_dbids = [tool_instance_dbid_by_key[k] for k in keys]
+
+            dbids_to_load = sorted(set(
+                tool_instance_dbid for tool_instance_dbid in tool_instance_dbids
+                if preloaded.get_inputs(tool_instance_dbid) is None or
+                preloaded.get_redo_state(tool_instance_dbid) is None))
+            inputs_by_tool_instance_dbid: Dict[int, Dict[str, Tuple[bool, Optional[bytes]]]] = {}
+            input_run_dbid_by_tool_instance_dbid = {}
+            redo_state_by_tool_instance_dbid: Dict[int, Dict[int, bytes]] = {}
+            for i in range(0, len(dbids_to_load), _MAX_QUERY_PARAMETER_COUNT):
+                chunk = dbids_to_load[i:i + _MAX_QUERY_PARAMETER_COUNT]
+                placeholders = ', '.join('?' * len(chunk))
+                for tool_instance_dbid, encoded_path, is_explicit, encoded_memo_before, run_dbid in cursor.execute(
+                        f"SELECT fs.tool_inst_dbid, fo.path, fs.is_explicit, fs.memo_before, fs.run_dbid "
+                        f"FROM ToolInstFsInput AS fs "
+                        f"INNER JOIN FsObject AS fo ON fs.fsobject_dbid = fo.fsobject_dbid "
+                        f"WHERE fs.tool_inst_dbid IN ({placeholders}) ORDER BY fo.path",
+                        chunk):
+                    inputs = inputs_by_tool_instance_dbid.get(tool_instance_dbid)
+                    if inputs is None:
+                        inputs = {}
+                        inputs_by_tool_instance_dbid[tool_instance_dbid] = inputs
+                    inputs[encoded_path] = bool(is_explicit), encoded_memo_before
+                    input_run_dbid_by_tool_instance_dbid[tool_instance_dbid] = min(
+                        run_dbid, input_run_dbid_by_tool_instance_dbid.get(tool_instance_dbid, run_dbid))
+
+                for tool_instance_dbid, aspect, memo_digest in cursor.execute(
+                        f"SELECT tool_inst_dbid, aspect, memo_digest FROM ToolInstRedoState "
+                        f"WHERE tool_inst_dbid IN ({placeholders})",
+                        chunk):
+                    redo_state_by_tool_instance_dbid.setdefault(tool_instance_dbid, {})[aspect] = memo_digest
+
+        preloaded.replace_inputs_of_many({
+            tool_instance_dbid: inputs_by_tool_instance_dbid.get(tool_instance_dbid, {})
+            for tool_instance_dbid in dbids_to_load
+        })
+        for tool_instance_dbid in dbids_to_load:
+            run_dbid = input_run_dbid_by_tool_instance_dbid.get(tool_instance_dbid)
+            if run_dbid is None:
+                preloaded.input_run_dbid_by_tool_instance_dbid.pop(tool_instance_dbid, None)
+            else:
+                preloaded.input_run_dbid_by_tool_instance_dbid[tool_instance_dbid] = run_dbid
+            preloaded.redo_state_by_tool_instance_dbid[tool_instance_dbid] = \
+                redo_state_by_tool_instance_dbid.get(tool_instance_dbid, {})
+
+        self._preloaded = preloaded
+        return tool_instance_dbids
+
     def get_and_register_tool_instance_dbid(self, permanent_local_tool_id: bytes,
                                             permanent_local_tool_instance_fingerprint: bytes) -> int:
         # Return a tool instance dbid *tool_instance_dbid* for a tool instance identified by
@@ -410,20 +855,33 @@ class Database:
         #
         # When called more than one before the next cleanup() on this object, this always returns the same value.
 
+        self._raise_writer_exception()
+
+        preloaded = self._preloaded
+        if preloaded is not None:
+            tool_instance_dbid = preloaded.tool_instance_dbid_by_key.get(
+                (permanent_local_tool_id, permanent_local_tool_instance_fingerprint))
+            if tool_instance_dbid is not None:
+                return tool_instance_dbid
+
         t = (_platform.PERMANENT_PLATFORM_ID, permanent_local_tool_id, permanent_local_tool_instance_fingerprint)
-        with self._cursor_with_exception_mapping() as cursor:
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:  # not modified by writer thread
             # assign tool_inst_dbid by AUTOINCREMENT:
             cursor.execute("INSERT OR IGNORE INTO ToolInst VALUES (NULL, ?, ?, ?)", t)
             cursor.execute("SELECT tool_inst_dbid FROM ToolInst WHERE "
                            "pl_platform_id = ? AND pl_tool_id = ? AND pl_tool_inst_fp = ?", t)
             tool_instance_dbid = cursor.fetchone()[0]
 
+        if preloaded is not None:
+            preloaded.register_tool_instance(t[1:], tool_instance_dbid)
+
         return tool_instance_dbid
 
     def get_tool_instance_dbid_count(self) -> int:
         # Returns the number of (different) registered *tool_instance_dbid* for the current platform.
 
-        with self._cursor_with_exception_mapping() as cursor:
+        self._raise_writer_exception()
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
             n = cursor.execute(
                 "SELECT COUNT(*) FROM ToolInst WHERE pl_platform_id = ?",
                 (_platform.PERMANENT_PLATFORM_ID,)
@@ -439,19 +897,34 @@ class Database:
         # If *is_explicit_filter* is not ``None``, only the dependencies with *is_explicit* = *is_explicit_filter* are
         # returned.
         #
+        # The returned dictionary is ordered by *encoded_path* (for repeatable diagnostic messages).
+        #
         # *tool_instance_dbid* must be the value returned by call of :meth:`get_and_register_tool_instance_dbid()` since
         # the last :meth:`cleanup()` (if any).
 
-        with self._cursor_with_exception_mapping() as cursor:
+        self._raise_writer_exception()
+
+        inputs = None if self._preloaded is None else self._preloaded.get_inputs(tool_instance_dbid)
+        if inputs is not None:
+            if is_explicit_filter is None:
+                return dict(inputs)
+            is_explicit_filter = bool(is_explicit_filter)
+            return {encoded_path: info for encoded_path, info in inputs.items() if info[0] == is_explicit_filter}
+
+        self._wait_for_pending_writes()  # also modified paths of other tool instances
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
 
             if is_explicit_filter is None:
                 rows = cursor.execute(
-                    "SELECT path, is_explicit, memo_before FROM ToolInstFsInput WHERE tool_inst_dbid == ?",
+                    "SELECT fo.path, fs.is_explicit, fs.memo_before FROM ToolInstFsInput AS fs "
+                    "INNER JOIN FsObject AS fo ON fs.fsobject_dbid = fo.fsobject_dbid "
+                    "WHERE fs.tool_inst_dbid == ? ORDER BY fo.path",
                     (tool_instance_dbid,)).fetchall()
             else:
                 rows = cursor.execute(
-                    "SELECT path, is_explicit, memo_before FROM ToolInstFsInput "
-                    "WHERE tool_inst_dbid == ? AND is_explicit == ?",
+                    "SELECT fo.path, fs.is_explicit, fs.memo_before FROM ToolInstFsInput AS fs "
+                    "INNER JOIN FsObject AS fo ON fs.fsobject_dbid = fo.fsobject_dbid "
+                    "WHERE fs.tool_inst_dbid == ? AND fs.is_explicit == ? ORDER BY fo.path",
                     (tool_instance_dbid, int(bool(is_explicit_filter)))).fetchall()
 
         return {
@@ -459,13 +932,66 @@ class Database:
             for encoded_path, is_explicit, encoded_memo_before in rows
         }
 
+    def get_change_journal_position_of_fsobject_inputs(self, tool_instance_dbid: int, session: str) -> Optional[int]:
+        # Return the position in the change journal of session *session* at the start of the (earlier) dlb run that
+        # last updated the information on filesystem object input dependencies of the tool instance
+        # *tool_instance_dbid*.
+        #
+        # Returns None if there is no such information or the dlb run did not use a change journal of
+        # session *session*.
+        #
+        # *tool_instance_dbid* must be the value returned by call of :meth:`get_and_register_tool_instance_dbid()` since
+        # the last :meth:`cleanup()` (if any).
+
+        self._raise_writer_exception()
+
+        if self._preloaded is not None and self._preloaded.get_inputs(tool_instance_dbid) is not None:
+            run_dbid = self._preloaded.input_run_dbid_by_tool_instance_dbid.get(tool_instance_dbid)
+            if run_dbid is None or run_dbid == self.run_dbid:
+                return None
+            with self._connection_lock, self._cursor_with_exception_mapping() as cursor:  # not modified by writer
+                rows = cursor.execute(
+                    "SELECT position FROM RunChangeJournal WHERE run_dbid == ? AND session == ?",
+                    (run_dbid, session)).fetchall()
+        else:
+            self._wait_for_pending_writes()
+            with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
+                rows = cursor.execute(
+                    "SELECT j.position FROM RunChangeJournal AS j WHERE j.session == ? AND j.run_dbid != ? AND "
+                    "j.run_dbid == (SELECT MIN(run_dbid) FROM ToolInstFsInput WHERE tool_inst_dbid == ?)",
+                    (session, self.run_dbid, tool_instance_dbid)).fetchall()
+
+        return rows[0][0] if rows else None
+
+    def set_change_journal_position(self, session: str, position: int):
+        # Record *position* as the position in the change journal of session *session* at the start of this dlb run.
+
+        if not isinstance(session, str):
+            raise TypeError("'session' must be a str")
+        position = int(position)
+
+        self._raise_writer_exception()
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:  # not modified by writer thread
+            cursor.execute("INSERT OR REPLACE INTO RunChangeJournal VALUES (?, ?, ?)",
+                           (self.run_dbid, session, position))
+
+        self._modifying_operations_since_commit += 1
+
     def get_redo_state(self, tool_instance_dbid: int) -> Dict[int, bytes]:
         # Return state of the last known redo of the tool instance *tool_instance_dbid* as a dictionary of
         # memo digests by aspect.
         #
         # *tool_instance_dbid* must be the value returned by call of :meth:`get_and_register_tool_instance_dbid()` since
         # the last :meth:`cleanup()` (if any).
-        with self._cursor_with_exception_mapping() as cursor:
+
+        self._raise_writer_exception()
+
+        redo_state = None if self._preloaded is None else self._preloaded.get_redo_state(tool_instance_dbid)
+        if redo_state is not None:
+            return dict(redo_state)
+
+        self._wait_for_pending_writes()
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
             rows = cursor.execute(
                 "SELECT aspect, memo_digest FROM ToolInstRedoState WHERE tool_inst_dbid == ?",
                 (tool_instance_dbid,)).fetchall()
@@ -491,48 +1017,138 @@ class Database:
         # Starts a new transaction when no transaction is active but does not commit.
         # In case of an exception, the information on dependencies in the run-database remains unchanged;
         # if a transaction was active, it is rolled back.
+        # With write-behind, the arguments are checked before this returns but the run-database is modified later by
+        # the writer thread; an exception raised there is raised by every later call of a method of this object
+        # (except close()). All modifications after the failed one are discarded and nothing is committed.
+        #
+        # All rows are prepared (and checked) before the first modification and then written with one
+        # executemany() per table. This is important for tool instances with hundreds of input dependencies
+        # (one Python-to-SQLite round trip per row would dominate the time).
+
+        self._raise_writer_exception()
+
+        try:
+            run_dbid = self.run_dbid
+
+            fsinput_rows = None
+            if info_by_encoded_path is not None:
+                fsinput_rows = []
+                for encoded_path, info in info_by_encoded_path.items():
+                    is_explicit, encoded_memo_before = info
+                    if not is_encoded_path(encoded_path):
+                        raise ValueError(f"not a valid 'encoded_path': {encoded_path!r}")
+                    if encoded_memo_before is not None and not isinstance(encoded_memo_before, bytes):
+                        raise TypeError(f"not a valid 'encoded_memo_before': {encoded_memo_before!r}")
+                    fsinput_rows.append(
+                        (tool_instance_dbid, int(bool(is_explicit)), encoded_memo_before, run_dbid, encoded_path))
+
+            redostate_rows = None
+            if memo_digest_by_aspect is not None:
+                redostate_rows = []
+                for aspect, memo_digest in memo_digest_by_aspect.items():
+                    if not isinstance(aspect, int):
+                        raise TypeError(f"not a valid 'aspect': {aspect!r}")
+                    if memo_digest is not None:
+                        if not isinstance(memo_digest, bytes):
+                            raise TypeError(f"not a valid 'memo_digest': {memo_digest!r}")
+                        redostate_rows.append((tool_instance_dbid, aspect, memo_digest, run_dbid))
+
+            modified_rows = None
+            if encoded_paths_of_modified is not None:
+                modified_rows = []
+                for modified_encoded_path in sorted(encoded_paths_of_modified):
+                    if not is_encoded_path(modified_encoded_path):
+                        raise ValueError(f"not a valid 'encoded_path': {modified_encoded_path!r}")
+                    # a path with a prefix in 'modified_rows' is redundant ('sorted' places prefix first)
+                    if not (modified_rows and modified_encoded_path.startswith(modified_rows[-1][0])):
+                        modified_rows.append((modified_encoded_path,))
+        except:
+            if self._pending_writes is not None:
+                self._pending_writes.join()
+            with self._connection_lock:
+                self._connection.rollback()
+            self._preloaded = None  # may contain changes of the transaction just rolled back
+            raise
+
+        if self._pending_writes is None:
+            with self._connection_lock:
+                self._write_dependencies_and_state(tool_instance_dbid, fsinput_rows, redostate_rows, modified_rows)
+            self._modifying_operations_since_commit += 1
+            self._update_preloaded_dependencies_and_state(
+                tool_instance_dbid, fsinput_rows, redostate_rows, modified_rows)
+        else:
+            # the writer thread drops the preloaded state if the modification of the run-database fails
+            self._update_preloaded_dependencies_and_state(
+                tool_instance_dbid, fsinput_rows, redostate_rows, modified_rows)
+            self._modifying_operations_since_commit += 1
+            self._pending_writes.put(functools.partial(
+                self._write_dependencies_and_state, tool_instance_dbid, fsinput_rows, redostate_rows, modified_rows))
+
+    def _write_dependencies_and_state(self, tool_instance_dbid: int,
+                                      fsinput_rows: Optional[List[Tuple[int, int, Optional[bytes], int, str]]],
+                                      redostate_rows: Optional[List[Tuple[int, int, bytes, int]]],
+                                      modified_rows: Optional[List[Tuple[str]]]):
+        # must be called with 'self._connection_lock' acquired
 
         with self._cursor_with_exception_mapping() as cursor:
             if not self._connection.in_transaction:
                 cursor.execute("BEGIN")
             try:
-                if info_by_encoded_path is not None:
+                if fsinput_rows is not None:
                     cursor.execute("DELETE FROM ToolInstFsInput WHERE tool_inst_dbid == ?", (tool_instance_dbid,))
-                    for encoded_path, info in info_by_encoded_path.items():
-                        is_explicit, encoded_memo_before = info
-                        if not is_encoded_path(encoded_path):
-                            raise ValueError(f"not a valid 'encoded_path': {encoded_path!r}")
-                        if encoded_memo_before is not None and not isinstance(encoded_memo_before, bytes):
-                            raise TypeError(f"not a valid 'encoded_memo_before': {encoded_memo_before!r}")
-                        cursor.execute("INSERT OR REPLACE INTO ToolInstFsInput VALUES (?, ?, ?, ?, ?)", (
-                            tool_instance_dbid, encoded_path, int(bool(is_explicit)),
-                            encoded_memo_before, self.run_dbid))
-
-                if memo_digest_by_aspect is not None:
+                    cursor.executemany("INSERT OR IGNORE INTO FsObject(path) VALUES (?)",
+                                       [(row[-1],) for row in fsinput_rows])
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO ToolInstFsInput "
+                        "SELECT ?, fsobject_dbid, ?, ?, ? FROM FsObject WHERE path == ?", fsinput_rows)
+
+                if redostate_rows is not None:
                     cursor.execute("DELETE FROM ToolInstRedoState WHERE tool_inst_dbid == ?", (tool_instance_dbid,))
-                    for aspect, memo_digest in memo_digest_by_aspect.items():
-                        if not isinstance(aspect, int):
-                            raise TypeError(f"not a valid 'aspect': {aspect!r}")
-                        if memo_digest is not None:
-                            if not isinstance(memo_digest, bytes):
-                                raise TypeError(f"not a valid 'memo_digest': {memo_digest!r}")
-                            cursor.execute("INSERT OR REPLACE INTO ToolInstRedoState VALUES (?, ?, ?, ?)",
-                                           (tool_instance_dbid, aspect, memo_digest, self.run_dbid))
-
-                if encoded_paths_of_modified is not None:
-                    for modified_encoded_path in encoded_paths_of_modified:
-                        if not is_encoded_path(modified_encoded_path):
-                            raise ValueError(f"not a valid 'encoded_path': {modified_encoded_path!r}")
-                        # replace the 'memo_before' all non-explicit dependencies (of all tool instances) whose
-                        # 'encoded_path' have 'modified_encoded_path' as a prefix by NULL
-                        cursor.execute(
-                            "UPDATE ToolInstFsInput SET memo_before = NULL WHERE instr(path, ?) == 1",
-                            (modified_encoded_path,))
+                    cursor.executemany("INSERT OR REPLACE INTO ToolInstRedoState VALUES (?, ?, ?, ?)", redostate_rows)
+
+                if modified_rows:
+                    # replace the 'memo_before' all non-explicit dependencies (of all tool instances) whose
+                    # 'encoded_path' have a member of 'encoded_paths_of_modified' as a prefix by NULL
+                    if modified_rows[0][0]:
+                        # range query makes use of index FsObject_path (in contrast to instr())
+                        cursor.executemany(
+                            "UPDATE ToolInstFsInput SET memo_before = NULL WHERE fsobject_dbid IN ("
+                                "SELECT fsobject_dbid FROM FsObject WHERE path >= ? AND path < ?"
+                            ")",
+                            [get_encoded_path_range_of_prefix(p) for p, in modified_rows])
+                    else:
+                        # managed tree's root (all other members of 'modified_rows' are redundant)
+                        cursor.execute("UPDATE ToolInstFsInput SET memo_before = NULL")
             except:
                 self._connection.rollback()
+                self._preloaded = None  # may contain changes of the transaction just rolled back
                 raise
 
-            self._modifying_operations_since_commit += 1
+    def _update_preloaded_dependencies_and_state(
+            self, tool_instance_dbid: int,
+            fsinput_rows: Optional[List[Tuple[int, int, Optional[bytes], int, str]]],
+            redostate_rows: Optional[List[Tuple[int, int, bytes, int]]],
+            modified_rows: Optional[List[Tuple[str]]]):
+        preloaded = self._preloaded
+        if preloaded is None:
+            return
+
+        if fsinput_rows is not None:
+            preloaded.replace_inputs(tool_instance_dbid, {  # like get_fsobject_inputs() without preload
+                encoded_path: (bool(is_explicit), encoded_memo_before)
+                for _, is_explicit, encoded_memo_before, _, encoded_path in sorted(fsinput_rows, key=lambda r: r[-1])
+            })
+            if fsinput_rows:
+                preloaded.input_run_dbid_by_tool_instance_dbid[tool_instance_dbid] = self.run_dbid
+            else:
+                preloaded.input_run_dbid_by_tool_instance_dbid.pop(tool_instance_dbid, None)
+        if redostate_rows is not None:
+            preloaded.redo_state_by_tool_instance_dbid[tool_instance_dbid] = {
+                aspect: memo_digest for _, aspect, memo_digest, _ in redostate_rows
+            }
+        if modified_rows:
+            for p, in modified_rows:
+                preloaded.declare_as_modified(*get_encoded_path_range_of_prefix(p))
 
     def get_latest_successful_run_summaries(self, max_count: int) -> List[Tuple[datetime.datetime, int, int, int]]:
         # Without the run that opened this run-database.
@@ -540,8 +1156,10 @@ class Database:
 
         max_count = max(0, int(max_count))
 
+        self._raise_writer_exception()
+
         summaries = []
-        with self._cursor_with_exception_mapping() as cursor:
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:  # not modified by writer thread
             for start_time, duration_ns, nonredo_count, redo_count in cursor.execute(
                     "SELECT start_time, duration_ns, nonredo_count, redo_count FROM Run "
                     "WHERE run_dbid != ? AND duration_ns >= 0 AND nonredo_count >= 0 AND redo_count >= 0 "
@@ -560,7 +1178,8 @@ class Database:
         successful_nonredo_run_count = max(0, min(2**63 - 1, successful_nonredo_run_count))
         successful_redo_run_count = max(0, min(2**63 - 1, successful_redo_run_count))
 
-        with self._cursor_with_exception_mapping() as cursor:
+        self._raise_writer_exception()
+        with self._connection_lock, self._cursor_with_exception_mapping() as cursor:
             # https://www.sqlite.org/datatype3.html
             cursor.execute(
                 "UPDATE Run SET duration_ns = ?, nonredo_count = ?, redo_count = ? WHERE run_dbid = ?",
@@ -572,17 +1191,26 @@ class Database:
                successful_nonredo_run_count + successful_redo_run_count, successful_redo_run_count
 
     def commit(self):
-        with self._cursor_with_exception_mapping('commit failed'):
-            self._connection.commit()
+        self._wait_for_pending_writes()
+        with self._connection_lock:
+            self._commit()
         self._modifying_operations_since_commit = 0
 
     def commit_if_overdue(self):
         # regular calls prevents unbounded growth of database journal
+        self._raise_writer_exception()
         if self._modifying_operations_since_commit > self.MAXIMUM_NUMBER_OF_UNCOMMITTED_OPERATIONS:
-            self.commit()
+            if self._pending_writes is None:
+                self.commit()
+            else:
+                self._pending_writes.put(self._commit)
+                self._modifying_operations_since_commit = 0
 
     def cleanup(self):
-        with self._cursor_with_exception_mapping('clean-up failed') as cursor:
+        self._preloaded = None  # tool instance dbids may become invalid
+
+        self._wait_for_pending_writes()
+        with self._connection_lock, self._cursor_with_exception_mapping('clean-up failed') as cursor:
             # remove unused tool dbids
             cursor.execute(
                 "DELETE FROM ToolInst WHERE tool_inst_dbid IN ("
@@ -592,14 +1220,75 @@ class Database:
                     "WHERE fs.tool_inst_dbid IS NULL AND do.tool_inst_dbid IS NULL"
                 ")")
 
+            # remove unused paths
+            cursor.execute(
+                "DELETE FROM FsObject WHERE fsobject_dbid NOT IN (SELECT fsobject_dbid FROM ToolInstFsInput)")
+
         self._modifying_operations_since_commit += 1
 
     def close(self):
         # note: uncommitted changes are lost!
+        # note: an exception in the writer thread is ignored
+
+        if self._writer_thread is not None:
+            self._pending_writes.put(None)
+            self._writer_thread.join()
+            self._writer_thread = None
+            self._pending_writes = None
+
         with self._cursor_with_exception_mapping('closing failed'):
             self._connection.close()
         self._connection = None
 
+    def _commit(self):
+        # must be called with 'self._connection_lock' acquired
+        with self._cursor_with_exception_mapping('commit failed'):
+            self._connection.commit()
+
+    def _write_pending(self):
+        # Body of the writer thread: perform the pending modifications in order until None is dequeued.
+        # All modifications dequeued at once are performed with 'self._connection_lock' acquired only once.
+        # After the first failed modification, all pending modifications (including commits) are discarded: the
+        # transaction with the partial modification must never be committed.
+
+        is_stopped = False
+        while not is_stopped:
+            writes = [self._pending_writes.get()]
+            while True:
+                try:
+                    writes.append(self._pending_writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            with self._connection_lock:
+                for write in writes:
+                    if write is None:
+                        is_stopped = True
+                        continue
+                    if self._writer_exception is not None:
+                        continue  # discard
+                    try:
+                        write()
+                    except BaseException as e:
+                        self._preloaded = None
+                        self._writer_exception = e  # raise by every later call of a method in the other thread
+
+            for _ in writes:
+                self._pending_writes.task_done()
+
+    def _raise_writer_exception(self):
+        # Raise the first exception in the writer thread (if any).
+        e = self._writer_exception
+        if e is not None:
+            raise e
+
+    def _wait_for_pending_writes(self):
+        # Wait until the writer thread has performed (or discarded) all pending modifications, then raise the first
+        # exception in the writer thread (if any).
+        if self._pending_writes is not None:
+            self._pending_writes.join()
+        self._raise_writer_exception()
+
     def _cursor_with_exception_mapping(self, summary_message_line: str = 'run-database access failed'):
         return _CursorWithExceptionMapping(
             self._connection,
@@ -5,15 +5,16 @@
 """Dependency-aware tool execution.
 This is an implementation detail - do not import it unless you know what you are doing."""
 
-__all__ = ['Tool']
+__all__ = ['Tool', 'start_all']
 
 import re
 import os
+import time
 import types
 import collections
-import hashlib
+import dataclasses
 import inspect
-from typing import Optional, Tuple, Type
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
 
 from .. import ut
 from .. import di
@@ -36,6 +37,10 @@ _tool_class_by_definition_location = {}
 
 # key: dlb.ex.Tool, value: ToolInfo
 _registered_info_by_tool = {}
+_dependency_actions_by_tool = {}
+
+# constructor of SHA1 hash objects of module 'hashlib', imported by the first tool instance to speed up 'import dlb.ex'
+_sha1 = None
 
 ToolInfo = collections.namedtuple('ToolInfo', ('permanent_local_tool_id', 'definition_paths'))
 
@@ -120,7 +125,11 @@ class _ToolBase:
 
         # build permanent fingerprint for tool instance from all explicit dependencies
 
-        hashalg = hashlib.sha1()
+        global _sha1
+        if _sha1 is None:
+            import hashlib
+            _sha1 = hashlib.sha1
+        hashalg = _sha1()
         # SHA1 is always present and fasted according to this:
         # http://atodorov.org/blog/2013/02/05/performance-test-md5-sha1-sha256-sha512/
 
@@ -166,6 +175,8 @@ class _ToolBase:
     def _get_execution_parameter_id(self) -> bytes:
         execution_parameter_id = b''
         for name in self.__class__._execution_parameter_names:
+            if name == 'RESOURCES':
+                continue  # affects only when a redo is started, not what it does
             value = getattr(self, name)
             try:
                 execution_parameter_id += ut.to_permanent_local_bytes(value)
@@ -185,10 +196,7 @@ class _ToolBase:
             # noinspection PyTypeChecker
             context: _context.Context = _context.Context.active
 
-            dependency_actions = tuple(
-                _dependaction.get_action(getattr(self.__class__, n), n)
-                for n in self.__class__._dependency_names
-            )
+            dependency_actions = _get_dependency_actions(self.__class__)
 
             db = _context._get_rundb()
             tool_instance_dbid = db.get_and_register_tool_instance_dbid(
@@ -202,32 +210,129 @@ class _ToolBase:
                                 with_time=True, is_progress=True):
                     result_proxy_of_last_run.complete()
 
+            inputs_from_last_redo = db.get_fsobject_inputs(tool_instance_dbid)
+            explicit_fs_inputs = _toolrun.collect_explicit_fs_input_dependencies(self, dependency_actions, context)
+            encoded_input_paths = list(inputs_from_last_redo) + list(explicit_fs_inputs[1])
+
+            # pending redos of an outer context may still modify input dependencies: wait for them
+            # (for all of them if the non-explicit input dependencies are unknown because there was no successful redo)
+            if context.parent is not None:
+                if inputs_from_last_redo or \
+                        _rundb.Aspect.RESULT.value in db.get_redo_state(tool_instance_dbid):
+                    context._complete_pending_redos_of_outer_contexts_for(encoded_input_paths)
+                else:
+                    context._complete_pending_redos_of_outer_contexts_for(None)
+
+            # pending redos of this context may still modify input dependencies: check the redo necessity after them
+            producer_tids = context._get_tids_of_pending_redos_for(encoded_input_paths)
+
+        redo_sequencer = context._redo_sequencer
+
+        if producer_tids:
+            di.inform(f"defer check of redo necessity until {len(producer_tids)} pending redo(s) are completed",
+                      level=cf.level.run_serialization)
+            # snapshot of environment variables and helpers as of this call
+            redo_context = _toolrun.RedoContext(context, {})
+            resource_limits = context.resource_limits
+            tid = redo_sequencer.enqueue(context.max_parallel_redo_count, 0.0,
+                                         self._check_redo_necessity_then_redo, _after=producer_tids,
+                                         _admit=cf.parallel_redo_admission,
+                                         _resources=self._get_limited_resources(resource_limits),
+                                         _resource_limits=resource_limits, _group=context,
+                                         _eager=True, force_redo=force_redo, context=context,
+                                         redo_context=redo_context, dependency_actions=dependency_actions, db=db,
+                                         tool_instance_dbid=tool_instance_dbid,
+                                         inputs_from_last_redo=inputs_from_last_redo,
+                                         explicit_fs_inputs=explicit_fs_inputs)
+            context._register_outputs_of_pending_redo(
+                tool_instance_dbid,
+                _toolrun.get_encoded_paths_of_explicit_fs_output_dependencies(self, dependency_actions, context))
+            return redo_sequencer.create_result_proxy(tid, uid=tool_instance_dbid, expected_class=_toolrun.RunResult,
+                                                      waits_for_bool=True)
+
+        redo_kwargs = self._check_redo_necessity(force_redo, context, context, dependency_actions, db,
+                                                 tool_instance_dbid, inputs_from_last_redo, explicit_fs_inputs)
+        if isinstance(redo_kwargs, _toolrun.RunResult):
+            _context._register_successful_run(False)
+            return redo_kwargs  # no redo
+        redo_kwargs['context'] = _toolrun.RedoContext(context, redo_kwargs.pop('dependency_action_by_path'))
+
+        # note: no db.commit() necessary as long as root context does commit on exception
+        resource_limits = context.resource_limits
+        resources = self._get_limited_resources(resource_limits)
+        if cf.schedule_redos_by_expected_duration:
+            # longest expected duration first; unknown duration (e.g. never redone before) first of all
+            encoded_duration = db.get_redo_state(tool_instance_dbid).get(_rundb.Aspect.REDO_DURATION.value)
+            expected_duration_ns = None if encoded_duration is None else \
+                _rundb.decode_encoded_duration(encoded_duration)
+            priority = float('inf') if expected_duration_ns is None else expected_duration_ns
+            tid = redo_sequencer.enqueue(context.max_parallel_redo_count, priority,
+                                         self._redo_with_aftermath, _admit=cf.parallel_redo_admission,
+                                         _resources=resources, _resource_limits=resource_limits, _group=context,
+                                         **redo_kwargs)
+        elif resources:
+            # do not wait here: redos of other tool instances can be started while the resources are in use
+            tid = redo_sequencer.enqueue(context.max_parallel_redo_count, 0.0,
+                                         self._redo_with_aftermath, _admit=cf.parallel_redo_admission,
+                                         _resources=resources, _resource_limits=resource_limits, _eager=True,
+                                         _group=context, **redo_kwargs)
+        else:
+            tid = redo_sequencer.wait_then_start(context.max_parallel_redo_count, None,
+                                                 self._redo_with_aftermath, _admit=cf.parallel_redo_admission,
+                                                 _group=context, **redo_kwargs)
+
+        context._register_outputs_of_pending_redo(
+            tool_instance_dbid, (_rundb.encode_path(p) for p in redo_kwargs['context']._dependency_action_by_path))
+        return redo_sequencer.create_result_proxy(tid, uid=tool_instance_dbid, expected_class=_toolrun.RunResult)
+
+    async def _check_redo_necessity_then_redo(self, force_redo, context, redo_context, dependency_actions, db,
+                                              tool_instance_dbid, inputs_from_last_redo, explicit_fs_inputs):
+        # Check the redo necessity like 'start()' after the pending redos of *context* that may modify input
+        # dependencies are completed, then redo if necessary.
+        # Environment variables are taken from *redo_context* (as of the call of 'start()').
+
+        redo_kwargs = self._check_redo_necessity(force_redo, context, redo_context, dependency_actions, db,
+                                                 tool_instance_dbid, inputs_from_last_redo, explicit_fs_inputs)
+        if isinstance(redo_kwargs, _toolrun.RunResult):
+            _context._register_successful_run(False)
+            return redo_kwargs  # no redo
+
+        redo_context._set_output_dependencies(redo_kwargs.pop('dependency_action_by_path'))
+        return await self._redo_with_aftermath(context=redo_context, **redo_kwargs)
+
+    def _check_redo_necessity(self, force_redo, context, env_context, dependency_actions, db, tool_instance_dbid,
+                              inputs_from_last_redo, explicit_fs_inputs) -> Union[_toolrun.RunResult, Dict]:
+        # Return the result if no redo is necessary and the keyword arguments for '_redo_with_aftermath()' otherwise
+        # (with 'dependency_action_by_path' instead of 'context').
+        # Environment variables are taken from *env_context*.
+
+        memo_cache = _context._get_fsobject_memo_cache()
+
         with di.Cluster(f'check redo necessity for tool instance {tool_instance_dbid!r}',
                         level=cf.level.redo_necessity_check, with_time=True, is_progress=True):
 
+            change_journal = memo_cache.change_journal
+            if change_journal is not None and inputs_from_last_redo:
+                position = db.get_change_journal_position_of_fsobject_inputs(tool_instance_dbid,
+                                                                             change_journal.session)
+                if position is not None:
+                    # memos of input dependencies not modified since they were read do not need to be read again
+                    from . import _fsjournal  # already imported when change journal was read
+                    n = memo_cache.add_unchanged_memos(
+                        _fsjournal.get_unchanged_memos(change_journal, position, inputs_from_last_redo))
+                    di.inform(f"{n} input dependencies unchanged according to change journal",
+                              level=cf.level.redo_necessity_check)
+
             with di.Cluster('explicit input dependencies', level=cf.level.redo_necessity_check,
                             with_time=True, is_progress=True):
-                memo_by_encoded_path = \
-                    _toolrun.check_and_memorize_explicit_fs_input_dependencies(self, dependency_actions, context)
+                memo_by_encoded_path = _toolrun.check_and_memorize_explicit_fs_input_dependencies(*explicit_fs_inputs)
 
                 # treat all files used for definition of self.__class__ like explicit input dependencies if they
                 # have a managed tree path.
-                definition_file_count = 0
-                for pn in get_and_register_tool_info(self.__class__).definition_paths:
-                    try:
-                        p = context.working_tree_path_of(fs.Path.Native(pn), existing=True, collapsable=False)
-                        encoded_path = _rundb.encode_path(p)
-                        memo = memo_by_encoded_path.get(encoded_path)
-                        if memo is None:
-                            memo = _worktree.read_filesystem_object_memo(context.root_path / p)  # may raise OSError
-                        assert memo.stat is not None
-                        definition_file_count += 1
-                        memo_by_encoded_path[encoded_path] = memo
-                        assert memo.stat is not None
-                    except (ValueError, OSError):
-                        # silently ignore all definition files not in managed tree
-                        pass
-                di.inform(f"added {definition_file_count} tool definition files as input dependency",
+                definition_memos = _get_definition_file_memos(self.__class__, context, memo_cache)
+                for encoded_path, memo in definition_memos:
+                    memo_by_encoded_path.setdefault(encoded_path, memo)
+                di.inform(f"added {len(definition_memos)} tool definition files as input dependency",
                           level=cf.level.redo_necessity_check)
 
             # 'memo_by_encoded_path' contains a current memo for every filesystem object in the managed tree that
@@ -243,13 +348,15 @@ class _ToolBase:
 
             with di.Cluster('input dependencies of the last redo', level=cf.level.redo_necessity_check,
                             with_time=True, is_progress=True):
-                db = _context._get_rundb()
-                inputs_from_last_redo = db.get_fsobject_inputs(tool_instance_dbid)
-                for encoded_path, (is_explicit, last_encoded_memo) in inputs_from_last_redo.items():
-                    if not is_explicit and encoded_path not in memo_by_encoded_path:
-                        memo, needs_redo = _toolrun.get_memo_for_fs_input_dependency_from_rundb(
-                            encoded_path, last_encoded_memo, needs_redo, context.root_path)
-                        memo_by_encoded_path[encoded_path] = memo  # memo.state may be None
+                last_encoded_memo_by_encoded_path = {
+                    encoded_path: last_encoded_memo
+                    for encoded_path, (is_explicit, last_encoded_memo) in inputs_from_last_redo.items()
+                    if not is_explicit and encoded_path not in memo_by_encoded_path
+                }
+                memo_by_nonexplicit_encoded_path, needs_redo = \
+                    _toolrun.get_memos_for_fs_input_dependencies_from_rundb(
+                        last_encoded_memo_by_encoded_path, needs_redo, memo_cache)
+                memo_by_encoded_path.update(memo_by_nonexplicit_encoded_path)  # memo.state may be None
 
             # 'memo_by_encoded_path' contains a current memo for every filesystem object in the managed tree that
             # is an explicit or non-explicit input dependency of this call of 'start()' or an non-explicit input
@@ -258,7 +365,7 @@ class _ToolBase:
             with di.Cluster('environment variables', level=cf.level.redo_necessity_check,
                             with_time=True, is_progress=True):
                 envvar_value_by_name, envvar_digest = \
-                    _toolrun.check_envvar_dependencies(self, dependency_actions, context)
+                    _toolrun.check_envvar_dependencies(self, dependency_actions, env_context)
 
             if not needs_redo and force_redo:
                 di.inform("redo requested by start()", level=cf.level.redo_reason)
@@ -283,12 +390,47 @@ class _ToolBase:
             if not needs_redo:
                 with di.Cluster('compare input dependencies with state before last successful redo',
                                 level=cf.level.redo_necessity_check, with_time=True, is_progress=True):
+                    # a difference in mtime alone is a reason for a redo unless the path is in an input dependency
+                    # role with 'compare' of 'digest'
+                    encoded_paths_to_compare_by_digest = {
+                        encoded_path
+                        for action, _, encoded_path, _ in explicit_fs_inputs[0]
+                        if encoded_path is not None and action.compares_content_digest()
+                    }
+                    compares_nonexplicit_by_digest = any(
+                        not action.dependency.explicit and action.compares_content_digest()
+                        for action in dependency_actions)
+
+                    encoded_paths_with_same_content = []
+                    read_digest_by_encoded_path = {}
+
+                    def read_digest(encoded_path_to_read):
+                        d = _worktree.read_regular_file_digest(
+                            context.root_path / _rundb.decode_encoded_path(encoded_path_to_read))
+                        read_digest_by_encoded_path[encoded_path_to_read] = d
+                        return d
+
                     # sorting not necessary for repeatability
                     for encoded_path, memo in memo_by_encoded_path.items():
                         is_explicit, last_encoded_memo = inputs_from_last_redo.get(encoded_path, (True, None))
                         assert memo.stat is not None or not is_explicit
+                        is_explicit_now = encoded_path in encoded_paths_of_explicit_input_dependencies
+                        compares_by_digest = encoded_path in encoded_paths_to_compare_by_digest if is_explicit_now \
+                            else compares_nonexplicit_by_digest
                         redo_reason = _rundb.compare_fsobject_memo_to_encoded_from_last_redo(
-                            memo, last_encoded_memo, encoded_path in encoded_paths_of_explicit_input_dependencies)
+                            memo, last_encoded_memo, is_explicit_now,
+                            (lambda p=encoded_path: read_digest(p)) if compares_by_digest else None)
+                        digest = read_digest_by_encoded_path.get(encoded_path)
+                        if digest is not None:
+                            # copy: *memo* may be shared with other tool instances by the memo cache
+                            memo = dataclasses.replace(memo, digest=digest)
+                            memo_by_encoded_path[encoded_path] = memo
+                        if redo_reason is None and compares_by_digest and memo.digest is not None:
+                            # 'memo.digest' may have been read for another tool instance (memos are shared by the
+                            # memo cache): compare with the mtime in the memo of this tool instance
+                            last_memo = _rundb.decode_encoded_fsobject_memo(last_encoded_memo)
+                            if memo.stat.mtime_ns != last_memo.stat.mtime_ns:
+                                encoded_paths_with_same_content.append(encoded_path)
                         if redo_reason is not None:
                             path = _rundb.decode_encoded_path(encoded_path)
                             di.inform(
@@ -300,15 +442,32 @@ class _ToolBase:
                             break
                         # TODO redo if mtime of true input not in the past (G-D4)
 
+                    if not needs_redo and encoded_paths_with_same_content:
+                        # mtime has changed but not the content: replace memos to avoid digest next time
+                        info_by_encoded_path = dict(inputs_from_last_redo)
+                        for encoded_path in encoded_paths_with_same_content:
+                            is_explicit, _ = info_by_encoded_path[encoded_path]
+                            info_by_encoded_path[encoded_path] = \
+                                is_explicit, _rundb.encode_fsobject_memo(memo_by_encoded_path[encoded_path])
+                        di.inform(f"refresh {len(encoded_paths_with_same_content)} input dependencies with "
+                                  f"changed mtime but same content", level=cf.level.redo_necessity_check)
+                        db.commit_if_overdue()
+                        db.update_dependencies_and_state(tool_instance_dbid, info_by_encoded_path=info_by_encoded_path)
+
         if not needs_redo:
-            _context._register_successful_run(False)
-            return _toolrun.RunResult(self, False)  # no redo
+            # noinspection PyUnboundLocalVariable
+            validated_value_by_name = _toolrun.decode_nonexplicit_object_outputs(
+                self, dependency_actions, redo_state_in_db.get(_rundb.Aspect.OBJECT_OUTPUTS.value))
+            return _toolrun.RunResult(
+                self, False, validated_value_by_name,
+                _toolrun.make_nonexplicit_fs_input_getter(dependency_actions, inputs_from_last_redo))
 
         if obstructive_paths:
             with di.Cluster('remove obstructive filesystem objects that are explicit output dependencies',
                             level=cf.level.redo_preparation, with_time=True, is_progress=True):
                 with context.temporary(is_dir=True) as tmp_dir:
                     for p in obstructive_paths:
+                        memo_cache.invalidate(_rundb.encode_path(p))
                         _worktree.remove_filesystem_object(context.root_path / p, abs_empty_dir_path=tmp_dir,
                                                            ignore_non_existent=True)
 
@@ -325,16 +484,30 @@ class _ToolBase:
                     )
                     raise _error.RedoError(msg) from None
 
-        # note: no db.commit() necessary as long as root context does commit on exception
-        redo_sequencer = context._redo_sequencer
-        tid = redo_sequencer.wait_then_start(
-            context.max_parallel_redo_count, None, self._redo_with_aftermath,
-            result=result, context=_toolrun.RedoContext(context, dependency_action_by_path),
+        return dict(
+            result=result, dependency_action_by_path=dependency_action_by_path,
             dependency_actions=dependency_actions, memo_by_encoded_path=memo_by_encoded_path,
             encoded_paths_of_explicit_input_dependencies=encoded_paths_of_explicit_input_dependencies,
             envvar_digest=envvar_digest, db=db, tool_instance_dbid=tool_instance_dbid)
 
-        return redo_sequencer.create_result_proxy(tid, uid=tool_instance_dbid, expected_class=_toolrun.RunResult)
+    def _get_limited_resources(self, resource_limits: Dict[str, int]) -> Dict[str, int]:
+        # Return the number of tokens needed by a redo for each resource of the execution parameter 'RESOURCES'
+        # (if any) with a limit in *resource_limits*.
+
+        resources = getattr(self, 'RESOURCES', None)
+        if resources is None:
+            return {}
+
+        if not isinstance(resources, collections.abc.Mapping):
+            raise _error.ExecutionParameterError(
+                f"value of execution parameter 'RESOURCES' must be a mapping: {resources!r}")
+        for name, count in resources.items():
+            if not (isinstance(name, str) and isinstance(count, int) and count >= 0):
+                raise _error.ExecutionParameterError(
+                    f"value of execution parameter 'RESOURCES' must map resource names (str) to "
+                    f"non-negative integers: {resources!r}")
+
+        return {name: count for name, count in resources.items() if name in resource_limits and count > 0}
 
     async def _redo_with_aftermath(self, result, context,
                                    dependency_actions, memo_by_encoded_path,
@@ -342,16 +515,40 @@ class _ToolBase:
                                    envvar_digest, db, tool_instance_dbid):
         # note: no db.commit() necessary as long as root context does commit on exception
         di.inform(f"start redo for tool instance {tool_instance_dbid!r}", level=cf.level.redo_start, with_time=True)
-        redo_request = bool(await self.redo(result, context))
+        memo_cache = _context._get_fsobject_memo_cache()
+        jobserver = _context._get_jobserver()
+        job_token = None if jobserver is None else await jobserver.acquire()
+        t0 = time.monotonic_ns()
+        try:
+            redo_request = bool(await self.redo(result, context))
+            redo_duration_ns = time.monotonic_ns() - t0
+        finally:
+            if jobserver is not None:
+                jobserver.release(job_token)
+
+            # the redo may have modified every explicit output dependency
+            # noinspection PyProtectedMember
+            for p in context._dependency_action_by_path:
+                memo_cache.invalidate(_rundb.encode_path(p))
 
         with di.Cluster(f"memorize successful redo for tool instance {tool_instance_dbid!r}",
                         level=cf.level.redo_aftermath, with_time=True):
             # collect non-explicit input and output dependencies of this redo
             encoded_paths_of_nonexplicit_input_dependencies = set()
             encoded_paths_of_modified_output_dependencies = set()
+            encoded_paths_to_compare_by_digest = set()
 
             for action in dependency_actions:
-                if not action.dependency.explicit:
+                if action.dependency.explicit:
+                    if isinstance(action.dependency, _depend.InputDependency) and action.compares_content_digest():
+                        for p in action.dependency.tuple_from_value(getattr(self, action.name)):
+                            try:
+                                p = context.working_tree_path_of(p, existing=True, collapsable=False)
+                            except ValueError:
+                                continue
+                            if not p.is_absolute():
+                                encoded_paths_to_compare_by_digest.add(_rundb.encode_path(p))
+                else:
                     validated_value = getattr(result, action.name)
                     if validated_value is NotImplemented:
                         if action.dependency.required:
@@ -376,7 +573,10 @@ class _ToolBase:
                                         raise _error.RedoError(msg) from None
                                 # absolute paths to the management tree are silently ignored
                                 if not p.is_absolute():
-                                    encoded_paths_of_nonexplicit_input_dependencies.add(_rundb.encode_path(p))
+                                    encoded_path = _rundb.encode_path(p)
+                                    encoded_paths_of_nonexplicit_input_dependencies.add(encoded_path)
+                                    if action.compares_content_digest():
+                                        encoded_paths_to_compare_by_digest.add(encoded_path)
                         elif isinstance(action.dependency, _depend.OutputDependency):
                             paths = action.dependency.tuple_from_value(validated_value)
                             for p in paths:
@@ -394,9 +594,20 @@ class _ToolBase:
                 encoded_paths_of_explicit_input_dependencies | encoded_paths_of_nonexplicit_input_dependencies
             for p in context.modified_outputs:
                 encoded_paths_of_modified_output_dependencies.add(_rundb.encode_path(p))
+            for encoded_path in encoded_paths_of_modified_output_dependencies:
+                memo_cache.invalidate(encoded_path)
 
             with di.Cluster('store state before redo in run-database', level=cf.level.redo_aftermath):
                 # redo was successful, so save the state before the redo to the run-database
+                for encoded_path, memo in memo_by_encoded_path.items():
+                    if encoded_path in encoded_paths_to_compare_by_digest:
+                        memo_by_encoded_path[encoded_path] = \
+                            _toolrun.add_content_digest_to_memo(memo, context.root_path, encoded_path)
+                    elif memo.digest is not None:
+                        # a digest stored for a filesystem object not compared by digest would make a difference in
+                        # mtime alone no reason for a redo
+                        memo_by_encoded_path[encoded_path] = dataclasses.replace(memo, digest=None)
+
                 info_by_fsobject_dbid = {
                     encoded_path: (
                         encoded_path in encoded_paths_of_explicit_input_dependencies,
@@ -417,7 +628,11 @@ class _ToolBase:
                         _rundb.Aspect.RESULT.value:
                             b'\x01' if redo_request else b'',
                         _rundb.Aspect.ENVIRONMENT_VARIABLES.value:
-                            envvar_digest if envvar_digest else None
+                            envvar_digest if envvar_digest else None,
+                        _rundb.Aspect.REDO_DURATION.value:
+                            _rundb.encode_duration(redo_duration_ns),
+                        _rundb.Aspect.OBJECT_OUTPUTS.value:
+                            _toolrun.encode_nonexplicit_object_outputs(result, dependency_actions)
                     },
                     encoded_paths_of_modified=encoded_paths_of_modified_output_dependencies)
 
@@ -663,6 +878,83 @@ def get_and_register_tool_info(tool: Type) -> ToolInfo:
     return info
 
 
+def _get_definition_file_memos(tool, context: _context.Context, memo_cache: _worktree.FilesystemObjectMemoCache) \
+        -> List[Tuple[str, _rundb.FilesystemObjectMemo]]:
+    # Return the encoded managed tree path and the memo of each file used for the definition of *tool* that is in the
+    # managed tree.
+    # Read at most once per run of dlb unless dlb modifies one of the files.
+
+    definition_memos = memo_cache.get_pinned_memos(tool)
+    if definition_memos is None:
+        definition_memos = []
+        for pn in get_and_register_tool_info(tool).definition_paths:
+            try:
+                p = context.working_tree_path_of(fs.Path.Native(pn), existing=True, collapsable=False)
+                encoded_path = _rundb.encode_path(p)
+                memo = memo_cache.read_filesystem_object_memo(p, encoded_path)  # may raise OSError
+                assert memo.stat is not None
+                definition_memos.append((encoded_path, memo))
+            except (ValueError, OSError):
+                # silently ignore all definition files not in managed tree
+                pass
+        memo_cache.pin_memos(tool, definition_memos)
+    return definition_memos
+
+
+def _get_dependency_actions(tool: Type) -> Tuple[_dependaction.Action, ...]:
+    # Return the dependency actions for the dependency roles of *tool* in the order of their names.
+    #
+    # The result is cached (the actions are stateless and the dependency roles of a tool cannot be changed).
+
+    actions = _dependency_actions_by_tool.get(tool)
+    if actions is None:
+        actions = tuple(_dependaction.get_action(getattr(tool, n), n) for n in tool._dependency_names)
+        _dependency_actions_by_tool[tool] = actions
+    return actions
+
+
+def start_all(tool_instances: Iterable[Tool], *, force_redo: bool = False) -> List:
+    # Like '[t.start(force_redo=force_redo) for t in tool_instances]', but with fewer queries of the run-database
+    # and fewer reads of filesystem objects.
+
+    tool_instances = list(tool_instances)
+    for t in tool_instances:
+        if not isinstance(t, Tool):
+            raise TypeError(f"'tool_instances' must be an iterable of 'dlb.ex.Tool' instances, not {t!r}")
+
+    with di.Cluster(f'prepare {len(tool_instances)} tool instances', level=cf.level.run_preparation,
+                    with_time=True, is_progress=True):
+        # noinspection PyTypeChecker
+        context: _context.Context = _context.Context.active
+
+        db = _context._get_rundb()
+        memo_cache = _context._get_fsobject_memo_cache()
+
+        tool_instance_dbids = db.preload_tool_instances([
+            (get_and_register_tool_info(t.__class__).permanent_local_tool_id, t.fingerprint)
+            for t in tool_instances
+        ])
+
+        # with a change journal, the memos of most input dependencies are not read at all
+        paths = []
+        if memo_cache.change_journal is None:
+            for tool_instance_dbid in tool_instance_dbids:
+                for encoded_path in db.get_fsobject_inputs(tool_instance_dbid):
+                    try:
+                        paths.append((_rundb.decode_encoded_path(encoded_path), encoded_path))
+                    except ValueError:
+                        pass
+        for tool in {t.__class__ for t in tool_instances}:
+            _get_definition_file_memos(tool, context, memo_cache)
+        n = memo_cache.hold_memos(paths)
+        di.inform(f"read {n} filesystem objects in the managed tree in advance", level=cf.level.run_preparation)
+
+    try:
+        return [t.start(force_redo=force_redo) for t in tool_instances]
+    finally:
+        memo_cache.release_memos()
+
+
 # noinspection PyCallByClass
 type.__setattr__(Tool, '__module__', '.'.join(_ToolBase.__module__.split('.')[:-1]))  # circumvent write protection
 ut.set_module_name_to_parent_by_name(vars(), [n for n in __all__ if n != 'Tool'])
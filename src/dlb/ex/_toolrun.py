@@ -7,8 +7,9 @@ This is an implementation detail - do not import it unless you know what you are
 
 __all__ = ['ChunkProcessor', 'RedoContext', 'RunResult']
 
-import hashlib
-from typing import Any, Collection, Dict, List, Iterable, Mapping, Optional, Set, Tuple, Union
+import stat
+import dataclasses
+from typing import Any, Callable, Collection, Dict, List, Iterable, Mapping, Optional, Set, Tuple, Union
 
 from .. import ut
 from .. import di
@@ -20,6 +21,7 @@ from . import _worktree
 from . import _context
 from . import _depend
 from . import input
+from . import output
 from . import _dependaction
 
 
@@ -36,13 +38,18 @@ class RedoContext(_context.ReadOnlyContext):
     # Do *not* construct RedoContext objects manually!
     # dlb.ex.Tool.start() will construct one and pass it as *context* to dlb.ex.Tool.redo(..., context).
     def __init__(self, context: _context.Context, dependency_action_by_path: Dict[fs.Path, _dependaction.Action]):
+        super().__init__(context)
+        self._set_output_dependencies(dependency_action_by_path)
+
+    def _set_output_dependencies(self, dependency_action_by_path: Dict[fs.Path, _dependaction.Action]):
+        # Called again by dlb.ex.Tool.start() when the explicit output dependencies are checked after the construction.
+
         if not isinstance(dependency_action_by_path, dict):
             raise TypeError
 
         # must be True for all values *v* of *dependency_action_by_path*:
         # isinstance(v.dependency, _depend.OutputDependency) and v.dependency.Value is dlb.fs.Path.
 
-        super().__init__(context)
         self._dependency_action_by_path = dependency_action_by_path
         self._paths_of_modified = set(
             p for p, a in dependency_action_by_path.items()
@@ -73,7 +80,7 @@ class RedoContext(_context.ReadOnlyContext):
 
     def _prepare_for_subprocess(self, helper_file: fs.PathLike, arguments: Iterable[Any],
                                 cwd: Optional[fs.PathLike], forced_env: Optional[Mapping[str, str]]) \
-            -> Tuple[fs.Path, List[str], Dict[str, str], fs.Path]:
+            -> Tuple[fs.Path, List[str], Dict[str, str], fs.Path, Tuple[int, ...]]:
 
         if not isinstance(helper_file, fs.Path):
             helper_file = fs.Path(helper_file)
@@ -89,6 +96,12 @@ class RedoContext(_context.ReadOnlyContext):
         if forced_env is None:
             forced_env = {}
         env = {k: v for k, v in self.env.items()}
+        pass_fds = ()
+        if cf.provide_jobserver_to_helpers and 'MAKEFLAGS' not in forced_env:
+            jobserver = _context._get_jobserver()
+            if jobserver is not None:
+                env['MAKEFLAGS'] = jobserver.makeflags
+                pass_fds = jobserver.pass_fds
         env.update(forced_env)
 
         if di.is_unsuppressed_level(cf.level.helper_execution):
@@ -107,7 +120,7 @@ class RedoContext(_context.ReadOnlyContext):
         #  - all elements must be str
         #  - must contain executable as first element
 
-        return helper_file, commandline_tokens, env, cwd
+        return helper_file, commandline_tokens, env, cwd, pass_fds
 
     def _open_potential_file(self, potential_file: Union[Optional[bool], fs.PathLike]):
         if potential_file is None:
@@ -140,7 +153,7 @@ class RedoContext(_context.ReadOnlyContext):
                              stdout_output: Union[Optional[bool], fs.PathLike] = None,
                              stderr_output: Union[Optional[bool], fs.PathLike] = None) -> int:
 
-        helper_file, commandline_tokens, env, cwd = \
+        helper_file, commandline_tokens, env, cwd, pass_fds = \
              self._prepare_for_subprocess(helper_file, arguments, cwd, forced_env)
 
         import asyncio
@@ -150,7 +163,7 @@ class RedoContext(_context.ReadOnlyContext):
             # io.BytesIO() cannot be used for *stdout* or *stderr* because file-like in the sense of
             # asyncio.create_subprocess_exec() means (as of Python 3.8): has a method fileno()
             proc = await asyncio.create_subprocess_exec(
-                *commandline_tokens, cwd=(self.root_path / cwd).native, env=env,
+                *commandline_tokens, cwd=(self.root_path / cwd).native, env=env, pass_fds=pass_fds,
                 stdin=None, stdout=stdout_file, stderr=stderr_file)
 
             await proc.communicate()
@@ -193,7 +206,7 @@ class RedoContext(_context.ReadOnlyContext):
                 raise ValueError(msg)
             max_chunk_size = max(1, int(chunk_processor.max_chunk_size))
 
-        helper_file, commandline_tokens, env, cwd = \
+        helper_file, commandline_tokens, env, cwd, pass_fds = \
             self._prepare_for_subprocess(helper_file, arguments, cwd, forced_env)
 
         other_file = self._open_potential_file(other_output)
@@ -214,7 +227,7 @@ class RedoContext(_context.ReadOnlyContext):
             transport, protocol = await loop.subprocess_exec(
                 protocol_factory, *commandline_tokens,
                 stdin=None, stdout=stdout, stderr=stderr,
-                cwd=(self.root_path / cwd).native, env=env)
+                cwd=(self.root_path / cwd).native, env=env, pass_fds=pass_fds)
             proc = asyncio.subprocess.Process(transport, protocol, loop)
 
             pipe = proc.stderr if output_to_process == 2 else proc.stdout
@@ -272,12 +285,36 @@ class RedoContext(_context.ReadOnlyContext):
                                  stdin=None, stdout=None, stderr=None, limit: int = 2**16) \
             -> 'asyncio.subprocess.Process':
 
-        helper_file, commandline_tokens, env, cwd = \
+        helper_file, commandline_tokens, env, cwd, pass_fds = \
              self._prepare_for_subprocess(helper_file, arguments, cwd, forced_env)
 
         import asyncio
         return await asyncio.create_subprocess_exec(*commandline_tokens, cwd=(self.root_path / cwd).native, env=env,
-                                                    stdin=stdin, stdout=stdout, stderr=stderr, limit=limit)
+                                                    pass_fds=pass_fds, stdin=stdin, stdout=stdout, stderr=stderr,
+                                                    limit=limit)
+
+    async def run_in_thread(self, function: Callable, *args, **kwargs):
+        # Run 'function(*args, **kwargs)' in a thread of a pool shared by all redos and return its return value.
+        # Other redos can progress meanwhile.
+        return await self._run_in_executor(False, function, args, kwargs)
+
+    async def run_in_process(self, function: Callable, *args, **kwargs):
+        # Run 'function(*args, **kwargs)' in a process of a pool shared by all redos and return its return value.
+        # *function*, *args*, *kwargs* and the return value must be picklable (e.g. *function* must be defined at
+        # module level). The processes are forked where possible; see _RootSpecifics._get_redo_executor().
+        return await self._run_in_executor(True, function, args, kwargs)
+
+    @staticmethod
+    async def _run_in_executor(in_process: bool, function: Callable, args: tuple, kwargs: Dict[str, Any]):
+        if not callable(function):
+            raise TypeError("'function' must be callable")
+        executor = _context._get_redo_executor(in_process)
+
+        import asyncio
+        import functools
+        if kwargs:
+            function = functools.partial(function, **kwargs)
+        return await asyncio.get_event_loop().run_in_executor(executor, function, *args)
 
     def replace_output(self, path: fs.PathLike, source: fs.PathLike):
         # *path* may or may not exist.
@@ -323,7 +360,12 @@ class RedoContext(_context.ReadOnlyContext):
         if path == source:
             raise ValueError(f"cannot replace a path by itself: {path.as_string()!r}")
 
-        did_replace = replacer(destination=path, source=source, context=self)
+        try:
+            did_replace = replacer(destination=path, source=source, context=self)
+        finally:
+            memo_cache = _context._get_fsobject_memo_cache()
+            memo_cache.invalidate(_rundb.encode_path(path))
+            memo_cache.invalidate(_rundb.encode_path(source))
         if did_replace:
             self._paths_of_modified.add(path)
 
@@ -343,9 +385,17 @@ class RunResult:
 
     # Do *not* construct RunResult objects manually!
     # dlb.ex.Tool.start() will construct one and pass it as *result* to dlb.ex.Tool.redo(..., result, ...).
-    def __init__(self, tool, redo: bool):
+    def __init__(self, tool, redo: bool, validated_value_by_name: Optional[Mapping[str, Any]] = None,
+                 get_validated_value: Optional[Callable[[str], Any]] = None):
+        # If *redo* is False, *validated_value_by_name* can contain validated values of non-explicit dependencies
+        # (from the last successful redo), and 'get_validated_value(name)' is called on the first read access to
+        # a non-explicit dependency *name* not in *validated_value_by_name*; it returns its validated value or
+        # NotImplemented.
         super().__setattr__('_tool', tool)
         super().__setattr__('_redo', bool(redo))
+        super().__setattr__('_get_validated_value', None if redo else get_validated_value)
+        if validated_value_by_name and not redo:
+            self.__dict__.update(validated_value_by_name)
 
     def complete(self):  # does not conflict with name of attribute of tool class (because single word)
         return self
@@ -365,7 +415,12 @@ class RunResult:
         if role.explicit:
             return getattr(self._tool, name)
 
-        return NotImplemented
+        if self._get_validated_value is None:
+            return NotImplemented
+
+        value = self._get_validated_value(name)
+        super().__setattr__(name, value)  # next read access does not call __getattr__()
+        return value
 
     def __setattr__(self, name, value):
         if not self._redo:
@@ -406,67 +461,189 @@ class RunResult:
         return f"{self.__class__.__name__}({args})"
 
 
-def get_memo_for_fs_input_dependency_from_rundb(encoded_path: str, last_encoded_memo: Optional[bytes],
-                                                needs_redo: bool, root_path: fs.Path) \
-        -> Tuple[_rundb.FilesystemObjectMemo, bool]:
-
-    path = None
-    memo = _rundb.FilesystemObjectMemo()
-
-    try:
-        path = _rundb.decode_encoded_path(encoded_path)  # may raise ValueError
-    except ValueError:
-        if not needs_redo:
-            di.inform(f"redo necessary because of invalid encoded path: {encoded_path!r}",
-                      level=cf.level.redo_suspicious_reason)
-            needs_redo = True
+def encode_nonexplicit_object_outputs(result: RunResult, dependency_actions: Tuple[_dependaction.Action, ...]) \
+        -> Optional[bytes]:
+    # Return the encoded values of all non-explicit output dependencies of type 'dlb.ex.output.Object' of *result*
+    # (of a successful redo) that are representable by 'ut.make_fundamental()', or None if there are none.
 
-    if path is None:
-        return memo, needs_redo
+    fundamental_value_by_name = {}
+    for action in dependency_actions:
+        if not action.dependency.explicit and isinstance(action.dependency, output.Object):
+            try:
+                fundamental_value_by_name[action.name] = ut.make_fundamental(getattr(result, action.name))
+            except TypeError:
+                pass  # not available in a run without redo
+    if not fundamental_value_by_name:
+        return None
+    return _rundb.encode_object_outputs(fundamental_value_by_name)
+
+
+def decode_nonexplicit_object_outputs(tool, dependency_actions: Tuple[_dependaction.Action, ...],
+                                      encoded_object_outputs: Optional[bytes]) -> Dict[str, Any]:
+    # Return the validated values of all non-explicit output dependencies of type 'dlb.ex.output.Object' of *tool*
+    # encoded by 'encode_nonexplicit_object_outputs()' by their names.
+    # Values that are invalid for the current dependency role are omitted.
+
+    if encoded_object_outputs is None:
+        return {}
+    fundamental_value_by_name = _rundb.decode_encoded_object_outputs(encoded_object_outputs)
+    if not fundamental_value_by_name:
+        return {}
+
+    validated_value_by_name = {}
+    for action in dependency_actions:
+        if not action.dependency.explicit and isinstance(action.dependency, output.Object):
+            try:
+                value = fundamental_value_by_name[action.name]
+                if value is not None:
+                    value = action.dependency.validate(value)
+                elif action.dependency.required:
+                    continue
+                validated_value_by_name[action.name] = value
+            except (KeyError, TypeError, ValueError):
+                pass
+    return validated_value_by_name
+
+
+def make_nonexplicit_fs_input_getter(dependency_actions: Tuple[_dependaction.Action, ...],
+                                     inputs_from_last_redo: Dict[str, Tuple[bool, Optional[bytes]]]) \
+        -> Optional[Callable[[str], Any]]:
+    # Return a function that returns the validated value of the only non-explicit input dependency for filesystem
+    # objects in *dependency_actions* by its name from the input dependencies of the last successful redo
+    # *inputs_from_last_redo* (as returned by 'Database.get_fsobject_inputs()'), or NotImplemented.
+    # Its paths are sorted.
+    #
+    # Returns None if there is not exactly one such dependency: the paths are not assigned to a dependency in the
+    # run-database.
+
+    actions = [
+        action for action in dependency_actions
+        if not action.dependency.explicit and isinstance(action.dependency, _depend.InputDependency) and
+        action.dependency.Value is fs.Path
+    ]
+    if len(actions) != 1:
+        return None
+    action = actions[0]
+
+    def get_validated_value(name: str) -> Any:
+        if name != action.name:
+            return NotImplemented
+        dependency = action.dependency
+        is_dir = isinstance(dependency, _depend.DirectoryMixin)
+        try:
+            paths = [
+                _rundb.decode_encoded_path(encoded_path, is_dir)
+                for encoded_path, (is_explicit, _) in inputs_from_last_redo.items() if not is_explicit
+            ]
+            if dependency.multiplicity is not None:
+                return dependency.validate(paths)
+            if len(paths) > 1:
+                return NotImplemented
+            if paths:
+                return dependency.validate(paths[0])
+        except (TypeError, ValueError):
+            return NotImplemented
+        return NotImplemented if dependency.required else None
+
+    return get_validated_value
+
+
+def get_memos_for_fs_input_dependencies_from_rundb(last_encoded_memo_by_encoded_path: Dict[str, Optional[bytes]],
+                                                   needs_redo: bool, memo_cache: _worktree.FilesystemObjectMemoCache) \
+        -> Tuple[Dict[str, _rundb.FilesystemObjectMemo], bool]:
+    # Read the memo of each filesystem object whose encoded managed tree path is a key of
+    # *last_encoded_memo_by_encoded_path* (possibly in parallel).
+    #
+    # Returns a dictionary whose keys are the keys of *last_encoded_memo_by_encoded_path* (in the same order)
+    # and whose values are the corresponding FilesystemObjectMemo m (``m.stat`` is None for a filesystem object that
+    # does not exist or cannot be accessed).
 
-    try:
-        # do _not_ check if in managed tree: does no harm if _not_ in managed tree
-        # may raise OSError or ValueError (if 'path' not representable on native system)
-        memo = _worktree.read_filesystem_object_memo(root_path / path)
-    except (ValueError, FileNotFoundError):
-        # ignore if did not exist according to valid 'encoded_memo'
-        did_not_exist_before_last_redo = False
+    path_by_encoded_path = {}
+    for encoded_path in last_encoded_memo_by_encoded_path:
         try:
-            did_not_exist_before_last_redo = \
-                last_encoded_memo is None or _rundb.decode_encoded_fsobject_memo(last_encoded_memo).stat is None
+            path_by_encoded_path[encoded_path] = _rundb.decode_encoded_path(encoded_path)  # may raise ValueError
         except ValueError:
             pass
-        if not did_not_exist_before_last_redo:
+
+    # do _not_ check if in managed tree: does no harm if _not_ in managed tree
+    # may contain OSError or ValueError (if 'path' not representable on native system)
+    memo_or_exception_by_encoded_path = dict(zip(
+        path_by_encoded_path,
+        memo_cache.read_filesystem_object_memos([(p, ep) for ep, p in path_by_encoded_path.items()])))
+
+    memo_by_encoded_path = {}
+    for encoded_path, last_encoded_memo in last_encoded_memo_by_encoded_path.items():
+        memo = _rundb.FilesystemObjectMemo()
+        memo_by_encoded_path[encoded_path] = memo
+
+        path = path_by_encoded_path.get(encoded_path)
+        if path is None:
             if not needs_redo:
-                msg = f"redo necessary because of non-existent filesystem object: {path.as_string()!r}"
-                di.inform(msg, level=cf.level.redo_reason)
+                di.inform(f"redo necessary because of invalid encoded path: {encoded_path!r}",
+                          level=cf.level.redo_suspicious_reason)
                 needs_redo = True
-    except OSError:
-        # comparision not possible -> redo
-        if not needs_redo:
-            msg = f"redo necessary because of inaccessible filesystem object: {path.as_string()!r}"
-            di.inform(msg, level=cf.level.redo_reason)
-            needs_redo = True  # comparision not possible -> redo
+            continue
+
+        memo_or_exception = memo_or_exception_by_encoded_path[encoded_path]
+        if isinstance(memo_or_exception, (ValueError, FileNotFoundError)):
+            # ignore if did not exist according to valid 'encoded_memo'
+            did_not_exist_before_last_redo = False
+            try:
+                did_not_exist_before_last_redo = \
+                    last_encoded_memo is None or _rundb.decode_encoded_fsobject_memo(last_encoded_memo).stat is None
+            except ValueError:
+                pass
+            if not did_not_exist_before_last_redo:
+                if not needs_redo:
+                    msg = f"redo necessary because of non-existent filesystem object: {path.as_string()!r}"
+                    di.inform(msg, level=cf.level.redo_reason)
+                    needs_redo = True
+        elif isinstance(memo_or_exception, OSError):
+            # comparision not possible -> redo
+            if not needs_redo:
+                msg = f"redo necessary because of inaccessible filesystem object: {path.as_string()!r}"
+                di.inform(msg, level=cf.level.redo_reason)
+                needs_redo = True  # comparision not possible -> redo
+        else:
+            memo_by_encoded_path[encoded_path] = memo_or_exception
 
-    return memo, needs_redo  # memo.state may be None
+    return memo_by_encoded_path, needs_redo  # memo.state may be None
 
 
-def check_and_memorize_explicit_fs_input_dependencies(tool, dependency_actions: Tuple[_dependaction.Action, ...],
-                                                      context: _context.Context) \
-        -> Dict[str, _rundb.FilesystemObjectMemo]:
+def add_content_digest_to_memo(memo: _rundb.FilesystemObjectMemo, root_path: fs.Path, encoded_path: str) \
+        -> _rundb.FilesystemObjectMemo:
+    # Return a copy of *memo* for the filesystem object with encoded managed tree path *encoded_path* with the content
+    # digest of the filesystem object, if it is a regular file whose stat summary is still the one of *memo*.
+    # Otherwise, return *memo*.
+
+    if memo.stat is None or not stat.S_ISREG(memo.stat.mode) or memo.digest is not None:
+        return memo
+
+    abs_path = root_path / _rundb.decode_encoded_path(encoded_path)
+    try:
+        digest = _worktree.read_regular_file_digest(abs_path)
+        if _worktree.read_filesystem_object_memo(abs_path).stat != memo.stat:  # modified since 'memo' was read?
+            return memo
+    except (ValueError, OSError):
+        return memo
+
+    return dataclasses.replace(memo, digest=digest)
+
+
+def collect_explicit_fs_input_dependencies(tool, dependency_actions: Tuple[_dependaction.Action, ...],
+                                           context: _context.Context) \
+        -> Tuple[List[Tuple[_dependaction.Action, fs.Path, Optional[str], Optional[Exception]]], Dict[str, fs.Path]]:
 
     # For all explicit input dependencies of *tool* in *dependency_actions* for filesystem objects:
-    # Check existence, read and check its FilesystemObjectMemo.
-    #
-    # Treats all definitions file of this tool class that are in the managed tree as explicit input dependencies.
+    # Collect the path of each filesystem object in a repeatable order without accessing the filesystem.
     #
-    # Returns a dictionary whose key are encoded managed tree paths and whose values are the corresponding
-    # FilesystemObjectMemo m with ``m.stat is not None``.
-
-    memo_by_encoded_path: Dict[str, _rundb.FilesystemObjectMemo] = {}
+    # Returns '(checked_paths, path_by_encoded_path)' to be passed to
+    # check_and_memorize_explicit_fs_input_dependencies(), where *path_by_encoded_path* contains the managed tree
+    # path of each filesystem object in the managed tree by its encoded form.
 
+    checked_paths = []  # (action, p, encoded_path, exception)
+    path_by_encoded_path = {}
     for action in dependency_actions:
-        # read memo of each filesystem object of an explicit input dependency in a repeatable order
         if action.dependency.explicit and isinstance(action.dependency, _depend.InputDependency) \
                 and action.dependency.Value is fs.Path:
             validated_value_tuple = action.dependency.tuple_from_value(getattr(tool, action.name))
@@ -480,40 +657,91 @@ def check_and_memorize_explicit_fs_input_dependencies(tool, dependency_actions:
                         if not p.is_absolute():
                             raise ValueError('not a managed tree path') from None
                         # absolute paths to the management tree are ok
+                except (ValueError, OSError) as e:
+                    checked_paths.append((action, p, None, e))
+                    continue
 
-                    # p is a relative path of a filesystem object in the managed tree or an absolute path
-                    # of filesystem object outside the managed tree
-                    if not p.is_absolute():
-                        encoded_path = _rundb.encode_path(p)
-                        memo = memo_by_encoded_path.get(encoded_path)
-                        if memo is None:
-                            memo = _worktree.read_filesystem_object_memo(context.root_path / p)  # may raise OSError
-                        action.check_filesystem_object_memo(memo)  # raise ValueError if memo is not as expected
-                        memo_by_encoded_path[encoded_path] = memo
-                        assert memo.stat is not None
-                except ValueError as e:
-                    msg = (
-                        f"input dependency {action.name!r} contains an invalid path: {p.as_string()!r}\n"
-                        f"  | reason: {ut.exception_to_line(e)}"
-                    )
-                    raise _error.DependencyError(msg) from None
-                except FileNotFoundError:
-                    msg = (
-                        f"input dependency {action.name!r} contains a path of a "
-                        f"non-existent filesystem object: {p.as_string()!r}"
-                    )
-                    raise _error.DependencyError(msg) from None
-                except OSError as e:
-                    msg = (
-                        f"input dependency {action.name!r} contains a path of an "
-                        f"inaccessible filesystem object: {p.as_string()!r}\n"
-                        f"  | reason: {ut.exception_to_line(e)}"
-                    )
-                    raise _error.DependencyError(msg) from None
+                # p is a relative path of a filesystem object in the managed tree or an absolute path
+                # of filesystem object outside the managed tree
+                encoded_path = None
+                if not p.is_absolute():
+                    encoded_path = _rundb.encode_path(p)
+                    path_by_encoded_path[encoded_path] = p
+                checked_paths.append((action, p, encoded_path, None))
+
+    return checked_paths, path_by_encoded_path
+
+
+def check_and_memorize_explicit_fs_input_dependencies(
+        checked_paths: List[Tuple[_dependaction.Action, fs.Path, Optional[str], Optional[Exception]]],
+        path_by_encoded_path: Dict[str, fs.Path]) -> Dict[str, _rundb.FilesystemObjectMemo]:
+
+    # For all explicit input dependencies for filesystem objects collected by
+    # collect_explicit_fs_input_dependencies(): Check existence, read and check its FilesystemObjectMemo.
+    #
+    # Returns a dictionary whose key are encoded managed tree paths and whose values are the corresponding
+    # FilesystemObjectMemo m with ``m.stat is not None``.
+
+    # read memo of each filesystem object (possibly in parallel)
+    memo_cache = _context._get_fsobject_memo_cache()
+    memo_or_exception_by_encoded_path = dict(zip(
+        path_by_encoded_path,
+        memo_cache.read_filesystem_object_memos([(p, ep) for ep, p in path_by_encoded_path.items()])))
+
+    memo_by_encoded_path: Dict[str, _rundb.FilesystemObjectMemo] = {}
+
+    for action, p, encoded_path, exception in checked_paths:
+        try:
+            if exception is not None:
+                raise exception
+            if encoded_path is not None:
+                memo = memo_or_exception_by_encoded_path[encoded_path]
+                if isinstance(memo, Exception):
+                    raise memo
+                action.check_filesystem_object_memo(memo)  # raise ValueError if memo is not as expected
+                memo_by_encoded_path[encoded_path] = memo
+                assert memo.stat is not None
+        except ValueError as e:
+            msg = (
+                f"input dependency {action.name!r} contains an invalid path: {p.as_string()!r}\n"
+                f"  | reason: {ut.exception_to_line(e)}"
+            )
+            raise _error.DependencyError(msg) from None
+        except FileNotFoundError:
+            msg = (
+                f"input dependency {action.name!r} contains a path of a "
+                f"non-existent filesystem object: {p.as_string()!r}"
+            )
+            raise _error.DependencyError(msg) from None
+        except OSError as e:
+            msg = (
+                f"input dependency {action.name!r} contains a path of an "
+                f"inaccessible filesystem object: {p.as_string()!r}\n"
+                f"  | reason: {ut.exception_to_line(e)}"
+            )
+            raise _error.DependencyError(msg) from None
 
     return memo_by_encoded_path
 
 
+def get_encoded_paths_of_explicit_fs_output_dependencies(tool, dependency_actions: Tuple[_dependaction.Action, ...],
+                                                         context: _context.Context) -> List[str]:
+    # Return the encoded managed tree paths of all explicit output dependencies of *tool* in *dependency_actions* for
+    # filesystem objects without accessing the filesystem (paths that are not managed tree paths are ignored).
+
+    encoded_paths = []
+    for action in dependency_actions:
+        if action.dependency.explicit and isinstance(action.dependency, _depend.OutputDependency) \
+                and action.dependency.Value is fs.Path:
+            for p in action.dependency.tuple_from_value(getattr(tool, action.name)):
+                try:
+                    p = context.working_tree_path_of(p, existing=True, collapsable=True)
+                except ValueError:
+                    continue
+                encoded_paths.append(_rundb.encode_path(p))
+    return encoded_paths
+
+
 def check_explicit_fs_output_dependencies(tool, dependency_actions: Tuple[_dependaction.Action, ...],
                                           encoded_paths_of_explicit_input_dependencies: Set[str],
                                           needs_redo: bool,
@@ -530,6 +758,8 @@ def check_explicit_fs_output_dependencies(tool, dependency_actions: Tuple[_depen
     # managed tree paths of existing filesystem objects with unexpected memos (e.g. wrong type):
     obstructive_paths = set()
 
+    memo_cache = _context._get_fsobject_memo_cache()
+
     for action in dependency_actions:
 
         # read memo of each filesystem object of an explicit input dependency in a repeatable order
@@ -564,7 +794,7 @@ def check_explicit_fs_output_dependencies(tool, dependency_actions: Tuple[_depen
                 memo = None
                 try:
                     # may raise OSError or ValueError (if 'path' not representable on native system)
-                    memo = _worktree.read_filesystem_object_memo(context.root_path / p)
+                    memo = memo_cache.read_filesystem_object_memo(p, encoded_path)
                     action.check_filesystem_object_memo(memo)  # raise ValueError if memo is not as expected
                 except (ValueError, OSError) as e:
                     if memo is not None and memo.stat is not None:
@@ -614,6 +844,7 @@ def check_envvar_dependencies(tool, dependency_actions: Tuple[_dependaction.Acti
     for name in sorted(envvar_value_by_name):
         envvar_digest += ut.to_permanent_local_bytes((name, envvar_value_by_name[name]))
     if len(envvar_digest) >= 20:
+        import hashlib
         envvar_digest = hashlib.sha1(envvar_digest).digest()
 
     return envvar_value_by_name, envvar_digest
@@ -9,8 +9,9 @@ __all__ = []
 
 import string
 import os
+import bisect
 import stat
-from typing import Optional, Tuple, Type, Union
+from typing import Dict, Hashable, List, Optional, Sequence, Set, Tuple, Type, Union
 
 from .. import ut
 from .. import fs
@@ -246,6 +247,255 @@ def read_filesystem_object_memo(abs_path: Union[str, fs.Path]) -> _rundb.Filesys
     return memo
 
 
+class FilesystemObjectMemoCache:
+    # Run-scoped cache of the ``FilesystemObjectMemo`` objects of filesystem objects in the managed tree
+    # with absolute path *root_path*, keyed by encoded managed tree path.
+    #
+    # The memo of a filesystem object is read with read_filesystem_object_memo() when it is requested for the first
+    # time (a miss) and then reused until invalidate() is called for its managed tree path or a prefix of it.
+    # Modifications of the managed tree bypassing invalidate() are not detected.
+    # The memos returned by read_filesystem_object_memo() must not be modified (they are shared by all tool instances);
+    # use a modified copy instead.
+    #
+    # If *enabled* is False, nothing is cached.
+    #
+    # read_filesystem_object_memos() reads the memos not in the cache with at most *max_parallel_read_count* threads
+    # (on network filesystems, reading a memo takes long but does not need the GIL).
+    # close() must be called when the object is no longer used.
+    #
+    # add_unchanged_memos() adds memos of filesystem objects a change journal reports as unchanged (even if *enabled*
+    # is False). If 'change_journal' is not None, invalidate() also declares the filesystem objects as modified in it.
+    #
+    # hold_memos() reads memos of many filesystem objects at once and keeps them in the cache until release_memos()
+    # (even if *enabled* is False).
+    #
+    # pin_memos() keeps memos of a few filesystem objects by a key until invalidate() is called for one of them or
+    # start_next_run() is called (even if *enabled* is False); get_pinned_memos() returns them.
+    #
+    # start_next_run() prepares the cache for another dlb run in the same process.
+
+    def __init__(self, root_path: fs.Path, *, enabled: bool, max_parallel_read_count: int = 1):
+        if not root_path.is_absolute():
+            raise ValueError("'root_path' must be absolute")
+        self._root_path = root_path
+        self._enabled = bool(enabled)
+        self._max_parallel_read_count = max(1, int(max_parallel_read_count))
+        self._executor = None  # constructed when needed
+        self._memo_by_encoded_path: Dict[str, _rundb.FilesystemObjectMemo] = {}
+        # keys of '_memo_by_encoded_path', sorted when needed by invalidate() (one bisect.insort() per miss would be
+        # O(n**2) for n misses)
+        self._encoded_paths: List[str] = []
+        self._are_encoded_paths_sorted = True
+        self.hit_count = 0
+        self.miss_count = 0
+        self.change_journal = None
+        self.modified_encoded_paths: Set[str] = set()  # all encoded paths passed to invalidate() in this run
+        self._held_encoded_paths: Set[str] = set()  # added by hold_memos() and not to be cached
+        self._pinned_memos_by_key: Dict[Hashable, List[Tuple[str, _rundb.FilesystemObjectMemo]]] = {}
+        self._pinned_keys_by_encoded_path: Dict[str, Set[Hashable]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def hold_memos(self, paths: Sequence[Tuple[fs.Path, str]]) -> int:
+        # Read the memos of the filesystem objects with managed tree paths *paths* (pairs of a managed tree path and
+        # its encoded form) not in the cache like read_filesystem_object_memos() and keep them in the cache until the
+        # next call of release_memos() or invalidate().
+        # Returns the number of memos read.
+
+        paths = list({ep: (p, ep) for p, ep in paths if ep not in self._memo_by_encoded_path}.values())
+        memos = self.read_filesystem_object_memos(paths)
+
+        n = 0
+        new_encoded_paths = []
+        for (_, encoded_path), memo in zip(paths, memos):
+            if not isinstance(memo, Exception):
+                n += 1
+                if encoded_path not in self._memo_by_encoded_path:
+                    self._memo_by_encoded_path[encoded_path] = memo
+                    new_encoded_paths.append(encoded_path)
+                    self._held_encoded_paths.add(encoded_path)
+        if new_encoded_paths:
+            self._encoded_paths += new_encoded_paths
+            self._are_encoded_paths_sorted = False
+        return n
+
+    def release_memos(self):
+        # Forget the memos kept in the cache by hold_memos() that would not have been cached otherwise.
+
+        held_encoded_paths, self._held_encoded_paths = self._held_encoded_paths, set()
+        if held_encoded_paths:
+            for encoded_path in held_encoded_paths:
+                self._memo_by_encoded_path.pop(encoded_path, None)
+            self._encoded_paths = [p for p in self._encoded_paths if p in self._memo_by_encoded_path]
+
+    def get_pinned_memos(self, key: Hashable) -> Optional[List[Tuple[str, _rundb.FilesystemObjectMemo]]]:
+        # Return the list of pairs of an encoded managed tree path and its memo pinned by pin_memos() with *key*
+        # or None if there is none.
+        return self._pinned_memos_by_key.get(key)
+
+    def pin_memos(self, key: Hashable, memos: List[Tuple[str, _rundb.FilesystemObjectMemo]]):
+        # Keep the list *memos* of pairs of an encoded managed tree path and its memo for get_pinned_memos() with *key*
+        # until invalidate() is called for one of the encoded managed tree paths (or a prefix).
+        # *memos* must not be modified afterwards.
+
+        self._pinned_memos_by_key[key] = memos
+        for encoded_path, _ in memos:
+            self._pinned_keys_by_encoded_path.setdefault(encoded_path, set()).add(key)
+
+    def add_unchanged_memos(self, memo_by_encoded_path: Dict[str, _rundb.FilesystemObjectMemo]) -> int:
+        # Add the memos *memo_by_encoded_path* of filesystem objects the change journal reports as unchanged
+        # since the memos were read (in an earlier run of dlb) and not yet in the cache.
+        # Returns the number of added memos.
+
+        n = 0
+        for encoded_path, memo in memo_by_encoded_path.items():
+            if encoded_path not in self._memo_by_encoded_path:
+                self._memo_by_encoded_path[encoded_path] = memo
+                self._encoded_paths.append(encoded_path)
+                n += 1
+        if n:
+            self._are_encoded_paths_sorted = False
+        return n
+
+    def read_filesystem_object_memo(self, path: fs.Path, encoded_path: str) -> _rundb.FilesystemObjectMemo:
+        # Return the memo of the filesystem object with managed tree path *path* (whose encoded form
+        # is *encoded_path*).
+        # Raises the same exceptions as read_filesystem_object_memo(); exceptions are not cached.
+
+        # must be fast
+
+        memo = self._memo_by_encoded_path.get(encoded_path)
+        if memo is not None:
+            self.hit_count += 1
+            return memo
+
+        memo = read_filesystem_object_memo(self._root_path / path)
+        if self._enabled:
+            self.miss_count += 1
+            self._memo_by_encoded_path[encoded_path] = memo
+            self._encoded_paths.append(encoded_path)
+            self._are_encoded_paths_sorted = False
+        return memo
+
+    def read_filesystem_object_memos(self, paths: Sequence[Tuple[fs.Path, str]]) \
+            -> List[Union[_rundb.FilesystemObjectMemo, OSError, ValueError]]:
+        # Return the memos of the filesystem objects with managed tree paths *paths* (pairs of a managed tree path and
+        # its encoded form) in the same order as *paths*.
+        # Instead of a memo, the list contains the exception read_filesystem_object_memo() raised.
+
+        results = [self._memo_by_encoded_path.get(encoded_path) for _, encoded_path in paths]
+        indices_to_read = [i for i, memo in enumerate(results) if memo is None]
+        self.hit_count += len(results) - len(indices_to_read)
+
+        abs_paths = [self._root_path / paths[i][0] for i in indices_to_read]
+        if self._max_parallel_read_count > 1 and len(abs_paths) > 1:
+            if self._executor is None:
+                import concurrent.futures
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_parallel_read_count, thread_name_prefix='dlb-memo-reader')
+            memos = list(self._executor.map(_read_filesystem_object_memo_or_exception, abs_paths))  # ordered
+        else:
+            memos = [_read_filesystem_object_memo_or_exception(p) for p in abs_paths]
+
+        for i, memo in zip(indices_to_read, memos):
+            results[i] = memo
+            if self._enabled and not isinstance(memo, Exception):
+                self.miss_count += 1
+                _, encoded_path = paths[i]
+                if encoded_path not in self._memo_by_encoded_path:
+                    self._memo_by_encoded_path[encoded_path] = memo
+                    self._encoded_paths.append(encoded_path)
+                    self._are_encoded_paths_sorted = False
+
+        return results
+
+    def invalidate(self, encoded_path: str):
+        # Forget the memos of the filesystem object with encoded managed tree path *encoded_path*
+        # and of all filesystem objects in it.
+
+        self.modified_encoded_paths.add(encoded_path)
+        if self.change_journal is not None:
+            self.change_journal.declare_as_modified(encoded_path)
+
+        if not (self._memo_by_encoded_path or self._pinned_keys_by_encoded_path):
+            return
+
+        first, last = _rundb.get_encoded_path_range_of_prefix(encoded_path)
+
+        if self._pinned_keys_by_encoded_path:  # few
+            for p in [p for p in self._pinned_keys_by_encoded_path if first <= p and (last is None or p < last)]:
+                for key in self._pinned_keys_by_encoded_path.pop(p):
+                    self._pinned_memos_by_key.pop(key, None)
+
+        sorted_encoded_paths = self._encoded_paths
+        if not self._are_encoded_paths_sorted:
+            sorted_encoded_paths.sort()  # fast for a sorted list with a few appended items
+            self._are_encoded_paths_sorted = True
+        i = bisect.bisect_left(sorted_encoded_paths, first)
+        j = len(sorted_encoded_paths) if last is None else bisect.bisect_left(sorted_encoded_paths, last, i)
+        for p in sorted_encoded_paths[i:j]:
+            del self._memo_by_encoded_path[p]
+        del sorted_encoded_paths[i:j]
+
+    def start_next_run(self, change_journal):
+        # Prepare this cache (of an earlier, completed dlb run) for another dlb run that uses the change journal
+        # *change_journal* (or None).
+        #
+        # Keeps the memos of all filesystem objects *change_journal* reports as unchanged since the position of the
+        # change journal of the earlier run (if both are of the same session). Forgets all other memos.
+
+        previous_change_journal = self.change_journal
+        if change_journal is None or previous_change_journal is None or \
+                change_journal.session != previous_change_journal.session:
+            self._memo_by_encoded_path = {}
+            self._encoded_paths = []
+            self._are_encoded_paths_sorted = True
+        else:
+            position = previous_change_journal.position
+            self._encoded_paths = [p for p in self._encoded_paths if change_journal.is_unchanged_since(p, position)]
+            self._memo_by_encoded_path = {p: self._memo_by_encoded_path[p] for p in self._encoded_paths}
+
+        self.change_journal = change_journal
+        self._held_encoded_paths = set()
+        self._pinned_memos_by_key = {}
+        self._pinned_keys_by_encoded_path = {}
+        self.hit_count = 0
+        self.miss_count = 0
+        self.modified_encoded_paths = set()
+
+    def close(self):  # safe to call multiple times
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _read_filesystem_object_memo_or_exception(abs_path: fs.Path) \
+        -> Union[_rundb.FilesystemObjectMemo, OSError, ValueError]:
+    try:
+        return read_filesystem_object_memo(abs_path)
+    except (OSError, ValueError) as e:
+        return e
+
+
+def read_regular_file_digest(abs_path: Union[str, fs.Path]) -> bytes:
+    # Returns a digest of the content of the regular file with absolute path *abs_path* as a short byte string.
+
+    if isinstance(abs_path, fs.Path):
+        abs_path = str(abs_path.native)
+
+    import hashlib
+    hashalg = hashlib.sha1()  # always present and fast
+    with open(abs_path, 'rb', buffering=0) as f:
+        while True:
+            block = f.read(2**16)
+            if not block:
+                break
+            hashalg.update(block)
+    return hashalg.digest()
+
+
 def normalize_dotdot_native_components(components: Tuple[str, ...], *, ref_dir_path: Optional[str] = None) \
         -> Tuple[str, ...]:
     # Return the components a path equivalent to the relative path with components *components* with all
@@ -377,7 +627,12 @@ def rundb_filename_for_schema_version(schema_version: Tuple[int]) -> str:
     return RUNDB_FILE_NAME_TEMPLATE.format('.'.join([str(c) for c in schema_version]))
 
 
-def prepare_locked_working_tree(root_path: fs.Path, rundb_schema_version: Tuple[int], max_dependency_age):
+def prepare_locked_working_tree(root_path: fs.Path, rundb_schema_version: Tuple[int], max_dependency_age,
+                                rundb_profile: str = 'safe', reusable_rundb: Optional[_rundb.Database] = None):
+    # If *reusable_rundb* is the open run-database of an earlier (completed) run of the same working tree with
+    # the same *rundb_profile*, it is returned for the next run if its file was not removed or replaced in
+    # the meantime. Otherwise, a new run-database object is returned (*reusable_rundb* is not closed).
+
     rundb_filename = rundb_filename_for_schema_version(rundb_schema_version)
     management_tree_path = os.path.join(str(root_path.native), MANAGEMENTTREE_DIR_NAME)
     temp_path_provider = UniquePathProvider(root_path / f'{MANAGEMENTTREE_DIR_NAME}/{TEMPORARY_DIR_NAME}/')
@@ -411,8 +666,14 @@ def prepare_locked_working_tree(root_path: fs.Path, rundb_schema_version: Tuple[
             else:
                 is_working_tree_case_sensitive = not os.path.samestat(probe_stat, probeu_stat)
 
-            db = _rundb.Database(rundb_path, max_dependency_age,
-                                 f"if you suspect database corruption, remove the run-database file(s): {rundb_path!r}")
+            if reusable_rundb is not None and reusable_rundb.is_file(rundb_path):
+                db = reusable_rundb
+                db.start_next_run(max_dependency_age)
+            else:
+                db = _rundb.Database(
+                    rundb_path, max_dependency_age,
+                    f"if you suspect database corruption, remove the run-database file(s): {rundb_path!r}",
+                    rundb_profile, write_behind=True)
         except:
             mtime_probe.close()
             raise
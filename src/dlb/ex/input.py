@@ -11,7 +11,18 @@ from . import _depend
 
 
 class RegularFile(_depend.NonDirectoryMixin, _depend.InputDependency):
-    pass
+
+    def __init__(self, *, compare: str = 'mtime', **kwargs):
+        super().__init__(**kwargs)
+        if not isinstance(compare, str):
+            raise TypeError("'compare' must be a str")
+        if compare not in ('mtime', 'digest'):
+            raise ValueError(f"'compare' must be 'mtime' or 'digest', not {compare!r}")
+        self._compare = compare  # ignore in compatible_and_no_less_restrictive()
+
+    @property
+    def compare(self) -> str:
+        return self._compare
 
 
 class NonRegularFile(_depend.NonDirectoryMixin, _depend.InputDependency):
@@ -64,7 +64,6 @@ from typing import List, Set, Union
 
 import dlb.fs
 import dlb.ex
-import dlb_contrib.gnumake
 import dlb_contrib.clike
 
 assert f'string' and sys.version_info >= (3, 7)
@@ -157,6 +156,7 @@ class _CompilerGcc(dlb_contrib.clike.ClikeCompiler):
 
     def get_included_files_from_make_rules_file(self, context, make_rules_file: dlb.fs.Path) -> Set[dlb.fs.Path]:
         # parse content of make_rules_file as a Makefile and add all paths in managed tree to included_files
+        import dlb_contrib.gnumake  # not needed for the definition of tool classes
         included_files = set()
         with open(make_rules_file.native, 'r', encoding=sys.getfilesystemencoding()) as dep_file:
             for p in dlb_contrib.gnumake.additional_sources_from_rule(dep_file):
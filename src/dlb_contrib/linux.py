@@ -24,6 +24,26 @@
 #   cache_sizes = dlb_contrib.linux.get_cpu_info().by_key('cache size')
 #   # e.g. {'8192 KB': (0, 1, 2, 3, 4, 5, 6, 7)}
 #
+#   cpu_count = dlb_contrib.linux.get_usable_cpu_count()
+#   # e.g. 2 (limited by 'cpu.max' of cgroup v2)
+#
+#   limit, usage = dlb_contrib.linux.get_cgroup_memory_info()
+#   # e.g. (4294967296, 1123536896) (from 'memory.max' and 'memory.current' of cgroup v2)
+#
+# Usage example:
+#
+#   # Start a redo only while the load and the available memory allow it (at least 1, at most 16 pending redos).
+#
+#   import dlb.cf
+#   import dlb.ex
+#   import dlb_contrib.linux
+#
+#   dlb.cf.parallel_redo_admission = dlb_contrib.linux.LoadAwareRedoAdmission(
+#       min_available_memory=2 * 2**30)
+#
+#   with dlb.ex.Context(max_parallel_redo_count=16):
+#       ...
+#
 # Usage example:
 #
 #   # List filesystems whose mountpoints are a prefix of os.path.realpath('.').
@@ -34,11 +54,17 @@
 #       dlb_contrib.backslashescape.get_mounted_filesystems(['.'])
 #       # e.g. {Path('/'): 'xfs', Path('/tmp/'): 'tmpfs'}
 
-__all__ = ['KEY_VALUE_LINE_REGEX', 'get_kernel_info', 'get_memory_info', 'get_cpu_info', 'get_mounted_filesystems']
+__all__ = [
+    'KEY_VALUE_LINE_REGEX',
+    'get_kernel_info', 'get_memory_info', 'get_cpu_info', 'get_mounted_filesystems',
+    'get_load_info', 'get_cgroup_cpu_limit', 'get_cgroup_memory_info', 'get_usable_cpu_count',
+    'LoadAwareRedoAdmission'
+]
 
 import re
 import os
-from typing import Dict, Iterable, Optional, Sequence, Tuple
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import dlb.fs
 import dlb_contrib.backslashescape
@@ -47,6 +73,7 @@ import dlb_contrib.backslashescape
 KEY_VALUE_LINE_REGEX = re.compile(rb'\A(?P<key>\S+(?: \S+)*)[ \t]*: *(?P<value>\S.*)?\n\Z')
 
 PROC_ROOT_DIRECTORY = dlb.fs.Path('/proc/')
+CGROUP_ROOT_DIRECTORY = dlb.fs.Path('/sys/fs/cgroup/')
 
 
 def _get_limited_text(source_path: dlb.fs.PathLike, max_size: int) -> bytes:
@@ -305,3 +332,196 @@ def get_mounted_filesystems(contained_paths: Optional[Iterable[dlb.fs.PathLike]]
                 vfstype_name_by_mountpoint[containing_mountpoint]
 
     return filtered_vfstype_name_by_mountpoint
+
+
+def get_load_info(*, proc_root_directory: dlb.fs.PathLike = PROC_ROOT_DIRECTORY) -> Tuple[float, float, float, int]:
+    # Return the load averages over 1, 5, and 15 minutes and the number of currently runnable threads
+    # (including the calling one).
+
+    proc_root_directory = dlb.fs.Path(proc_root_directory)
+    loadavg_file = proc_root_directory / 'loadavg'
+
+    # https://man7.org/linux/man-pages/man5/proc.5.html:
+    #   The first three fields in this file are load average figures [...].
+    #   The fourth field consists of two numbers separated by a slash (/). The first of these is the number of
+    #   currently runnable kernel scheduling entities (processes, threads).
+    line = _get_limited_text(loadavg_file, 1024)
+    try:
+        load1, load5, load15, runnable, _ = line.split()
+        return float(load1), float(load5), float(load15), int(runnable.split(b'/')[0], 10)
+    except ValueError:
+        raise RuntimeError(f'unexpected content in {loadavg_file.as_string()!r}: {line!r}') from None
+
+
+def _get_cgroup_directories(proc_root_directory: dlb.fs.Path, cgroup_root_directory: dlb.fs.Path) -> List[dlb.fs.Path]:
+    # Return the directories of the cgroup (v2) of the calling process and all its ancestors, the innermost first.
+    # Return [] if the calling process is not in a cgroup of the unified hierarchy.
+
+    # https://man7.org/linux/man-pages/man7/cgroups.7.html:
+    #   hierarchy-ID:controller-list:cgroup-path
+    #   For the cgroups version 2 hierarchy, this field contains the value 0. [...] controller-list is empty.
+    cgroup_file = proc_root_directory / 'self/cgroup'
+    cgroup_path = None
+    with open(cgroup_file.native, 'rb') as f:
+        for line in f:
+            if line.startswith(b'0::/'):
+                cgroup_path = os.fsdecode(line[4:].rstrip(b'\n'))
+    if cgroup_path is None:
+        return []
+
+    components = [c for c in cgroup_path.split('/') if c]
+    return [cgroup_root_directory / dlb.fs.Path('/'.join(components[:i]) or '.', is_dir=True)
+            for i in range(len(components), -1, -1)]
+
+
+def _read_cgroup_values(cgroup_directory: dlb.fs.Path, file_name: str) -> Optional[Tuple[str, ...]]:
+    try:
+        return tuple(_get_limited_text(cgroup_directory / file_name, 1024).decode().split())
+    except FileNotFoundError:  # controller not enabled or root cgroup
+        return None
+
+
+def get_cgroup_cpu_limit(*, proc_root_directory: dlb.fs.PathLike = PROC_ROOT_DIRECTORY,
+                         cgroup_root_directory: dlb.fs.PathLike = CGROUP_ROOT_DIRECTORY) -> Optional[float]:
+    # Return the (non-integer) number of CPUs the calling process may use according to the bandwidth limit 'cpu.max'
+    # of its cgroup (v2) and all its ancestors or None if there is no such limit.
+
+    proc_root_directory = dlb.fs.Path(proc_root_directory)
+    cgroup_root_directory = dlb.fs.Path(cgroup_root_directory)
+
+    # https://docs.kernel.org/admin-guide/cgroup-v2.html#cpu-interface-files:
+    #   cpu.max: $MAX $PERIOD [...] "max" for $MAX indicates no limit.
+    cpu_limit = None
+    for d in _get_cgroup_directories(proc_root_directory, cgroup_root_directory):
+        values = _read_cgroup_values(d, 'cpu.max')
+        if values is None or values[:1] == ('max',):
+            continue
+        try:
+            quota, period = (int(v, 10) for v in values)
+            limit = quota / period
+        except (ValueError, ZeroDivisionError):
+            raise RuntimeError(f"unexpected content in {(d / 'cpu.max').as_string()!r}: {values!r}") from None
+        cpu_limit = limit if cpu_limit is None else min(cpu_limit, limit)
+
+    return cpu_limit
+
+
+def get_cgroup_memory_info(*, proc_root_directory: dlb.fs.PathLike = PROC_ROOT_DIRECTORY,
+                           cgroup_root_directory: dlb.fs.PathLike = CGROUP_ROOT_DIRECTORY) -> Optional[Tuple[int, int]]:
+    # Return the memory limit 'memory.max' and the memory usage 'memory.current' (in byte) of the cgroup (v2) of the
+    # calling process or the one of its ancestors with the least unused memory below its limit,
+    # or None if there is no such limit.
+
+    proc_root_directory = dlb.fs.Path(proc_root_directory)
+    cgroup_root_directory = dlb.fs.Path(cgroup_root_directory)
+
+    # https://docs.kernel.org/admin-guide/cgroup-v2.html#memory-interface-files:
+    #   memory.max: Memory usage hard limit. [...] The default is "max".
+    #   memory.current: The total amount of memory currently being used by the cgroup and its descendants.
+    memory_info = None
+    for d in _get_cgroup_directories(proc_root_directory, cgroup_root_directory):
+        limit = _read_cgroup_values(d, 'memory.max')
+        usage = _read_cgroup_values(d, 'memory.current')
+        if limit is None or usage is None or limit == ('max',):
+            continue
+        try:
+            (limit,), (usage,) = (int(v, 10) for v in limit), (int(v, 10) for v in usage)
+        except ValueError:
+            raise RuntimeError(f'unexpected memory limit or usage in {d.as_string()!r}') from None
+        if memory_info is None or limit - usage < memory_info[0] - memory_info[1]:
+            memory_info = limit, usage
+
+    return memory_info
+
+
+def get_usable_cpu_count(*, proc_root_directory: dlb.fs.PathLike = PROC_ROOT_DIRECTORY,
+                         cgroup_root_directory: dlb.fs.PathLike = CGROUP_ROOT_DIRECTORY) -> int:
+    # Return the number of CPUs the calling process may use (at least 1), limited by its CPU affinity mask and
+    # the bandwidth limit of its cgroup (v2).
+
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 1
+
+    try:
+        cpu_limit = get_cgroup_cpu_limit(proc_root_directory=proc_root_directory,
+                                         cgroup_root_directory=cgroup_root_directory)
+    except FileNotFoundError:  # no cgroup
+        cpu_limit = None
+    if cpu_limit is not None:
+        cpu_count = min(cpu_count, math.ceil(cpu_limit))
+
+    return max(1, cpu_count)
+
+
+class LoadAwareRedoAdmission:
+    # Callable for 'dlb.cf.parallel_redo_admission' that admits another redo while *n* redos are pending if
+    #
+    #  - *n* < *min_count*, or
+    #  - *n* < *max_count* (if not None) and the number of currently runnable threads (except the calling one) is
+    #    less than *max_load_per_cpu* times the number of usable CPUs and the available memory is at least
+    #    *min_available_memory* byte.
+    #
+    # The number of usable CPUs is determined on construction, the load and the available memory on each call.
+    # The available memory is the one estimated by the Linux kernel for starting new applications without swapping,
+    # reduced to the unused memory below the limit of the cgroup (v2) of the calling process.
+    # Information that cannot be determined (e.g. because /proc is not mounted) does not restrict admission.
+
+    def __init__(self, *, min_count: int = 1, max_count: Optional[int] = None, max_load_per_cpu: float = 1.0,
+                 min_available_memory: int = 512 * 2**20,
+                 proc_root_directory: dlb.fs.PathLike = PROC_ROOT_DIRECTORY,
+                 cgroup_root_directory: dlb.fs.PathLike = CGROUP_ROOT_DIRECTORY):
+        self._min_count = max(1, int(min_count))
+        self._max_count = None if max_count is None else max(self._min_count, int(max_count))
+        self._max_load_per_cpu = float(max_load_per_cpu)
+        self._min_available_memory = int(min_available_memory)
+        self._proc_root_directory = dlb.fs.Path(proc_root_directory)
+        self._cgroup_root_directory = dlb.fs.Path(cgroup_root_directory)
+        try:
+            self._cpu_count = get_usable_cpu_count(proc_root_directory=self._proc_root_directory,
+                                                   cgroup_root_directory=self._cgroup_root_directory)
+        except (OSError, RuntimeError):
+            self._cpu_count = None
+
+    @property
+    def cpu_count(self) -> Optional[int]:
+        return self._cpu_count
+
+    def get_available_memory(self) -> Optional[int]:
+        # Return the available memory in byte or None if unknown.
+
+        available_memory = None
+        try:
+            _, available_memory = get_memory_info(proc_root_directory=self._proc_root_directory)
+        except (OSError, RuntimeError):
+            pass
+
+        try:
+            memory_info = get_cgroup_memory_info(proc_root_directory=self._proc_root_directory,
+                                                 cgroup_root_directory=self._cgroup_root_directory)
+        except (OSError, RuntimeError):
+            memory_info = None
+        if memory_info is not None:
+            limit, usage = memory_info
+            unused = max(0, limit - usage)
+            available_memory = unused if available_memory is None else min(available_memory, unused)
+
+        return available_memory
+
+    def __call__(self, pending_count: int) -> bool:
+        if pending_count < self._min_count:
+            return True
+        if self._max_count is not None and pending_count >= self._max_count:
+            return False
+
+        if self._cpu_count is not None:
+            try:
+                _, _, _, runnable_count = get_load_info(proc_root_directory=self._proc_root_directory)
+            except (OSError, RuntimeError):
+                runnable_count = None
+            if runnable_count is not None and runnable_count - 1 >= self._max_load_per_cpu * self._cpu_count:
+                return False
+
+        available_memory = self.get_available_memory()
+        return available_memory is None or available_memory >= self._min_available_memory
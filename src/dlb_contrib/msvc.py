@@ -68,7 +68,6 @@ from typing import List, Set, Tuple, Union
 import dlb.fs
 import dlb.ex
 import dlb_contrib.clike
-import dlb_contrib.mscrt
 
 assert f'string' and sys.version_info >= (3, 7)
 
@@ -330,6 +329,7 @@ class LinkerMsvc(dlb.ex.Tool):
             for a in link_arguments:
                 if a[:1] == '@':
                     raise ValueError(f"argument must not start with '@': {a!r}")
+            import dlb_contrib.mscrt  # not needed for the definition of tool classes
             with open(response_file.native, 'w', encoding='utf-16') as f:
                 link_arguments, _ = context.prepare_arguments(link_arguments)
                 f.write(dlb_contrib.mscrt.list2cmdline(link_arguments))
@@ -23,6 +23,7 @@ import sys
 import os.path
 import zipfile
 
+import dlb.fs
 import dlb.ex
 
 assert f'string' and sys.version_info >= (3, 7)
@@ -48,39 +49,46 @@ class ZipDirectory(dlb.ex.Tool):
             if not content_directory.is_absolute():
                 content_directory = context.root_path / content_directory
 
-            with zipfile.ZipFile(archive_file.native, 'w', compression=self.COMPRESSION,
-                                 compresslevel=self.COMPRESS_LEVEL) as z:
-                regular_files = [
-                    p for p in content_directory.list_r(recurse_name_filter='', follow_symlinks=False)
-                    if os.path.isfile(str((content_directory / p).native))
-                ]
-
-                containing_directories = set()
-
-                if self.INCLUDE_PREFIX_DIRECTORIES:
-
-                    for p in regular_files:
-                        while True:
-                            p = p[:-1]
-                            if not p.parts:
-                                break
-                            if p in containing_directories:
-                                break
-                            containing_directories.add(p)
-
-                for p in sorted(containing_directories) + regular_files:
-                    z.write((content_directory / p).native, arcname=p.as_string())
-
-            # For zipimport on MSYS2, adding directories to the archive seems to be necessary
-
-            # https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT:
-            #
-            #     4.4.17.1 The name of the file, with optional relative path.
-            #     The path stored MUST NOT contain a drive or
-            #     device letter, or a leading slash.  All slashes
-            #     MUST be forward slashes '/' as opposed to
-            #     backwards slashes '\' for compatibility with Amiga
-            #     and UNIX file systems etc.  If input came from standard
-            #     input, there is no file name field.
+            # compressors of 'zipfile' release the GIL: other redos can progress meanwhile
+            await context.run_in_thread(_write_archive, archive_file, content_directory,
+                                        compression=self.COMPRESSION, compress_level=self.COMPRESS_LEVEL,
+                                        include_prefix_directories=self.INCLUDE_PREFIX_DIRECTORIES)
 
             context.replace_output(result.archive_file, archive_file)
+
+
+def _write_archive(archive_file: dlb.fs.Path, content_directory: dlb.fs.Path, *,
+                   compression: int, compress_level: int, include_prefix_directories: bool):
+    with zipfile.ZipFile(archive_file.native, 'w', compression=compression, compresslevel=compress_level) as z:
+        regular_files = [
+            p for p in content_directory.list_r(recurse_name_filter='', follow_symlinks=False)
+            if os.path.isfile(str((content_directory / p).native))
+        ]
+
+        containing_directories = set()
+
+        if include_prefix_directories:
+
+            for p in regular_files:
+                while True:
+                    p = p[:-1]
+                    if not p.parts:
+                        break
+                    if p in containing_directories:
+                        break
+                    containing_directories.add(p)
+
+        for p in sorted(containing_directories) + regular_files:
+            z.write((content_directory / p).native, arcname=p.as_string())
+
+    # For zipimport on MSYS2, adding directories to the archive seems to be necessary
+
+    # https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT:
+    #
+    #     4.4.17.1 The name of the file, with optional relative path.
+    #     The path stored MUST NOT contain a drive or
+    #     device letter, or a leading slash.  All slashes
+    #     MUST be forward slashes '/' as opposed to
+    #     backwards slashes '\' for compatibility with Amiga
+    #     and UNIX file systems etc.  If input came from standard
+    #     input, there is no file name field.
@@ -14,6 +14,13 @@ __all__ = ['main']
 import sys
 import os.path
 
+# Unix domain socket of the dlb server of a working tree, relative to its root (the length of a socket path is limited)
+SERVER_SOCKET_PATH = os.path.join('.dlbroot', 'w', 's')
+SERVER_PROTOCOL_LINE = b'dlb server 1\n'
+SERVER_MAX_REQUEST_SIZE = 2**20  # in bytes (command-line arguments and environment variables of the client)
+
+INTERRUPTED_EXIT_STATUS = 130  # 128 + SIGINT, like a shell reports a process terminated by SIGINT
+
 
 def chdir_to_workingtree_root():
     while not os.path.isdir('.dlbroot'):
@@ -23,7 +30,7 @@ def chdir_to_workingtree_root():
             raise Exception("current working directory not in a dlb working tree (no '.dlbroot' found)")
 
 
-def complete_module_search_path(dlbroot_path, script_abs_path):
+def get_zip_files(dlbroot_path):
     ext = '.zip'
     zip_files = []
     try:
@@ -31,9 +38,14 @@ def complete_module_search_path(dlbroot_path, script_abs_path):
             zip_files = [e.path for e in it if e.is_file() and e.name.endswith(ext) and e.name != ext]
     except FileNotFoundError:
         pass
+    zip_files.sort()
+    return zip_files
+
+
+def complete_module_search_path(dlbroot_path, script_abs_path):
+    zip_files = get_zip_files(dlbroot_path)
     sys.path = [os.path.abspath(p) for p in sys.path]
     if zip_files:
-        zip_files.sort()
         print(f'adding {len(zip_files)} zip file(s) to module search path', file=sys.stderr)
         sys.path = zip_files + sys.path
     sys.path.insert(0, os.path.dirname(script_abs_path))
@@ -105,6 +117,378 @@ def find_script(script_name):
     return script_abs_path, spec, module, module_name
 
 
+def exec_script(script_name, script_arguments, history_file_path, script_abs_path, spec, module, module_name):
+    sys.argv = [script_abs_path] + script_arguments
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)  # may change the working directory of the process and sys.argv
+
+    # noinspection PyBroadException
+    try:
+        with open(history_file_path, 'wb') as f:
+            f.write(repr([script_name] + script_arguments).encode())
+    except Exception:
+        pass
+
+
+def run_by_server(arguments):
+    # Run the dlb script with command-line arguments *arguments* by the dlb server of the working tree whose root is
+    # the current working directory.
+    # Returns the exit status of the dlb script or None if no server did accept it.
+
+    import socket
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(socket, 'SCM_RIGHTS'):
+        return None
+
+    import array
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(SERVER_SOCKET_PATH)
+            # the server uses the same standard input, output and error output as this process (and the dlb script)
+            s.sendmsg([SERVER_PROTOCOL_LINE],
+                      [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [0, 1, 2]))])
+            s.sendall(repr((arguments, dict(os.environ))).encode())
+            s.shutdown(socket.SHUT_WR)
+            response = s.makefile('rb')
+            server_pid = int(response.readline())  # ValueError if the server refused
+        except (OSError, ValueError):
+            return None
+
+        while True:
+            try:
+                line = response.readline()
+                break
+            except KeyboardInterrupt:
+                import signal
+                os.kill(server_pid, signal.SIGINT)  # interrupt the dlb script
+
+    try:
+        return int(line)
+    except ValueError:
+        raise Exception('dlb server terminated while running the dlb script') from None
+
+
+def get_zip_files_state(dlbroot_path):
+    state = []
+    for p in get_zip_files(dlbroot_path):
+        try:
+            sr = os.stat(p)
+            state.append((p, sr.st_mtime_ns, sr.st_size))
+        except OSError:
+            pass
+    return state
+
+
+class ScriptRunner:
+    # Runs dlb scripts of the working tree with root *root_path* one after the other in this process, with the modules
+    # imported at construction kept in memory.
+    #
+    # The process state a dlb script is likely to change is restored after each run: the working directory,
+    # environment variables, module search paths, the configuration of dlb, and the modules (and their tool classes)
+    # imported from the working tree.
+
+    def __init__(self, root_path, dlbroot_path):
+        self._root_path = root_path
+        self._dlbroot_path = dlbroot_path
+        self._history_file_path = os.path.join(dlbroot_path, f'last.{os.name}')
+        self._zip_files_state = get_zip_files_state(dlbroot_path)
+
+        sys.path = [os.path.abspath(p) for p in sys.path]
+        self._module_search_paths = sys.path
+        sys.path = [p for p, _, _ in self._zip_files_state] + sys.path  # import dlb as the dlb script would
+
+        import dlb.di
+        import dlb.cf
+        import dlb.ex
+        import dlb.ex._context
+        import dlb.ex._tool
+        dlb.ex._context._retain_root_state = True  # keep run-database and memo caches between runs
+
+        self._module_names = set(sys.modules)
+        self._main_module = sys.modules.get('__main__')
+        self._variables_by_module = {m: dict(vars(m)) for m in (dlb.di, dlb.cf, dlb.cf.level)}
+        self._environment = dict(os.environ)
+        self._standard_files = sys.stdin, sys.stdout, sys.stderr
+
+    def is_up_to_date(self):
+        # Are the modules imported at construction still the ones a dlb script would import?
+        return get_zip_files_state(self._dlbroot_path) == self._zip_files_state
+
+    def _is_in_working_tree(self, path):
+        return os.path.realpath(path).startswith(os.path.join(os.path.realpath(self._root_path), ''))
+
+    def _restore_state(self):
+        for f in (sys.stdout, sys.stderr):
+            try:
+                f.flush()
+            except Exception:
+                pass
+
+        os.chdir(self._root_path)
+        os.environ.clear()
+        os.environ.update(self._environment)
+        sys.path = list(self._module_search_paths)
+        sys.stdin, sys.stdout, sys.stderr = self._standard_files
+
+        for m, variables in self._variables_by_module.items():
+            module_variables = vars(m)
+            for name in set(module_variables) - set(variables):
+                del module_variables[name]
+            module_variables.update(variables)
+
+        # forget modules (and the tool classes defined in them) that may change before the next run
+        for name in set(sys.modules) - self._module_names:
+            path = getattr(sys.modules[name], '__file__', None)
+            if path is None or self._is_in_working_tree(path):
+                del sys.modules[name]
+        if self._main_module is not None:
+            sys.modules['__main__'] = self._main_module
+
+        import dlb.ex._tool
+        # noinspection PyProtectedMember
+        tool_class_by_definition_location = dlb.ex._tool._tool_class_by_definition_location
+        for location in list(tool_class_by_definition_location):
+            if self._is_in_working_tree(location[0]):
+                del tool_class_by_definition_location[location]
+        # noinspection PyProtectedMember
+        registered_info_by_tool = dlb.ex._tool._registered_info_by_tool
+        for tool in list(registered_info_by_tool):
+            if self._is_in_working_tree(tool.definition_location[0]):
+                del registered_info_by_tool[tool]
+
+    def run(self, arguments):
+        # Run the dlb script with command-line arguments *arguments* and return its exit status.
+        try:
+            return self._run_script(arguments)
+        finally:
+            self._restore_state()
+
+    def _run_script(self, arguments):
+        try:
+            script_name, script_arguments = complete_command_line(self._history_file_path, arguments)
+            if script_name is None:
+                raise ValueError('missing script name')
+            script_abs_path, spec, module, module_name = find_script(script_name)
+            complete_module_search_path(self._dlbroot_path, script_abs_path)
+        except Exception as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+
+        try:
+            exec_script(script_name, script_arguments, self._history_file_path, script_abs_path, spec, module,
+                        module_name)
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            sys.excepthook(*sys.exc_info())
+            return INTERRUPTED_EXIT_STATUS
+        except BaseException:
+            sys.excepthook(*sys.exc_info())
+            return 1
+        return 0
+
+
+def get_peer_uid(connection):
+    # Return the user ID of the process connected by the Unix domain socket *connection* or None if the platform
+    # does not tell.
+
+    import socket
+    if not hasattr(socket, 'SO_PEERCRED'):  # GNU/Linux only
+        return None
+
+    import struct
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)  # struct ucred
+    return uid
+
+
+def parse_server_request(request):
+    # Return the command-line arguments and the environment variables of a request (without the protocol line)
+    # to the dlb server.
+    # Raises ValueError or SyntaxError if *request* is invalid.
+
+    import ast
+    if len(request) > SERVER_MAX_REQUEST_SIZE:
+        raise ValueError('request too large')
+
+    try:
+        # ast.literal_eval() can exhaust the stack for a deeply nested expression (see complete_command_line())
+        arguments, environment = ast.literal_eval(request.decode())
+    except (TypeError, MemoryError, RecursionError):
+        raise ValueError('invalid request') from None
+    if not (isinstance(arguments, list) and all(isinstance(a, str) for a in arguments)):
+        raise ValueError('invalid command-line arguments')
+    if not (isinstance(environment, dict) and
+            all(isinstance(n, str) and isinstance(v, str) for n, v in environment.items())):
+        raise ValueError('invalid environment variables')
+
+    return arguments, environment
+
+
+class ScriptServer(ScriptRunner):
+    # Runs dlb scripts for clients connected to a Unix domain socket, one at a time.
+    #
+    # Only clients of the same user as this process are served: a client determines the environment variables and
+    # the open files of the dlb script.
+
+    def handle(self, connection):
+        # Run the dlb script requested by the client connected by *connection*.
+        # Returns False if the server must be restarted to run dlb scripts like the client would.
+
+        import socket
+        import array
+
+        peer_uid = get_peer_uid(connection)
+        if peer_uid is not None and peer_uid != os.getuid():
+            print(f'refused client of other user: {peer_uid}', file=sys.stderr)
+            return True
+
+        fds = array.array('i')
+        data, ancillary_data, _, _ = connection.recvmsg(
+            len(SERVER_PROTOCOL_LINE), socket.CMSG_SPACE(3 * fds.itemsize))
+        for level, kind, cmsg_data in ancillary_data:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+
+        try:
+            chunks = [data]
+            size = len(data)
+            while size <= len(SERVER_PROTOCOL_LINE) + SERVER_MAX_REQUEST_SIZE:  # stop reading if too large
+                chunk = connection.recv(2**16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            request = b''.join(chunks)
+            if len(fds) != 3 or not request.startswith(SERVER_PROTOCOL_LINE):
+                return True
+            arguments, environment = parse_server_request(request[len(SERVER_PROTOCOL_LINE):])
+
+            if not self.is_up_to_date():
+                print(f"zip files in '.dlbroot/u/' have changed: server must be restarted", file=sys.stderr)
+                return False
+
+            for f in self._standard_files:
+                f.flush()
+            standard_fds = [os.dup(fd) for fd in (0, 1, 2)]
+            try:
+                for fd, client_fd in zip((0, 1, 2), fds):
+                    os.dup2(client_fd, fd)
+                os.environ.clear()
+                os.environ.update(environment)
+                connection.sendall(f'{os.getpid()}\n'.encode())
+                exit_status = self.run(arguments)
+            finally:
+                for fd, standard_fd in zip((0, 1, 2), standard_fds):
+                    os.dup2(standard_fd, fd)
+                    os.close(standard_fd)
+            connection.sendall(f'{exit_status}\n'.encode())
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+        return True
+
+
+def serve():
+    chdir_to_workingtree_root()
+    root_path = os.getcwd()
+
+    import socket
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(socket, 'SCM_RIGHTS'):
+        raise Exception('dlb server not supported on this platform')
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(SERVER_SOCKET_PATH)
+            raise Exception(f'another dlb server is running for working tree: {root_path!r}')
+        except OSError:
+            pass
+
+    os.makedirs(os.path.dirname(SERVER_SOCKET_PATH), exist_ok=True)
+    try:
+        os.remove(SERVER_SOCKET_PATH)  # stale
+    except FileNotFoundError:
+        pass
+
+    server = ScriptServer(root_path, os.path.abspath('.dlbroot'))
+    import dlb.ex._context
+
+    import signal
+    signal.signal(signal.SIGINT, signal.default_int_handler)  # even if ignored: clients forward their SIGINT
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        umask = os.umask(0o077)  # only the user of this process may connect
+        try:
+            s.bind(SERVER_SOCKET_PATH)
+        finally:
+            os.umask(umask)
+        try:
+            s.listen()
+            print(f'running dlb scripts of working tree {root_path!r} until interrupted', file=sys.stderr)
+            is_up_to_date = True
+            while is_up_to_date:
+                connection, _ = s.accept()
+                with connection:
+                    try:
+                        is_up_to_date = server.handle(connection)
+                    except (OSError, ValueError, SyntaxError):
+                        pass  # client disappeared or sent invalid request
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.chdir(root_path)
+            try:
+                os.remove(SERVER_SOCKET_PATH)
+            except OSError:
+                pass
+            # noinspection PyProtectedMember
+            dlb.ex._context._close_retained_root_state()
+
+
+def run_on_changes(arguments):
+    # Run the dlb script with command-line arguments *arguments* whenever a filesystem object in the managed tree
+    # was changed by something else than a redo, until interrupted.
+
+    chdir_to_workingtree_root()
+    root_path = os.getcwd()
+    dlbroot_path = os.path.abspath('.dlbroot')
+    history_file_path = os.path.join(dlbroot_path, f'last.{os.name}')
+    script_name, script_arguments = complete_command_line(history_file_path, arguments)
+    if script_name is None:
+        raise Exception('no script name given and no arguments of last successful run available')
+    find_script(script_name)  # fail early
+
+    runner = ScriptRunner(root_path, dlbroot_path)
+    sys.dont_write_bytecode = True  # modules imported from the managed tree are imported anew for each run
+
+    import dlb.fs
+    import dlb.ex._context
+    import dlb.ex._fsjournal
+    waiter = dlb.ex._fsjournal.ChangeWaiter(dlb.fs.Path(dlb.fs.Path.Native(root_path), is_dir=True))
+    try:
+        while True:
+            exit_status = runner.run([script_name] + script_arguments)
+            if exit_status == INTERRUPTED_EXIT_STATUS:
+                return
+            if not runner.is_up_to_date():
+                raise Exception("zip files in '.dlbroot/u/' have changed: restart")
+            print(f'dlb script exited with status {exit_status}: waiting for changes until interrupted',
+                  file=sys.stderr)
+            # noinspection PyProtectedMember
+            changed_encoded_paths = waiter.wait(dlb.ex._context._encoded_paths_modified_by_last_run)
+            print(f'running dlb script again after change of {len(changed_encoded_paths)} filesystem object(s)',
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        waiter.close()
+        # noinspection PyProtectedMember
+        dlb.ex._context._close_retained_root_state()
+
+
 def get_help():
     # 80 characters xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
     help_msg = \
@@ -114,6 +498,27 @@ def get_help():
     
         When called with '--help' as the first parameter, displays this help and exits.
     
+        When called with '--watch-changes' as the only parameter, records the paths of
+        all modified filesystem objects in the managed tree in the change journal
+        '.dlbroot/w/j' until interrupted (GNU/Linux only). A dlb script with
+        'dlb.cf.use_change_journal = True' then does not need to read the status of
+        unmodified input dependencies.
+    
+        When called with '--serve' as the only parameter, runs dlb scripts for later
+        calls of this script in the same working tree until interrupted (POSIX only).
+        Such a call then does not have to start a Python interpreter, import dlb or
+        open the run-database; it falls back to running the dlb script itself when no
+        such server is running. The server must be restarted after modules outside
+        the working tree were changed. While it is running, do not run dlb scripts
+        of the working tree other than by this script. Only calls of this script by
+        the same user are served.
+    
+        When called with '--watch' as the first parameter, runs the dlb script given by
+        the other parameters (as described below) in this process, and runs it again
+        after each change in the working tree until interrupted (GNU/Linux only).
+        Changes in '.dlbroot/' and changes of output dependencies by redos are ignored.
+        The run-database stays open between runs.
+    
         When called with a least one parameter and the first parameter is not '--help',
         the first parameter must be a dlb script path relative to the root of the
         working tree. This path must not start with '-' and must - after normalization -
@@ -129,7 +534,8 @@ def get_help():
     
         Exit status:
     
-           0  if called with '--help'
+           0  if called with '--help' or if called with '--watch-changes',
+              '--serve' or '--watch' and interrupted
            1  if the specified dlb script could not be executed
            2  if no command-line arguments were given and the command-line arguments
               of the last successful call are not available
@@ -144,6 +550,9 @@ def get_help():
                                  # was successful
            PYTHONVERBOSE=1 dlb   # when called from a POSIX-compliant shell
            dlb --help
+           dlb --watch-changes &
+           dlb --serve &
+           dlb --watch build/all # executes 'build/all.py' after each change
         """
     import textwrap
     help_msg = textwrap.dedent(help_msg).strip()
@@ -161,11 +570,47 @@ def get_help():
     return help_msg
 
 
+def watch_changes():
+    chdir_to_workingtree_root()
+    import dlb.fs
+    import dlb.ex._fsjournal
+    root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+    print(f'recording changes in working tree {root_path.as_string()!r} until interrupted', file=sys.stderr)
+    try:
+        dlb.ex._fsjournal.watch(root_path)
+    except KeyboardInterrupt:
+        pass
+
+
 def main():
     if sys.argv[1:2] == ['--help']:
         print(get_help())
         return 0
 
+    if sys.argv[1:] == ['--watch-changes']:
+        try:
+            watch_changes()
+        except Exception as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+        return 0
+
+    if sys.argv[1:2] == ['--watch']:
+        try:
+            run_on_changes(sys.argv[2:])
+        except Exception as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+        return 0
+
+    if sys.argv[1:] == ['--serve']:
+        try:
+            serve()
+        except Exception as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+        return 0
+
     try:
         chdir_to_workingtree_root()
         dlbroot_path = os.path.abspath('.dlbroot')
@@ -178,25 +623,19 @@ def main():
             executable_name = os.path.basename(sys.argv[0])
             if not all(' ' < c < chr(0x7F) for c in executable_name):
                 executable_name = repr(executable_name)
-            print(f'usage: {executable_name} [ --help ] [ <script-name> [ <script-parameter> ... ] ]', file=sys.stderr)
+            print(f'usage: {executable_name} [ --help | --watch-changes | --serve | --watch ] '
+                  f'[ <script-name> [ <script-parameter> ... ] ]', file=sys.stderr)
             return 2
+        exit_status = run_by_server([script_name] + script_arguments)
+        if exit_status is not None:
+            return exit_status
         script_abs_path, spec, module, module_name = find_script(script_name)
         complete_module_search_path(dlbroot_path, script_abs_path)
     except Exception as e:
         print(f'error: {e}', file=sys.stderr)
         return 1
 
-    sys.argv = [script_abs_path] + script_arguments
-    sys.modules[module_name] = module
-    spec.loader.exec_module(module)  # may change the working directory of the process and sys.argv
-
-    # noinspection PyBroadException
-    try:
-        with open(history_file_path, 'wb') as f:
-            f.write(repr([script_name] + script_arguments).encode())
-    except Exception:
-        pass
-
+    exec_script(script_name, script_arguments, history_file_path, script_abs_path, spec, module, module_name)
     return 0
 
 
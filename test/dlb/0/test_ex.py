@@ -40,6 +40,7 @@ class ImportTest(unittest.TestCase):
             'RedoContext',
             'RunResult',
             'Tool',
+            'start_all',
 
             'input',
             'output'
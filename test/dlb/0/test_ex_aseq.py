@@ -71,6 +71,342 @@ class LimitingCoroutineSequencerTest(unittest.TestCase):
         self.assertEqual({}, results)
         self.assertEqual({}, exceptions)
 
+    def test_enqueued_are_started_by_priority_when_waiting(self):
+        started = []
+
+        async def record_start(i):
+            started.append(i)
+            await asyncio.sleep(0.01)
+            return i
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        tids = [sequencer.enqueue(1, priority, record_start, i) for i, priority in enumerate([1, 3, 2, 3])]
+        self.assertEqual([0, 1, 2, 3], tids)
+        self.assertEqual([], started)
+
+        sequencer.complete(tids[2], timeout=None)
+        self.assertEqual([1, 3, 2], started)
+
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([1, 3, 2, 0], started)
+
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual({0: 0, 1: 1, 2: 2, 3: 3}, results)
+        self.assertEqual({}, exceptions)
+
+    def test_enqueued_are_started_within_limit(self):
+        pending_count = 0
+        max_pending_count = 0
+
+        async def count_pending():
+            nonlocal pending_count, max_pending_count
+            pending_count += 1
+            max_pending_count = max(max_pending_count, pending_count)
+            await asyncio.sleep(0.01)
+            pending_count -= 1
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        for i in range(10):
+            sequencer.enqueue(3, i % 4, count_pending)
+        sequencer.wait_then_start(3, None, count_pending)
+        sequencer.complete_all(timeout=None)
+
+        self.assertEqual(3, max_pending_count)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(11, len(results))
+
+    def test_admission_limits_started(self):
+        pending_count = 0
+        max_pending_count = 0
+        admission_requests = []
+
+        async def count_pending():
+            nonlocal pending_count, max_pending_count
+            pending_count += 1
+            max_pending_count = max(max_pending_count, pending_count)
+            await asyncio.sleep(0.01)
+            pending_count -= 1
+
+        def admit(n):
+            admission_requests.append(n)
+            return n < 2
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        for i in range(5):
+            sequencer.wait_then_start(4, None, count_pending, _admit=admit)
+        for i in range(5):
+            sequencer.enqueue(4, 0, count_pending, _admit=admit)
+        sequencer.complete_all(timeout=None)
+
+        self.assertEqual(2, max_pending_count)
+        self.assertNotIn(0, admission_requests)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(10, len(results))
+
+    def test_refused_admission_is_requested_again_without_done_task(self):
+        admission_requests = []
+
+        async def sleep_long():
+            await asyncio.sleep(10.0)
+
+        async def sleep_short():
+            await asyncio.sleep(0.01)
+
+        def admit(n):
+            admission_requests.append(n)
+            return len(admission_requests) > 2
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+        sequencer.wait_then_start(2, None, sleep_long)
+        tid = sequencer.wait_then_start(2, 5.0, sleep_short, _admit=admit)  # must not wait for 'sleep_long()'
+
+        self.assertEqual([1, 1, 1], admission_requests)
+        sequencer.complete(tid, timeout=None)
+        sequencer.cancel_all(timeout=None)
+
+    def test_cancel_all_cancels_enqueued(self):
+
+        async def sleep_long():
+            await asyncio.sleep(10.0)
+            return 42
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        sequencer.wait_then_start(1, None, sleep_long)
+        sequencer.enqueue(1, 0, sleep_long)
+
+        sequencer.cancel_all(timeout=None)
+        results, exceptions = sequencer.consume_all()
+
+        self.assertEqual({}, results)
+        self.assertEqual([0, 1], sorted(exceptions))
+        self.assertTrue(all(isinstance(e, asyncio.CancelledError) for e in exceptions.values()))
+
+    def test_wait_in_coroutine_fails_without_affecting_outer_wait(self):
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        async def complete_all():
+            await asyncio.sleep(0.01)
+            sequencer.complete_all(timeout=None)
+
+        tid = sequencer.wait_then_start(2, None, complete_all)
+        sequencer.complete_all(timeout=5.0)
+
+        with self.assertRaises(RuntimeError):
+            sequencer.consume(tid)
+
+    def test_resources_limit_started(self):
+        pending_by_resource = {'a': 0, 'b': 0}
+        max_pending_by_resource = {'a': 0, 'b': 0}
+        pending_count = 0
+        max_pending_count = 0
+
+        async def count_pending(resource):
+            nonlocal pending_count, max_pending_count
+            pending_count += 1
+            max_pending_count = max(max_pending_count, pending_count)
+            pending_by_resource[resource] += 1
+            max_pending_by_resource[resource] = max(max_pending_by_resource[resource], pending_by_resource[resource])
+            await asyncio.sleep(0.01)
+            pending_by_resource[resource] -= 1
+            pending_count -= 1
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop(), resource_limits={'a': 1})
+
+        for i in range(4):
+            sequencer.enqueue(3, 0, count_pending, 'a', _resources={'a': 5})  # at most limit
+        for i in range(4):
+            sequencer.enqueue(3, 0, count_pending, 'b', _resources={'b': 5})  # without limit
+        sequencer.complete_all(timeout=None)
+
+        self.assertEqual(1, max_pending_by_resource['a'])
+        self.assertEqual(2, max_pending_by_resource['b'])
+        self.assertEqual(3, max_pending_count)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(8, len(results))
+
+    def test_eager_is_started_immediately_if_resources_available(self):
+        started = []
+
+        async def sleep_short(i):
+            started.append(i)
+            await asyncio.sleep(0.01)
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop(), resource_limits={'a': 1})
+
+        sequencer.enqueue(3, 0, sleep_short, 0, _resources={'a': 1}, _eager=True)
+        sequencer.enqueue(3, 0, sleep_short, 1, _resources={'a': 1}, _eager=True)
+
+        # not blocked by the queued coroutine
+        sequencer.wait_then_start(3, None, sleep_short, 2)
+        sequencer.wait_then_start(3, None, sleep_short, 3)
+
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([0, 2, 3, 1], started)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(4, len(results))
+
+    def test_eager_are_started_in_order_of_enqueue(self):
+        started = []
+
+        async def sleep_short(i):
+            started.append(i)
+            await asyncio.sleep(0.01)
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop(),
+                                                            resource_limits={'a': 1, 'b': 1})
+
+        for i in range(6):
+            sequencer.enqueue(3, 0, sleep_short, i, _resources={'ab'[i % 2]: 1}, _eager=True)
+        sequencer.enqueue(3, 0, sleep_short, 6, _resources={'a': 1}, _resource_limits={'a': 2}, _eager=True)
+
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([0, 1, 6, 2, 3, 4, 5], started)
+
+    def test_effort_for_eager_does_not_depend_on_blocked(self):
+        check_count = 0
+
+        class Sequencer(dlb.ex._aseq.LimitingCoroutineSequencer):
+            def _are_resources_available(self, resources, resource_limits):
+                nonlocal check_count
+                check_count += 1
+                return super()._are_resources_available(resources, resource_limits)
+
+        async def nop():
+            pass
+
+        sequencer = Sequencer(asyncio.get_event_loop(), resource_limits={'a': 1})
+
+        n = 1000
+        for _ in range(n):
+            sequencer.enqueue(64, 0, nop, _resources={'a': 1}, _eager=True)
+        self.assertEqual(n, check_count)
+
+        sequencer.complete_all(timeout=None)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(n, len(results))
+        self.assertLess(check_count, 3 * n)
+
+    def test_after_is_started_when_all_done(self):
+        started = []
+
+        async def sleep_short(i, t=0.01):
+            started.append(i)
+            await asyncio.sleep(t)
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        tid0 = sequencer.wait_then_start(3, None, sleep_short, 0, t=0.2)
+        tid1 = sequencer.wait_then_start(3, None, sleep_short, 1)
+        sequencer.enqueue(3, 0, sleep_short, 2, _after=[tid0, tid1], _eager=True)
+        sequencer.enqueue(3, 0, sleep_short, 3, _after=[], _eager=True)  # not held
+
+        # not blocked by the held coroutine
+        sequencer.wait_then_start(3, None, sleep_short, 4)
+
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([0, 1, 3, 4, 2], started)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(5, len(results))
+
+    def test_after_failed_is_not_started(self):
+        started = []
+
+        async def sleep_short(i, t=0.01):
+            started.append(i)
+            await asyncio.sleep(t)
+
+        async def fail(t):
+            await asyncio.sleep(t)
+            raise ValueError('failed')
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        tid0 = sequencer.wait_then_start(3, None, fail, 0.1)
+        tid1 = sequencer.wait_then_start(3, None, sleep_short, 1)
+        tid2 = sequencer.enqueue(3, 0, sleep_short, 2, _after=[tid0, tid1], _eager=True)
+        tid3 = sequencer.enqueue(3, 0, sleep_short, 3, _after=[tid2])
+        tid4 = sequencer.enqueue(3, 0, sleep_short, 4, _after=[tid1], _eager=True)
+
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([1, 4], started)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual({tid1, tid4}, set(results))
+        self.assertEqual({tid0, tid2, tid3}, set(exceptions))
+        self.assertIs(exceptions[tid0], exceptions[tid2])
+        self.assertIs(exceptions[tid0], exceptions[tid3])
+
+    def test_after_done_is_ignored(self):
+        started = []
+
+        async def sleep_short(i):
+            started.append(i)
+            await asyncio.sleep(0.01)
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        tid0 = sequencer.wait_then_start(3, None, sleep_short, 0)
+        sequencer.complete_all(timeout=None)
+        sequencer.enqueue(3, 0, sleep_short, 1, _after=[tid0])
+        sequencer.complete_all(timeout=None)
+        self.assertEqual([0, 1], started)
+
+    def test_group_is_completed_and_consumed_on_its_own(self):
+        async def sleep(t):
+            await asyncio.sleep(t)
+            return t
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        tid0 = sequencer.wait_then_start(3, None, sleep, 0.5, _group='a')
+        tid1 = sequencer.wait_then_start(3, None, sleep, 0.01, _group='b')
+        tid2 = sequencer.enqueue(3, 0, sleep, 0.02, _group='b')
+        tid3 = sequencer.wait_then_start(3, None, sleep, 0.03)
+
+        sequencer.complete_all(timeout=None, group='b')
+        results, exceptions = sequencer.consume_all(group='b')
+        self.assertEqual({tid1: 0.01, tid2: 0.02}, results)
+        self.assertEqual({}, exceptions)
+
+        sequencer.cancel_all(timeout=None, group='a')
+        results, exceptions = sequencer.consume_all(group='a')
+        self.assertEqual({}, results)
+        self.assertEqual([tid0], list(exceptions))
+
+        sequencer.complete_all(timeout=None)
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual({tid3: 0.03}, results)
+        self.assertEqual({}, exceptions)
+
+    def test_limits_hold_for_all_groups(self):
+        pending_count = 0
+        max_pending_count = 0
+
+        async def count_pending():
+            nonlocal pending_count, max_pending_count
+            pending_count += 1
+            max_pending_count = max(max_pending_count, pending_count)
+            await asyncio.sleep(0.01)
+            pending_count -= 1
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        sequencer.enqueue(2, 0, count_pending, _resources={'a': 1}, _resource_limits={'a': 2}, _group=1)
+        sequencer.enqueue(2, 0, count_pending, _resources={'a': 1}, _resource_limits={'a': 1}, _group=2)
+        sequencer.enqueue(2, 0, count_pending, _resources={'a': 1}, _resource_limits={'a': 2}, _group=2)
+        sequencer.complete_all(timeout=None, group=2)
+        self.assertEqual(2, max_pending_count)  # second one only after first one is done
+
+        for i in range(3):
+            sequencer.wait_then_start(3, None, count_pending, _group=1)
+        sequencer.wait_then_start(2, None, count_pending, _group=2)
+        self.assertLessEqual(pending_count, 2)
+        sequencer.complete_all(timeout=None)
+        self.assertEqual(3, max_pending_count)
+
     def test_timeout(self):
 
         do_print = False
@@ -227,6 +563,34 @@ class LimitingResultSequencerTest(unittest.TestCase):
 
         self.assertIsNone(sequencer.get_result_proxy(uid))
 
+    def test_attribute_access_starts_and_completes_enqueued(self):
+
+        sequencer = dlb.ex._aseq.LimitingResultSequencer(asyncio.get_event_loop())
+        tid = sequencer.enqueue(3, 0, LimitingResultSequencerTest.sleep_or_raise, 0.1)
+
+        proxy = sequencer.create_result_proxy(tid, 1)
+        self.assertFalse(proxy.iscomplete)
+        self.assertEqual(0.1, proxy.value)  # starts and waits for completion
+        self.assertTrue(proxy.iscomplete)
+
+    def test_bool_waits_if_requested(self):
+
+        class Result:
+            def __bool__(self):
+                return False
+
+        async def return_result():
+            await asyncio.sleep(0.1)
+            return Result()
+
+        sequencer = dlb.ex._aseq.LimitingResultSequencer(asyncio.get_event_loop())
+        tid = sequencer.wait_then_start(3, None, return_result)
+
+        proxy = sequencer.create_result_proxy(tid, 1, waits_for_bool=True)
+        self.assertFalse(proxy.iscomplete)
+        self.assertFalse(proxy)
+        self.assertTrue(proxy.iscomplete)
+
     def test_consume_all_completes(self):
 
         sequencer = dlb.ex._aseq.LimitingResultSequencer(asyncio.get_event_loop())
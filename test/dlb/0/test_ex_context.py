@@ -4,7 +4,9 @@
 
 import testenv  # also sets up module search paths
 import dlb.fs
+import dlb.cf
 import dlb.ex
+import dlb.ex._context
 import dlb.ex._worktree
 import dlb.ex._rundb
 import os.path
@@ -13,6 +15,7 @@ import time
 import datetime
 import testtool
 import unittest
+import unittest.mock
 
 
 RUNDB_FILENAME = dlb.ex._worktree.rundb_filename_for_schema_version(dlb.ex._rundb.SCHEMA_VERSION)
@@ -296,6 +299,83 @@ class ManagementTreeCleanupTest(testenv.TemporaryWorkingDirectoryTestCase):
                 c._root_specifics._rundb = '2'
 
 
+class RetainedRootStateTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def tearDown(self):
+        dlb.ex._context._retain_root_state = False
+        dlb.ex._context._close_retained_root_state()
+        super().tearDown()
+
+    def test_rundb_is_retained_only_if_successful_and_requested(self):
+        with dlb.ex.Context() as c:
+            rundb = c._root_specifics._rundb
+        with dlb.ex.Context() as c:
+            self.assertIsNot(rundb, c._root_specifics._rundb)
+
+        dlb.ex._context._retain_root_state = True
+        with dlb.ex.Context() as c:
+            rundb = c._root_specifics._rundb
+            run_dbid = rundb.run_dbid
+        self.assertIsNotNone(dlb.ex._context._retained_root_state)
+        with dlb.ex.Context() as c:
+            self.assertIs(rundb, c._root_specifics._rundb)
+            self.assertGreater(rundb.run_dbid, run_dbid)
+
+        with self.assertRaises(ValueError):
+            with dlb.ex.Context():
+                raise ValueError
+        self.assertIsNone(dlb.ex._context._retained_root_state)
+
+    def test_helper_lookup_is_retained_if_requested(self):
+        os.mkdir('bin')
+        open(os.path.join('bin', 'h'), 'xb').close()
+        path = os.pathsep.join([os.path.abspath('bin')] + os.get_exec_path())
+
+        dlb.ex._context._retain_root_state = True
+        with unittest.mock.patch.dict(os.environ, {'PATH': path}):
+            with dlb.ex.Context() as c:
+                executable_search_paths = c.executable_search_paths
+                self.assertIsNotNone(c.helper.get('h'))
+            with dlb.ex.Context() as c:
+                self.assertIs(executable_search_paths, c.executable_search_paths)
+                self.assertIn(dlb.fs.Path('h'), c.helper)
+
+        with dlb.ex.Context() as c:
+            self.assertIsNot(executable_search_paths, c.executable_search_paths)
+            self.assertNotIn(dlb.fs.Path('h'), c.helper)
+
+    def test_encoded_paths_modified_by_last_run_are_available(self):
+        with self.assertRaises(ValueError):
+            with dlb.ex.Context() as c:
+                c._root_specifics._fsobject_memo_cache.invalidate('a/')
+                raise ValueError
+        self.assertEqual(frozenset(['a/']), dlb.ex._context._encoded_paths_modified_by_last_run)
+
+        with dlb.ex.Context():
+            pass
+        self.assertEqual(frozenset(), dlb.ex._context._encoded_paths_modified_by_last_run)
+
+    def test_rundb_is_not_reused_if_replaced(self):
+        dlb.ex._context._retain_root_state = True
+        with dlb.ex.Context() as c:
+            rundb = c._root_specifics._rundb
+        os.remove(os.path.join('.dlbroot', RUNDB_FILENAME))
+        with dlb.ex.Context() as c:
+            self.assertIsNot(rundb, c._root_specifics._rundb)
+        self.assertIsNone(rundb._connection)  # closed
+
+    def test_rundb_is_not_reused_with_other_profile(self):
+        dlb.ex._context._retain_root_state = True
+        with dlb.ex.Context() as c:
+            rundb = c._root_specifics._rundb
+        try:
+            dlb.cf.rundb_profile = 'fast'
+            with dlb.ex.Context() as c:
+                self.assertIsNot(rundb, c._root_specifics._rundb)
+        finally:
+            dlb.cf.rundb_profile = 'safe'
+
+
 class RootContextPathTest(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_root_is_correct(self):
@@ -315,6 +395,50 @@ class RootContextPathTest(testenv.TemporaryWorkingDirectoryTestCase):
                 self.assertEqual(dlb.ex.Context.active.root_path.__class__, dlb.fs.NoSpacePath)
 
 
+class ResourceLimitsTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_is_empty_by_default(self):
+        with dlb.ex.Context():
+            self.assertEqual({}, dlb.ex.Context.active.resource_limits)
+
+    def test_inner_without_limits_inherits_from_outer(self):
+        with dlb.ex.Context(resource_limits={'link': 2}):
+            with dlb.ex.Context() as c:
+                self.assertEqual({'link': 2}, c.resource_limits)
+                with dlb.ex.Context(resource_limits={}) as c2:
+                    self.assertEqual({}, c2.resource_limits)
+        self.assertEqual({}, c.resource_limits)
+
+    def test_fails_for_invalid(self):
+        with self.assertRaises(TypeError) as cm:
+            dlb.ex.Context(resource_limits=[('link', 1)])
+        self.assertEqual("'resource_limits' must be None or a mapping", str(cm.exception))
+
+        with self.assertRaises(TypeError) as cm:
+            dlb.ex.Context(resource_limits={1: 1})
+        self.assertEqual("each key of 'resource_limits' must be a str", str(cm.exception))
+
+        with self.assertRaises(ValueError) as cm:
+            dlb.ex.Context(resource_limits={'link': 0})
+        self.assertEqual("limit of resource 'link' must be a positive integer", str(cm.exception))
+
+
+class OutputsOfPendingRedosTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_output_in_or_containing_path_is_found(self):
+        with dlb.ex.Context() as c:
+            c._register_outputs_of_pending_redo(1, ['gen/a.h/', 'gen/b/'])
+            c._register_outputs_of_pending_redo(2, ['gen/c/d/'])
+            c._register_outputs_of_pending_redo(3, ['gen_/'])
+
+            self.assertEqual({1}, c._get_uids_of_redos_with_outputs_for(['gen/a.h/']))
+            self.assertEqual({1, 2}, c._get_uids_of_redos_with_outputs_for(['gen/']))
+            self.assertEqual({1}, c._get_uids_of_redos_with_outputs_for(['gen/b/e/f/']))
+            self.assertEqual({2}, c._get_uids_of_redos_with_outputs_for(['gen/c/']))
+            self.assertEqual({1, 2, 3}, c._get_uids_of_redos_with_outputs_for(['']))
+            self.assertEqual(set(), c._get_uids_of_redos_with_outputs_for(['gen/a/', 'gen/c/e/', 'ge/']))
+
+
 class RootContextInvalidPathTest(testenv.TemporaryDirectoryTestCase):
 
     def test_fails_for_invalid_path_class(self):
@@ -725,6 +849,26 @@ class ReadOnlyAccessTest(testenv.TemporaryWorkingDirectoryTestCase):
             self.assertEqual(dlb.fs.Path('/a'), rc1.helper['a'])
             self.assertEqual(dlb.fs.Path('/b'), rc2.helper['b'])
 
+    def test_read_access_is_to_state_at_construction(self):
+        with dlb.ex.Context() as c:
+            c.env.import_from_outer('A_B_C', pattern=r'.*', example='')
+            c.env['A_B_C'] = '1'
+            c.helper['a'] = '/a'
+            rc = dlb.ex.ReadOnlyContext(c)
+            self.assertIs(rc.env, dlb.ex.ReadOnlyContext(c).env)  # not modified since
+
+            c.env['A_B_C'] = '2'
+            c.helper['a'] = '/b'
+            c.helper['b'] = '/b'
+            self.assertEqual('1', rc.env['A_B_C'])
+            self.assertEqual(dlb.fs.Path('/a'), rc.helper['a'])
+            self.assertNotIn('b', rc.helper)
+
+            with dlb.ex.Context() as c2:
+                rc2 = dlb.ex.ReadOnlyContext(c2)
+            self.assertTrue(rc2.env.is_imported('A_B_C'))
+            self.assertEqual('2', rc2.env['A_B_C'])
+
     def test_write_access_to_inactive_context_fails(self):
         with dlb.ex.Context() as c:
             c.helper['a'] = '/a'
@@ -803,3 +947,79 @@ class ForgetOldInformationTest(testenv.TemporaryWorkingDirectoryTestCase):
                 self.assertEqual(0, len(dlb.ex.Context.active.summary_of_latest_runs(max_count=3)))
         finally:
             dlb.cf.max_dependency_age = orig
+
+
+class MaxParallelMemoReadCountTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_fails_for_nonpositive(self):
+        orig = dlb.cf.max_parallel_memo_read_count
+        try:
+            dlb.cf.max_parallel_memo_read_count = 0
+            with self.assertRaises(ValueError) as cm:
+                with dlb.ex.Context():
+                    pass
+            self.assertEqual("'dlb.cf.max_parallel_memo_read_count' must be positive", str(cm.exception))
+        finally:
+            dlb.cf.max_parallel_memo_read_count = orig
+
+    def test_fails_for_noninteger(self):
+        orig = dlb.cf.max_parallel_memo_read_count
+        try:
+            for value in [2.0, '2', True]:
+                dlb.cf.max_parallel_memo_read_count = value
+                with self.assertRaises(TypeError) as cm:
+                    with dlb.ex.Context():
+                        pass
+                self.assertEqual("'dlb.cf.max_parallel_memo_read_count' must be an int", str(cm.exception))
+        finally:
+            dlb.cf.max_parallel_memo_read_count = orig
+
+        with dlb.ex.Context():  # working tree is not locked
+            pass
+
+
+class PreloadRunDatabaseTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_fails_for_nonbool(self):
+        orig = dlb.cf.preload_run_database
+        try:
+            dlb.cf.preload_run_database = 1
+            with self.assertRaises(TypeError) as cm:
+                with dlb.ex.Context():
+                    pass
+            self.assertEqual("'dlb.cf.preload_run_database' must be a bool", str(cm.exception))
+        finally:
+            dlb.cf.preload_run_database = orig
+
+
+class RundbProfileTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_fails_for_unknown(self):
+        orig = dlb.cf.rundb_profile
+        try:
+            dlb.cf.rundb_profile = 'unsafe'
+            with self.assertRaises(ValueError) as cm:
+                with dlb.ex.Context():
+                    pass
+            msg = "'dlb.cf.rundb_profile' must be one of 'safe', 'fast', 'ci-ephemeral'"
+            self.assertEqual(msg, str(cm.exception))
+
+            dlb.cf.rundb_profile = None
+            with self.assertRaises(TypeError) as cm:
+                with dlb.ex.Context():
+                    pass
+            self.assertEqual("'dlb.cf.rundb_profile' must be a str", str(cm.exception))
+        finally:
+            dlb.cf.rundb_profile = orig
+
+    def test_all_profiles_keep_information(self):
+        orig = dlb.cf.rundb_profile
+        try:
+            for profile in ['fast', 'ci-ephemeral', 'safe']:
+                dlb.cf.rundb_profile = profile
+                with dlb.ex.Context():
+                    pass
+                with dlb.ex.Context():
+                    self.assertEqual(1, len(dlb.ex.Context.active.summary_of_latest_runs(max_count=1)))
+        finally:
+            dlb.cf.rundb_profile = orig
@@ -266,6 +266,20 @@ class PropertyTest(unittest.TestCase):
         d = dlb.ex.output.RegularFile(replace_by_same_content=False)
         self.assertFalse(d.replace_by_same_content)
 
+    def test_regularfile_input_dependency_has_compare(self):
+        d = dlb.ex.input.RegularFile()
+        self.assertEqual('mtime', d.compare)
+        d = dlb.ex.input.RegularFile(compare='digest')
+        self.assertEqual('digest', d.compare)
+
+        with self.assertRaises(ValueError) as cm:
+            dlb.ex.input.RegularFile(compare='size')
+        self.assertEqual("'compare' must be 'mtime' or 'digest', not 'size'", str(cm.exception))
+
+        with self.assertRaises(TypeError) as cm:
+            dlb.ex.input.RegularFile(compare=None)
+        self.assertEqual("'compare' must be a str", str(cm.exception))
+
     def test_envvar_intput_dependency_has_name_pattern_and_example(self):
         d = dlb.ex.input.EnvVar(name='n', pattern=r'.', example='!')
         self.assertEqual('n', d.name)
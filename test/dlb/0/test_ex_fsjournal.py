@@ -0,0 +1,245 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# dlb - a Pythonic build tool
+# Copyright (C) 2020 Daniel Lutz <dlu-ch@users.noreply.github.com>
+
+import testenv  # also sets up module search paths
+import dlb.fs
+import dlb.cf
+import dlb.ex
+import dlb.ex._fsjournal
+import dlb.ex._rundb
+import dlb.ex._worktree
+import sys
+import os.path
+import time
+import signal
+import subprocess
+import unittest
+import unittest.mock
+
+
+class ChangeJournalTest(unittest.TestCase):
+
+    def test_changed_object_is_changed_after_earlier_position(self):
+        j = dlb.ex._fsjournal.ChangeJournal('s', 10, [(3, 'ca/b/'), (5, 'cc/')])
+        self.assertEqual('s', j.session)
+        self.assertEqual(10, j.position)
+
+        self.assertFalse(j.is_unchanged_since('a/b/', 0))
+        self.assertFalse(j.is_unchanged_since('a/b/', 3))
+        self.assertTrue(j.is_unchanged_since('a/b/', 4))
+        self.assertTrue(j.is_unchanged_since('a/', 0))  # change of content does not change directory
+        self.assertTrue(j.is_unchanged_since('a/b/c/', 0))
+        self.assertFalse(j.is_unchanged_since('c/', 5))
+        self.assertTrue(j.is_unchanged_since('d/', 0))
+
+    def test_replaced_object_is_changed_with_all_objects_in_it(self):
+        j = dlb.ex._fsjournal.ChangeJournal('s', 10, [(3, 'ra/b/'), (4, 'x'), (5, 'rc/')])
+
+        self.assertFalse(j.is_unchanged_since('a/b/', 3))
+        self.assertFalse(j.is_unchanged_since('a/b/c/d/', 3))
+        self.assertTrue(j.is_unchanged_since('a/b/c/d/', 4))
+        self.assertTrue(j.is_unchanged_since('a/', 0))
+        self.assertTrue(j.is_unchanged_since('a/bb/', 0))
+        self.assertFalse(j.is_unchanged_since('c/d/', 5))
+
+    def test_replaced_root_changes_everything(self):
+        j = dlb.ex._fsjournal.ChangeJournal('s', 10, [(3, 'r')])
+        self.assertFalse(j.is_unchanged_since('', 3))
+        self.assertFalse(j.is_unchanged_since('a/b/', 3))
+        self.assertTrue(j.is_unchanged_since('a/b/', 4))
+
+    def test_declared_as_modified_is_changed_after_every_position(self):
+        j = dlb.ex._fsjournal.ChangeJournal('s', 10, [])
+        j.declare_as_modified('a/')
+        self.assertFalse(j.is_unchanged_since('a/', 9))
+        self.assertFalse(j.is_unchanged_since('a/b/', 10))
+        self.assertTrue(j.is_unchanged_since('b/', 0))
+
+
+class GetUnchangedMemosTest(unittest.TestCase):
+
+    def test_contains_only_unchanged_existing(self):
+        memo = dlb.ex._rundb.FilesystemObjectMemo(
+            dlb.ex._rundb.FilesystemStatSummary(mode=0o100644, size=1, mtime_ns=2, uid=3, gid=4))
+        encoded_memo = dlb.ex._rundb.encode_fsobject_memo(memo)
+        inputs = {
+            'a/': (True, encoded_memo),
+            'b/': (False, encoded_memo),
+            'c/': (False, None),
+            'd/': (False, dlb.ex._rundb.encode_fsobject_memo(dlb.ex._rundb.FilesystemObjectMemo())),
+            'e/': (False, b'?')
+        }
+        j = dlb.ex._fsjournal.ChangeJournal('s', 10, [(5, 'cb/')])
+
+        memo_by_encoded_path = dlb.ex._fsjournal.get_unchanged_memos(j, 5, inputs)
+        self.assertEqual({'a/': memo}, memo_by_encoded_path)
+
+        memo_by_encoded_path = dlb.ex._fsjournal.get_unchanged_memos(j, 6, inputs)
+        self.assertEqual({'a/': memo, 'b/': memo}, memo_by_encoded_path)
+
+
+class ReadChangeJournalTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_is_none_without_watcher(self):
+        self.assertIsNone(dlb.ex._fsjournal.read_change_journal(os.getcwd(), 0.1))
+
+        os.mkdir(dlb.ex._fsjournal.JOURNAL_DIR_NAME)
+        open(os.path.join(dlb.ex._fsjournal.JOURNAL_DIR_NAME, dlb.ex._fsjournal.WATCHER_LOCK_FILE_NAME), 'xb').close()
+        self.assertIsNone(dlb.ex._fsjournal.read_change_journal(os.getcwd(), 0.1))
+        self.assertEqual([dlb.ex._fsjournal.WATCHER_LOCK_FILE_NAME],
+                         os.listdir(dlb.ex._fsjournal.JOURNAL_DIR_NAME))
+
+
+class WatcherTestCase(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        if not sys.platform.startswith('linux'):
+            raise unittest.SkipTest('requires GNU/Linux')
+        super().setUp()
+        self.management_tree_path = os.path.abspath(dlb.ex._worktree.MANAGEMENTTREE_DIR_NAME)
+        self.watcher = None
+
+    def tearDown(self):
+        if self.watcher is not None:
+            self.watcher.send_signal(signal.SIGINT)
+            self.watcher.wait(10)
+        super().tearDown()
+
+    def start_watcher(self):
+        src_path = os.path.dirname(os.path.dirname(os.path.abspath(dlb.__file__)))
+        self.watcher = subprocess.Popen(
+            [sys.executable, '-c', 'import sys, dlb_launcher; sys.exit(dlb_launcher.main())', '--watch-changes'],
+            env=dict(os.environ, PYTHONPATH=src_path), stderr=subprocess.DEVNULL)
+
+        t0 = time.monotonic()
+        while True:
+            journal = dlb.ex._fsjournal.read_change_journal(self.management_tree_path, 0.5)
+            if journal is not None:
+                return journal
+            if self.watcher.poll() is not None:
+                raise unittest.SkipTest('watcher not supported')
+            if time.monotonic() - t0 > 10.0:
+                self.fail('watcher not responding')
+            time.sleep(0.05)
+
+
+class WatcherTest(WatcherTestCase):
+
+    def test_records_changes(self):
+        os.makedirs(os.path.join('a', 'b'))
+        open(os.path.join('a', 'b', 'c'), 'xb').close()
+        open('d', 'xb').close()
+
+        j0 = self.start_watcher()
+        j = dlb.ex._fsjournal.read_change_journal(self.management_tree_path, 5.0)
+        self.assertEqual(j0.session, j.session)
+        self.assertGreater(j.position, j0.position)
+        self.assertTrue(j.is_unchanged_since('a/b/c/', j0.position))
+        self.assertTrue(j.is_unchanged_since('d/', j0.position))
+
+        with open(os.path.join('a', 'b', 'c'), 'wb') as f:
+            f.write(b'1')
+        j1 = dlb.ex._fsjournal.read_change_journal(self.management_tree_path, 5.0)
+        self.assertFalse(j1.is_unchanged_since('a/b/c/', j.position))
+        self.assertTrue(j1.is_unchanged_since('a/b/', j.position))
+        self.assertTrue(j1.is_unchanged_since('d/', j.position))
+
+        os.rename(os.path.join('a', 'b'), 'e')
+        open(os.path.join('e', 'f'), 'xb').close()
+        j2 = dlb.ex._fsjournal.read_change_journal(self.management_tree_path, 5.0)
+        self.assertFalse(j2.is_unchanged_since('a/b/c/', j1.position))
+        self.assertFalse(j2.is_unchanged_since('e/c/', j1.position))
+        self.assertFalse(j2.is_unchanged_since('a/', j1.position))
+        self.assertTrue(j2.is_unchanged_since('d/', j1.position))
+
+        with open(os.path.join('e', 'c'), 'wb') as f:  # moved directory is watched
+            f.write(b'2')
+        j3 = dlb.ex._fsjournal.read_change_journal(self.management_tree_path, 5.0)
+        self.assertFalse(j3.is_unchanged_since('e/c/', j2.position))
+        self.assertTrue(j3.is_unchanged_since('e/f/', j2.position))
+
+    def test_second_watcher_fails(self):
+        self.start_watcher()
+        output = subprocess.run(
+            [sys.executable, '-c', 'import sys, dlb_launcher; sys.exit(dlb_launcher.main())', '--watch-changes'],
+            env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(dlb.__file__)))),
+            stderr=subprocess.PIPE, timeout=10)
+        self.assertEqual(1, output.returncode)
+        self.assertIn(b'another watcher is running', output.stderr)
+
+
+class RunWithChangeJournalTest(WatcherTestCase):
+
+    def test_unchanged_inputs_are_not_read(self):
+        class BTool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile()
+            object_file = dlb.ex.output.RegularFile()
+
+            async def redo(self, result, context):
+                with open((context.root_path / self.object_file).native, 'wb') as f:
+                    f.write(b'x')
+
+        open('a.cpp', 'xb').close()
+        self.start_watcher()
+
+        orig = dlb.cf.use_change_journal
+        read_filesystem_object_memo = dlb.ex._worktree.read_filesystem_object_memo
+        try:
+            dlb.cf.use_change_journal = True
+
+            with dlb.ex.Context():
+                t = BTool(source_file='a.cpp', object_file='a.o')
+                t2 = BTool(source_file='a.o', object_file='b.o')
+                self.assertTrue(t.start().complete())
+                self.assertTrue(t2.start())
+
+            with unittest.mock.patch.object(dlb.ex._worktree, 'read_filesystem_object_memo',
+                                            wraps=read_filesystem_object_memo) as m:
+                with dlb.ex.Context():
+                    self.assertFalse(t.start())
+                    self.assertFalse(t2.start())
+            read_paths = {c[0][0].components[-1] for c in m.call_args_list}
+            self.assertNotIn('a.cpp', read_paths)
+            self.assertIn('b.o', read_paths)  # output dependencies are read
+
+            with open('a.cpp', 'wb') as f:
+                f.write(b'1')
+
+            with dlb.ex.Context():
+                self.assertTrue(t.start().complete())
+                self.assertTrue(t2.start().complete())  # modified by redo of 't' in the same run
+                self.assertFalse(t2.start())
+
+            with dlb.ex.Context():
+                self.assertFalse(t.start())
+                self.assertFalse(t2.start())
+        finally:
+            dlb.cf.use_change_journal = orig
+
+
+class ChangeWaiterTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        if not sys.platform.startswith('linux'):
+            raise unittest.SkipTest('requires GNU/Linux')
+        super().setUp()
+
+    def test_returns_changes_since_construction_except_ignored(self):
+        os.makedirs(os.path.join('a', 'b'))
+        open(os.path.join('a', 'b', 'c'), 'xb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        waiter = dlb.ex._fsjournal.ChangeWaiter(root_path)
+        try:
+            os.makedirs(os.path.join('o', 'p'))  # parent of ignored
+            open(os.path.join('o', 'p', 'q'), 'xb').close()  # ignored
+            open(os.path.join('.dlbroot', 'x'), 'xb').close()  # in management tree
+            with open(os.path.join('a', 'b', 'c'), 'wb') as f:
+                f.write(b'1')
+            self.assertEqual(['a/b/c/'], waiter.wait(['o/p/q/']))
+
+            open(os.path.join('a', 'd'), 'xb').close()
+            self.assertEqual(['a/', 'a/d/'], waiter.wait(delay=0.2))
+        finally:
+            waiter.close()
@@ -0,0 +1,217 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# dlb - a Pythonic build tool
+# Copyright (C) 2020 Daniel Lutz <dlu-ch@users.noreply.github.com>
+
+import testenv  # also sets up module search paths
+import dlb.cf
+import dlb.fs
+import dlb.ex
+import dlb.ex._jobserver
+import sys
+import os
+import asyncio
+import unittest
+import unittest.mock
+
+
+pending_count = 0
+max_pending_count = 0
+tokens_available_to_helper = None
+
+
+class STool(dlb.ex.Tool):
+    NAME = ''
+
+    async def redo(self, result, context):
+        global pending_count, max_pending_count
+        pending_count += 1
+        max_pending_count = max(max_pending_count, pending_count)
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            pending_count -= 1
+
+
+class HTool(dlb.ex.Tool):
+    async def redo(self, result, context):
+        # count job tokens available to helper like GNU Make would do
+        script = (
+            "import os, fcntl\n"
+            "makeflags = os.environ['MAKEFLAGS']\n"
+            "r, w = (int(s) for s in makeflags.split('--jobserver-auth=')[1].split(','))\n"
+            "fcntl.fcntl(r, fcntl.F_SETFL, fcntl.fcntl(r, fcntl.F_GETFL) | os.O_NONBLOCK)\n"
+            "tokens = b''\n"
+            "try:\n"
+            "    while True:\n"
+            "        tokens += os.read(r, 1)\n"
+            "except BlockingIOError:\n"
+            "    pass\n"
+            "os.write(w, tokens)\n"
+            "print(len(tokens))\n"
+        )
+        _, output = await context.execute_helper_with_output('python3', ['-c', script])
+        global tokens_available_to_helper
+        tokens_available_to_helper = int(output.decode())
+
+
+def read_available_tokens(read_fd: int) -> bytes:
+    tokens = b''
+    try:
+        while True:
+            token = os.read(read_fd, 1)
+            if not token:
+                break
+            tokens += token
+    except BlockingIOError:
+        pass
+    return tokens
+
+
+class ThisIsAUnitTest(unittest.TestCase):
+    pass
+
+
+class ParseJobserverAuthTest(unittest.TestCase):
+
+    def test_none_without_jobserver(self):
+        self.assertIsNone(dlb.ex._jobserver.parse_jobserver_auth(''))
+        self.assertIsNone(dlb.ex._jobserver.parse_jobserver_auth('k -j4'))
+
+    def test_file_descriptors(self):
+        self.assertEqual((3, 4), dlb.ex._jobserver.parse_jobserver_auth(' -j4 --jobserver-auth=3,4'))
+        self.assertEqual((5, 6), dlb.ex._jobserver.parse_jobserver_auth('--jobserver-fds=5,6 -j'))
+
+    def test_fifo(self):
+        self.assertEqual('/tmp/a', dlb.ex._jobserver.parse_jobserver_auth('-j2 --jobserver-auth=fifo:/tmp/a'))
+        self.assertEqual('/tmp/x', dlb.ex._jobserver.parse_jobserver_auth('--jobserver-auth=3,4 '
+                                                                          '--jobserver-auth=fifo:/tmp/x'))
+
+    def test_fails_for_unsupported(self):
+        with self.assertRaises(ValueError):
+            dlb.ex._jobserver.parse_jobserver_auth('--jobserver-auth=gmake_semaphore_1234')
+        with self.assertRaises(ValueError):
+            dlb.ex._jobserver.parse_jobserver_auth('--jobserver-auth=-2,-2')
+        with self.assertRaises(ValueError):
+            dlb.ex._jobserver.parse_jobserver_auth('--jobserver-auth=fifo:')
+
+
+@unittest.skipIf(not hasattr(os, 'mkfifo'), 'requires POSIX')
+class JobserverTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_acquire_waits_for_release(self):
+        jobserver = dlb.ex._jobserver.create('jobserver', 1)
+        acquired = []
+
+        async def acquire_and_release(i):
+            token = await jobserver.acquire()
+            acquired.append((i, token))
+            await asyncio.sleep(0.05)
+            jobserver.release(token)
+
+        async def run_all():
+            await asyncio.gather(*[acquire_and_release(i) for i in range(4)])
+
+        try:
+            asyncio.get_event_loop().run_until_complete(run_all())
+        finally:
+            jobserver.close()
+
+        self.assertEqual([(0, None), (1, b'+')], acquired[:2])
+        self.assertEqual([0, 1, 2, 3], sorted(i for i, _ in acquired))
+
+        read_fd = os.open('jobserver', os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            self.assertEqual(b'', read_available_tokens(read_fd))  # no writer: EOF
+        finally:
+            os.close(read_fd)
+
+    def test_makeflags_advertise_file_descriptors(self):
+        jobserver = dlb.ex._jobserver.create('jobserver', 2)
+        try:
+            self.assertRegex(jobserver.makeflags, r'^ -j3 --jobserver-auth=[0-9]+,[0-9]+$')
+            self.assertEqual(jobserver.pass_fds, dlb.ex._jobserver.parse_jobserver_auth(jobserver.makeflags))
+        finally:
+            jobserver.close()
+
+
+@unittest.skipIf(not hasattr(os, 'mkfifo'), 'requires POSIX')
+class InheritedJobserverTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        global pending_count, max_pending_count
+        pending_count = 0
+        max_pending_count = 0
+
+    def run_tools(self, makeflags: str):
+        with unittest.mock.patch.dict(os.environ, {'MAKEFLAGS': makeflags}):
+            with dlb.ex.Context(max_parallel_redo_count=8):
+                for i in range(6):
+                    STool(NAME=str(i)).start()
+
+    def test_fifo_limits_pending_redos(self):
+        os.mkfifo('jobserver')  # stand-in for GNU Make >= 4.4
+        read_fd = os.open('jobserver', os.O_RDONLY | os.O_NONBLOCK)
+        write_fd = os.open('jobserver', os.O_WRONLY)
+        try:
+            os.write(write_fd, b'ab')
+            self.run_tools(f' -j3 --jobserver-auth=fifo:{os.path.abspath("jobserver")}')
+            self.assertEqual(3, max_pending_count)
+            self.assertEqual(b'ab', bytes(sorted(read_available_tokens(read_fd))))
+        finally:
+            os.close(write_fd)
+            os.close(read_fd)
+
+    @unittest.skipIf(not os.path.isdir('/proc/self/fd'), 'requires GNU/Linux')
+    def test_pipe_limits_pending_redos(self):
+        read_fd, write_fd = os.pipe()  # stand-in for GNU Make < 4.4
+        try:
+            os.write(write_fd, b'+')
+            self.run_tools(f' -j2 --jobserver-auth={read_fd},{write_fd}')
+            self.assertEqual(2, max_pending_count)
+            os.set_blocking(read_fd, False)
+            self.assertEqual(b'+', read_available_tokens(read_fd))
+        finally:
+            os.close(write_fd)
+            os.close(read_fd)
+
+    def test_ignores_unusable(self):
+        read_fd, write_fd = os.pipe()
+        os.close(read_fd)
+        os.close(write_fd)
+        self.run_tools(f' -j2 --jobserver-auth={read_fd},{write_fd}')
+        self.assertEqual(6, max_pending_count)
+
+    def test_ignored_if_not_used(self):
+        os.mkfifo('jobserver')
+        read_fd = os.open('jobserver', os.O_RDONLY | os.O_NONBLOCK)
+        write_fd = os.open('jobserver', os.O_WRONLY)
+        orig = dlb.cf.use_jobserver_of_make
+        try:
+            dlb.cf.use_jobserver_of_make = False
+            self.run_tools(f' -j1 --jobserver-auth=fifo:{os.path.abspath("jobserver")}')
+            self.assertEqual(6, max_pending_count)
+        finally:
+            dlb.cf.use_jobserver_of_make = orig
+            os.close(write_fd)
+            os.close(read_fd)
+
+
+@unittest.skipIf(not hasattr(os, 'mkfifo'), 'requires POSIX')
+class ProvidedJobserverTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.orig = dlb.cf.provide_jobserver_to_helpers
+        dlb.cf.provide_jobserver_to_helpers = True
+
+    def tearDown(self):
+        dlb.cf.provide_jobserver_to_helpers = self.orig
+        super().tearDown()
+
+    def test_helper_gets_tokens_not_held_by_redos(self):
+        with unittest.mock.patch.dict(os.environ, {'MAKEFLAGS': ''}):
+            with dlb.ex.Context(max_parallel_redo_count=3):
+                dlb.ex.Context.active.helper['python3'] = sys.executable
+                HTool().start().complete()
+        self.assertEqual(2, tokens_available_to_helper)
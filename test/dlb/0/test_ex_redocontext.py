@@ -479,6 +479,117 @@ class ExecuteHelperRawTest(testenv.TemporaryWorkingDirectoryTestCase):
             self.assertEqual('fileno', cm.exception.args[0])
 
 
+class RunInThreadTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_returns_return_value_and_does_not_block_loop(self):
+        import threading
+        import time
+
+        async def redo(context):
+            def work(a, b, *, c):
+                time.sleep(0.2)
+                return a + b + c, threading.current_thread()
+
+            async def tick():
+                for i in range(5):
+                    await asyncio.sleep(0.01)
+                    ticks.append(i)
+
+            ticks = []
+            (r, thread), _ = await asyncio.gather(context.run_in_thread(work, 1, 2, c=3), tick())
+            self.assertEqual([0, 1, 2, 3, 4], ticks)  # loop was not blocked
+            return r, thread
+
+        with dlb.ex.Context(max_parallel_redo_count=2) as c:
+            rd = dlb.ex._toolrun.RedoContext(c, dict())
+            r, thread = asyncio.get_event_loop().run_until_complete(redo(rd))
+        self.assertEqual(6, r)
+        self.assertIsNot(threading.current_thread(), thread)
+
+    def test_raises_exception_of_function(self):
+        async def redo(context):
+            return await context.run_in_thread(int, 'x')
+
+        with dlb.ex.Context() as c:
+            rd = dlb.ex._toolrun.RedoContext(c, dict())
+            with self.assertRaises(ValueError):
+                asyncio.get_event_loop().run_until_complete(redo(rd))
+
+    def test_fails_for_noncallable(self):
+        async def redo(context):
+            return await context.run_in_thread(42)
+
+        with dlb.ex.Context() as c:
+            rd = dlb.ex._toolrun.RedoContext(c, dict())
+            with self.assertRaises(TypeError) as cm:
+                asyncio.get_event_loop().run_until_complete(redo(rd))
+        self.assertEqual("'function' must be callable", str(cm.exception))
+
+
+class RunInProcessTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_returns_return_value(self):
+        async def redo(context):
+            return await asyncio.gather(context.run_in_process(divmod, 7, 2), context.run_in_process(os.getpid))
+
+        with dlb.ex.Context(max_parallel_redo_count=2) as c:
+            rd = dlb.ex._toolrun.RedoContext(c, dict())
+            quotient_and_remainder, pid = asyncio.get_event_loop().run_until_complete(redo(rd))
+        self.assertEqual((3, 1), quotient_and_remainder)
+        self.assertNotEqual(os.getpid(), pid)
+
+    def test_works_while_writer_thread_holds_lock(self):
+        import threading
+
+        is_writing = threading.Event()
+        is_called = threading.Event()
+
+        def write():  # called in writer thread of run-database with its lock acquired
+            is_writing.set()
+            is_called.wait()
+
+        async def redo(context):
+            return await context.run_in_process(divmod, 7, 2)
+
+        with dlb.ex.Context() as c:
+            rundb = dlb.ex._context._get_rundb()
+            self.assertIsNotNone(rundb._writer_thread)
+            rundb._pending_writes.put(write)
+            self.assertTrue(is_writing.wait(10.0))
+            try:
+                self.assertTrue(rundb._connection_lock.locked())
+                rd = dlb.ex._toolrun.RedoContext(c, dict())
+                quotient_and_remainder = asyncio.get_event_loop().run_until_complete(
+                    asyncio.wait_for(redo(rd), 30.0))
+            finally:
+                is_called.set()
+        self.assertEqual((3, 1), quotient_and_remainder)
+
+    @unittest.skipIf('fork' not in __import__('multiprocessing').get_all_start_methods(), 'requires fork')
+    def test_calls_function_of_script_without_running_it_again(self):
+        import sys
+        import subprocess
+
+        with open('build.py', 'x') as f:
+            f.write(
+                "import dlb.ex\n"
+                "def square(x):\n"
+                "    return x * x\n"
+                "class ATool(dlb.ex.Tool):\n"
+                "    async def redo(self, result, context):\n"
+                "        print(await context.run_in_process(square, 3))\n"
+                "print('run')\n"
+                "with dlb.ex.Context():\n"
+                "    ATool().start()\n"
+            )
+
+        src_path = os.path.dirname(os.path.dirname(os.path.abspath(dlb.__file__)))
+        output = subprocess.run([sys.executable, 'build.py'], env=dict(os.environ, PYTHONPATH=src_path),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        self.assertEqual(0, output.returncode, output.stderr)
+        self.assertEqual(b'run\n9\n', output.stdout)
+
+
 class ReplaceOutputTest(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_fails_for_nonoutput_dependency(self):
@@ -48,6 +48,35 @@ class CreationTest(testenv.TemporaryDirectoryTestCase):
             pass
 
 
+class ProfileTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_all_profiles_can_be_used_one_after_the_other(self):
+        for profile in list(dlb.ex._rundb.PRAGMAS_BY_PROFILE) + ['safe']:
+            with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', profile=profile)) as rundb:
+                tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', profile.encode())
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (False, b'1')})
+                rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            for profile in dlb.ex._rundb.PRAGMAS_BY_PROFILE:
+                tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', profile.encode())
+                self.assertEqual({'a/': (False, b'1')}, rundb.get_fsobject_inputs(tool_dbid))
+
+    def test_pragmas_are_applied(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', profile='fast')) as rundb:
+            self.assertEqual([('wal',)], rundb._connection.execute("PRAGMA journal_mode").fetchall())
+            self.assertEqual([(1,)], rundb._connection.execute("PRAGMA synchronous").fetchall())
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual([('delete',)], rundb._connection.execute("PRAGMA journal_mode").fetchall())
+            self.assertEqual([(2,)], rundb._connection.execute("PRAGMA synchronous").fetchall())
+
+    def test_fails_for_unknown(self):
+        with self.assertRaises(ValueError) as cm:
+            dlb.ex._rundb.Database('runs.sqlite', profile='unsafe')
+        self.assertEqual("unknown 'profile': 'unsafe'", str(cm.exception))
+
+
 class CreationWithPermissionProblemTest(testenv.TemporaryDirectoryWithChmodTestCase):
 
     def test_fails_with_meaningful_message_on_permission_problem_when_nonexistent(self):
@@ -99,6 +128,35 @@ class RunDbidTest(testenv.TemporaryDirectoryTestCase):
             run_dbid2 = rundb.run_dbid
         self.assertNotEqual(run_dbid1, run_dbid2)
 
+    def test_changes_with_next_run(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            run_dbid1 = rundb.run_dbid
+            rundb.update_run_summary(1, 0)
+            rundb.cleanup()
+            rundb.commit()
+            rundb.start_next_run()
+            run_dbid2 = rundb.run_dbid
+            self.assertNotEqual(run_dbid1, run_dbid2)
+            self.assertEqual(1, len(rundb.get_latest_successful_run_summaries(10)))
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertGreater(rundb.run_dbid, run_dbid2)
+
+
+class IsFileTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_is_false_for_removed_or_replaced(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertTrue(rundb.is_file('runs.sqlite'))
+            self.assertTrue(rundb.is_file(os.path.abspath('runs.sqlite')))
+
+            os.rename('runs.sqlite', 'runs2.sqlite')
+            self.assertFalse(rundb.is_file('runs.sqlite'))
+            self.assertTrue(rundb.is_file('runs2.sqlite'))
+
+            open('runs.sqlite', 'xb').close()
+            self.assertFalse(rundb.is_file('runs.sqlite'))
+
 
 class EncodePathTest(unittest.TestCase):
 
@@ -186,6 +244,21 @@ class DecodeEncodedPathTest(unittest.TestCase):
             dlb.fs.Path('.')), is_dir=False).is_dir())
 
 
+class GetEncodedPathRangeOfPrefixTest(unittest.TestCase):
+
+    def test_contains_exactly_encoded_paths_with_prefix(self):
+        encoded_paths = [
+            dlb.ex._rundb.encode_path(dlb.fs.Path(s))
+            for s in ['a', 'a/b', 'a/b/c', 'a/b.', 'a/b0', 'a/b_', 'a/B', 'a/b\U0010FFFF', 'b']
+        ]
+        first, last = dlb.ex._rundb.get_encoded_path_range_of_prefix('a/b/')
+        self.assertEqual(['a/b/', 'a/b/c/'], [p for p in encoded_paths if first <= p < last])
+        self.assertEqual(['a/b/', 'a/b/c/'], [p for p in encoded_paths if p.startswith('a/b/')])
+
+    def test_has_no_upper_bound_for_root(self):
+        self.assertEqual(('', None), dlb.ex._rundb.get_encoded_path_range_of_prefix(''))
+
+
 class EncodeFsobjectMemoTest(unittest.TestCase):
 
     def test_fails_for_none(self):
@@ -227,6 +300,20 @@ class EncodeFsobjectMemoTest(unittest.TestCase):
                 symlink_target='/')
             dlb.ex._rundb.encode_fsobject_memo(m)
 
+    def test_fails_for_digest_of_nonregular_file(self):
+        with self.assertRaises(ValueError):
+            m = dlb.ex._rundb.FilesystemObjectMemo(
+                stat=dlb.ex._rundb.FilesystemStatSummary(mode=stat.S_IFDIR, size=0, mtime_ns=0, uid=0, gid=0),
+                digest=b'')
+            dlb.ex._rundb.encode_fsobject_memo(m)
+
+        with self.assertRaises(TypeError):
+            # noinspection PyTypeChecker
+            m = dlb.ex._rundb.FilesystemObjectMemo(
+                stat=dlb.ex._rundb.FilesystemStatSummary(mode=stat.S_IFREG, size=0, mtime_ns=0, uid=0, gid=0),
+                digest='')
+            dlb.ex._rundb.encode_fsobject_memo(m)
+
     def test_returns_nonempty_for_non_existent(self):
         m = dlb.ex._rundb.FilesystemObjectMemo()
         e = dlb.ex._rundb.encode_fsobject_memo(m)
@@ -254,7 +341,10 @@ class DecodeEncodedFsobjectMemoTest(unittest.TestCase):
             dlb.ex._rundb.FilesystemObjectMemo(
                 stat=dlb.ex._rundb.FilesystemStatSummary(
                     mode=stat.S_IFLNK | stat.S_IRWXG, size=2, mtime_ns=3, uid=4, gid=5),
-                symlink_target='/a/b/c/')
+                symlink_target='/a/b/c/'),
+            dlb.ex._rundb.FilesystemObjectMemo(
+                stat=dlb.ex._rundb.FilesystemStatSummary(mode=stat.S_IFREG, size=2, mtime_ns=3, uid=4, gid=5),
+                digest=b'\x01\x02')
         ]
         paths_roundtrip = [
             dlb.ex._rundb.decode_encoded_fsobject_memo(dlb.ex._rundb.encode_fsobject_memo(m))
@@ -301,6 +391,66 @@ class DecodeEncodedFsobjectMemoTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             dlb.ex._rundb.decode_encoded_fsobject_memo(b)  # non symlink target for symlink
 
+        b = dlb.ex._rundb.encode_fsobject_memo(m)
+        t = marshal.loads(b)
+        t = t + (b'',)
+        b = marshal.dumps(t)
+        with self.assertRaises(ValueError):
+            dlb.ex._rundb.decode_encoded_fsobject_memo(b)  # digest for symlink
+
+
+class CompareFsobjectMemoTest(unittest.TestCase):
+
+    @staticmethod
+    def memo(mtime_ns, digest=None):
+        return dlb.ex._rundb.FilesystemObjectMemo(
+            stat=dlb.ex._rundb.FilesystemStatSummary(mode=stat.S_IFREG, size=2, mtime_ns=mtime_ns, uid=4, gid=5),
+            digest=digest)
+
+    def test_mtime_difference_is_reason_without_digest(self):
+        last_encoded_memo = dlb.ex._rundb.encode_fsobject_memo(self.memo(3))
+        m = self.memo(4)
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(m, last_encoded_memo, True, lambda: b'1')
+        self.assertEqual('mtime has changed', reason)
+
+        last_encoded_memo = dlb.ex._rundb.encode_fsobject_memo(self.memo(3, b'1'))
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(m, last_encoded_memo, True)
+        self.assertEqual('mtime has changed', reason)
+        self.assertIsNone(m.digest)
+
+    def test_mtime_difference_is_no_reason_with_same_digest(self):
+        last_encoded_memo = dlb.ex._rundb.encode_fsobject_memo(self.memo(3, b'1'))
+        m = self.memo(4)
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(m, last_encoded_memo, True, lambda: b'1')
+        self.assertIsNone(reason)
+        self.assertIsNone(m.digest)  # not modified
+
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(
+            self.memo(4, b'1'), last_encoded_memo, True, lambda: b'2')
+        self.assertIsNone(reason)  # digest of memo is used
+
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(
+            self.memo(4), last_encoded_memo, True, lambda: b'2')
+        self.assertEqual('content has changed', reason)
+
+    def test_digest_is_not_read_if_mtime_is_same(self):
+        def read_digest():
+            raise AssertionError
+
+        last_encoded_memo = dlb.ex._rundb.encode_fsobject_memo(self.memo(3, b'1'))
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(
+            self.memo(3), last_encoded_memo, True, read_digest)
+        self.assertIsNone(reason)
+
+    def test_inaccessible_is_reason(self):
+        def read_digest():
+            raise FileNotFoundError
+
+        last_encoded_memo = dlb.ex._rundb.encode_fsobject_memo(self.memo(3, b'1'))
+        reason = dlb.ex._rundb.compare_fsobject_memo_to_encoded_from_last_redo(
+            self.memo(4), last_encoded_memo, True, read_digest)
+        self.assertEqual('mtime has changed and content is inaccessible', reason)
+
 
 class EncodeDatetimeTest(testenv.TemporaryDirectoryTestCase):
     def test_is_correct_for_typical(self):
@@ -343,6 +493,47 @@ class DecodeDatetimeTest(testenv.TemporaryDirectoryTestCase):
             dlb.ex._rundb.decode_datetime('20200319112025')
 
 
+class EncodeDurationTest(unittest.TestCase):
+
+    def test_is_roundtrip_lossless(self):
+        for duration_ns in [0, 1, 12_345_678_901, 2**70]:
+            encoded_duration = dlb.ex._rundb.encode_duration(duration_ns)
+            self.assertIsInstance(encoded_duration, bytes)
+            self.assertEqual(duration_ns, dlb.ex._rundb.decode_encoded_duration(encoded_duration))
+
+    def test_fails_for_invalid(self):
+        with self.assertRaises(TypeError):
+            dlb.ex._rundb.encode_duration(1.0)
+        with self.assertRaises(ValueError):
+            dlb.ex._rundb.encode_duration(-1)
+
+    def test_decode_returns_none_for_invalid(self):
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_duration(b''))
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_duration(b'\x01'))
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_duration(marshal.dumps(-1)))
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_duration(marshal.dumps('1')))
+
+
+class EncodeObjectOutputsTest(unittest.TestCase):
+
+    def test_is_roundtrip_lossless(self):
+        for value_by_name in [{}, {'a': None, 'b': (1, 'x', b'y'), 'c': {'d': frozenset([2.5])}}]:
+            encoded_object_outputs = dlb.ex._rundb.encode_object_outputs(value_by_name)
+            self.assertIsInstance(encoded_object_outputs, bytes)
+            self.assertEqual(value_by_name, dlb.ex._rundb.decode_encoded_object_outputs(encoded_object_outputs))
+
+    def test_fails_for_invalid(self):
+        with self.assertRaises(TypeError):
+            dlb.ex._rundb.encode_object_outputs([])
+        with self.assertRaises(ValueError):
+            dlb.ex._rundb.encode_object_outputs({'a': object()})
+
+    def test_decode_returns_none_for_invalid(self):
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_object_outputs(b''))
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_object_outputs(marshal.dumps(('a', 1))))
+        self.assertIsNone(dlb.ex._rundb.decode_encoded_object_outputs(marshal.dumps({1: 1})))
+
+
 class UpdateAndGetFsobjectInputTest(testenv.TemporaryDirectoryTestCase):
 
     def test_non_existent_is_added(self):
@@ -534,6 +725,36 @@ class DeclareFsobjectInputAsModifiedTest(testenv.TemporaryDirectoryTestCase):
             with self.assertRaises(ValueError):
                 rundb.update_dependencies_and_state(0, encoded_paths_of_modified='..')
 
+    def test_uses_index(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            query_plan = rundb._connection.execute(
+                "EXPLAIN QUERY PLAN UPDATE ToolInstFsInput SET memo_before = NULL WHERE fsobject_dbid IN ("
+                "SELECT fsobject_dbid FROM FsObject WHERE path >= ? AND path < ?)",
+                ('a/', 'a0')).fetchall()
+            self.assertIn('FsObject_path', repr(query_plan))
+            self.assertIn('ToolInstFsInput_fsobject', repr(query_plan))
+
+    def test_paths_with_modified_prefix_are_redundant(self):
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            encoded_paths = [dlb.ex._rundb.encode_path(dlb.fs.Path(s)) for s in ['a/b', 'a/b/c', 'a/bc', 'd']]
+
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={
+                encoded_path: (False, b'n') for encoded_path in encoded_paths
+            })
+
+            rundb.update_dependencies_and_state(tool_dbid, encoded_paths_of_modified=[
+                encoded_paths[1], encoded_paths[3], encoded_paths[0], encoded_paths[1]
+            ])
+
+            self.assertEqual({
+                encoded_paths[0]: (False, None),
+                encoded_paths[1]: (False, None),
+                encoded_paths[2]: (False, b'n'),
+                encoded_paths[3]: (False, None)
+            }, rundb.get_fsobject_inputs(tool_dbid))
+
 
 class ReplaceFsInputsTest(testenv.TemporaryDirectoryTestCase):
 
@@ -639,6 +860,274 @@ class ReplaceAndGetRedoStateTest(testenv.TemporaryDirectoryTestCase):
                 rundb.update_dependencies_and_state(12, memo_digest_by_aspect={1: ''})
 
 
+class PreloadTest(testenv.TemporaryDirectoryTestCase):
+
+    @staticmethod
+    def fill(rundb):
+        tool_dbid1 = rundb.get_and_register_tool_instance_dbid(b't', b'i1')
+        rundb.update_dependencies_and_state(
+            tool_dbid1,
+            info_by_encoded_path={'a/': (True, b'1'), 'a/b/': (False, b'2'), 'c/': (False, None)},
+            memo_digest_by_aspect={0: b'', 1: b'E'})
+        tool_dbid2 = rundb.get_and_register_tool_instance_dbid(b't', b'i2')
+        rundb.update_dependencies_and_state(tool_dbid2, info_by_encoded_path={'a/b/': (True, b'3')})
+        rundb.get_and_register_tool_instance_dbid(b't', b'i3')
+        return tool_dbid1, tool_dbid2
+
+    @staticmethod
+    def get_all(rundb, tool_dbids):
+        return [
+            (rundb.get_fsobject_inputs(d), rundb.get_fsobject_inputs(d, True),
+             rundb.get_fsobject_inputs(d, False), rundb.get_redo_state(d))
+            for d in tool_dbids
+        ]
+
+    def test_returns_same_as_without_preload(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbids = self.fill(rundb) + (1234,)
+            expected = self.get_all(rundb, tool_dbids)
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertFalse(rundb.is_preloaded)
+            rundb.preload()
+            self.assertTrue(rundb.is_preloaded)
+            self.assertEqual(expected, self.get_all(rundb, tool_dbids))
+            self.assertEqual(tool_dbids[0], rundb.get_and_register_tool_instance_dbid(b't', b'i1'))
+            self.assertEqual(tool_dbids[1], rundb.get_and_register_tool_instance_dbid(b't', b'i2'))
+            self.assertNotIn(rundb.get_and_register_tool_instance_dbid(b't', b'i4'), tool_dbids)
+
+    def test_paths_of_interleaved_inputs_are_sorted(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbids = [rundb.get_and_register_tool_instance_dbid(b't', str(i).encode()) for i in range(3)]
+            for i, tool_dbid in enumerate(tool_dbids):
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={
+                    f'p{j}/': (False, b'') for j in range(i, 30, 3)
+                })
+            rundb.commit()
+
+        expected = sorted(f'p{j}/' for j in range(30))
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.preload()
+            self.assertEqual(expected, rundb._preloaded.sorted_encoded_paths)
+            rundb.update_dependencies_and_state(tool_dbids[0], info_by_encoded_path={'o/': (False, b'')})
+            self.assertEqual(sorted(expected + ['o/']), rundb._preloaded.sorted_encoded_paths)
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.preload_tool_instances([(b't', b'2'), (b't', b'1')])
+            self.assertEqual(sorted(f'p{j}/' for j in range(30) if j % 3 > 0),
+                             rundb._preloaded.sorted_encoded_paths)
+
+    def test_update_is_written_through(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.preload()
+            tool_dbids = self.fill(rundb)
+            tool_dbids += (rundb.get_and_register_tool_instance_dbid(b't', b'i4'),)
+            rundb.update_dependencies_and_state(tool_dbids[2], info_by_encoded_path={'a/b/c/': (False, b'4')},
+                                                encoded_paths_of_modified=['a/b/'])
+            rundb.update_dependencies_and_state(tool_dbids[0], memo_digest_by_aspect={0: b'\x01'},
+                                                encoded_paths_of_modified=['c/'])
+            self.assertTrue(rundb.is_preloaded)
+            preloaded = self.get_all(rundb, tool_dbids)
+            rundb.commit()
+
+        self.assertEqual({'a/': (True, b'1'), 'a/b/': (False, None), 'c/': (False, None)}, preloaded[0][0])
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual(preloaded, self.get_all(rundb, tool_dbids))
+
+    def test_is_dropped_after_rollback(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbid1, _ = self.fill(rundb)
+            rundb.commit()
+            rundb.preload()
+            rundb.update_dependencies_and_state(tool_dbid1, info_by_encoded_path={'d/': (True, b'1')})
+            with self.assertRaises(dlb.ex.DatabaseError):
+                rundb.update_dependencies_and_state(12, info_by_encoded_path={'a/': (True, b'')})
+            self.assertFalse(rundb.is_preloaded)
+            self.assertEqual({'a/': (True, b'1'), 'a/b/': (False, b'2'), 'c/': (False, None)},
+                             rundb.get_fsobject_inputs(tool_dbid1))
+
+    def test_is_ordered_by_path(self):
+        info_by_encoded_path = {'c/': (False, None), 'a/b/': (False, b'2'), 'a/': (True, b'1')}
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path=info_by_encoded_path)
+            self.assertEqual(['a/', 'a/b/', 'c/'], list(rundb.get_fsobject_inputs(tool_dbid)))
+            rundb.preload()
+            self.assertEqual(['a/', 'a/b/', 'c/'], list(rundb.get_fsobject_inputs(tool_dbid)))
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path=info_by_encoded_path)
+            self.assertEqual(['a/', 'a/b/', 'c/'], list(rundb.get_fsobject_inputs(tool_dbid)))
+
+    def test_is_dropped_by_cleanup(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.preload()
+            rundb.cleanup()
+            self.assertFalse(rundb.is_preloaded)
+
+
+class PreloadToolInstancesTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_returns_same_as_without_preload(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbids = PreloadTest.fill(rundb)
+            expected = PreloadTest.get_all(rundb, tool_dbids)
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            dbids = rundb.preload_tool_instances([(b't', b'i2'), (b't', b'i4'), (b't', b'i1'), (b't', b'i2')])
+            self.assertFalse(rundb.is_preloaded)
+            self.assertEqual([tool_dbids[1], dbids[1], tool_dbids[0], tool_dbids[1]], dbids)
+            self.assertNotIn(dbids[1], tool_dbids)
+            self.assertEqual(dbids[1], rundb.get_and_register_tool_instance_dbid(b't', b'i4'))
+            self.assertEqual(expected, PreloadTest.get_all(rundb, tool_dbids))
+            self.assertEqual([({}, {}, {}, {})], PreloadTest.get_all(rundb, [dbids[1]]))
+
+    def test_update_is_written_through(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbids = PreloadTest.fill(rundb)
+            tool_dbid3 = rundb.get_and_register_tool_instance_dbid(b't', b'i3')
+            rundb.preload_tool_instances([(b't', b'i1')])
+
+            # tool instance not in memory
+            rundb.update_dependencies_and_state(tool_dbids[1], memo_digest_by_aspect={0: b''},
+                                                encoded_paths_of_modified=['a/'])
+            self.assertEqual({'a/': (True, None), 'a/b/': (False, None), 'c/': (False, None)},
+                             rundb.get_fsobject_inputs(tool_dbids[0]))
+            self.assertEqual({'a/b/': (True, None)}, rundb.get_fsobject_inputs(tool_dbids[1]))
+            self.assertEqual({0: b''}, rundb.get_redo_state(tool_dbids[1]))
+
+            rundb.update_dependencies_and_state(tool_dbid3, info_by_encoded_path={'d/': (True, b'4')})
+            self.assertEqual({'d/': (True, b'4')}, rundb.get_fsobject_inputs(tool_dbid3))
+            self.assertEqual({}, rundb.get_redo_state(tool_dbid3))
+            preloaded = PreloadTest.get_all(rundb, tool_dbids + (tool_dbid3,))
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual(preloaded, PreloadTest.get_all(rundb, tool_dbids + (tool_dbid3,)))
+
+    def test_reads_pending_writes(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbids = PreloadTest.fill(rundb)
+            expected = PreloadTest.get_all(rundb, tool_dbids)
+            rundb.preload_tool_instances([(b't', b'i1'), (b't', b'i2')])
+            self.assertEqual(expected, PreloadTest.get_all(rundb, tool_dbids))
+            rundb.commit()
+
+    def test_many(self):
+        keys = [(b't', str(i).encode()) for i in range(2000)]
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbids = [rundb.get_and_register_tool_instance_dbid(*k) for k in keys[::2]]
+            for tool_dbid in tool_dbids:
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (True, b'1')})
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            dbids = rundb.preload_tool_instances(keys)
+            self.assertEqual(tool_dbids, dbids[::2])
+            self.assertEqual(len(keys), len(set(dbids)))
+            self.assertEqual({'a/': (True, b'1')}, rundb.get_fsobject_inputs(dbids[-2]))
+            self.assertEqual({}, rundb.get_fsobject_inputs(dbids[-1]))
+
+
+class WriteBehindTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_reads_pending_writes(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbid1 = rundb.get_and_register_tool_instance_dbid(b't', b'i1')
+            tool_dbid2 = rundb.get_and_register_tool_instance_dbid(b't', b'i2')
+            for i in range(100):
+                rundb.update_dependencies_and_state(tool_dbid1, info_by_encoded_path={'a/b/': (False, b'1')},
+                                                    memo_digest_by_aspect={0: str(i).encode()})
+                rundb.commit_if_overdue()
+            rundb.update_dependencies_and_state(tool_dbid2, encoded_paths_of_modified=['a/'])
+
+            self.assertEqual({'a/b/': (False, None)}, rundb.get_fsobject_inputs(tool_dbid1))
+            self.assertEqual({0: b'99'}, rundb.get_redo_state(tool_dbid1))
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual({'a/b/': (False, None)}, rundb.get_fsobject_inputs(tool_dbid1))
+
+    def test_commits_when_overdue(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (False, b'1')})
+            rundb._modifying_operations_since_commit = rundb.MAXIMUM_NUMBER_OF_UNCOMMITTED_OPERATIONS + 1
+            rundb.commit_if_overdue()
+            self.assertEqual(0, rundb._modifying_operations_since_commit)
+            rundb._wait_for_pending_writes()
+            self.assertFalse(rundb._connection.in_transaction)
+
+    def test_fails_immediately_for_invalid_arguments(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.commit()
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (False, b'1')})
+            with self.assertRaises(ValueError):
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'..': (False, b'')})
+            self.assertEqual({}, rundb.get_fsobject_inputs(tool_dbid))  # rolled back
+
+    def test_exception_of_writer_is_raised_by_every_later_call(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.commit()
+            rundb.preload()
+
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (False, b'1')})
+            rundb.update_dependencies_and_state(12, info_by_encoded_path={'a/': (True, b'')})  # unknown dbid
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'b/': (False, b'2')})
+
+            with self.assertRaises(dlb.ex.DatabaseError) as cm:
+                rundb.commit()
+            self.assertIn('FOREIGN KEY constraint failed', str(cm.exception))
+            self.assertFalse(rundb.is_preloaded)
+
+            with self.assertRaises(dlb.ex.DatabaseError):
+                rundb.get_fsobject_inputs(tool_dbid)
+            with self.assertRaises(dlb.ex.DatabaseError):
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'c/': (False, b'3')})
+            with self.assertRaises(dlb.ex.DatabaseError):
+                rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual({}, rundb.get_fsobject_inputs(tool_dbid))  # not committed
+
+    def test_discards_pending_writes_after_failed_write(self):
+        import unittest.mock
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', write_behind=True)) as rundb:
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.commit()
+
+            write = rundb._write_dependencies_and_state
+            calls = []
+
+            def write_failing_first(tool_instance_dbid, fsinput_rows, *args):
+                calls.append(fsinput_rows)
+                write(tool_instance_dbid, fsinput_rows, *args)  # partial modification
+                if len(calls) == 1:
+                    raise OSError('injected')
+
+            with unittest.mock.patch.object(rundb, '_write_dependencies_and_state', write_failing_first):
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (False, b'1')})
+                rundb._modifying_operations_since_commit = rundb.MAXIMUM_NUMBER_OF_UNCOMMITTED_OPERATIONS + 1
+                rundb.commit_if_overdue()
+                rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'b/': (False, b'2')})
+
+                with self.assertRaises(OSError):
+                    rundb._wait_for_pending_writes()
+                self.assertEqual(1, len(calls))
+                self.assertTrue(rundb._connection.in_transaction)  # not committed
+
+                with self.assertRaises(OSError):
+                    rundb.commit_if_overdue()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            self.assertEqual({}, rundb.get_fsobject_inputs(tool_dbid))
+
+
 class CommitTest(testenv.TemporaryDirectoryTestCase):
 
     def test_update_counts_as_modifying_operation(self):
@@ -724,6 +1213,27 @@ class CleanupTest(testenv.TemporaryDirectoryTestCase):
 
             self.assertEqual(3 - 1, rundb.get_tool_instance_dbid_count())
 
+    def test_removes_unused_paths(self):
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_dbid1 = rundb.get_and_register_tool_instance_dbid(b't', b'i1')
+            rundb.update_dependencies_and_state(tool_dbid1,
+                                                info_by_encoded_path={'a/': (False, b'1'), 'b/': (False, b'2')})
+            tool_dbid2 = rundb.get_and_register_tool_instance_dbid(b't', b'i2')
+            rundb.update_dependencies_and_state(tool_dbid2, info_by_encoded_path={'b/': (True, b'3')})
+
+            rows = rundb._connection.execute("SELECT path FROM FsObject ORDER BY path").fetchall()
+            self.assertEqual([('a/',), ('b/',)], rows)  # each path only once
+
+            rundb.update_dependencies_and_state(tool_dbid1, info_by_encoded_path={'c/': (False, b'4')})
+            rundb.cleanup()
+
+            rows = rundb._connection.execute("SELECT path FROM FsObject ORDER BY path").fetchall()
+            self.assertEqual([('b/',), ('c/',)], rows)
+
+            self.assertEqual({'c/': (False, b'4')}, rundb.get_fsobject_inputs(tool_dbid1))
+            self.assertEqual({'b/': (True, b'3')}, rundb.get_fsobject_inputs(tool_dbid2))
+
 
 def wait_for_time_change():
     t0 = datetime.datetime.utcnow()
@@ -766,6 +1276,64 @@ class ForgetRunsBeforeTest(testenv.TemporaryDirectoryTestCase):
             self.assertEqual(0, len(rundb.get_redo_state(tool_dbid2)))
 
 
+class ChangeJournalPositionTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_is_position_of_earlier_run_with_same_session(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.set_change_journal_position('s', 7)
+            tool_dbid1 = rundb.get_and_register_tool_instance_dbid(b't', b'i1')
+            rundb.update_dependencies_and_state(tool_dbid1, info_by_encoded_path={'a/': (True, b'1')})
+            tool_dbid2 = rundb.get_and_register_tool_instance_dbid(b't', b'i2')
+            self.assertIsNone(rundb.get_change_journal_position_of_fsobject_inputs(tool_dbid1, 's'))  # this run
+            rundb.commit()
+
+        for preload in (False, True):
+            with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+                if preload:
+                    rundb.preload()
+                self.assertEqual(7, rundb.get_change_journal_position_of_fsobject_inputs(tool_dbid1, 's'))
+                self.assertIsNone(rundb.get_change_journal_position_of_fsobject_inputs(tool_dbid1, 't'))
+                self.assertIsNone(rundb.get_change_journal_position_of_fsobject_inputs(tool_dbid2, 's'))
+
+    def test_is_none_after_update_in_run_without_change_journal(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.set_change_journal_position('s', 7)
+            tool_dbid = rundb.get_and_register_tool_instance_dbid(b't', b'i')
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (True, b'1')})
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.preload()
+            rundb.update_dependencies_and_state(tool_dbid, info_by_encoded_path={'a/': (True, b'2')})
+            rundb.commit()
+
+        for preload in (False, True):
+            with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+                if preload:
+                    rundb.preload()
+                self.assertIsNone(rundb.get_change_journal_position_of_fsobject_inputs(tool_dbid, 's'))
+
+    def test_is_forgotten_with_run(self):
+        t0 = datetime.datetime.utcnow()
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            rundb.set_change_journal_position('s', 7)
+            rundb.commit()
+
+        wait_for_time_change()
+        max_age = datetime.datetime.utcnow() - t0
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite', max_dependency_age=max_age)) as rundb:
+            rundb.commit()
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            with rundb._cursor_with_exception_mapping() as cursor:
+                self.assertEqual([], cursor.execute("SELECT * FROM RunChangeJournal").fetchall())
+
+    def test_fails_for_invalid_session(self):
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            with self.assertRaises(TypeError):
+                rundb.set_change_journal_position(b's', 7)
+
+
 class RunSummaryTest(testenv.TemporaryDirectoryTestCase):
 
     def test_scenario1(self):
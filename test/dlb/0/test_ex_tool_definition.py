@@ -1122,6 +1122,16 @@ class ToolInstanceFingerprintTest(unittest.TestCase):
         self.assertNotEqual(tool1.fingerprint, tool3.fingerprint)
         self.assertEqual(tool1.fingerprint, tool4.fingerprint)
 
+    def test_is_equal_for_different_resources(self):
+        class BTool(ToolInstanceFingerprintTest.ATool):
+            RESOURCES = {'link': 1}
+
+        tool1 = BTool(source_file=['src/a/b.c'], object_file='e.o')
+        tool2 = BTool(source_file=['src/a/b.c'], object_file='e.o', RESOURCES={'link': 2})
+        tool3 = BTool(source_file=['src/a/b.c'], object_file='e.o', RESOURCES={})
+        self.assertEqual(tool1.fingerprint, tool2.fingerprint)
+        self.assertEqual(tool1.fingerprint, tool3.fingerprint)
+
     def test_is_reproducible(self):
         tool = ToolInstanceFingerprintTest.ATool(source_file=[], object_file='e.o')
         fingerprint1 = tool.fingerprint
@@ -4,6 +4,7 @@
 
 import testenv  # also sets up module search paths
 import dlb.di
+import dlb.cf
 import dlb.fs
 import dlb.ex
 import os
@@ -30,11 +31,63 @@ class ATool(dlb.ex.Tool):
         result.included_files = [dlb.fs.Path('a.h'), dlb.fs.Path('b.h')]
 
 
+class CTool(dlb.ex.Tool):
+    source_file = dlb.ex.input.RegularFile()
+    object_file = dlb.ex.output.RegularFile()
+
+    async def redo(self, result, context):
+        dlb.di.inform(f"redoing right now for {self.object_file.as_string()}")
+        await asyncio.sleep(0.2)
+        if not os.path.exists(self.object_file.native):
+            with (context.root_path / self.object_file).native.raw.open('xb'):
+                pass
+
+
+class FailingTool(dlb.ex.Tool):
+    source_file = dlb.ex.input.RegularFile()
+    object_file = dlb.ex.output.RegularFile()
+
+    async def redo(self, result, context):
+        await asyncio.sleep(0.2)
+        raise ValueError('failed')
+
+
 class BTool(dlb.ex.Tool):
     async def redo(self, result, context):
         pass
 
 
+started_names = []
+
+
+class STool(dlb.ex.Tool):
+    NAME = ''
+    DURATION = 0.0
+
+    async def redo(self, result, context):
+        started_names.append(self.NAME)
+        await asyncio.sleep(self.DURATION)
+
+
+pending_resource_users = []
+max_pending_resource_user_count = 0
+
+
+class RTool(dlb.ex.Tool):
+    NAME = ''
+    RESOURCES = {'link': 1, 'unlimited': 1}
+
+    async def redo(self, result, context):
+        global max_pending_resource_user_count
+        started_names.append(self.NAME)
+        pending_resource_users.append(self.NAME)
+        max_pending_resource_user_count = max(max_pending_resource_user_count, len(pending_resource_users))
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            pending_resource_users.remove(self.NAME)
+
+
 class ThisIsAUnitTest(unittest.TestCase):
     pass
 
@@ -111,12 +164,41 @@ class MultiplePendingRedosTest(testenv.TemporaryWorkingDirectoryTestCase):
         )
         self.assertRegex(output.getvalue(), regex)
 
-    def test_inner_context_completes_redo(self):
-        output = io.StringIO()
-        dlb.di.set_output_file(output)
+    def test_max_parallel_redo_count_holds_for_redos_of_outer_context(self):
+        class PTool(dlb.ex.Tool):
+            NAME = ''
+
+            async def redo(self, result, context):
+                nonlocal pending_count, max_pending_count
+                pending_count += 1
+                max_pending_count = max(max_pending_count, pending_count)
+                try:
+                    await asyncio.sleep(0.1)
+                finally:
+                    pending_count -= 1
+
+        pending_count = 0
+        max_pending_count = 0
+
+        # with successful redo: start() does not wait for all pending redos of outer context
+        with dlb.ex.Context(max_parallel_redo_count=3):
+            for i in range(3):
+                PTool(NAME=f'b{i}').start()
+        max_pending_count = 0
+
+        with dlb.ex.Context(max_parallel_redo_count=3):
+            for i in range(3):
+                PTool(NAME=f'a{i}').start()
+            with dlb.ex.Context(max_parallel_redo_count=2):
+                for i in range(3):
+                    PTool(NAME=f'b{i}').start(force_redo=True)
+        self.assertEqual(3, max_pending_count)
+
+    def test_inner_context_does_not_complete_redo(self):
+        with dlb.ex.Context():
+            CTool(source_file='b.cpp', object_file='b.o').start()
 
         with dlb.ex.Context(max_parallel_redo_count=2):
-            self.assertEqual(2, dlb.ex.Context.active.max_parallel_redo_count)
             ra = ATool(source_file='a.cpp', object_file='a.o').start()
             self.assertIsNotNone(ra)
             self.assertFalse(ra.iscomplete)
@@ -124,68 +206,319 @@ class MultiplePendingRedosTest(testenv.TemporaryWorkingDirectoryTestCase):
             with dlb.ex.Context(max_parallel_redo_count=200):
                 pass
 
-            self.assertTrue(ra.iscomplete)
+            self.assertFalse(ra.iscomplete)
+
+            with dlb.ex.Context():
+                rb = CTool(source_file='b.cpp', object_file='b.o').start(force_redo=True)
+                self.assertFalse(ra.iscomplete)
+            self.assertFalse(ra.iscomplete)
+            self.assertTrue(rb.iscomplete)
+
+    def test_inner_context_completes_all_redos_if_not_redone_before(self):
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            ra = ATool(source_file='a.cpp', object_file='a.o').start()
+            with dlb.ex.Context():
+                rb = CTool(source_file='b.cpp', object_file='b.o').start()
+                self.assertTrue(ra.iscomplete)
+                self.assertTrue(rb)
+
+    def test_inner_context_completes_redo_with_input_as_output(self):
+        with dlb.ex.Context():
+            CTool(source_file='a.cpp', object_file='a.o').start()
+            CTool(source_file='a.o', object_file='c.o').start().complete()
+
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            ra = CTool(source_file='a.cpp', object_file='a.o').start(force_redo=True)
             rb = ATool(source_file='b.cpp', object_file='b.o').start()
-            self.assertIsNotNone(rb)
-            self.assertFalse(rb.iscomplete)
+            with dlb.ex.Context():
+                CTool(source_file='a.o', object_file='c.o').start()
+                self.assertTrue(ra.iscomplete)
+                self.assertFalse(rb.iscomplete)
 
-        regex = (
-            r"(?m)"
-            r"I create a.o\n"
-            r"(.|\n)*"
-            r"I redoing right now for b.o\n"
-        )
-        self.assertRegex(output.getvalue(), regex)
+    def test_inner_context_completes_redo_with_output_in_input_directory(self):
+        class GTool(dlb.ex.Tool):
+            output_file = dlb.ex.output.RegularFile()
+
+            async def redo(self, result, context):
+                await asyncio.sleep(0.5)
+                with (context.root_path / self.output_file).native.raw.open('xb'):
+                    pass
+
+        class LTool(dlb.ex.Tool):
+            input_directory = dlb.ex.input.Directory()
+
+            async def redo(self, result, context):
+                listed.append(sorted(os.listdir(self.input_directory.native)))
+
+        listed = []
+        os.mkdir('gen')
+        with dlb.ex.Context():
+            LTool(input_directory='gen/').start()
+
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            rg = GTool(output_file='gen/a.h').start()
+            with dlb.ex.Context():
+                LTool(input_directory='gen/').start(force_redo=True)
+                self.assertTrue(rg.iscomplete)
+
+        self.assertEqual([[], ['a.h']], listed)
 
-    def test_env_modification_completes_redo(self):
+    def test_consumer_of_pending_output_is_deferred(self):
         output = io.StringIO()
         dlb.di.set_output_file(output)
 
         with dlb.ex.Context(max_parallel_redo_count=2):
-            self.assertEqual(2, dlb.ex.Context.active.max_parallel_redo_count)
             ra = ATool(source_file='a.cpp', object_file='a.o').start()
-            self.assertIsNotNone(ra)
+            rc = ATool(source_file='a.o', object_file='c.o').start()  # does not wait for 'a.o'
             self.assertFalse(ra.iscomplete)
-
-            dlb.ex.Context.active.env.import_from_outer('LANG', pattern=r'.*', example='')
-
-            self.assertTrue(ra.iscomplete)
-            rb = ATool(source_file='b.cpp', object_file='b.o').start()
-            self.assertIsNotNone(rb)
-            self.assertFalse(rb.iscomplete)
+            self.assertFalse(rc.iscomplete)
+            rd = ATool(source_file='c.o', object_file='d.o').start()
+            self.assertFalse(ra.iscomplete)
+            self.assertTrue(rd)  # waits for the redo
 
         regex = (
             r"(?m)"
             r"I create a.o\n"
             r"(.|\n)*"
-            r"I redoing right now for b.o\n"
+            r"I redoing right now for c.o\n"
+            r"(.|\n)*"
+            r"I create c.o\n"
+            r"(.|\n)*"
+            r"I redoing right now for d.o\n"
         )
         self.assertRegex(output.getvalue(), regex)
 
-    def test_helper_modification_completes_redo(self):
+    def test_deferred_consumer_is_false_without_redo(self):
+        with dlb.ex.Context():
+            CTool(source_file='a.cpp', object_file='a.o').start()
+            CTool(source_file='a.o', object_file='c.o').start()
+
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            ra = CTool(source_file='a.cpp', object_file='a.o').start(force_redo=True)
+            rc = CTool(source_file='a.o', object_file='c.o').start()
+            self.assertFalse(ra.iscomplete)
+            self.assertFalse(rc)  # waits for the check of the redo necessity
+
+    def test_deferred_check_fails_on_access(self):
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            CTool(source_file='a.cpp', object_file='a.o').start()
+            r = CTool(source_file='a.o', object_file='a.o').start()  # does not fail here
+            with self.assertRaises(dlb.ex.DependencyError) as cm:
+                r.complete()
+        msg = "output dependency 'object_file' contains a path that is also an explicit input dependency: 'a.o'"
+        self.assertEqual(msg, str(cm.exception))
+
+    def test_deferred_consumer_of_failed_producer_is_not_redone(self):
         output = io.StringIO()
         dlb.di.set_output_file(output)
 
+        with self.assertRaises(ValueError) as cm:
+            with dlb.ex.Context(max_parallel_redo_count=2):
+                FailingTool(source_file='a.cpp', object_file='a.o').start()
+                r = CTool(source_file='a.o', object_file='c.o').start()  # does not wait for 'a.o'
+                with self.assertRaises(ValueError) as cm2:
+                    r.complete()
+        self.assertEqual('failed', str(cm.exception))
+        self.assertIs(cm.exception, cm2.exception)  # exception of the producer
+
+        self.assertNotIn('redoing right now for c.o', output.getvalue())
+        self.assertFalse(os.path.exists('c.o'))
+
+    def test_env_modification_does_not_complete_redo(self):
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            ra = ATool(source_file='a.cpp', object_file='a.o').start()
+            self.assertIsNotNone(ra)
+            self.assertFalse(ra.iscomplete)
+
+            dlb.ex.Context.active.env.import_from_outer('LANG', pattern=r'.*', example='')
+            dlb.ex.Context.active.env['LANG'] = 'C'
+
+            self.assertFalse(ra.iscomplete)
+
+    def test_helper_modification_does_not_complete_redo(self):
         with dlb.ex.Context(max_parallel_redo_count=2):
-            self.assertEqual(2, dlb.ex.Context.active.max_parallel_redo_count)
             ra = ATool(source_file='a.cpp', object_file='a.o').start()
             self.assertIsNotNone(ra)
             self.assertFalse(ra.iscomplete)
 
             dlb.ex.Context.active.helper['a'] = '/a'
 
-            self.assertTrue(ra.iscomplete)
-            rb = ATool(source_file='b.cpp', object_file='b.o').start()
-            self.assertIsNotNone(rb)
-            self.assertFalse(rb.iscomplete)
+            self.assertFalse(ra.iscomplete)
 
-        regex = (
-            r"(?m)"
-            r"I create a.o\n"
-            r"(.|\n)*"
-            r"I redoing right now for b.o\n"
+    def test_redo_sees_env_and_helper_as_of_start(self):
+        class ETool(dlb.ex.Tool):
+            NAME = ''
+
+            async def redo(self, result, context):
+                seen_by_name[self.NAME] = (context.env.get('A_B_C'), context.env.is_imported('A_B_C'),
+                                           context.helper.get('h'))
+
+        seen_by_name = {}
+
+        with dlb.ex.Context(max_parallel_redo_count=4):
+            dlb.ex.Context.active.env.import_from_outer('A_B_C', pattern=r'.*', example='')
+            dlb.ex.Context.active.env['A_B_C'] = '1'
+            dlb.ex.Context.active.helper['h'] = '/h1'
+            ETool(NAME='1').start()
+
+            dlb.ex.Context.active.env['A_B_C'] = '2'
+            dlb.ex.Context.active.helper['h'] = '/h2'
+            ETool(NAME='2').start()
+
+            with dlb.ex.Context():
+                dlb.ex.Context.active.env['A_B_C'] = '3'
+                ETool(NAME='3').start()
+                del dlb.ex.Context.active.env['A_B_C']
+                ETool(NAME='4').start()
+
+        self.assertEqual({
+            '1': ('1', True, dlb.fs.Path('/h1')),
+            '2': ('2', True, dlb.fs.Path('/h2')),
+            '3': ('3', True, dlb.fs.Path('/h2')),
+            '4': (None, True, dlb.fs.Path('/h2'))
+        }, seen_by_name)
+
+
+class ScheduleByExpectedDurationTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        started_names.clear()
+        self.orig = dlb.cf.schedule_redos_by_expected_duration
+
+    def tearDown(self):
+        dlb.cf.schedule_redos_by_expected_duration = self.orig
+        super().tearDown()
+
+    def test_starts_longest_first(self):
+        durations = [('a', 0.01), ('b', 0.3), ('c', 0.1)]
+
+        with dlb.ex.Context():
+            for n, d in durations:
+                STool(NAME=n, DURATION=d).start()
+        self.assertEqual(['a', 'b', 'c'], started_names)
+
+        started_names.clear()
+        dlb.cf.schedule_redos_by_expected_duration = True
+        with dlb.ex.Context():
+            results = [STool(NAME=n, DURATION=d).start(force_redo=True) for n, d in durations + [('d', 0.0)]]
+            self.assertEqual([], started_names)
+            self.assertTrue(all(results))
+            self.assertFalse(results[1].iscomplete)
+            results[1].complete()
+            self.assertTrue(results[1].iscomplete)
+            self.assertEqual(['d', 'b'], started_names)  # never redone before, then longest
+
+        self.assertEqual(['d', 'b', 'c', 'a'], started_names)
+
+    def test_limits_pending_redos(self):
+        dlb.cf.schedule_redos_by_expected_duration = True
+
+        with dlb.ex.Context(max_parallel_redo_count=2):
+            results = [STool(NAME=str(i), DURATION=0.1).start() for i in range(3)]
+            results[0].complete()
+            self.assertEqual(['0', '1'], started_names)
+            self.assertFalse(results[2].iscomplete)
+
+        self.assertEqual(['0', '1', '2'], started_names)
+
+
+class ParallelRedoAdmissionTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        started_names.clear()
+        self.orig = dlb.cf.parallel_redo_admission
+
+    def tearDown(self):
+        dlb.cf.parallel_redo_admission = self.orig
+        super().tearDown()
+
+    def test_limits_pending_redos(self):
+        pending_counts = []
+
+        def admit(n):
+            pending_counts.append(n)
+            return n < 2
+
+        dlb.cf.parallel_redo_admission = admit
+        with dlb.ex.Context(max_parallel_redo_count=4):
+            results = [STool(NAME=str(i), DURATION=0.1).start() for i in range(3)]
+            self.assertEqual(['0', '1'], started_names)  # third one waited until first one was completed
+            results[2].complete()
+
+        self.assertEqual(['0', '1', '2'], started_names)
+        self.assertEqual(1, pending_counts[0])
+        self.assertEqual(2, max(pending_counts))
+
+    def test_fails_for_noncallable(self):
+        dlb.cf.parallel_redo_admission = 2
+        with self.assertRaises(TypeError) as cm:
+            with dlb.ex.Context():
+                pass
+        self.assertEqual("'dlb.cf.parallel_redo_admission' must be None or callable", str(cm.exception))
+
+
+class ResourceLimitTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        global max_pending_resource_user_count
+        started_names.clear()
+        max_pending_resource_user_count = 0
+
+    def test_limits_pending_redos_with_resource(self):
+        with dlb.ex.Context(max_parallel_redo_count=4, resource_limits={'link': 1}):
+            for i in range(3):
+                RTool(NAME=f'r{i}').start()
+            STool(NAME='s0', DURATION=0.1).start()  # is not delayed by the pending redos of RTool
+
+        self.assertEqual(['r0', 's0', 'r1', 'r2'], started_names)
+        self.assertEqual(1, max_pending_resource_user_count)
+
+    def test_resource_without_limit_is_ignored(self):
+        with dlb.ex.Context(max_parallel_redo_count=4):
+            for i in range(3):
+                RTool(NAME=f'r{i}').start()
+        self.assertEqual(3, max_pending_resource_user_count)
+
+    def test_limit_of_outer_context_is_inherited(self):
+        with dlb.ex.Context(max_parallel_redo_count=4, resource_limits={'link': 2}):
+            with dlb.ex.Context(max_parallel_redo_count=4):
+                self.assertEqual({'link': 2}, dlb.ex.Context.active.resource_limits)
+                for i in range(3):
+                    RTool(NAME=f'r{i}').start()
+        self.assertEqual(2, max_pending_resource_user_count)
+
+    def test_limit_holds_for_redos_of_outer_context(self):
+        global max_pending_resource_user_count
+        with dlb.ex.Context(max_parallel_redo_count=4):
+            RTool(NAME='r1').start()  # with successful redo: does not wait for all pending redos of outer context
+        started_names.clear()
+        max_pending_resource_user_count = 0
+
+        with dlb.ex.Context(max_parallel_redo_count=4, resource_limits={'link': 1}):
+            RTool(NAME='r0').start()
+            with dlb.ex.Context(max_parallel_redo_count=4):
+                RTool(NAME='r1').start(force_redo=True)
+        self.assertEqual(['r0', 'r1'], started_names)
+        self.assertEqual(1, max_pending_resource_user_count)
+
+    def test_fails_for_invalid_resources(self):
+        class XTool(dlb.ex.Tool):
+            RESOURCES = {'link': -1}
+
+            async def redo(self, result, context):
+                pass
+
+        with dlb.ex.Context(resource_limits={'link': 1}):
+            with self.assertRaises(dlb.ex.ExecutionParameterError) as cm:
+                XTool().start()
+        msg = (
+            "value of execution parameter 'RESOURCES' must map resource names (str) to non-negative integers: "
+            "{'link': -1}"
         )
-        self.assertRegex(output.getvalue(), regex)
+        self.assertEqual(msg, str(cm.exception))
 
 
 class KeyboardInterruptTest(testenv.TemporaryWorkingDirectoryTestCase):
@@ -227,9 +560,14 @@ class ContextInRedoTest(testenv.TemporaryWorkingDirectoryTestCase):
                 with dlb.ex.Context():
                     pass
 
-        with self.assertRaises(RuntimeError):
+        with self.assertRaises(RuntimeError) as cm:
             with dlb.ex.Context():
                 CTool().start()
+        self.assertEqual("context must not be entered in a redo", str(cm.exception))
+
+        with dlb.ex.Context():  # no running loop outside of redo
+            with dlb.ex.Context():
+                pass
 
     def test_fails_for_env_modification_in_redo(self):
         class CTool(dlb.ex.Tool):
@@ -460,6 +798,111 @@ class RedoResultEnvVarTest(testenv.TemporaryWorkingDirectoryTestCase):
         self.assertEqual(msg, str(cm.exception))
 
 
+class RedoResultObjectOutputOfLastRedoTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_is_assigned_on_result_without_redo(self):
+
+        class OTool(dlb.ex.Tool):
+            tool_version = dlb.ex.output.Object(explicit=False)
+            compiler_options = dlb.ex.output.Object[:](explicit=False)
+            output_path = dlb.ex.output.Object(explicit=False, required=False)
+            file_count = dlb.ex.output.Object(explicit=False, required=False)
+
+            async def redo(self, result, context):
+                result.tool_version = {'major': 1, 'minor': [2, 3]}
+                result.compiler_options = ['-a', '-b']
+                result.output_path = dlb.fs.Path('a/b')  # not representable by dlb.ut.make_fundamental()
+
+        t = OTool()
+        with dlb.ex.Context():
+            result = t.start()
+            self.assertTrue(result)
+            self.assertEqual(('-a', '-b'), result.compiler_options)
+        self.assertEqual({'major': 1, 'minor': [2, 3]}, result.tool_version)
+        self.assertEqual(dlb.fs.Path('a/b'), result.output_path)
+        self.assertIsNone(result.file_count)
+
+        with dlb.ex.Context():
+            result = t.start()
+        self.assertFalse(result)
+        self.assertEqual({'major': 1, 'minor': (2, 3)}, result.tool_version)
+        self.assertEqual(('-a', '-b'), result.compiler_options)
+        self.assertIs(NotImplemented, result.output_path)
+        self.assertIsNone(result.file_count)
+
+        with dlb.ex.Context():
+            result = t.start(force_redo=True)
+        self.assertTrue(result)
+
+    def test_is_not_assigned_without_successful_redo(self):
+
+        class OTool(dlb.ex.Tool):
+            tool_version = dlb.ex.output.Object(explicit=False)
+
+            async def redo(self, result, context):
+                result.tool_version = '1.2'
+                return True  # redo requested
+
+        t = OTool()
+        with dlb.ex.Context():
+            t.start()
+        with dlb.ex.Context():
+            self.assertTrue(t.start())  # redo requested by last redo
+
+
+class RedoResultNonExplicitInputOfLastRedoTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_is_assigned_on_result_without_redo(self):
+
+        class ITool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile()
+            included_files = dlb.ex.input.RegularFile[:](explicit=False)
+            tool_version = dlb.ex.output.Object(explicit=False, required=False)
+
+            async def redo(self, result, context):
+                result.included_files = ['b.h', 'a.h', '/usr/include/stdio.h']
+
+        open('a.cpp', 'xb').close()
+        open('a.h', 'xb').close()
+        open('b.h', 'xb').close()
+
+        t = ITool(source_file='a.cpp')
+        with dlb.ex.Context():
+            result = t.start()
+        self.assertTrue(result)
+        self.assertEqual((dlb.fs.Path('b.h'), dlb.fs.Path('a.h'), dlb.fs.Path('/usr/include/stdio.h')),
+                         result.included_files)
+
+        with dlb.ex.Context():
+            t.start()  # new non-explicit dependencies
+        with dlb.ex.Context():
+            result = t.start()
+        self.assertFalse(result)
+        self.assertEqual((dlb.fs.Path('a.h'), dlb.fs.Path('b.h')), result.included_files)  # only managed tree paths
+        self.assertIs(result.included_files, result.included_files)
+        self.assertIsNone(result.tool_version)
+
+    def test_is_notimplemented_for_several_roles(self):
+
+        class ITool(dlb.ex.Tool):
+            included_files = dlb.ex.input.RegularFile[:](explicit=False)
+            data_files = dlb.ex.input.RegularFile[:](explicit=False)
+
+            async def redo(self, result, context):
+                result.included_files = ['a.h']
+                result.data_files = []
+
+        open('a.h', 'xb').close()
+
+        t = ITool()
+        for i in range(3):
+            with dlb.ex.Context():
+                result = t.start()
+        self.assertFalse(result)
+        self.assertIs(NotImplemented, result.included_files)
+        self.assertIs(NotImplemented, result.data_files)
+
+
 class RedoResultExplicitInputDependencyTest(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_absolute_in_managed_tree_remains_absolute(self):
@@ -10,6 +10,7 @@ import sys
 import re
 import os.path
 import marshal
+import dataclasses
 import tempfile
 import zipfile
 import io
@@ -302,6 +303,173 @@ class NoRedoIfInputNotModifiedTest(testenv.TemporaryWorkingDirectoryTestCase):
             self.assertFalse(t.start())
 
 
+class NoRedoIfInputNotModifiedWithPreloadedRunDatabaseTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_run_causes_redo_only_if_necessary(self):
+        open('a.cpp', 'xb').close()
+
+        orig = dlb.cf.preload_run_database
+        try:
+            dlb.cf.preload_run_database = True
+
+            with dlb.ex.Context():
+                t = FTool(source_file='a.cpp', object_file='a.o')
+                self.assertTrue(t.start())
+                self.assertTrue(t.start())  # because new dependency
+                self.assertFalse(t.start())
+
+            with dlb.ex.Context():
+                t = FTool(source_file='a.cpp', object_file='a.o')
+                self.assertFalse(t.start())
+
+                # output of 'a.o' is input of t2
+                t2 = FTool(source_file='a.o', object_file='b.o')
+                self.assertTrue(t2.start())
+                self.assertTrue(t2.start())
+                self.assertFalse(t2.start())
+
+                # is considered modified
+                self.assertTrue(t.start(force_redo=True).complete())
+                self.assertTrue(t2.start())
+                self.assertFalse(t2.start())
+
+            with dlb.ex.Context():
+                self.assertFalse(t.start())
+                self.assertFalse(t2.start())
+        finally:
+            dlb.cf.preload_run_database = orig
+
+
+class NoRedoIfInputNotModifiedWithCachedMemosTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_run_causes_redo_only_if_necessary(self):
+        open('a.cpp', 'xb').close()
+        open('a.h', 'xb').close()
+        open('b.h', 'xb').close()
+
+        orig = dlb.cf.cache_filesystem_object_memos
+        try:
+            dlb.cf.cache_filesystem_object_memos = True
+
+            with dlb.ex.Context():
+                for i in range(3):
+                    t = FTool(source_file='a.cpp', object_file=f'a{i}.o')
+                    self.assertTrue(t.start())
+                    self.assertTrue(t.start())  # because new dependency
+                    self.assertFalse(t.start())
+
+            with dlb.ex.Context():
+                for i in range(3):
+                    t = FTool(source_file='a.cpp', object_file=f'a{i}.o')
+                    self.assertFalse(t.start())
+                # noinspection PyProtectedMember
+                cache = dlb.ex._context._get_fsobject_memo_cache()
+                self.assertEqual(3 + 3, cache.miss_count)  # 'a.cpp', 'a.h', 'b.h', 'a0.o', 'a1.o', 'a2.o'
+                self.assertGreaterEqual(cache.hit_count, 2 * 3)
+
+                # output of 't' is input of t2
+                t = FTool(source_file='a.cpp', object_file='a0.o')
+                t2 = FTool(source_file='a0.o', object_file='b.o')
+                self.assertTrue(t2.start())
+                self.assertTrue(t2.start())  # because new dependency
+                self.assertFalse(t2.start())
+
+                # modification of explicit output dependency invalidates cached memo
+                self.assertTrue(t.start(force_redo=True).complete())
+                self.assertTrue(t2.start())
+                self.assertFalse(t2.start())
+
+            with dlb.ex.Context():
+                self.assertFalse(t.start())
+                self.assertFalse(t2.start())
+        finally:
+            dlb.cf.cache_filesystem_object_memos = orig
+
+    def test_modified_output_is_not_cached(self):
+        class BTool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile()
+            object_file = dlb.ex.output.RegularFile()
+            REPLACE = True
+
+            async def redo(self, result, context):
+                redo_count[0] += 1
+                if self.REPLACE:
+                    with context.temporary() as p:
+                        with open(p.native, 'wb') as f:
+                            f.write(b'x' * redo_count[0])  # size differs from last redo
+                        context.replace_output(self.object_file, p)
+                else:
+                    with open((context.root_path / self.object_file).native, 'wb') as f:
+                        f.write(b'x' * redo_count[0])  # size differs from last redo
+
+        class CTool(BTool):
+            REPLACE = False
+
+        open('a.cpp', 'xb').close()
+        redo_count = [0]
+
+        orig = dlb.cf.cache_filesystem_object_memos
+        try:
+            dlb.cf.cache_filesystem_object_memos = True
+
+            for tool_class in [BTool, CTool]:
+                with dlb.ex.Context():
+                    t = tool_class(source_file='a.cpp', object_file='a.o')
+                    t2 = tool_class(source_file='a.o', object_file='b.o')
+                    self.assertTrue(t.start(force_redo=True).complete())
+                    self.assertTrue(t2.start())
+                    self.assertFalse(t2.start())
+                    self.assertTrue(t.start(force_redo=True).complete())
+                    self.assertTrue(t2.start())
+                    self.assertFalse(t2.start())
+
+                with dlb.ex.Context():
+                    self.assertFalse(t.start())
+                    self.assertFalse(t2.start())  # memo of 'a.o' stored in run-database was current
+        finally:
+            dlb.cf.cache_filesystem_object_memos = orig
+
+
+class NoRedoIfInputNotModifiedWithParallelMemoReadTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_run_causes_redo_only_if_necessary(self):
+        class BTool(dlb.ex.Tool):
+            source_files = dlb.ex.input.RegularFile[:]()
+            object_file = dlb.ex.output.RegularFile()
+            included_files = dlb.ex.input.RegularFile[:](explicit=False)
+
+            async def redo(self, result, context):
+                open((context.root_path / self.object_file).native, 'wb').close()
+                result.included_files = [f'h{i}.h' for i in range(20)]
+
+        for i in range(20):
+            open(f'h{i}.h', 'xb').close()
+            open(f's{i}.c', 'xb').close()
+
+        orig = dlb.cf.max_parallel_memo_read_count
+        try:
+            dlb.cf.max_parallel_memo_read_count = 4
+
+            with dlb.ex.Context():
+                t = BTool(source_files=[f's{i}.c' for i in range(20)], object_file='a.o')
+                self.assertTrue(t.start())
+                self.assertTrue(t.start())  # because new dependency
+                self.assertFalse(t.start())
+
+                with open('h7.h', 'wb') as f:
+                    f.write(b'//')
+                self.assertTrue(t.start())
+                self.assertFalse(t.start())
+
+                t = BTool(source_files=['s0.c', 's1.c', 'x.c', 's2.c', 'y.c'], object_file='a.o')
+                with self.assertRaises(dlb.ex.DependencyError) as cm:
+                    t.start()
+                msg = "input dependency 'source_files' contains a path of a non-existent filesystem object: 'x.c'"
+                self.assertEqual(msg, str(cm.exception))
+        finally:
+            dlb.cf.max_parallel_memo_read_count = orig
+
+
 class RedoIfNoKnownRedoBefore(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_redo(self):
@@ -375,6 +543,194 @@ class RedoIfRegularFileInputModifiedTest(testenv.TemporaryWorkingDirectoryTestCa
             self.assertRegex(output.getvalue(), r'\b()filesystem object did not exist\b')
 
 
+class RedoIfRegularFileInputContentModifiedTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_explicit(self):
+        class BTool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile(compare='digest')
+
+            async def redo(self, result, context):
+                pass
+
+        with open('a.cpp', 'xb') as f:
+            f.write(b'abc')
+
+        t = BTool(source_file='a.cpp')
+
+        with dlb.ex.Context():
+            self.assertTrue(t.start())
+            self.assertFalse(t.start())
+
+        os.utime('a.cpp', ns=(0, 123456789))  # like checkout of branch
+        with dlb.ex.Context():
+            output = io.StringIO()
+            dlb.di.set_threshold_level(dlb.di.DEBUG)
+            dlb.di.set_output_file(output)
+            self.assertFalse(t.start())
+            regex = r'\b()refresh 1 input dependencies with changed mtime but same content\n'
+            self.assertRegex(output.getvalue(), regex)
+
+            output = io.StringIO()
+            dlb.di.set_output_file(output)
+            self.assertFalse(t.start())
+            self.assertNotIn('refresh', output.getvalue())
+
+        with open('a.cpp', 'wb') as f:
+            f.write(b'xyz')  # same size
+        os.utime('a.cpp', ns=(0, 123456789))
+        with dlb.ex.Context():
+            self.assertFalse(t.start())  # mtime as in run-database
+
+        os.utime('a.cpp', ns=(0, 987654321))
+        with dlb.ex.Context():
+            output = io.StringIO()
+            dlb.di.set_output_file(output)
+            self.assertTrue(t.start())
+            self.assertRegex(output.getvalue(), r'\b()content has changed\b')
+            self.assertFalse(t.start())
+
+    def test_refreshes_memo_of_each_tool_instance_with_cached_memos(self):
+        class BTool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile(compare='digest')
+
+            async def redo(self, result, context):
+                pass
+
+        class CTool(BTool):
+            pass
+
+        with open('a.cpp', 'xb') as f:
+            f.write(b'abc')
+
+        orig = dlb.cf.cache_filesystem_object_memos
+        try:
+            dlb.cf.cache_filesystem_object_memos = True
+            tools = [BTool(source_file='a.cpp'), CTool(source_file='a.cpp')]
+
+            with dlb.ex.Context():
+                for t in tools:
+                    self.assertTrue(t.start())
+
+            os.utime('a.cpp', ns=(0, 123456789))  # like checkout of branch
+            with dlb.ex.Context():
+                output = io.StringIO()
+                dlb.di.set_threshold_level(dlb.di.DEBUG)
+                dlb.di.set_output_file(output)
+                for t in tools:
+                    self.assertFalse(t.start())
+                regex = r'\b()refresh 1 input dependencies with changed mtime but same content\n'
+                self.assertEqual(2, len(re.findall(regex, output.getvalue())))
+
+            with dlb.ex.Context():
+                output = io.StringIO()
+                dlb.di.set_output_file(output)
+                for t in tools:
+                    self.assertFalse(t.start())
+                self.assertNotIn('refresh', output.getvalue())
+        finally:
+            dlb.cf.cache_filesystem_object_memos = orig
+
+    def test_digest_does_not_affect_other_compare_with_cached_memos(self):
+        class ATool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile()
+
+            async def redo(self, result, context):
+                pass
+
+        class BTool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile(compare='digest')
+
+            async def redo(self, result, context):
+                pass
+
+        with open('a.cpp', 'xb') as f:
+            f.write(b'abc')
+
+        orig = dlb.cf.cache_filesystem_object_memos
+        try:
+            for cache_filesystem_object_memos in [False, True]:
+                dlb.cf.cache_filesystem_object_memos = cache_filesystem_object_memos
+                a = ATool(source_file='a.cpp')
+                b = BTool(source_file='a.cpp')
+
+                with dlb.ex.Context():
+                    a.start(force_redo=True)
+                    b.start(force_redo=True)
+
+                for mtime_ns in [123456789, 987654321]:
+                    os.utime('a.cpp', ns=(0, mtime_ns))  # touch
+                    with dlb.ex.Context():
+                        self.assertFalse(b.start())
+                        self.assertTrue(a.start())  # compares mtime
+        finally:
+            dlb.cf.cache_filesystem_object_memos = orig
+
+    def test_digest_in_rundb_is_ignored_and_dropped_for_mtime_compare(self):
+        class ATool(dlb.ex.Tool):
+            source_file = dlb.ex.input.RegularFile()
+            header_file = dlb.ex.input.RegularFile(compare='digest')
+
+            async def redo(self, result, context):
+                pass
+
+        with open('a.cpp', 'xb') as f:
+            f.write(b'abc')
+        with open('a.h', 'xb') as f:
+            f.write(b'def')
+
+        t = ATool(source_file='a.cpp', header_file='a.h')
+        encoded_path = dlb.ex._rundb.encode_path(dlb.fs.Path('a.cpp'))
+
+        with dlb.ex.Context():
+            self.assertTrue(t.start())
+
+        with dlb.ex.Context():
+            # add content digest to memo of 'a.cpp'
+            rundb = dlb.ex._context._get_rundb()
+            info_by_encoded_path = rundb.get_fsobject_inputs(1)
+            is_explicit, encoded_memo = info_by_encoded_path[encoded_path]
+            self.assertIsNone(dlb.ex._rundb.decode_encoded_fsobject_memo(encoded_memo).digest)
+            memo = dataclasses.replace(dlb.ex._rundb.decode_encoded_fsobject_memo(encoded_memo),
+                                       digest=dlb.ex._worktree.read_regular_file_digest(os.path.abspath('a.cpp')))
+            info_by_encoded_path[encoded_path] = is_explicit, dlb.ex._rundb.encode_fsobject_memo(memo)
+            rundb.update_dependencies_and_state(1, info_by_encoded_path=info_by_encoded_path)
+
+        os.utime('a.cpp', ns=(0, 123456789))  # touch
+        with dlb.ex.Context():
+            self.assertTrue(t.start())  # compares mtime
+
+        with dlb.ex.Context():
+            rundb = dlb.ex._context._get_rundb()
+            _, encoded_memo = rundb.get_fsobject_inputs(1)[encoded_path]
+            self.assertIsNone(dlb.ex._rundb.decode_encoded_fsobject_memo(encoded_memo).digest)
+
+    def test_nonexplicit(self):
+        class BTool(dlb.ex.Tool):
+            included_files = dlb.ex.input.RegularFile[:](explicit=False, compare='digest')
+
+            async def redo(self, result, context):
+                result.included_files = ['a.h']
+
+        with open('a.h', 'xb') as f:
+            f.write(b'abc')
+
+        t = BTool()
+
+        with dlb.ex.Context():
+            self.assertTrue(t.start())
+            self.assertTrue(t.start())  # because new dependency
+            self.assertFalse(t.start())
+
+        os.utime('a.h', ns=(0, 123456789))
+        with dlb.ex.Context():
+            self.assertFalse(t.start())
+
+        with open('a.h', 'wb') as f:
+            f.write(b'xyz')
+        with dlb.ex.Context():
+            self.assertTrue(t.start())
+
+
 class RedoIfRegularFileInputChmodModifiedTest(testenv.TemporaryDirectoryWithChmodTestCase,
                                               testenv.TemporaryWorkingDirectoryTestCase):
 
@@ -991,6 +1347,45 @@ class RedoIfDefinitionChangedTest(testenv.TemporaryWorkingDirectoryTestCase):
             self.assertRegex(output.getvalue(), regex)
 
 
+    def test_redo_if_source_is_modified_by_redo_in_same_run(self):
+        module_name = 'single_use_module7'
+        self.assertNotIn(module_name, sys.modules)  # needs a name different from all already loaded modules
+
+        os.mkdir(module_name)
+        open(os.path.join(module_name, '__init__.py'), 'w').close()
+        with open(os.path.join(module_name, 'v.py'), 'w') as f:
+            f.write(
+                'import dlb.ex\n'
+                'class A(dlb.ex.Tool):\n'
+                '    async def redo(self, result, context):\n'
+                '       pass\n'
+            )
+
+        class WTool(dlb.ex.Tool):
+            output_file = dlb.ex.output.RegularFile()
+
+            async def redo(self, result, context):
+                with open(self.output_file.native, 'a') as f:
+                    f.write('# modified\n')
+
+        importlib.invalidate_caches()
+        sys.path.insert(0, os.getcwd())
+        try:
+            # noinspection PyUnresolvedReferences
+            import single_use_module7.v
+        finally:
+            del sys.path[0]
+
+        t = single_use_module7.v.A()
+
+        with dlb.ex.Context():
+            self.assertTrue(t.start())
+            self.assertFalse(t.start())
+            self.assertFalse(t.start())  # definition file not read again
+            WTool(output_file=f'{module_name}/v.py').start().complete()
+            self.assertTrue(t.start())
+
+
 class RedoRemovesObstructingExplicitOutputBeforeRedoTest(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_redo_ignores_nonexistent_output_file(self):
@@ -1041,3 +1436,47 @@ class RedoRemovesObstructingExplicitOutputBeforeRedoTest(testenv.TemporaryWorkin
 
         self.assertTrue(os.path.isfile('a.o'))
         self.assertTrue(os.path.isdir('d'))
+
+
+class StartAllTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_redo_as_for_start(self):
+        os.mkdir('src')
+        for n in 'abc':
+            open(os.path.join('src', f'{n}.cpp'), 'xb').close()
+        open('a.h', 'xb').close()
+        open('b.h', 'xb').close()
+
+        tools = [FTool(source_file=f'src/{n}.cpp', object_file=f'{n}.o') for n in 'abc']
+
+        with dlb.ex.Context():
+            results = dlb.ex.start_all(tools)
+            self.assertEqual([True, True, True], [bool(r) for r in results])
+            for r in results:
+                r.complete()
+            results = dlb.ex.start_all(tools)
+            self.assertEqual([True, True, True], [bool(r) for r in results])  # because new dependency
+
+        with dlb.ex.Context():
+            results = dlb.ex.start_all(tools + [FTool(source_file='src/a.cpp', object_file='d.o')])
+            self.assertEqual([False, False, False, True], [bool(r) for r in results])
+            self.assertEqual((dlb.fs.Path('a.h'), dlb.fs.Path('b.h')), results[0].included_files)
+
+        with open('b.h', 'wb') as f:
+            f.write(b'// modified')
+
+        with dlb.ex.Context():
+            self.assertEqual([True, True, True], [bool(r) for r in dlb.ex.start_all(tools)])
+            self.assertEqual([False, False], [bool(r) for r in dlb.ex.start_all(tools[:2])])
+            self.assertEqual([True], [bool(r) for r in dlb.ex.start_all(iter(tools[2:]), force_redo=True)])
+            self.assertEqual([], dlb.ex.start_all([]))
+
+    def test_fails_for_non_tool(self):
+        with dlb.ex.Context():
+            with self.assertRaises(TypeError) as cm:
+                dlb.ex.start_all([FTool(source_file='a.cpp', object_file='a.o'), 'x'])
+        self.assertRegex(str(cm.exception), r"\A'tool_instances' must be an iterable of 'dlb\.ex\.Tool' instances, ")
+
+    def test_fails_if_not_running(self):
+        with self.assertRaises(dlb.ex.NotRunningError):
+            dlb.ex.start_all([FTool(source_file='a.cpp', object_file='a.o')])
@@ -5,6 +5,7 @@
 import testenv  # also sets up module search paths
 import dlb.fs
 import dlb.ex._worktree
+import dlb.ex._fsjournal
 import os.path
 import string
 import tempfile
@@ -238,6 +239,204 @@ class ReadFilesystemObjectMemoTest(testenv.TemporaryDirectoryTestCase):
             os.chmod('d', orig_mode)  # would raise PermissionError on FreeBSD if more permissive than initially
 
 
+class FilesystemObjectMemoCacheTest(testenv.TemporaryDirectoryTestCase):
+
+    def test_fails_for_relative_root_path(self):
+        with self.assertRaises(ValueError) as cm:
+            dlb.ex._worktree.FilesystemObjectMemoCache(dlb.fs.Path('a/'), enabled=True)
+        self.assertEqual("'root_path' must be absolute", str(cm.exception))
+
+    def test_reads_once_until_invalidated(self):
+        os.mkdir('d')
+        open(os.path.join('d', 'x'), 'wb').close()
+        open('y', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=True)
+        self.assertTrue(cache.enabled)
+
+        p = dlb.fs.Path('d/x')
+        m = cache.read_filesystem_object_memo(p, 'd/x/')
+        self.assertEqual(dlb.ex._worktree.read_filesystem_object_memo(root_path / p), m)
+        self.assertIs(m, cache.read_filesystem_object_memo(p, 'd/x/'))
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+        self.assertEqual((1, 2), (cache.hit_count, cache.miss_count))
+
+        with open(os.path.join('d', 'x'), 'wb') as f:
+            f.write(b'abc')
+        self.assertIs(m, cache.read_filesystem_object_memo(p, 'd/x/'))  # modification not detected
+
+        cache.invalidate('d/')  # also invalidates 'd/x/'
+        m = cache.read_filesystem_object_memo(p, 'd/x/')
+        self.assertEqual(3, m.stat.size)
+        self.assertEqual((2, 3), (cache.hit_count, cache.miss_count))
+
+        cache.invalidate('d/x/y/')
+        cache.invalidate('d/y/')
+        cache.read_filesystem_object_memo(p, 'd/x/')
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+        self.assertEqual((4, 3), (cache.hit_count, cache.miss_count))
+
+        cache.invalidate('')  # everything
+        cache.read_filesystem_object_memo(p, 'd/x/')
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+        self.assertEqual((4, 5), (cache.hit_count, cache.miss_count))
+
+    def test_invalidates_by_prefix_after_reads_in_any_order(self):
+        os.mkdir('d')
+        for p in ['y', 'd/x', 'd/w', 'c']:
+            open(p, 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=True)
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+        cache.read_filesystem_object_memos([(dlb.fs.Path('d/x'), 'd/x/'), (dlb.fs.Path('d/w'), 'd/w/')])
+        cache.invalidate('d/x/')
+        cache.read_filesystem_object_memo(dlb.fs.Path('c'), 'c/')
+        cache.add_unchanged_memos({'b/': dlb.ex._rundb.FilesystemObjectMemo()})
+        self.assertEqual((0, 4), (cache.hit_count, cache.miss_count))
+
+        cache.invalidate('d/')
+        for p in ['y', 'd/x', 'd/w', 'c']:
+            cache.read_filesystem_object_memo(dlb.fs.Path(p), p + '/')
+        self.assertEqual((2, 6), (cache.hit_count, cache.miss_count))
+
+    def test_does_not_cache_exception(self):
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=True)
+
+        with self.assertRaises(FileNotFoundError):
+            cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+        open('x', 'wb').close()
+        self.assertIsNotNone(cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/').stat)
+        self.assertEqual((0, 1), (cache.hit_count, cache.miss_count))
+
+    def test_reads_many_in_order(self):
+        os.mkdir('d')
+        for i in range(10):
+            with open(os.path.join('d', f'x{i}'), 'wb') as f:
+                f.write(b'x' * i)
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        paths = [(dlb.fs.Path(f'd/x{i}'), f'd/x{i}/') for i in [3, 12, 0, 9, 3, 5, 1, 2, 8, 7, 6, 4]]
+
+        for max_parallel_read_count in [1, 4]:
+            cache = dlb.ex._worktree.FilesystemObjectMemoCache(
+                root_path, enabled=True, max_parallel_read_count=max_parallel_read_count)
+            try:
+                cache.read_filesystem_object_memo(dlb.fs.Path('d/x9'), 'd/x9/')
+                results = cache.read_filesystem_object_memos(paths)
+            finally:
+                cache.close()
+                cache.close()
+
+            self.assertEqual(len(paths), len(results))
+            self.assertIsInstance(results[1], FileNotFoundError)
+            sizes = [None if isinstance(m, Exception) else m.stat.size for m in results]
+            self.assertEqual([3, None, 0, 9, 3, 5, 1, 2, 8, 7, 6, 4], sizes)
+            self.assertEqual((1, 1 + 10), (cache.hit_count, cache.miss_count))  # 'd/x3' was read twice
+            self.assertIs(results[3], cache.read_filesystem_object_memo(dlb.fs.Path('d/x9'), 'd/x9/'))
+
+    def test_disabled_does_not_cache(self):
+        open('x', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=False)
+        self.assertFalse(cache.enabled)
+
+        m = cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+        self.assertIsNot(m, cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/'))
+        self.assertEqual((0, 0), (cache.hit_count, cache.miss_count))
+
+    def test_held_are_kept_until_released_or_invalidated(self):
+        open('x', 'wb').close()
+        open('y', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        for enabled in [False, True]:
+            cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=enabled)
+            paths = [(dlb.fs.Path('x'), 'x/'), (dlb.fs.Path('y'), 'y/'), (dlb.fs.Path('z'), 'z/'),
+                     (dlb.fs.Path('x'), 'x/')]
+            self.assertEqual(2, cache.hold_memos(paths))
+            self.assertEqual(0, cache.hold_memos(paths))
+
+            mx = cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+            my = cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+            self.assertIs(mx, cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/'))
+            cache.invalidate('y/')
+            self.assertIsNot(my, cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/'))
+
+            cache.release_memos()
+            self.assertEqual(enabled, mx is cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/'))
+
+    def test_held_in_any_order_are_invalidated_by_prefix(self):
+        os.mkdir('b')
+        open(os.path.join('b', 'c'), 'wb').close()
+        open('a', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=False)
+        paths = [(dlb.fs.Path('b/c'), 'b/c/'), (dlb.fs.Path('a'), 'a/'), (dlb.fs.Path('b/'), 'b/')]
+        self.assertEqual(3, cache.hold_memos(paths))
+        memos = [cache.read_filesystem_object_memo(p, ep) for p, ep in paths]
+
+        cache.invalidate('b/')
+        self.assertEqual([False, True, False],
+                         [m is cache.read_filesystem_object_memo(p, ep) for (p, ep), m in zip(paths, memos)])
+
+    def test_pinned_are_kept_until_invalidated_or_next_run(self):
+        open('x', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=False)
+        self.assertIsNone(cache.get_pinned_memos('a'))
+
+        memos = [('x/', cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/'))]
+        cache.pin_memos('a', memos)
+        cache.pin_memos('b', memos)
+        cache.pin_memos('c', [])
+        self.assertIs(memos, cache.get_pinned_memos('a'))
+
+        cache.invalidate('y/')
+        self.assertIs(memos, cache.get_pinned_memos('a'))
+        cache.invalidate('x/')
+        self.assertIsNone(cache.get_pinned_memos('a'))
+        self.assertIsNone(cache.get_pinned_memos('b'))
+        self.assertEqual([], cache.get_pinned_memos('c'))
+
+        cache.pin_memos('a', memos)
+        cache.invalidate('')  # prefix of all
+        self.assertIsNone(cache.get_pinned_memos('a'))
+
+        cache.pin_memos('c', [])
+        cache.start_next_run(None)
+        self.assertIsNone(cache.get_pinned_memos('c'))
+
+    def test_next_run_keeps_only_memos_unchanged_in_change_journal(self):
+        open('x', 'wb').close()
+        open('y', 'wb').close()
+
+        root_path = dlb.fs.Path(dlb.fs.Path.Native(os.getcwd()), is_dir=True)
+        cache = dlb.ex._worktree.FilesystemObjectMemoCache(root_path, enabled=True)
+        cache.start_next_run(dlb.ex._fsjournal.ChangeJournal('s', 10, []))
+        mx = cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+
+        cache.start_next_run(dlb.ex._fsjournal.ChangeJournal('s', 20, [(11, 'cy/')]))
+        self.assertEqual((0, 0), (cache.hit_count, cache.miss_count))
+        self.assertIs(mx, cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/'))
+        cache.read_filesystem_object_memo(dlb.fs.Path('y'), 'y/')
+        self.assertEqual((1, 1), (cache.hit_count, cache.miss_count))
+
+        cache.start_next_run(dlb.ex._fsjournal.ChangeJournal('t', 30, []))  # other session
+        cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+        self.assertEqual((0, 1), (cache.hit_count, cache.miss_count))
+
+        cache.start_next_run(None)
+        cache.read_filesystem_object_memo(dlb.fs.Path('x'), 'x/')
+        self.assertEqual((0, 1), (cache.hit_count, cache.miss_count))
+
+
 class NormalizeDotDotWithoutReference(unittest.TestCase):
 
     def test_is_correct(self):
@@ -9,7 +9,10 @@ import sys
 import os.path
 import re
 import io
+import time
+import signal
 import pathlib
+import subprocess
 import unittest
 
 
@@ -154,7 +157,8 @@ class UsageTest(testenv.CommandlineToolTestCase,
     def test_outputs_usage_without_parameters(self):
         r = dlb_launcher.main()
         self.assertEqual(2, r)
-        regex = r'usage: .* {}\n'.format(re.escape('[ --help ] [ <script-name> [ <script-parameter> ... ] ]'))
+        regex = r'usage: .* {}\n'.format(
+            re.escape('[ --help | --watch-changes | --serve | --watch ] [ <script-name> [ <script-parameter> ... ] ]'))
         self.assertRegex(sys.stderr.getvalue(), regex)
 
 
@@ -410,3 +414,234 @@ class ModuleSearchPathTest(testenv.CommandlineToolTestCase,
         r = dlb_launcher.main()
         self.assertEqual(0, r)
         self.assertEqual(repr(os.path.dirname(script_path)) + '\n', sys.stdout.getvalue())
+
+
+class ServerTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        import socket
+        if not hasattr(socket, 'AF_UNIX'):
+            raise unittest.SkipTest('requires Unix domain sockets')
+        super().setUp()
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.send_signal(signal.SIGINT)
+            self.server.wait(10)
+        super().tearDown()
+
+    @staticmethod
+    def run_launcher(*arguments):
+        src_path = os.path.dirname(os.path.abspath(dlb_launcher.__file__))
+        return subprocess.run(
+            [sys.executable, '-c', 'import sys, dlb_launcher; sys.exit(dlb_launcher.main())'] + list(arguments),
+            env=dict(os.environ, PYTHONPATH=src_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    def start_server(self):
+        src_path = os.path.dirname(os.path.abspath(dlb_launcher.__file__))
+        self.server = subprocess.Popen(
+            [sys.executable, '-c', 'import sys, dlb_launcher; sys.exit(dlb_launcher.main())', '--serve'],
+            env=dict(os.environ, PYTHONPATH=src_path), stderr=subprocess.DEVNULL)
+
+        t0 = time.monotonic()
+        while not os.path.exists(dlb_launcher.SERVER_SOCKET_PATH):
+            if self.server.poll() is not None:
+                self.fail('server failed')
+            if time.monotonic() - t0 > 10.0:
+                self.fail('server not responding')
+            time.sleep(0.05)
+
+    def test_runs_script_in_server_process(self):
+        with open('build.py', 'x') as f:
+            f.write(
+                "import os, sys\n"
+                "print(os.getpid(), repr(sys.argv[1:]), os.environ.get('X'))\n"
+                "sys.stdout.flush()\n"
+                "if sys.argv[1] != '0':\n"
+                "    sys.exit(int(sys.argv[1]))\n"
+            )
+
+        self.start_server()
+        output1 = self.run_launcher('build', '0')
+        output2 = self.run_launcher('build', '3')
+
+        self.assertEqual(0, output1.returncode)
+        self.assertEqual(3, output2.returncode)
+        self.assertEqual(f"{self.server.pid} ['0'] None\n".encode(), output1.stdout)
+        self.assertEqual(f"{self.server.pid} ['3'] None\n".encode(), output2.stdout)
+
+        with open(os.path.join('.dlbroot', f'last.{os.name}'), 'rb') as f:
+            history = f.read().decode()
+        self.assertEqual("['build.py', '0']", history)  # sys.exit(3) is not successful
+
+    def test_runs_tool_definitions_in_fresh_namespace(self):
+        with open('build.py', 'x') as f:
+            f.write(
+                "import dlb.ex\n"
+                "class ATool(dlb.ex.Tool):\n"
+                "    async def redo(self, result, context):\n"
+                "        pass\n"
+                "with dlb.ex.Context():\n"
+                "    print(bool(ATool().start()))\n"
+            )
+
+        self.start_server()
+        output1 = self.run_launcher('build')
+        output2 = self.run_launcher('build')
+        self.assertEqual((0, b'True\n'), (output1.returncode, output1.stdout), output1.stderr)
+        self.assertEqual((0, b'False\n'), (output2.returncode, output2.stdout), output2.stderr)
+
+    def test_outputs_traceback_of_script(self):
+        with open('build.py', 'x') as f:
+            f.write("raise ValueError('oops')\n")
+
+        self.start_server()
+        output = self.run_launcher('build')
+        self.assertEqual(1, output.returncode)
+        self.assertIn(b"ValueError: oops\n", output.stderr)
+
+    def test_falls_back_without_responding_server(self):
+        with open('build.py', 'x') as f:
+            f.write(
+                "import os\n"
+                "print(os.getpid())\n"
+            )
+
+        self.start_server()
+        self.server.send_signal(signal.SIGKILL)  # leaves socket file
+        self.server.wait(10)
+        self.server = None
+        self.assertTrue(os.path.exists(dlb_launcher.SERVER_SOCKET_PATH))
+
+        output = self.run_launcher('build')
+        self.assertEqual(0, output.returncode)
+        self.assertNotEqual(b'', output.stdout)
+
+    def test_second_server_fails(self):
+        self.start_server()
+        output = self.run_launcher('--serve')
+        self.assertEqual(1, output.returncode)
+        self.assertIn(b'another dlb server is running', output.stderr)
+
+    def test_socket_is_accessible_by_user_only(self):
+        self.start_server()
+        self.assertEqual(0, os.stat(dlb_launcher.SERVER_SOCKET_PATH).st_mode & 0o077)
+
+    def test_refuses_too_large_request(self):
+        import socket
+        import array
+
+        with open('build.py', 'x') as f:
+            f.write(
+                "import os\n"
+                "print(os.getpid())\n"
+            )
+
+        self.start_server()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(dlb_launcher.SERVER_SOCKET_PATH)
+            s.sendmsg([dlb_launcher.SERVER_PROTOCOL_LINE],
+                      [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [0, 1, 2]))])
+            try:
+                s.sendall(repr((['build'], {'X': 'x' * dlb_launcher.SERVER_MAX_REQUEST_SIZE})).encode())
+                s.shutdown(socket.SHUT_WR)
+            except OSError:  # closed by server
+                pass
+            self.assertEqual(b'', s.makefile('rb').readline())
+
+        output = self.run_launcher('build')  # server is still running
+        self.assertEqual(0, output.returncode)
+        self.assertEqual(f'{self.server.pid}\n'.encode(), output.stdout)
+
+
+class ServerRequestTest(unittest.TestCase):
+
+    def test_refuses_client_of_other_user(self):
+        import socket
+        import unittest.mock
+
+        server = dlb_launcher.ScriptServer.__new__(dlb_launcher.ScriptServer)  # not initialized
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with a, b:
+            b.sendall(dlb_launcher.SERVER_PROTOCOL_LINE)
+            with unittest.mock.patch.object(dlb_launcher, 'get_peer_uid', return_value=os.getuid() + 1):
+                self.assertTrue(server.handle(a))
+            a.shutdown(socket.SHUT_WR)
+            self.assertEqual(b'', b.recv(1))
+
+    @unittest.skipIf(not hasattr(__import__('socket'), 'SO_PEERCRED'), 'requires SO_PEERCRED')
+    def test_peer_uid_is_uid_of_this_process(self):
+        import socket
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with a, b:
+            self.assertEqual(os.getuid(), dlb_launcher.get_peer_uid(a))
+
+    def test_parses_valid(self):
+        request = b"(['build', 'a'], {'X': 'y'})"
+        self.assertEqual((['build', 'a'], {'X': 'y'}), dlb_launcher.parse_server_request(request))
+
+    def test_fails_for_invalid(self):
+        for request in [b"['build']", b"(['build'], {'X': 1})", b"([1], {})", b"((), {})", b"(" * 100000,
+                        b"\xff", b"([], {})" + b" " * dlb_launcher.SERVER_MAX_REQUEST_SIZE]:
+            with self.assertRaises((ValueError, SyntaxError)):
+                dlb_launcher.parse_server_request(request)
+
+
+class WatchTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        if not sys.platform.startswith('linux'):
+            raise unittest.SkipTest('requires GNU/Linux')
+        super().setUp()
+
+    def test_runs_again_after_change_but_not_after_redo(self):
+        os.makedirs(os.path.join('w', '.dlbroot'))  # working tree without 'output.log'
+        os.mkdir(os.path.join('w', 'src'))
+        open(os.path.join('w', 'src', 'a'), 'xb').close()
+        with open(os.path.join('w', 'build.py'), 'x') as f:
+            f.write(
+                "import dlb.ex\n"
+                "class CopyTool(dlb.ex.Tool):\n"
+                "    source_file = dlb.ex.input.RegularFile()\n"
+                "    target_file = dlb.ex.output.RegularFile()\n"
+                "    async def redo(self, result, context):\n"
+                "        with context.temporary() as t:\n"
+                "            with open(self.source_file.native, 'rb') as i, open(t.native, 'wb') as o:\n"
+                "                o.write(i.read())\n"
+                "            context.replace_output(result.target_file, t)\n"
+                "with dlb.ex.Context():\n"
+                "    r = CopyTool(source_file='src/a', target_file='out/a').start()\n"
+                "print('redo' if r else 'no redo', flush=True)\n"
+            )
+
+        src_path = os.path.dirname(os.path.abspath(dlb_launcher.__file__))
+        with open('output.log', 'xb') as output_file:
+            watcher = subprocess.Popen(
+                [sys.executable, '-c', 'import sys, dlb_launcher; sys.exit(dlb_launcher.main())', '--watch', 'build'],
+                env=dict(os.environ, PYTHONPATH=src_path), stdout=output_file, stderr=subprocess.DEVNULL,
+                cwd=os.path.join(os.getcwd(), 'w', 'src'))
+
+        def wait_for_lines(n):
+            t0 = time.monotonic()
+            while True:
+                with open('output.log', 'rb') as f:
+                    lines = f.read().decode().splitlines()
+                if len(lines) >= n or time.monotonic() - t0 > 10.0:
+                    return lines
+                time.sleep(0.05)
+
+        try:
+            self.assertEqual(['redo'], wait_for_lines(1))
+            time.sleep(0.5)
+            self.assertEqual(['redo'], wait_for_lines(1))  # not run again after redo
+            with open(os.path.join('w', 'src', 'a'), 'wb') as f:
+                f.write(b'1')
+            self.assertEqual(['redo', 'redo'], wait_for_lines(2))
+        finally:
+            watcher.send_signal(signal.SIGINT)
+            watcher.wait(10)
+
+        self.assertEqual(0, watcher.returncode)
+        with open(os.path.join('w', 'out', 'a'), 'rb') as f:
+            self.assertEqual(b'1', f.read())
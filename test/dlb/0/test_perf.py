@@ -4,9 +4,12 @@
 
 import testenv  # also sets up module search paths
 import dlb.di
+import dlb.cf
 import dlb.fs
 import dlb.ex
+import sys
 import os.path
+import subprocess
 import cProfile
 import pstats
 import unittest
@@ -14,6 +17,8 @@ import unittest
 
 included_files = [f"a{i}.h" for i in range(20)]
 
+IMPORT_TIME_BUDGET_OF_DLB_EX = 0.5  # s; generous to allow for slow machines and missing compiled bytecode
+
 
 class ATool(dlb.ex.Tool):
     source_file = dlb.ex.input.RegularFile()
@@ -41,6 +46,26 @@ def dump_profile_stats(profile, test_case: unittest.TestCase, result_index: int)
     # e.g. for https://github.com/jiffyclub/snakeviz or https://github.com/nschloe/tuna
 
 
+def run_with_import_times(script: str):
+    # Run *script* in a new Python interpreter with '-X importtime' and return the cumulative import time
+    # in seconds by name of each imported module and the (float) value printed as the last line of the output.
+
+    src_path = os.path.dirname(os.path.dirname(os.path.abspath(dlb.__file__)))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                               env=dict(os.environ, PYTHONPATH=src_path),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+    import_time_by_module = {}
+    for line in completed.stderr.decode().splitlines():
+        # 'import time:       314 |      51303 | dlb.ex'
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            import_time_by_module[fields[2].strip()] = int(fields[1]) / 1e6
+
+    output_lines = completed.stdout.decode().splitlines()
+    return import_time_by_module, float(output_lines[-1]) if output_lines else None
+
+
 class ThisIsAUnitTest(unittest.TestCase):
     pass
 
@@ -123,6 +148,41 @@ class ImportantRunExecutionPathBenchmark(testenv.TemporaryWorkingDirectoryTestCa
         profile.disable()
         dump_profile_stats(profile, self, 2)
 
+    def test_update_dependencies_and_state(self):
+        import contextlib
+
+        # typical for a compiler tool: some hundred included files, some of them modified by other tool instances
+        encoded_paths = [dlb.ex._rundb.encode_path(dlb.fs.Path(f'src/include/h{i}.h')) for i in range(500)]
+        encoded_memo = dlb.ex._rundb.encode_fsobject_memo(dlb.ex._rundb.FilesystemObjectMemo())
+
+        with contextlib.closing(dlb.ex._rundb.Database('runs.sqlite')) as rundb:
+            tool_instance_dbids = [rundb.get_and_register_tool_instance_dbid(b't', str(i).encode()) for i in range(200)]
+
+            profile = cProfile.Profile()
+            profile.enable()
+
+            # findings:
+            #  - one execute() per row: Python-to-SQLite round trip is significant
+            #  - 'UPDATE ... WHERE instr(path, ?) == 1' for each modified output scans the whole table (dominates)
+            #  - range query 'path >= ? AND path < ?' uses index; index makes insertion a bit slower
+
+            # times for comparison (aftermath of 200 tool instances with 500 input dependencies each):
+            #   2210 ms (originally: one execute() per row)
+            #   1650 ms (with executemany())
+            #   1010 ms (current: with executemany() and range query)
+
+            for i, tool_instance_dbid in enumerate(tool_instance_dbids):
+                rundb.update_dependencies_and_state(
+                    tool_instance_dbid,
+                    info_by_encoded_path={p: (False, encoded_memo) for p in encoded_paths},
+                    memo_digest_by_aspect={dlb.ex._rundb.Aspect.RESULT.value: b''},
+                    encoded_paths_of_modified=[f'out/o{i}.o/'])
+                rundb.commit_if_overdue()
+
+            profile.disable()
+
+        dump_profile_stats(profile, self, 5)
+
     def test_inform(self):
         profile = cProfile.Profile()
 
@@ -151,6 +211,212 @@ class ImportantRunExecutionPathBenchmark(testenv.TemporaryWorkingDirectoryTestCa
         dump_profile_stats(profile, self, 4)
 
 
+class HighLatencyFilesystemBenchmark(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_read_memos_of_input_dependencies(self):
+        import time
+        import unittest.mock
+
+        class BTool(dlb.ex.Tool):
+            source_files = dlb.ex.input.RegularFile[:]()
+            object_file = dlb.ex.output.RegularFile()
+            included_files = dlb.ex.input.RegularFile[:](explicit=False)
+
+            async def redo(self, result, context):
+                with (context.root_path / self.object_file).native.raw.open('wb'):
+                    pass
+                result.included_files = included_files
+
+        source_files = [f"s{i}.cpp" for i in range(100)]
+        for p in included_files + source_files:
+            open(p, 'xb').close()
+
+        # delay shim: simulate a filesystem with high latency (e.g. NFS) without FUSE
+        orig_lstat = os.lstat
+
+        def lstat_with_latency(path, *args, **kwargs):
+            time.sleep(1e-3)  # releases the GIL like a blocking system call
+            return orig_lstat(path, *args, **kwargs)
+
+        orig = dlb.cf.max_parallel_memo_read_count
+        try:
+            for max_parallel_memo_read_count in [1, 8]:
+                dlb.cf.max_parallel_memo_read_count = max_parallel_memo_read_count
+                with dlb.ex.Context():
+                    dlb.di.set_threshold_level(dlb.di.WARNING)
+
+                    t = BTool(source_files=source_files, object_file='a.o')
+                    t.start()
+                    t.start()
+
+                    profile = cProfile.Profile()
+                    profile.enable()
+
+                    # findings:
+                    #  - os.lstat() releases the GIL; reading the memos by a thread pool hides the latency
+
+                    # times for comparison (100 explicit and 20 non-explicit input dependencies, 1 ms per lstat):
+                    #   1470 ms (max_parallel_memo_read_count = 1)
+                    #   310 ms (max_parallel_memo_read_count = 8)
+
+                    with unittest.mock.patch('os.lstat', lstat_with_latency):
+                        for i in range(10):
+                            assert not t.start()
+
+                    profile.disable()
+
+                dump_profile_stats(profile, self, max_parallel_memo_read_count)
+        finally:
+            dlb.cf.max_parallel_memo_read_count = orig
+
+
+class StartAllBenchmark(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_start_many_tool_instances(self):
+        import time
+        import unittest.mock
+
+        source_files = [f"s{i}.cpp" for i in range(200)]
+        for p in included_files + source_files:
+            open(p, 'xb').close()
+
+        def tools():
+            return [ATool(source_file=p, object_file=p[:-4] + '.o') for p in source_files]
+
+        with dlb.ex.Context():
+            dlb.di.set_threshold_level(dlb.di.WARNING)
+            for _ in range(2):
+                for t in tools():
+                    t.start()
+
+        # delay shim: simulate a filesystem with high latency (e.g. NFS) without FUSE
+        orig_lstat = os.lstat
+
+        def lstat_with_latency(path, *args, **kwargs):
+            time.sleep(1e-4)  # releases the GIL like a blocking system call
+            return orig_lstat(path, *args, **kwargs)
+
+        # findings:
+        #  - each start() queries the run-database for its tool instance and reads the memos of its 20 non-explicit
+        #    input dependencies although they are the same for all tool instances
+
+        # times for comparison (200 tool instances with 20 shared non-explicit input dependencies, 0.1 ms per lstat,
+        # max_parallel_memo_read_count = 8):
+        #   390 ms (start() for each)
+        #   175 ms (start_all())
+
+        orig = dlb.cf.max_parallel_memo_read_count
+        try:
+            dlb.cf.max_parallel_memo_read_count = 8
+            for is_batch in [False, True]:
+                with dlb.ex.Context():
+                    dlb.di.set_threshold_level(dlb.di.WARNING)
+
+                    profile = cProfile.Profile()
+                    profile.enable()
+
+                    with unittest.mock.patch('os.lstat', lstat_with_latency):
+                        if is_batch:
+                            results = dlb.ex.start_all(tools())
+                        else:
+                            results = [t.start() for t in tools()]
+
+                    profile.disable()
+                    assert not any(results)
+
+                dump_profile_stats(profile, self, 2 if is_batch else 1)
+        finally:
+            dlb.cf.max_parallel_memo_read_count = orig
+
+
+class RedoSchedulingBenchmark(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_long_redo_started_last(self):
+        import asyncio
+
+        class CTool(dlb.ex.Tool):
+            NAME = ''
+            DURATION = 0.0
+
+            async def redo(self, result, context):
+                await asyncio.sleep(self.DURATION)  # like a compiler or linker process
+
+        # many short redos (compilation of small source files), then a long one (e.g. linking a large library)
+        durations = [(f's{i}', 0.02) for i in range(40)] + [('l', 0.3)]
+
+        with dlb.ex.Context():
+            dlb.di.set_threshold_level(dlb.di.WARNING)
+            for n, d in durations:
+                CTool(NAME=n, DURATION=d).start()  # record durations of redos
+
+        # findings:
+        #  - with start() order, the long redo runs (almost) alone at the end
+
+        # times for comparison (41 redos, max_parallel_redo_count = 8):
+        #   420 ms (schedule_redos_by_expected_duration = False)
+        #   310 ms (schedule_redos_by_expected_duration = True)
+
+        orig = dlb.cf.schedule_redos_by_expected_duration
+        try:
+            for schedule_redos_by_expected_duration in [False, True]:
+                dlb.cf.schedule_redos_by_expected_duration = schedule_redos_by_expected_duration
+                with dlb.ex.Context(max_parallel_redo_count=8):
+                    dlb.di.set_threshold_level(dlb.di.WARNING)
+
+                    profile = cProfile.Profile()
+                    profile.enable()
+
+                    for n, d in durations:
+                        CTool(NAME=n, DURATION=d).start(force_redo=True)
+                    dlb.ex.Context.active.complete_pending_redos()
+
+                    profile.disable()
+
+                dump_profile_stats(profile, self, 2 if schedule_redos_by_expected_duration else 1)
+        finally:
+            dlb.cf.schedule_redos_by_expected_duration = orig
+
+
+class CoroutineSequencingBenchmark(unittest.TestCase):
+
+    def test_many_trivial_coroutines(self):
+        import asyncio
+        import dlb.ex._aseq
+
+        async def trivial():
+            await asyncio.sleep(0)
+
+        # findings:
+        #  - waiting for each of the pending tasks with asyncio.wait() for each slot is O(pending) per start
+        #  - creating a task to wait for pending tasks costs more than a trivial coroutine
+        #  - with done callbacks, the time is dominated by the creation and stepping of the tasks by 'asyncio'
+
+        # times for comparison (100000 coroutines each, max. 64 pending):
+        #   2500 ms / 1450 ms (originally: wait_then_start() / enqueue())
+        #   1070 ms / 1430 ms (current: with done callbacks and without a task for waiting)
+
+        sequencer = dlb.ex._aseq.LimitingCoroutineSequencer(asyncio.get_event_loop())
+
+        profile = cProfile.Profile()
+        profile.enable()
+        for i in range(100000):
+            sequencer.wait_then_start(64, None, trivial)
+        sequencer.complete_all(timeout=None)
+        profile.disable()
+        dump_profile_stats(profile, self, 1)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        for i in range(100000):
+            sequencer.enqueue(64, 0, trivial)
+        sequencer.complete_all(timeout=None)
+        profile.disable()
+        dump_profile_stats(profile, self, 2)
+
+        results, exceptions = sequencer.consume_all()
+        self.assertEqual(200000, len(results))
+
+
 class ImportantImportBenchmark(testenv.TemporaryWorkingDirectoryTestCase):
 
     def test_define_tool(self):
@@ -180,3 +446,39 @@ class ImportantImportBenchmark(testenv.TemporaryWorkingDirectoryTestCase):
 
         profile.disable()
         dump_profile_stats(profile, self, 1)
+
+    def test_import_time_of_dlb_ex_is_within_budget(self):
+        import_time_by_module = run_with_import_times('import dlb.ex')[0]
+
+        # findings:
+        #  - 'sqlite3' and 'hashlib' (OpenSSL) together take about a third of the import time of 'dlb.ex'
+        #  - 'inspect' and 'datetime' cannot be avoided: imported by 'dataclasses' and 'dlb.cf'
+
+        # times for comparison (with compiled bytecode):
+        #   77 ms (originally)
+        #   52 ms (current - 'sqlite3', 'hashlib' and 'dlb.ex._fsjournal' imported when needed)
+
+        # modules not needed to define tool classes
+        for module_name in ['sqlite3', 'hashlib', 'dlb.ex._fsjournal']:
+            self.assertNotIn(module_name, import_time_by_module)
+
+        self.assertLess(import_time_by_module['dlb.ex'], IMPORT_TIME_BUDGET_OF_DLB_EX)
+
+    def test_startup_time_of_typical_script(self):
+        # like example/c-minimal/build-all.py
+        import_time_by_module = run_with_import_times(
+            'import dlb.fs\n'
+            'import dlb.ex\n'
+            'import dlb_contrib.gcc\n'
+            'with dlb.ex.Context():\n'
+            '    pass\n')[0]
+
+        # findings:
+        #  - import of 'dlb.ex' dominates the startup, followed by 'dlb.fs'
+        #  - entering the root context (opening the run-database) is small in comparison
+
+        # times for comparison (with compiled bytecode):
+        #   75 ms (current - import of 'dlb', 'dlb.fs', 'dlb.ex' and 'dlb_contrib.gcc'; 54 ms of it for 'dlb.ex')
+        #   3 ms (current - entering of root context)
+
+        self.assertNotIn('dlb_contrib.gnumake', import_time_by_module)
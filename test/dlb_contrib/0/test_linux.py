@@ -397,3 +397,131 @@ class CpuInfoTest(testenv.TemporaryWorkingDirectoryTestCase):
                 print(f'    {key!r}: {value_by_key[key]!r}')
 
         print(repr(cpu_info))
+
+
+class LoadInfoTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def test_is_correct_for_typical(self):
+        with open('loadavg', 'xb') as f:
+            f.write(b'0.50 0.41 0.38 3/1432 12345\n')
+
+        info = dlb_contrib.linux.get_load_info(proc_root_directory='.')
+        self.assertEqual((0.5, 0.41, 0.38, 3), info)
+
+    def test_fails_for_unexpected_content(self):
+        with open('loadavg', 'xb') as f:
+            f.write(b'0.50 0.41 0.38\n')
+
+        with self.assertRaises(RuntimeError) as cm:
+            dlb_contrib.linux.get_load_info(proc_root_directory='.')
+        self.assertEqual("unexpected content in 'loadavg': b'0.50 0.41 0.38\\n'", str(cm.exception))
+
+    @unittest.skipUnless(sys.platform == 'linux', 'requires Linux')
+    def test_can_query_running_kernel(self):
+        _, _, _, runnable_count = dlb_contrib.linux.get_load_info()
+        self.assertGreaterEqual(runnable_count, 1)
+
+
+class CgroupTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.mkdir('self')
+        with open(os.path.join('self', 'cgroup'), 'xb') as f:
+            f.write(b'4:memory:/ignored\n0::/ci.slice/job\n')
+        os.makedirs(os.path.join('cg', 'ci.slice', 'job'))
+
+    @staticmethod
+    def write_cgroup_file(path, content: bytes):
+        with open(os.path.join('cg', path), 'xb') as f:
+            f.write(content)
+
+    def test_cpu_limit_is_most_restrictive_of_ancestors(self):
+        self.assertIsNone(dlb_contrib.linux.get_cgroup_cpu_limit(proc_root_directory='.', cgroup_root_directory='cg/'))
+
+        self.write_cgroup_file(os.path.join('ci.slice', 'job', 'cpu.max'), b'max 100000\n')
+        self.write_cgroup_file(os.path.join('ci.slice', 'cpu.max'), b'250000 100000\n')
+        limit = dlb_contrib.linux.get_cgroup_cpu_limit(proc_root_directory='.', cgroup_root_directory='cg/')
+        self.assertEqual(2.5, limit)
+        self.assertLessEqual(
+            dlb_contrib.linux.get_usable_cpu_count(proc_root_directory='.', cgroup_root_directory='cg/'), 3)
+
+    def test_memory_info_is_the_one_with_least_unused_memory(self):
+        self.assertIsNone(dlb_contrib.linux.get_cgroup_memory_info(proc_root_directory='.', cgroup_root_directory='cg/'))
+
+        self.write_cgroup_file(os.path.join('ci.slice', 'job', 'memory.max'), b'4000\n')
+        self.write_cgroup_file(os.path.join('ci.slice', 'job', 'memory.current'), b'1000\n')
+        self.write_cgroup_file(os.path.join('ci.slice', 'memory.max'), b'8000\n')
+        self.write_cgroup_file(os.path.join('ci.slice', 'memory.current'), b'6000\n')
+        self.write_cgroup_file(os.path.join('memory.max'), b'max\n')
+        info = dlb_contrib.linux.get_cgroup_memory_info(proc_root_directory='.', cgroup_root_directory='cg/')
+        self.assertEqual((8000, 6000), info)
+
+    def test_fails_for_unexpected_cpu_limit(self):
+        self.write_cgroup_file(os.path.join('ci.slice', 'cpu.max'), b'100000\n')
+        with self.assertRaises(RuntimeError) as cm:
+            dlb_contrib.linux.get_cgroup_cpu_limit(proc_root_directory='.', cgroup_root_directory='cg/')
+        self.assertEqual("unexpected content in 'cg/ci.slice/cpu.max': ('100000',)", str(cm.exception))
+
+    def test_no_limit_without_cgroup_v2(self):
+        with open(os.path.join('self', 'cgroup'), 'wb') as f:
+            f.write(b'4:memory:/ignored\n')
+        self.write_cgroup_file('cpu.max', b'100000 100000\n')
+        self.assertIsNone(dlb_contrib.linux.get_cgroup_cpu_limit(proc_root_directory='.', cgroup_root_directory='cg/'))
+
+
+class LoadAwareRedoAdmissionTest(testenv.TemporaryWorkingDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.mkdir('self')
+        with open(os.path.join('self', 'cgroup'), 'xb') as f:
+            f.write(b'0::/\n')
+        os.mkdir('cg')
+        with open(os.path.join('cg', 'cpu.max'), 'xb') as f:
+            f.write(b'200000 100000\n')  # 2 CPUs
+        self.write_load_and_memory(runnable_count=1, available_memory_kib=4096)
+
+    @staticmethod
+    def write_load_and_memory(runnable_count: int, available_memory_kib: int):
+        with open('loadavg', 'wb') as f:
+            f.write(f'1.00 1.00 1.00 {runnable_count}/100 1234\n'.encode())
+        with open('meminfo', 'wb') as f:
+            f.write(f'MemTotal: 8192 kB\nMemAvailable: {available_memory_kib} kB\n'.encode())
+
+    def test_admits_while_load_and_memory_allow(self):
+        admit = dlb_contrib.linux.LoadAwareRedoAdmission(min_available_memory=2048 * 2**10,
+                                                         proc_root_directory='.', cgroup_root_directory='cg/')
+        self.assertLessEqual(admit.cpu_count, 2)
+        self.assertEqual(4096 * 2**10, admit.get_available_memory())
+        self.assertTrue(admit(1))
+
+        self.write_load_and_memory(runnable_count=3, available_memory_kib=4096)
+        self.assertFalse(admit(1))
+
+        self.write_load_and_memory(runnable_count=1, available_memory_kib=1024)
+        self.assertFalse(admit(1))
+
+    def test_admits_between_min_and_max(self):
+        self.write_load_and_memory(runnable_count=10, available_memory_kib=4096)
+        admit = dlb_contrib.linux.LoadAwareRedoAdmission(min_count=2, max_count=3, min_available_memory=0,
+                                                         proc_root_directory='.', cgroup_root_directory='cg/')
+        self.assertTrue(admit(1))
+        self.assertFalse(admit(2))
+
+        self.write_load_and_memory(runnable_count=1, available_memory_kib=4096)
+        self.assertTrue(admit(2))
+        self.assertFalse(admit(3))
+
+    def test_unknown_information_does_not_restrict(self):
+        admit = dlb_contrib.linux.LoadAwareRedoAdmission(proc_root_directory='nonexistent/',
+                                                         cgroup_root_directory='nonexistent/')
+        self.assertGreaterEqual(admit.cpu_count, 1)  # from CPU affinity mask
+        self.assertIsNone(admit.get_available_memory())
+        self.assertTrue(admit(100))
+
+    @unittest.skipUnless(sys.platform == 'linux', 'requires Linux')
+    def test_can_query_running_kernel(self):
+        admit = dlb_contrib.linux.LoadAwareRedoAdmission(min_available_memory=0)
+        self.assertGreaterEqual(admit.cpu_count, 1)
+        self.assertTrue(admit(0))